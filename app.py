@@ -8,7 +8,6 @@ import os
 import sys
 import logging
 from pathlib import Path
-import tempfile
 import uuid
 from typing import List, Dict, Any, Optional
 import pandas as pd
@@ -23,20 +22,80 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # RAG rendszer import
-from src.rag_system import RAGSystem
+from src.serving import SharedRAGService
+from src.ingestion import IngestionQueue
 from src.utils.session_manager import SessionManager
 from src.monitoring.analytics import Analytics
 from src.monitoring.metrics import MetricsCollector
+from src.utils.rate_limiter import request_priority
 
 # -----------------------------
 # UI helper functions
 # -----------------------------
-def _get_doc_count() -> int:
+@st.cache_resource(show_spinner="RAG rendszer betöltése...")
+def get_rag_service() -> SharedRAGService:
+    """
+    Folyamatonként egyetlen RAG kiszolgáló mag, amelyet minden böngésző
+    session megoszt (a modellek, a Chroma kliens és a metrikák egyszer töltődnek be)
+    """
+    service = SharedRAGService()
+    # EAGER LOADING: az első oldalbetöltés már a meglévő dokumentumokat látja
+    service.system
+    return service
+
+
+@st.cache_resource
+def get_ingestion_queue() -> IngestionQueue:
+    """Folyamat szintű háttér feldolgozó sor a megosztott RAG példány fölött"""
+    return IngestionQueue(get_rag_service(), owner='app')
+
+
+INGESTION_STATUS_LABELS = {
+    'queued': "⏳ Sorban áll",
+    'running': "⚙️ Feldolgozás",
+    'completed': "✅ Kész",
+    'failed': "❌ Hiba",
+    'cancelled': "⛔ Megszakítva",
+}
+
+
+def _ingestion_jobs_view():
+    jobs = get_ingestion_queue().jobs()[:5]
+    if not jobs:
+        return
+    st.subheader("📥 Feldolgozás")
+    for job in jobs:
+        progress = job['progress']
+        names = ", ".join(job['file_names'])
+        st.caption(f"{INGESTION_STATUS_LABELS.get(job['status'], job['status'])}: {names}")
+        if job['status'] not in ('completed', 'failed', 'cancelled'):
+            st.progress(
+                job['fraction'],
+                text=(
+                    f"{progress['pages_parsed']} oldal, {progress['chunks_embedded']}/{progress['chunks_total']} "
+                    f"chunk embeddelve, {progress['chunks_written']} kiírva"
+                )
+            )
+            if st.button("Megszakítás", key=f"cancel_{job['job_id']}", use_container_width=True):
+                get_ingestion_queue().cancel(job['job_id'])
+                st.rerun()
+        elif job['error']:
+            st.caption(f"↳ {job['error']}")
+
+
+# Futó job-ok mellett a lista magától frissül (a chat közben használható)
+if hasattr(st, 'fragment'):
+    _render_ingestion_jobs = st.fragment(run_every=2)(_ingestion_jobs_view)
+else:
+    _render_ingestion_jobs = _ingestion_jobs_view
+
+
+def _get_doc_count(rag_system) -> int:
     try:
-        if st.session_state.rag_system is None:
+        if rag_system is None:
             logger.warning("_get_doc_count: rag_system is None")
             return 0
-        stats = st.session_state.rag_system.get_stats()
+        stats = rag_system.get_stats()
         doc_count = int(stats.get("vector_db", {}).get("document_count", 0) or 0)
         logger.info(f"_get_doc_count: {doc_count}")
         return doc_count
@@ -79,11 +138,11 @@ def _format_source(doc: Dict[str, Any], idx: int) -> str:
     return " ".join(parts)
 
 
-def _handle_feedback(message_id: str, rating: str, query: str = None, response: str = None):
+def _handle_feedback(rag_system, message_id: str, rating: str, query: str = None, response: str = None):
     """Handle user feedback submission"""
     try:
-        if st.session_state.rag_system and st.session_state.rag_system.metrics_collector:
-            st.session_state.rag_system.metrics_collector.record_user_feedback(
+        if rag_system and rag_system.metrics_collector:
+            rag_system.metrics_collector.record_user_feedback(
                 message_id=message_id,
                 rating=rating,
                 query=query,
@@ -96,7 +155,7 @@ def _handle_feedback(message_id: str, rating: str, query: str = None, response:
     return False
 
 
-def _render_message(message: Dict[str, Any], show_sources: bool, show_feedback: bool = True):
+def _render_message(rag_system, message: Dict[str, Any], show_sources: bool, show_feedback: bool = True):
     role = message.get("role", "assistant")
     content = message.get("content", "")
     context = message.get("context")
@@ -114,7 +173,7 @@ def _render_message(message: Dict[str, Any], show_sources: bool, show_feedback:
                         st.caption(text[:800] + ("…" if len(text) > 800 else ""))
 
         # Feedback gombok asszisztens válaszokhoz
-        if show_feedback and role == "assistant" and st.session_state.rag_system:
+        if show_feedback and role == "assistant" and rag_system:
             feedback_key = f"feedback_{message_id}"
 
             # Ha még nincs feedback adva
@@ -124,13 +183,13 @@ def _render_message(message: Dict[str, Any], show_sources: bool, show_feedback:
 
                 with col1:
                     if st.button("👍", key=f"pos_{message_id}", help="Hasznos"):
-                        if _handle_feedback(message_id, "positive", response=content):
+                        if _handle_feedback(rag_system, message_id, "positive", response=content):
                             st.session_state[feedback_key] = "positive"
                             st.rerun()
 
                 with col2:
                     if st.button("👎", key=f"neg_{message_id}", help="Nem hasznos"):
-                        if _handle_feedback(message_id, "negative", response=content):
+                        if _handle_feedback(rag_system, message_id, "negative", response=content):
                             st.session_state[feedback_key] = "negative"
                             st.rerun()
             else:
@@ -147,17 +206,8 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Session state inicializálása - EAGER LOADING!
-# Betöltjük a RAG rendszert az oldal betöltésekor, hogy lássa a meglévő dokumentumokat
-if 'rag_system' not in st.session_state:
-    try:
-        st.session_state.rag_system = RAGSystem()
-        logger.info("RAG rendszer inicializálva (eager loading)")
-    except Exception as e:
-        st.error(f"RAG rendszer inicializálási hiba: {e}")
-        logger.error(f"RAG init hiba: {e}")
-        st.session_state.rag_system = None
-
+# Session state inicializálása: csak a session saját állapota (history, kapcsolók);
+# a RAG rendszer a folyamat szintű megosztott példány (get_rag_service)
 if 'session_manager' not in st.session_state:
     st.session_state.session_manager = SessionManager()
 
@@ -168,7 +218,7 @@ if 'messages' not in st.session_state:
     st.session_state.messages = []
 
 # Főoldal
-def main_page():
+def main_page(rag_system):
     """Főoldal - Chat és dokumentum feltöltés"""
     st.title("🤖 RAG Alapú AI Asszisztens")
     st.markdown("---")
@@ -199,51 +249,56 @@ def main_page():
         if st.button("Dokumentumok Hozzáadása", type="primary"):
             if not uploaded_files:
                 st.warning("Előbb válassz ki legalább 1 fájlt.")
-            elif st.session_state.rag_system is None:
+            elif rag_system is None:
                 st.error("RAG rendszer nem inicializálódott. Frissítsd az oldalt (F5).")
             else:
-                with st.spinner("Dokumentumok feldolgozása..."):
-                    # Fájlok mentése ideiglenes könyvtárba
-                    temp_dir = Path(tempfile.mkdtemp())
-                    file_paths = []
-                    
-                    for uploaded_file in uploaded_files:
-                        file_path = temp_dir / uploaded_file.name
-                        with open(file_path, "wb") as f:
-                            f.write(uploaded_file.getbuffer())
-                        file_paths.append(str(file_path))
-                    
-                    # Dokumentumok hozzáadása a RAG rendszerhez
-                    try:
-                        st.session_state.rag_system.add_documents(file_paths)
-                        st.success(f"{len(file_paths)} dokumentum sikeresen hozzáadva!")
-                        # Automatikus oldal frissítés a dokumentum szám frissítéséhez
-                        st.rerun()
-                    except Exception as e:
-                        st.error(f"Hiba a dokumentumok hozzáadásánál: {e}")
-                        logger.error(f"Dokumentum hozzáadás hiba: {e}")
+                # Háttér feldolgozás: a session (és a chat) közben használható marad
+                try:
+                    job = get_ingestion_queue().submit_uploads(
+                        (uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files
+                    )
+                    st.success(f"{len(job.files)} dokumentum feldolgozásra vár (job: `{job.job_id}`)")
+                except Exception as e:
+                    st.error(f"Hiba a dokumentumok hozzáadásánál: {e}")
+                    logger.error(f"Dokumentum hozzáadás hiba: {e}")
+
+        if rag_system is not None:
+            _render_ingestion_jobs()
         
         st.markdown("---")
         st.header("ℹ️ Információk")
         
         # Rendszer statisztikák
-        doc_count = _get_doc_count()
+        doc_count = _get_doc_count(rag_system)
         st.metric("Dokumentumok (vector DB)", doc_count)
         st.caption(f"Session: `{st.session_state.current_session_id}`")
+
+        # Konfiguráció változás (pl. .env) után új megosztott példány; a
+        # folyamatban lévő kérések a régin fejeződnek be
+        if rag_system is not None:
+            service_stats = get_rag_service().stats()
+            st.caption(
+                f"Megosztott RAG példány: v{service_stats['version']}, "
+                f"aktív kérések: {service_stats['active_leases']}"
+            )
+            if st.button("Konfiguráció újratöltése", use_container_width=True):
+                with st.spinner("RAG rendszer újratöltése..."):
+                    get_rag_service().reload(reload_env=True)
+                st.rerun()
     
     # Chat felület
     st.header("💬 Chat")
     
     # Üzenetek megjelenítése
     for message in st.session_state.messages:
-        _render_message(message, show_sources=show_sources)
+        _render_message(rag_system, message, show_sources=show_sources)
     
     # Chat input ellenőrzések
-    if st.session_state.rag_system is None:
+    if rag_system is None:
         st.error("⚠️ RAG rendszer nem inicializálódott. Frissítsd az oldalt (F5).")
         return
 
-    doc_count = _get_doc_count()
+    doc_count = _get_doc_count(rag_system)
     if doc_count <= 0:
         st.info("📄 Nincs dokumentum a vector adatbázisban. Tölts fel PDF/TXT/DOCX fájlokat a bal oldali feltöltővel!")
         return
@@ -277,7 +332,7 @@ def main_page():
                 ]
 
                 # Streaming válasz
-                response = st.session_state.rag_system.query(
+                response = rag_system.query(
                     prompt, stream=True, conversation_history=chat_history
                 )
 
@@ -304,26 +359,8 @@ def main_page():
                         message_placeholder.markdown(full_response + "▌")
 
                     message_placeholder.markdown(full_response)
-
-                # LLM metrikák rögzítése streaming után
-                try:
-                    estimated_tokens = len(full_response.split()) * 1.3
-                    prompt_tokens = int(estimated_tokens * 0.7)
-                    completion_tokens = int(estimated_tokens * 0.3)
-                    model_name = st.session_state.rag_system.llm_generator.model_name
-
-                    cost = st.session_state.rag_system.metrics_collector.calculate_cost(
-                        model_name, prompt_tokens, completion_tokens
-                    )
-
-                    st.session_state.rag_system.metrics_collector.record_llm_call(
-                        prompt_tokens=prompt_tokens,
-                        completion_tokens=completion_tokens,
-                        model=model_name,
-                        cost=cost
-                    )
-                except Exception as metric_error:
-                    logger.warning(f"Metrika rögzítés hiba: {metric_error}")
+                    # LLM metrikák (TTFT, tokens/sec, token usage) rögzítését
+                    # a StreamingGenerator végzi a stream lezárásakor
 
                 if show_sources and context_docs:
                     with st.expander("Források / Kontextus", expanded=False):
@@ -340,12 +377,12 @@ def main_page():
                 feedback_key = f"feedback_{assistant_msg_id}"
                 with col1:
                     if st.button("👍", key=f"pos_{assistant_msg_id}", help="Hasznos"):
-                        if _handle_feedback(assistant_msg_id, "positive", query=prompt, response=full_response):
+                        if _handle_feedback(rag_system, assistant_msg_id, "positive", query=prompt, response=full_response):
                             st.session_state[feedback_key] = "positive"
 
                 with col2:
                     if st.button("👎", key=f"neg_{assistant_msg_id}", help="Nem hasznos"):
-                        if _handle_feedback(assistant_msg_id, "negative", query=prompt, response=full_response):
+                        if _handle_feedback(rag_system, assistant_msg_id, "negative", query=prompt, response=full_response):
                             st.session_state[feedback_key] = "negative"
 
                 # Válasz mentése
@@ -376,13 +413,13 @@ def main_page():
 
 
 # Monitoring oldal
-def monitoring_page():
+def monitoring_page(rag_system):
     """Monitoring és analitika oldal"""
     st.title("📊 Monitoring és Analitika")
     st.markdown("---")
     
     try:
-        metrics_collector = st.session_state.rag_system.metrics_collector
+        metrics_collector = rag_system.metrics_collector
         analytics = Analytics(metrics_collector)
         
         # Statisztikák
@@ -401,6 +438,50 @@ def monitoring_page():
             st.metric("Átlagos Válaszidő", f"{avg_time:.2f}s" if avg_time else "N/A")
         
         st.markdown("---")
+
+        # Erőforrás telemetria
+        st.subheader("🖥️ Erőforrások")
+        resources = rag_system.resource_monitor.get_stats()
+
+        def _mb(value) -> str:
+            return f"{value / 1024 / 1024:,.1f} MB" if value else "N/A"
+
+        vector_info = resources.get('vector_store', {}) or {}
+        metrics_info = resources.get('metrics', {}) or {}
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Process RSS", _mb(resources.get('rss_bytes')))
+        with col2:
+            st.metric("Vektor DB (lemez)", _mb(vector_info.get('disk_bytes')))
+        with col3:
+            st.metric("Vektorok (memória, becsült)", _mb(vector_info.get('vector_bytes')))
+        with col4:
+            st.metric("Metrika eventek", f"{metrics_info.get('events', 0):,}",
+                      help=f"Becsült memória: {_mb(metrics_info.get('memory_bytes'))}")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            models = resources.get('models', {})
+            st.dataframe(
+                pd.DataFrame([
+                    {'Modell': name, 'Paraméter memória': _mb(size) if size else "nincs betöltve"}
+                    for name, size in models.items()
+                ]),
+                use_container_width=True
+            )
+        with col2:
+            caches = resources.get('caches', {})
+            st.dataframe(
+                pd.DataFrame([
+                    {'Cache': name, 'Bejegyzések': info['entries'], 'Méret': _mb(info['bytes'])}
+                    for name, info in caches.items()
+                ]),
+                use_container_width=True
+            )
+        if resources.get('shrink_events'):
+            st.warning(f"Cache zsugorítás memória küszöb miatt: {resources['shrink_events']} alkalommal")
+
+        st.markdown("---")
         
         # Napi használat grafikon
         st.subheader("Napi Használat")
@@ -517,17 +598,16 @@ def monitoring_page():
 
 
 # Evaluation oldal
-def evaluation_page():
+def evaluation_page(rag_system):
     """Evaluation oldal - RAG, Prompt, App szintű értékelés az UI-ból"""
     st.title("🧪 Evaluation")
     st.markdown("---")
 
-    if st.session_state.rag_system is None:
+    if rag_system is None:
         st.error("RAG rendszer nem inicializálódott. Frissítsd az oldalt (F5).")
         return
 
-    rag_system = st.session_state.rag_system
-    doc_count = _get_doc_count()
+    doc_count = _get_doc_count(rag_system)
 
     from src.evaluation.rag_eval import RAGEvaluator
     from src.evaluation.prompt_eval import PromptEvaluator
@@ -729,7 +809,22 @@ def evaluation_page():
             c2.metric("Átlag Total Time", f"{res.get('avg_total_time', 0):.2f}s")
             c3.metric("P95 First Token", f"{res.get('p95_first_token_time', 0):.2f}s")
             c4.metric("P95 Total Time", f"{res.get('p95_total_time', 0):.2f}s")
-            st.caption(f"{res.get('num_queries', 0)} query x {res.get('num_runs_per_query', 0)} futtatás")
+            st.caption(f"{res.get('num_queries', 0)} query x {res.get('num_runs_per_query', 0)} futtatás (warm cache)")
+
+            if res.get('cold') and res.get('warm'):
+                phases = pd.DataFrame([
+                    {
+                        'Cache': phase,
+                        'TTFT p50 (s)': res[phase]['ttft']['p50'],
+                        'TTFT p95 (s)': res[phase]['ttft']['p95'],
+                        'Inter-token p95 (ms)': res[phase]['inter_token_latency']['p95'] * 1000,
+                        'Retrieval átlag (s)': res[phase]['retrieval_time']['mean'],
+                        'Generálás átlag (s)': res[phase]['generation_time']['mean'],
+                        'Total p95 (s)': res[phase]['total_time']['p95'],
+                    }
+                    for phase in ('cold', 'warm')
+                ])
+                st.dataframe(phases, use_container_width=True)
 
         st.markdown("---")
 
@@ -788,8 +883,24 @@ def main():
     st.sidebar.title("Navigáció")
     selected_page = st.sidebar.radio("Válassz oldalt", list(pages.keys()))
     
+    try:
+        rag_service = get_rag_service()
+    except Exception as e:
+        st.error(f"RAG rendszer inicializálási hiba: {e}")
+        logger.error(f"RAG init hiba: {e}")
+        rag_service = None
+
     # Kiválasztott oldal megjelenítése
-    pages[selected_page]()
+    # Az evaluation LLM hívásai batch prioritással futnak, hogy ne éheztessék ki a chatet
+    priority = 'batch' if pages[selected_page] is evaluation_page else 'interactive'
+    with request_priority(priority):
+        if rag_service is None:
+            pages[selected_page](None)
+        else:
+            # A teljes futás (a stream végigolvasásával együtt) ugyanazt a példányt
+            # használja; egy közben történt reload ezt a kérést nem szakítja meg
+            with rag_service.lease() as rag_system:
+                pages[selected_page](rag_system)
 
 
 if __name__ == "__main__":
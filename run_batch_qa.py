@@ -0,0 +1,82 @@
+"""
+Tömeges kérdés-válasz futtatás script
+CSV vagy JSONL kérdéslista megválaszolása batch-ekben, folytatható
+(checkpointolt) JSONL kimenettel.
+
+Példák:
+    python run_batch_qa.py --input tickets.csv --question-field subject
+    python run_batch_qa.py --input faq.jsonl --output ./data/faq_answers.jsonl --batch-size 64 --workers 8
+    python run_batch_qa.py --input faq.jsonl --restart
+"""
+
+import os
+import sys
+import logging
+import argparse
+from pathlib import Path
+
+# Logging beállítása
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """Fő függvény"""
+    parser = argparse.ArgumentParser(description='RAG Batch Q&A')
+    parser.add_argument('--input', required=True, help='Kérdések (CSV vagy JSONL)')
+    parser.add_argument('--output', default=None,
+                        help='Kimeneti JSONL, egyben checkpoint (alapértelmezett: <input>.answers.jsonl)')
+    parser.add_argument('--question-field', default=None, help='Kérdés oszlop (alapértelmezett: question / query)')
+    parser.add_argument('--id-field', default='id', help='Azonosító oszlop (hiányában a sorszám)')
+    parser.add_argument('--batch-size', type=int, default=32, help='Kérdések száma batch-enként')
+    parser.add_argument('--workers', type=int, default=4, help='Párhuzamos generálások száma')
+    parser.add_argument('--top-k', type=int, default=None)
+    parser.add_argument('--restart', action='store_true', help='A korábbi kimenet törlése, újrakezdés')
+    parser.add_argument('--backend', choices=['real', 'fake'], default=None,
+                        help='Modell backend (fake = offline, determinisztikus; alapértelmezett: MODEL_BACKEND)')
+    args = parser.parse_args()
+
+    # A backend választásnak a modellek importja előtt kell érvényesülnie
+    if args.backend:
+        os.environ['MODEL_BACKEND'] = args.backend
+
+    from src.rag_system import RAGSystem
+    from src.batch_qa import BatchQARunner, read_questions
+    from src.utils.rate_limiter import request_priority
+
+    input_path = Path(args.input)
+    output_path = Path(args.output) if args.output else input_path.with_suffix('.answers.jsonl')
+    questions = read_questions(str(input_path), args.question_field, args.id_field)
+    if not questions:
+        print("Nincs feldolgozható kérdés")
+        sys.exit(1)
+    if args.restart and output_path.exists():
+        output_path.unlink()
+
+    runner = BatchQARunner(
+        RAGSystem(),
+        str(output_path),
+        batch_size=args.batch_size,
+        max_workers=args.workers,
+        top_k=args.top_k
+    )
+
+    def progress(done: int, total: int):
+        print(f"\r{done}/{total} kérdés", end='', flush=True)
+
+    # Batch prioritás: a közös rate limiteren az interaktív forgalom előzi
+    with request_priority('batch'):
+        summary = runner.run(questions, progress_callback=progress)
+
+    print(f"\n\n=== Batch Q&A ({summary['wall_time']:.1f}s, {summary['questions_per_sec']:.2f} kérdés/s) ===")
+    print(f"Összes kérdés: {summary['total']}")
+    print(f"Korábbi futásból kész: {summary['skipped']}")
+    print(f"Megválaszolva: {summary['answered']} (ebből abstain: {summary['abstained']})")
+    if summary['failed']:
+        print(f"Sikertelen (a következő futás újrapróbálja): {len(summary['failed'])}")
+    print(f"\nEredmények: {output_path}")
+    sys.exit(1 if summary['failed'] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark futtatás script
+Stage szintű micro-benchmarkok szintetikus korpuszon, baseline összehasonlítással.
+
+Példák:
+    python run_benchmark.py --backend fake
+    python run_benchmark.py --backend fake --save-baseline
+    python run_benchmark.py --backend fake --baseline ./benchmarks/baseline.json --tolerance 0.15
+    python run_benchmark.py --stages vector_store --vector-sizes 1000,100000,1000000
+"""
+
+import os
+import sys
+import logging
+import argparse
+
+# Logging beállítása
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTPUT = "./benchmarks/benchmark_results.json"
+DEFAULT_BASELINE = "./benchmarks/baseline.json"
+
+
+def _print_results(results: dict):
+    print("\n=== Benchmark Eredmények ===")
+    for stage, metrics in results['stages'].items():
+        print(f"\n[{stage}]")
+        for name, value in metrics.items():
+            print(f"  {name}: {value:.3f}" if isinstance(value, float) else f"  {name}: {value}")
+
+
+def _print_comparison(rows: list, tolerance: float) -> int:
+    print(f"\n=== Összehasonlítás a baseline-nal (tolerancia: {tolerance:.0%}) ===")
+    regressions = 0
+    for row in rows:
+        flag = "REGRESSZIÓ" if row['regression'] else "ok"
+        regressions += row['regression']
+        print(
+            f"  [{flag:>10}] {row['stage']}.{row['metric']}: "
+            f"{row['baseline']:.3f} -> {row['current']:.3f} ({row['change']:+.1%})"
+        )
+    return regressions
+
+
+def main():
+    """Fő függvény"""
+    parser = argparse.ArgumentParser(description='RAG Benchmark Runner')
+    parser.add_argument('--stages', default='', help='Stage-ek vesszővel (üres = mind)')
+    parser.add_argument('--backend', choices=['real', 'fake'], default=None,
+                        help='Modell backend (fake = offline, determinisztikus; alapértelmezett: MODEL_BACKEND)')
+    parser.add_argument('--pages', type=int, default=50, help='Szintetikus kézikönyv oldalszáma')
+    parser.add_argument('--vector-sizes', default='1000,10000', help='VectorStore méretek (chunkok), pl. 1000,100000,1000000')
+    parser.add_argument('--embed-texts', type=int, default=256, help='Embedding benchmark szövegeinek száma')
+    parser.add_argument('--queries', type=int, default=20, help='Lekérdezések száma a latency mérésekhez')
+    parser.add_argument('--seed', type=int, default=42, help='Korpusz seed')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='Eredmény JSON')
+    parser.add_argument('--baseline', default=None, help=f'Baseline JSON összehasonlításhoz (pl. {DEFAULT_BASELINE})')
+    parser.add_argument('--save-baseline', action='store_true', help='Az eredmény mentése baseline-ként is')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Megengedett relatív romlás (0.1 = 10%%)')
+    args = parser.parse_args()
+
+    # A backend választásnak a modellek importja előtt kell érvényesülnie
+    if args.backend:
+        os.environ['MODEL_BACKEND'] = args.backend
+
+    from src.benchmark import BenchmarkSuite, STAGES, compare_results, load_results, save_results
+
+    selected = [s.strip() for s in args.stages.split(',') if s.strip()] or STAGES
+    unknown = set(selected) - set(STAGES)
+    if unknown:
+        parser.error(f"Ismeretlen stage: {', '.join(sorted(unknown))} (választható: {', '.join(STAGES)})")
+
+    suite = BenchmarkSuite(
+        pages=args.pages,
+        vector_sizes=[int(n) for n in args.vector_sizes.split(',') if n.strip()],
+        embed_texts=args.embed_texts,
+        queries=args.queries,
+        seed=args.seed
+    )
+    results = suite.run(selected)
+    save_results(results, args.output)
+    _print_results(results)
+    print(f"\nEredmények mentve: {args.output}")
+
+    if args.save_baseline:
+        save_results(results, DEFAULT_BASELINE)
+        print(f"Baseline mentve: {DEFAULT_BASELINE}")
+
+    if args.baseline:
+        rows = compare_results(results, load_results(args.baseline), args.tolerance)
+        regressions = _print_comparison(rows, args.tolerance)
+        if regressions:
+            print(f"\n[FAIL] {regressions} metrika romlott a baseline-hoz képest")
+            sys.exit(1)
+        print("\n[OK] Nincs regresszió")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,9 @@ Evaluation futtatás script
 
 import os
 import sys
+import time
 import logging
+from functools import partial
 from pathlib import Path
 
 # Logging beállítása
@@ -17,9 +19,12 @@ from src.evaluation.rag_eval import RAGEvaluator
 from src.evaluation.prompt_eval import PromptEvaluator
 from src.evaluation.app_eval import AppEvaluator
 from src.evaluation.test_cases import RAG_TEST_CASES, PROMPT_TEST_CASES, APP_TEST_CASES
+from src.evaluation.parallel_runner import ParallelRunner, parse_suite_limits, run_suites_in_processes
+from src.evaluation.retrieval_memo import RetrievalMemo
+from src.utils.rate_limiter import request_priority
 
 
-def run_rag_evaluation():
+def run_rag_evaluation(runner: ParallelRunner = None, memo: RetrievalMemo = None):
     """RAG szintű evaluation futtatása"""
     logger.info("RAG szintű evaluation indítása...")
     
@@ -30,13 +35,18 @@ def run_rag_evaluation():
         # Evaluator inicializálása
         evaluator = RAGEvaluator(
             vector_store=rag_system.vector_store,
-            retrieval_engine=rag_system.retrieval_engine,
+            retrieval_engine=memo.wrap(rag_system.retrieval_engine) if memo else rag_system.retrieval_engine,
             embedding_model=rag_system.embedding_model,
-            chunking_strategy=rag_system.chunking
+            chunking_strategy=rag_system.chunking,
+            runner=runner
         )
         
         # Evaluation futtatása
         results = evaluator.run_full_evaluation(RAG_TEST_CASES)
+        if runner is not None:
+            results['timing'] = {
+                suite: runner.timing_report(suite) for suite in ('rag_retrieval', 'rag_embedding')
+            }
         
         # Eredmények mentése
         output_path = Path("./evaluations/rag_evaluation_results.json")
@@ -65,7 +75,7 @@ def run_rag_evaluation():
         raise
 
 
-def run_prompt_evaluation():
+def run_prompt_evaluation(runner: ParallelRunner = None, memo: RetrievalMemo = None):
     """Prompt szintű evaluation futtatása"""
     logger.info("Prompt szintű evaluation indítása...")
     
@@ -74,10 +84,16 @@ def run_prompt_evaluation():
         rag_system = RAGSystem()
         
         # Evaluator inicializálása
-        evaluator = PromptEvaluator(llm_generator=rag_system.llm_generator)
+        evaluator = PromptEvaluator(
+            llm_generator=rag_system.llm_generator,
+            runner=runner,
+            retrieval_engine=memo.wrap(rag_system.retrieval_engine) if memo else rag_system.retrieval_engine
+        )
         
         # Evaluation futtatása
         results = evaluator.run_evaluation(PROMPT_TEST_CASES)
+        if runner is not None:
+            results['timing'] = runner.timing_report('prompt')
         
         # Eredmények mentése
         output_path = Path("./evaluations/prompt_evaluation_results.json")
@@ -96,13 +112,21 @@ def run_prompt_evaluation():
         raise
 
 
-def run_app_evaluation():
-    """Alkalmazás szintű evaluation futtatása"""
+def run_app_evaluation(runner: ParallelRunner = None, memo: RetrievalMemo = None):
+    """
+    Alkalmazás szintű evaluation futtatása
+
+    A user journey-k állapotot tartanak (feltöltés, chat előzmények), a latency
+    mérés pedig terhelés nélkül értelmes, ezért ez a suite szekvenciális marad;
+    párhuzamosan csak a többi suite-tal együtt, külön processzben fut.
+    """
     logger.info("Alkalmazás szintű evaluation indítása...")
     
     try:
         # RAG rendszer inicializálása
         rag_system = RAGSystem()
+        if memo is not None:
+            memo.attach(rag_system)
         
         # Evaluator inicializálása
         evaluator = AppEvaluator(rag_system=rag_system)
@@ -118,8 +142,17 @@ def run_app_evaluation():
         print("\n=== Alkalmazás Evaluation Eredmények ===")
         if 'latency' in results:
             latency = results['latency']
-            print(f"Átlagos First Token Time: {latency.get('avg_first_token_time', 0):.3f}s")
-            print(f"Átlagos Total Time: {latency.get('avg_total_time', 0):.3f}s")
+            print(f"Átlagos First Token Time (warm): {latency.get('avg_first_token_time') or 0:.3f}s")
+            print(f"Átlagos Total Time (warm): {latency.get('avg_total_time', 0):.3f}s")
+            for phase in ('cold', 'warm'):
+                stats = latency.get(phase)
+                if stats:
+                    print(
+                        f"  [{phase}] TTFT p50 {stats['ttft']['p50']:.3f}s / p95 {stats['ttft']['p95']:.3f}s, "
+                        f"inter-token p95 {stats['inter_token_latency']['p95'] * 1000:.1f}ms, "
+                        f"retrieval {stats['retrieval_time']['mean']:.3f}s, "
+                        f"generálás {stats['generation_time']['mean']:.3f}s"
+                    )
         
         return results
     
@@ -128,6 +161,64 @@ def run_app_evaluation():
         raise
 
 
+SUITES = {
+    'rag': run_rag_evaluation,
+    'prompt': run_prompt_evaluation,
+    'app': run_app_evaluation,
+}
+
+
+def _isolate_metrics(name: str):
+    """
+    Suite-onként saját metrika fájl (<METRICS_FILE könyvtár>/eval-<suite>/)
+
+    A külön processzekben futó suite-ok így nem írják felül egymás metrikáit
+    (a pool egy processze több suite-ot is futtathat egymás után).
+    """
+    metrics_file = Path(os.getenv('METRICS_FILE', './data/metrics.json'))
+    os.environ['METRICS_FILE'] = str(metrics_file.parent / f"eval-{name}" / metrics_file.name)
+    if os.getenv('METRICS_COLUMNAR_DIR'):
+        os.environ['METRICS_COLUMNAR_DIR'] = str(Path(os.environ['METRICS_COLUMNAR_DIR']) / f"eval-{name}")
+
+
+def _run_suite(name: str, workers: int, suite_limits: dict, memo: RetrievalMemo = None,
+               isolate_metrics: bool = False):
+    """
+    Egy suite futtatása batch prioritással (process pool worker belépési pont)
+
+    A retrieval memo processzen belül közös a suite-ok között; külön
+    processzben futó suite saját memót kap.
+
+    Args:
+        isolate_metrics: Saját metrika fájl a suite-nak (külön processzben futtatáskor)
+    """
+    if isolate_metrics:
+        _isolate_metrics(name)
+    runner = ParallelRunner(max_workers=workers, suite_limits=suite_limits) if workers > 1 else None
+    memo = memo or RetrievalMemo()
+    with request_priority('batch'):
+        return SUITES[name](runner=runner, memo=memo)
+
+
+def _print_timing(results: dict):
+    """Esetenkénti időmérés és speedup kiírása"""
+    timing = results.get('timing') if isinstance(results, dict) else None
+    if not timing:
+        return
+    reports = timing.values() if 'suite' not in timing else [timing]
+    for report in reports:
+        if not report:
+            continue
+        print(
+            f"  [{report['suite']}] {report['num_cases']} eset, {report['workers']} szál: "
+            f"{report['wall_time']:.2f}s wall, {report['total_case_time']:.2f}s összes eset idő, "
+            f"speedup {report['speedup']:.2f}x"
+        )
+        slowest = sorted((c for c in report['cases'] if c), key=lambda c: c['duration'], reverse=True)[:3]
+        for case in slowest:
+            print(f"    leglassabb eset #{case['index']}: {case['duration']:.2f}s")
+
+
 def main():
     """Fő függvény"""
     import argparse
@@ -139,21 +230,60 @@ def main():
         default='all',
         help='Evaluation típusa'
     )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Párhuzamos szálak száma suite-onként (I/O-kötött teszt esetek)'
+    )
+    parser.add_argument(
+        '--suite-workers',
+        default='',
+        help='Suite-onkénti szál limit, pl. "prompt=2,rag_retrieval=8"'
+    )
+    parser.add_argument(
+        '--processes',
+        type=int,
+        default=1,
+        help='A suite-ok párhuzamos futtatása ennyi külön processzben (--type all esetén); '
+             'a retrieval memo ilyenkor nem közös a processzek között, és minden suite '
+             'saját metrika fájlba ír (<METRICS_FILE könyvtár>/eval-<suite>/)'
+    )
     
     args = parser.parse_args()
     
     # Eredmények könyvtár létrehozása
     Path("./evaluations").mkdir(parents=True, exist_ok=True)
+
+    selected = [name for name in SUITES if args.type in (name, 'all')]
+    suite_limits = parse_suite_limits(args.suite_workers)
     
     try:
-        if args.type in ['rag', 'all']:
-            run_rag_evaluation()
-        
-        if args.type in ['prompt', 'all']:
-            run_prompt_evaluation()
-        
-        if args.type in ['app', 'all']:
-            run_app_evaluation()
+        wall_start = time.time()
+        if args.processes > 1 and len(selected) > 1:
+            all_results, report = run_suites_in_processes(
+                {name: partial(_run_suite, name, args.workers, suite_limits, isolate_metrics=True)
+                 for name in selected},
+                args.processes
+            )
+            print(
+                f"\n=== Suite-ok {args.processes} processzen: {report['wall_time']:.2f}s wall, "
+                f"speedup {report['speedup']:.2f}x ==="
+            )
+        else:
+            # Evaluation hívások batch prioritással: a processzek közötti közös rate limit keret
+            # interaktív tartalékát (OPENAI_BATCH_RESERVE) nem használják
+            memo = RetrievalMemo()
+            all_results = {name: _run_suite(name, args.workers, suite_limits, memo) for name in selected}
+            stats = memo.stats()
+            print(
+                f"\nRetrieval memo: {stats['entries']} egyedi keresés, "
+                f"{stats['hits']} találat / {stats['misses']} számolás ({stats['hit_rate']:.1%})"
+            )
+
+        for name in selected:
+            _print_timing(all_results.get(name))
+        print(f"\nTeljes futási idő: {time.time() - wall_start:.2f}s")
         
         print("\n[OK] Osszes evaluation befejezve!")
     
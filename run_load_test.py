@@ -0,0 +1,135 @@
+"""
+Load teszt futtatás script
+A user journey-k párhuzamos visszajátszása növekvő terhelési szinteken.
+
+Példák:
+    python run_load_test.py --backend fake --synthetic-chunks 500 --mode closed --levels 1,2,5,10,20
+    python run_load_test.py --backend fake --synthetic-chunks 500 --mode open --levels 1,5,10,20 --duration 20
+
+A query lépések alapértelmezetten szintetikus, egymástól különböző kérdéseket
+kapnak (--query-pool), hogy a cache-ek és a single-flight ne fedjék el a
+telítődést. A metrikák ideiglenes fájlba kerülnek (--metrics-file), nem a
+production metrics.json-ba.
+"""
+
+import os
+import json
+import shutil
+import logging
+import tempfile
+import argparse
+from pathlib import Path
+
+# Logging beállítása
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def _print_report(report: dict):
+    unit = 'felhasználó' if report['mode'] == 'closed' else 'érkezés/mp'
+    print(f"\n=== Load teszt ({report['mode']} modell, {report['duration']:.0f}s / szint) ===")
+    print(f"{'szint':>8} {'journey/s':>10} {'lépés/s':>9} {'p50 (s)':>8} {'p95 (s)':>8} {'p99 (s)':>8} {'hiba':>7}")
+    for level in report['levels']:
+        latency = level['journey_latency']
+        print(
+            f"{level['level']:>8} {level['throughput_journeys_per_sec']:>10.2f} "
+            f"{level['throughput_steps_per_sec']:>9.2f} {latency.get('p50', 0):>8.3f} "
+            f"{latency.get('p95', 0):>8.3f} {latency.get('p99', 0):>8.3f} {level['step_error_rate']:>7.1%}"
+        )
+
+    last = report['levels'][-1]
+    print(f"\nLépés típusonként (legnagyobb szint: {last['level']} {unit}):")
+    for action, stats in last['per_step'].items():
+        print(
+            f"  {action:<30} n={stats['count']:<5} p50={stats.get('p50', 0):.3f}s "
+            f"p95={stats.get('p95', 0):.3f}s hiba={stats['error_rate']:.1%}"
+        )
+
+    knee = report['knee']
+    if knee:
+        print(
+            f"\nTelítődési pont: ~{knee['level']} {unit} ({knee['reason']}), "
+            f"{knee['throughput']:.2f} journey/s, p95 {knee['p95_latency']:.3f}s"
+        )
+    else:
+        print("\nA mért szinteken nem látszik telítődés")
+
+
+def main():
+    """Fő függvény"""
+    parser = argparse.ArgumentParser(description='RAG Load Test Runner')
+    parser.add_argument('--mode', choices=['open', 'closed'], default='closed',
+                        help='closed = fix felhasználószám, open = Poisson érkezési ráta')
+    parser.add_argument('--levels', default='1,2,5,10,20',
+                        help='Terhelési szintek (felhasználók vagy érkezés/mp), növekvő sorrendben')
+    parser.add_argument('--duration', type=float, default=30.0, help='Mérési idő szintenként (mp)')
+    parser.add_argument('--think-time', type=float, default=0.0, help='Zárt modell: szünet két journey között (mp)')
+    parser.add_argument('--max-workers', type=int, default=64, help='Nyitott modell: egyidejű journey-k korlátja')
+    parser.add_argument('--journeys', default='', help='Journey nevek vesszővel (üres = mind)')
+    parser.add_argument('--backend', choices=['real', 'fake'], default=None,
+                        help='Modell backend (fake = offline, determinisztikus; alapértelmezett: MODEL_BACKEND)')
+    parser.add_argument('--synthetic-chunks', type=int, default=0,
+                        help='Szintetikus chunkok betöltése egy ideiglenes vektor adatbázisba (0 = meglévő adatbázis)')
+    parser.add_argument('--query-pool', type=int, default=10000,
+                        help='Különböző szintetikus kérdések száma a query lépésekhez (0 = a journey-k fix kérdései)')
+    parser.add_argument('--metrics-file', default=None,
+                        help='Metrika fájl (alapértelmezett: ideiglenes, a futás végén törölve)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='./evaluations/load_test_results.json', help='Eredmény JSON')
+    args = parser.parse_args()
+
+    # A backend választásnak a modellek importja előtt kell érvényesülnie
+    if args.backend:
+        os.environ['MODEL_BACKEND'] = args.backend
+    temp_dirs = []
+    if args.synthetic_chunks:
+        temp_dirs.append(tempfile.mkdtemp(prefix="rag-load-db-"))
+        os.environ['VECTOR_DB_PATH'] = temp_dirs[-1]
+    if args.metrics_file:
+        os.environ['METRICS_FILE'] = args.metrics_file
+    else:
+        temp_dirs.append(tempfile.mkdtemp(prefix="rag-load-metrics-"))
+        os.environ['METRICS_FILE'] = os.path.join(temp_dirs[-1], 'metrics.json')
+
+    try:
+        _run(args)
+    finally:
+        for path in temp_dirs:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _run(args):
+    from src.rag_system import RAGSystem
+    from src.benchmark.synthetic import SyntheticCorpus
+    from src.evaluation.test_cases import APP_TEST_CASES
+    from src.evaluation.load_test import LoadTestRunner
+
+    journeys = APP_TEST_CASES['user_journeys']
+    if args.journeys:
+        names = {n.strip() for n in args.journeys.split(',')}
+        journeys = [j for j in journeys if j.get('name') in names]
+
+    rag_system = RAGSystem()
+    corpus = SyntheticCorpus(seed=args.seed)
+    if args.synthetic_chunks:
+        from src.benchmark.stages import ingest_chunks
+        ingest_chunks(rag_system, corpus.chunk_texts(args.synthetic_chunks))
+
+    queries = corpus.queries(args.query_pool) if args.query_pool > 0 else None
+    runner = LoadTestRunner(rag_system, journeys, seed=args.seed, queries=queries)
+    levels = [float(x) if args.mode == 'open' else int(x) for x in args.levels.split(',') if x.strip()]
+    try:
+        report = runner.sweep(args.mode, levels, args.duration, args.think_time, args.max_workers)
+    finally:
+        rag_system.close()
+
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    _print_report(report)
+    print(f"\nEredmények mentve: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Paraméter sweep futtatás script
+chunk_size / chunk_overlap / top_k / similarity_threshold / reranking rács
+kiértékelése izolált ideiglenes indexeken, Pareto táblával.
+
+Példák:
+    python run_sweep.py --backend fake --synthetic-pages 40
+    python run_sweep.py --docs ./data/documents/manual.pdf --chunk-sizes 500,800,1000 --top-k 3,5,8
+"""
+
+import os
+import sys
+import json
+import logging
+import argparse
+from pathlib import Path
+
+# Logging beállítása
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def _ints(spec: str):
+    return [int(x) for x in spec.split(',') if x.strip()]
+
+
+def _floats(spec: str):
+    return [float(x) for x in spec.split(',') if x.strip()]
+
+
+def _print_report(report: dict):
+    quality = report['meta']['quality_metric']
+    print(f"\n=== Paraméter sweep ({report['meta']['configs']} konfiguráció, "
+          f"{report['meta']['test_cases']} teszt, {report['meta']['wall_time']:.1f}s) ===")
+    print(f"{'':2}{'chunk':>6} {'overlap':>8} {'top_k':>6} {'küszöb':>7} {'rerank':>7} "
+          f"{'prec':>6} {'recall':>7} {'mrr':>6} {'p95 ms':>8} {'chunkok':>8} {'index KB':>9}")
+    for row in report['results']:
+        print(
+            f"{'*' if row['pareto'] else ' ':2}{row['chunk_size']:>6} {row['chunk_overlap']:>8} {row['top_k']:>6} "
+            f"{row['similarity_threshold']:>7.2f} {'igen' if row['use_reranking'] else 'nem':>7} "
+            f"{row['precision']:>6.3f} {row['recall']:>7.3f} {row['mrr']:>6.3f} {row['latency_p95_ms']:>8.2f} "
+            f"{row['chunks']:>8} {row['index_bytes'] / 1024:>9.0f}"
+        )
+    cache = report['embedding_cache']
+    print(f"\n* = Pareto optimális ({quality} vs. p95 latency vs. index méret)")
+    print(f"Embedding cache: {cache['entries']} egyedi szöveg, találati arány {cache['hit_rate']:.1%}")
+
+
+def main():
+    """Fő függvény"""
+    parser = argparse.ArgumentParser(description='RAG Parameter Sweep')
+    parser.add_argument('--docs', nargs='*', default=[], help='Dokumentum fájlok (PDF / TXT / DOCX)')
+    parser.add_argument('--synthetic-pages', type=int, default=0,
+                        help='Szintetikus kézikönyv oldalszáma (--docs helyett, saját kulcsszó tesztekkel)')
+    parser.add_argument('--synthetic-tests', type=int, default=30, help='Szintetikus kulcsszó tesztek száma')
+    parser.add_argument('--chunk-sizes', default='500,1000')
+    parser.add_argument('--chunk-overlaps', default='100,200')
+    parser.add_argument('--top-k', default='3,5')
+    parser.add_argument('--thresholds', default='0.3')
+    parser.add_argument('--rerank', default='off,on', help='Reranking változatok: off, on vagy off,on')
+    parser.add_argument('--quality', choices=['precision', 'recall', 'mrr'], default='mrr',
+                        help='A Pareto front minőség metrikája')
+    parser.add_argument('--workers', type=int, default=4, help='Párhuzamosan kiértékelt konfigurációk')
+    parser.add_argument('--backend', choices=['real', 'fake'], default=None,
+                        help='Modell backend (fake = offline, determinisztikus; alapértelmezett: MODEL_BACKEND)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='./evaluations/sweep_results.json', help='Eredmény JSON')
+    args = parser.parse_args()
+
+    if not args.docs and not args.synthetic_pages:
+        parser.error("Add meg a --docs fájlokat vagy a --synthetic-pages oldalszámot")
+
+    # A backend választásnak a modellek importja előtt kell érvényesülnie
+    if args.backend:
+        os.environ['MODEL_BACKEND'] = args.backend
+
+    from src.rag.embeddings import EmbeddingModel
+    from src.evaluation.sweep import ParameterSweep
+    from src.evaluation.parallel_runner import ParallelRunner
+
+    if args.synthetic_pages:
+        from src.benchmark.synthetic import SyntheticCorpus
+        corpus = SyntheticCorpus(seed=args.seed)
+        documents = [{'text': corpus.document(args.synthetic_pages), 'metadata': {'file_name': 'synthetic.pdf'}}]
+        test_cases = corpus.keyword_tests(args.synthetic_tests)
+    else:
+        from src.rag.document_processor import DocumentProcessor
+        from src.evaluation.test_cases import RAG_TEST_CASES
+        documents = DocumentProcessor().process_multiple_files(args.docs)
+        test_cases = RAG_TEST_CASES['retrieval_tests']
+    if not documents:
+        print("Nincs feldolgozható dokumentum")
+        sys.exit(1)
+
+    grid = {
+        'chunk_size': _ints(args.chunk_sizes),
+        'chunk_overlap': _ints(args.chunk_overlaps),
+        'top_k': _ints(args.top_k),
+        'similarity_threshold': _floats(args.thresholds),
+        'use_reranking': [mode.strip() == 'on' for mode in args.rerank.split(',') if mode.strip()],
+    }
+
+    sweep = ParameterSweep(
+        EmbeddingModel(),
+        documents,
+        test_cases,
+        runner=ParallelRunner(max_workers=args.workers)
+    )
+    report = sweep.run(grid, quality_key=args.quality)
+
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    _print_report(report)
+    print(f"\nEredmények mentve: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
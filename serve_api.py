@@ -0,0 +1,163 @@
+"""
+Headless HTTP API szerver indítása (FastAPI + uvicorn)
+Egy worker esetén egyetlen processz szolgál ki minden végpontot. Több
+worker esetén N csak olvasó query processz osztozik a --port socketen (a
+kernel osztja el köztük a kapcsolatokat), az index egyetlen írója pedig egy
+külön ingest processz a --ingest-port porton. A query worker-ek a korpusz
+verzió fájlból veszik észre az új dokumentumokat, és újranyitják az indexet.
+
+Minden worker saját metrika fájlt ír (<METRICS_FILE könyvtár>/<szerep>-<index>/),
+és ha be van állítva, saját OpenMetrics portot kap (METRICS_EXPORTER_PORT + index).
+A /stats 'metrics' része a kiszolgáló worker saját adata; a 'cluster_metrics'
+az összes worker metrika fájljából összesít. Az OpenMetrics végpontok
+worker-enként külön scrape-elendők (a Prometheus oldalon összegezve).
+Az OpenAI rate limit keret (OPENAI_RPM_LIMIT / OPENAI_TPM_LIMIT) az
+OPENAI_RATE_LIMIT_STATE állapotfájlon át a worker-ek között közös, nem
+worker-enként teljes. A leállt worker-eket a szülő processz újraindítja.
+
+Példák:
+    python serve_api.py
+    python serve_api.py --workers 4 --port 8000 --ingest-port 8001
+    python serve_api.py --backend fake --workers 2
+
+    curl -N -X POST localhost:8000/query/stream -H 'Content-Type: application/json' \\
+         -d '{"query": "Hogyan kell tölteni az autót?"}'
+"""
+
+import os
+import sys
+import time
+import signal
+import logging
+import argparse
+import multiprocessing
+from pathlib import Path
+
+# Logging beállítása
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def _configure_worker_env(role: str, index: int, slot: int):
+    """A worker processz környezete: szerep, saját metrika fájl és exporter port"""
+    os.environ['API_ROLE'] = role
+    os.environ['API_WORKER_INDEX'] = str(index)
+    name = f"{role}-{index}"
+    metrics_file = Path(os.getenv('METRICS_FILE', './data/metrics.json'))
+    # A /stats innen összesíti az összes worker metrika fájlját
+    os.environ['API_METRICS_ROOT'] = str(metrics_file.parent)
+    os.environ['METRICS_FILE'] = str(metrics_file.parent / name / metrics_file.name)
+    if os.getenv('METRICS_COLUMNAR_DIR'):
+        os.environ['METRICS_COLUMNAR_DIR'] = str(Path(os.environ['METRICS_COLUMNAR_DIR']) / name)
+    if os.getenv('METRICS_EXPORTER_PORT'):
+        os.environ['METRICS_EXPORTER_PORT'] = str(int(os.environ['METRICS_EXPORTER_PORT']) + slot)
+
+
+def _run_worker(role: str, index: int, slot: int, sockets, log_level: str):
+    """Egy uvicorn worker processz (spawn-nal indítva)"""
+    import uvicorn
+
+    _configure_worker_env(role, index, slot)
+    config = uvicorn.Config('src.api:create_app', factory=True, log_level=log_level, access_log=False)
+    uvicorn.Server(config).run(sockets=sockets)
+
+
+def _serve_multi(args):
+    """N query worker közös socketen + egy ingest worker, felügyelettel"""
+    import uvicorn
+    from src.rag.vector_store import VectorStore
+    from chromadb.api.client import SharedSystemClient
+
+    # A Chroma séma létrehozása egyszer, a worker-ek indítása előtt
+    # (üres adatbázison a párhuzamosan induló processzek ütköznének)
+    VectorStore()
+    SharedSystemClient.clear_system_cache()
+
+    query_socket = uvicorn.Config('src.api:create_app', host=args.host, port=args.port).bind_socket()
+    ingest_socket = uvicorn.Config('src.api:create_app', host=args.host, port=args.ingest_port).bind_socket()
+    specs = [('query', i, i, [query_socket]) for i in range(args.workers)]
+    specs.append(('ingest', 0, args.workers, [ingest_socket]))
+
+    context = multiprocessing.get_context('spawn')
+    processes = {}
+    stopping = False
+
+    def start(spec):
+        role, index, slot, sockets = spec
+        process = context.Process(
+            target=_run_worker, args=(role, index, slot, sockets, args.log_level),
+            name=f"rag-api-{role}-{index}"
+        )
+        process.start()
+        processes[spec[:2]] = (spec, process)
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    for spec in specs:
+        start(spec)
+    logger.info(
+        f"{args.workers} query worker: http://{args.host}:{args.port}, "
+        f"ingest worker: http://{args.host}:{args.ingest_port}"
+    )
+
+    while not stopping:
+        time.sleep(1.0)
+        for key, (spec, process) in list(processes.items()):
+            if not process.is_alive() and not stopping:
+                logger.warning(f"A(z) {key[0]}-{key[1]} worker leállt (exit code: {process.exitcode}), újraindítás")
+                start(spec)
+
+    # Leállítás: a worker-ek a folyamatban lévő kéréseket még befejezik
+    for _, process in processes.values():
+        if process.is_alive():
+            process.terminate()
+    deadline = time.time() + args.shutdown_timeout
+    for _, process in processes.values():
+        process.join(max(0.0, deadline - time.time()))
+        if process.is_alive():
+            process.kill()
+    query_socket.close()
+    ingest_socket.close()
+
+
+def main():
+    """Fő függvény"""
+    parser = argparse.ArgumentParser(description='RAG HTTP API szerver')
+    parser.add_argument('--host', default=os.getenv('API_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('API_PORT', 8000)))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('API_WORKERS', 1)),
+                        help='Query worker processzek száma (>1 esetén külön ingest processz indul)')
+    parser.add_argument('--ingest-port', type=int, default=None,
+                        help='Az ingest worker portja több worker esetén (alapértelmezett: API_INGEST_PORT vagy port + 1)')
+    parser.add_argument('--max-concurrency', type=int, default=None,
+                        help='Worker-enként egyszerre kiszolgált query-k (alapértelmezett: API_MAX_CONCURRENCY vagy 8)')
+    parser.add_argument('--shutdown-timeout', type=float, default=30.0,
+                        help='Leállításkor ennyi ideig várunk a folyamatban lévő kérésekre')
+    parser.add_argument('--backend', choices=['real', 'fake'], default=None,
+                        help='Modell backend (fake = offline, determinisztikus; alapértelmezett: MODEL_BACKEND)')
+    parser.add_argument('--log-level', default='info')
+    args = parser.parse_args()
+
+    # A worker processzek a környezetet öröklik; a backend választásnak a modellek importja előtt kell érvényesülnie
+    if args.backend:
+        os.environ['MODEL_BACKEND'] = args.backend
+    if args.max_concurrency:
+        os.environ['API_MAX_CONCURRENCY'] = str(args.max_concurrency)
+    if args.ingest_port is None:
+        args.ingest_port = int(os.getenv('API_INGEST_PORT', args.port + 1))
+
+    if args.workers <= 1:
+        import uvicorn
+        uvicorn.run('src.api:create_app', factory=True, host=args.host, port=args.port,
+                    log_level=args.log_level, access_log=False, timeout_graceful_shutdown=args.shutdown_timeout)
+        return
+    _serve_multi(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,416 @@
+"""
+Headless HTTP API a RAGSystem fölött (FastAPI)
+A Streamlit felület nélkül, más szolgáltatásokból / load balancer mögül
+elérhető végpontok:
+
+    GET    /health                 Állapot (szerep, worker, betöltött példány)
+    POST   /query                  Blokkoló válasz (JSON)
+    POST   /query/stream           Streamelt válasz (Server-Sent Events)
+    POST   /feedback               Felhasználói visszajelzés egy válaszra
+    GET    /stats                  Rendszer és kiszolgálási statisztikák
+    POST   /ingest                 Dokumentumok feltöltése (base64) háttér job-ba
+    GET    /ingest/jobs[/{id}]     Job lista / egy job állapota
+    DELETE /ingest/jobs/{id}       Futó / sorban álló job megszakítása
+
+A szerep (API_ROLE) határozza meg a regisztrált végpontokat: 'all' (egy
+processz mindent kiszolgál), 'query' (csak olvasó worker, ingest nélkül) és
+'ingest' (az index egyetlen írója). Több worker processz esetén a query
+worker-ek ugyanazt a vektor adatbázist olvassák, a változásokat a korpusz
+verzió alapján veszik észre (lásd serve_api.py).
+
+Egy worker egyszerre legfeljebb API_MAX_CONCURRENCY query-t szolgál ki; a
+többi legfeljebb API_QUEUE_TIMEOUT másodpercig vár, utána 503-at kap.
+
+Több worker processz esetén a /stats 'metrics' része csak a kiszolgáló
+worker saját metrikáit mutatja; a 'cluster_metrics' az összes worker
+metrika fájljából (API_METRICS_ROOT) összesít.
+"""
+
+import os
+import json
+import time
+import uuid
+import base64
+import asyncio
+import binascii
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
+
+from .serving import SharedRAGService
+from .monitoring.metrics import MetricsSnapshot
+
+logger = logging.getLogger(__name__)
+
+ROLES = ('all', 'query', 'ingest')
+SUPPORTED_UPLOAD_FORMATS = ('.pdf', '.txt', '.docx')
+
+# Belső kulcsok, amelyek nem kerülnek ki a job állapotban (szerver oldali útvonalak)
+_PRIVATE_JOB_FIELDS = ('files', 'upload_dir')
+
+
+class HistoryMessage(BaseModel):
+    role: Literal['user', 'assistant']
+    content: str
+
+
+class QueryRequest(BaseModel):
+    query: str = Field(..., min_length=1)
+    top_k: Optional[int] = Field(None, ge=1, le=50)
+    history: List[HistoryMessage] = Field(default_factory=list)
+
+
+class FeedbackRequest(BaseModel):
+    message_id: str
+    rating: Literal['positive', 'negative', 'neutral']
+    comment: Optional[str] = None
+    query: Optional[str] = None
+    response: Optional[str] = None
+
+
+class UploadedFile(BaseModel):
+    name: str
+    content_base64: str
+
+
+class IngestRequest(BaseModel):
+    files: List[UploadedFile] = Field(..., min_length=1)
+
+
+def _json_default(value: Any):
+    # numpy skalárok / tömbök (pl. rerank score-ok), egyéb objektumok szövegként
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def _dumps(payload: Any) -> str:
+    return json.dumps(payload, ensure_ascii=False, default=_json_default)
+
+
+def _json_response(payload: Any, status_code: int = 200) -> Response:
+    return Response(content=_dumps(payload), status_code=status_code, media_type='application/json')
+
+
+def _sse(event: str, payload: Any) -> str:
+    return f"event: {event}\ndata: {_dumps(payload)}\n\n"
+
+
+def _public_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in job.items() if key not in _PRIVATE_JOB_FIELDS}
+
+
+def _cluster_metrics(root: str, days: int = 30) -> Dict[str, Any]:
+    """Az összes worker metrika fájljának (<root>/<szerep>-<index>/) összesített statisztikája"""
+    name = Path(os.getenv('METRICS_FILE', './data/metrics.json')).name
+    files = sorted(Path(root).glob(f"*-*/{name}"))
+    stats = MetricsSnapshot([str(f) for f in files]).get_statistics(days=days)
+    stats['workers'] = [f.parent.name for f in files]
+    return stats
+
+
+class _Permit:
+    """Egy megszerzett query slot; a felszabadítás idempotens"""
+
+    def __init__(self, limiter: "ConcurrencyLimiter"):
+        self._limiter = limiter
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._limiter._release()
+
+    def __del__(self):
+        # Biztonsági háló: el sem indult (pl. a kliens azonnal bontott) stream
+        self.release()
+
+
+class ConcurrencyLimiter:
+    """Worker szintű párhuzamos query korlát, időkorlátos várakozással"""
+
+    def __init__(self, limit: int, queue_timeout: float):
+        """
+        Args:
+            limit: Egyszerre kiszolgált query-k száma
+            queue_timeout: Maximális várakozás szabad slotra (másodperc)
+        """
+        self.limit = max(1, int(limit))
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def acquire(self) -> _Permit:
+        """Slot foglalása; telítettség esetén 503 (Retry-After fejléccel)"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="A szerver túlterhelt, próbáld újra később",
+                headers={'Retry-After': str(max(1, int(self.queue_timeout)))}
+            )
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        return _Permit(self)
+
+    def _release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {'limit': self.limit, 'active': self.active, 'waiting': self.waiting, 'rejected': self.rejected}
+
+
+def create_app(
+    service: Optional[SharedRAGService] = None,
+    role: Optional[str] = None,
+    ingestion_queue=None
+) -> FastAPI:
+    """
+    FastAPI alkalmazás létrehozása (uvicorn factory módban is használható)
+
+    Args:
+        service: Megosztott RAG példány (alapértelmezett: új SharedRAGService)
+        role: 'all', 'query' vagy 'ingest' (alapértelmezett: API_ROLE vagy 'all')
+        ingestion_queue: Háttér feldolgozó sor (alapértelmezett: induláskor létrehozva,
+            ha a szerep ingestiont tartalmaz)
+
+    Returns:
+        A konfigurált FastAPI alkalmazás
+    """
+    role = role or os.getenv('API_ROLE', 'all')
+    if role not in ROLES:
+        raise ValueError(f"Ismeretlen API szerep: {role} (lehetséges: {', '.join(ROLES)})")
+    service = service or SharedRAGService()
+    serves_queries = role in ('all', 'query')
+    serves_ingest = role in ('all', 'ingest')
+    limiter = ConcurrencyLimiter(
+        int(os.getenv('API_MAX_CONCURRENCY', 8)),
+        float(os.getenv('API_QUEUE_TIMEOUT', 30))
+    )
+    max_upload_bytes = int(float(os.getenv('API_MAX_UPLOAD_MB', 50)) * 1024 * 1024)
+    worker = {'role': role, 'index': int(os.getenv('API_WORKER_INDEX', 0)), 'pid': os.getpid()}
+    metrics_root = os.getenv('API_METRICS_ROOT')
+    state: Dict[str, Any] = {'ingestion': ingestion_queue, 'started_at': time.time()}
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # A modellek betöltése induláskor, hogy az első kérés ne várjon rá
+        await run_in_threadpool(lambda: service.system)
+        if serves_ingest and state['ingestion'] is None:
+            from .ingestion import IngestionQueue
+            state['ingestion'] = IngestionQueue(service, owner='api')
+        logger.info(f"API worker kész (szerep: {role}, worker: {worker['index']}, pid: {worker['pid']})")
+        yield
+        if state['ingestion'] is not None:
+            await run_in_threadpool(state['ingestion'].stop, 30)
+        await run_in_threadpool(service.close)
+
+    app = FastAPI(title="RAG API", lifespan=lifespan)
+
+    def ingestion():
+        queue = state['ingestion']
+        if queue is None:
+            raise HTTPException(status_code=503, detail="A feldolgozó sor még nem indult el")
+        return queue
+
+    @app.get('/health')
+    async def health():
+        return {'status': 'ok', 'worker': worker, 'service': service.stats()}
+
+    @app.post('/feedback')
+    async def feedback(request: FeedbackRequest):
+        def record():
+            service.system.metrics_collector.record_user_feedback(
+                message_id=request.message_id,
+                rating=request.rating,
+                comment=request.comment,
+                query=request.query,
+                response=request.response
+            )
+        await run_in_threadpool(record)
+        return {'recorded': True}
+
+    @app.get('/stats')
+    async def stats():
+        def collect():
+            with service.lease() as rag_system:
+                system_stats = rag_system.get_stats()
+            system_stats['api'] = {
+                'worker': worker,
+                'uptime_sec': time.time() - state['started_at'],
+                'concurrency': limiter.stats(),
+                'service': service.stats(),
+            }
+            if state['ingestion'] is not None:
+                system_stats['api']['ingestion_active_jobs'] = state['ingestion'].active_count()
+            if metrics_root:
+                system_stats['cluster_metrics'] = _cluster_metrics(metrics_root)
+            return system_stats
+        return _json_response(await run_in_threadpool(collect))
+
+    if serves_queries:
+        @app.post('/query')
+        async def query(request: QueryRequest):
+            permit = await limiter.acquire()
+            try:
+                def run():
+                    with service.lease() as rag_system:
+                        return rag_system.query(
+                            request.query,
+                            top_k=request.top_k,
+                            conversation_history=[m.model_dump() for m in request.history] or None
+                        )
+                response = await run_in_threadpool(run)
+            finally:
+                permit.release()
+            response.pop('generator', None)
+            response['message_id'] = str(uuid.uuid4())
+            return _json_response(response)
+
+        @app.post('/query/stream')
+        async def query_stream(request: QueryRequest):
+            permit = await limiter.acquire()
+            return StreamingResponse(
+                _stream_events(service, request, permit),
+                media_type='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+
+    if serves_ingest:
+        @app.post('/ingest', status_code=202)
+        async def ingest(request: IngestRequest):
+            uploads = []
+            total = 0
+            for item in request.files:
+                name = Path(item.name).name
+                if Path(name).suffix.lower() not in SUPPORTED_UPLOAD_FORMATS:
+                    raise HTTPException(status_code=415, detail=f"Nem támogatott fájl típus: {name}")
+                try:
+                    content = base64.b64decode(item.content_base64, validate=True)
+                except (binascii.Error, ValueError):
+                    raise HTTPException(status_code=400, detail=f"Érvénytelen base64 tartalom: {name}")
+                total += len(content)
+                if total > max_upload_bytes:
+                    raise HTTPException(status_code=413, detail="A feltöltés mérete túllépi az API_MAX_UPLOAD_MB korlátot")
+                uploads.append((name, content))
+            job = await run_in_threadpool(ingestion().submit_uploads, uploads)
+            return _json_response(_public_job(job.to_dict()), status_code=202)
+
+        @app.get('/ingest/jobs')
+        async def ingest_jobs(include_finished: bool = True):
+            return _json_response([_public_job(job) for job in ingestion().jobs(include_finished)])
+
+        @app.get('/ingest/jobs/{job_id}')
+        async def ingest_job(job_id: str):
+            job = ingestion().get(job_id)
+            if job is None:
+                raise HTTPException(status_code=404, detail="Ismeretlen job")
+            return _json_response(_public_job(job))
+
+        @app.delete('/ingest/jobs/{job_id}')
+        async def cancel_ingest_job(job_id: str):
+            queue = ingestion()
+            if queue.get(job_id) is None:
+                raise HTTPException(status_code=404, detail="Ismeretlen job")
+            if not queue.cancel(job_id):
+                raise HTTPException(status_code=409, detail="A job már befejeződött")
+            return _json_response(_public_job(queue.get(job_id)))
+
+    return app
+
+
+async def _stream_events(service: SharedRAGService, request: QueryRequest, permit: _Permit) -> AsyncIterator[str]:
+    """
+    SSE eventek: context (források, message_id), token (szövegrészek),
+    done (teljes válasz) vagy error
+
+    A példány lease-e és a query slot a stream végéig (vagy a kliens
+    bontásáig) foglalt. A generátor minden lépése és a lezárása ugyanazon a
+    stream-enkénti szálon fut, így bontáskor a lezárás megvárja a még futó
+    next() hívást (a generátort nem zárjuk be egy másik szálból futás közben).
+    """
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sse-stream")
+    stack = ExitStack()
+    generator = None
+
+    async def call(fn, *args, **kwargs):
+        # A hívó kontextusa (pl. rate limit prioritás) a stream szálon is érvényes
+        ctx = contextvars.copy_context()
+        return await asyncio.wrap_future(executor.submit(ctx.run, fn, *args, **kwargs))
+
+    try:
+        rag_system = await call(stack.enter_context, service.lease())
+        response = await call(
+            rag_system.query,
+            request.query,
+            stream=True,
+            top_k=request.top_k,
+            conversation_history=[m.model_dump() for m in request.history] or None
+        )
+        message_id = str(uuid.uuid4())
+        yield _sse('context', {
+            'message_id': message_id,
+            'context': response.get('context') or [],
+            'metadata': response.get('metadata', {}),
+        })
+
+        generator = response.get('generator')
+        if generator is None:
+            # Abstain / cache-elt válasz: nincs token stream
+            answer = response.get('answer') or ''
+            if answer:
+                yield _sse('token', {'text': answer})
+        else:
+            parts = []
+            done = object()
+            while True:
+                chunk = await call(next, generator, done)
+                if chunk is done:
+                    break
+                parts.append(chunk)
+                yield _sse('token', {'text': chunk})
+            answer = ''.join(parts)
+        yield _sse('done', {'message_id': message_id, 'answer': answer})
+    except Exception as e:
+        logger.error(f"Hiba a streamelt válasz közben: {e}")
+        yield _sse('error', {'error': str(e)})
+    finally:
+        def cleanup():
+            # Megszakított (bontott) streamnél is: a generátor lezárása rögzíti a metrikákat
+            try:
+                close = getattr(generator, 'close', None)
+                if close is not None:
+                    close()
+            except Exception as e:
+                logger.debug(f"Stream lezárási hiba: {e}")
+            finally:
+                stack.close()
+                try:
+                    loop.call_soon_threadsafe(permit.release)
+                except RuntimeError:
+                    # Az event loop már leállt (szerver leállítás)
+                    pass
+
+        # A stream szálon, a még futó lépés után; az event loop nem vár rá
+        executor.submit(cleanup)
+        executor.shutdown(wait=False)
@@ -0,0 +1,187 @@
+"""
+Tömeges (offline) kérdés-válasz feldolgozás
+CSV vagy JSONL kérdéslistából RAGSystem.query_batch batch-ekkel, az
+eredmények soronként egy JSONL kimeneti fájlba kerülnek.
+
+A kimeneti fájl egyben a checkpoint: minden batch után flush + fsync,
+újraindításkor a már megválaszolt ID-k kimaradnak, a félbeszakadt
+utolsó sor levágódik. A sikertelen (hibás) kérdések nem kerülnek a
+kimenetbe, így a következő futás újrapróbálja őket.
+"""
+
+import os
+import csv
+import json
+import time
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+QUESTION_FIELDS = ('question', 'query', 'kerdes')
+
+
+def read_questions(path: str, question_field: str = None, id_field: str = 'id') -> List[Dict[str, Any]]:
+    """
+    Kérdések beolvasása CSV vagy JSONL fájlból
+
+    Args:
+        path: Bemeneti fájl (.csv vagy .jsonl)
+        question_field: A kérdés oszlop / kulcs (alapértelmezett: question, query vagy kerdes)
+        id_field: Az azonosító oszlop / kulcs (hiányában a sorszám)
+
+    Returns:
+        [{'id': str, 'question': str, 'fields': {a sor többi mezője}}]
+    """
+    path = Path(path)
+    if path.suffix.lower() == '.csv':
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            rows = list(csv.DictReader(f))
+    elif path.suffix.lower() in ('.jsonl', '.ndjson'):
+        with open(path, 'r', encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    else:
+        raise ValueError(f"Nem támogatott bemeneti formátum: {path.suffix} (csv vagy jsonl)")
+
+    questions = []
+    for number, row in enumerate(rows, 1):
+        field = question_field or next((name for name in QUESTION_FIELDS if name in row), None)
+        question = (row.get(field) or '').strip() if field else ''
+        if not question:
+            logger.warning(f"Üres kérdés kihagyva ({path.name}, {number}. sor)")
+            continue
+        row_id = str(row.get(id_field) or number)
+        questions.append({
+            'id': row_id,
+            'question': question,
+            'fields': {k: v for k, v in row.items() if k not in (field, id_field)}
+        })
+    return questions
+
+
+class BatchQARunner:
+    """Kérdéslista feldolgozása batch-enként, folytatható JSONL kimenettel"""
+
+    def __init__(
+        self,
+        rag_system,
+        output_path: str,
+        batch_size: int = 32,
+        max_workers: int = 4,
+        top_k: Optional[int] = None
+    ):
+        """
+        Args:
+            rag_system: RAGSystem (query_batch)
+            output_path: Kimeneti JSONL (egyben checkpoint)
+            batch_size: Egy query_batch hívás kérdésszáma
+            max_workers: Párhuzamos generálások száma batch-en belül
+            top_k: Visszaadott dokumentumok száma (None = a rendszer alapértéke)
+        """
+        self.rag_system = rag_system
+        self.output_path = Path(output_path)
+        self.batch_size = max(1, batch_size)
+        self.max_workers = max_workers
+        self.top_k = top_k
+
+    def completed_ids(self) -> Set[str]:
+        """
+        A kimenetben már szereplő ID-k; a félbeszakadt (nem teljes) utolsó
+        sor levágódik, hogy a folytatás érvényes JSONL-t írjon
+        """
+        if not self.output_path.exists():
+            return set()
+        done: Set[str] = set()
+        valid_bytes = 0
+        with open(self.output_path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    done.add(str(json.loads(line)['id']))
+                except (ValueError, KeyError):
+                    break
+                valid_bytes += len(line)
+        if valid_bytes < self.output_path.stat().st_size:
+            logger.warning(f"Félbeszakadt sor levágva a checkpointból: {self.output_path}")
+            with open(self.output_path, 'r+b') as f:
+                f.truncate(valid_bytes)
+        return done
+
+    @staticmethod
+    def _record(item: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+        metadata = result.get('metadata', {})
+        return {
+            'id': item['id'],
+            'question': item['question'],
+            'answer': result.get('answer'),
+            'abstained': metadata.get('abstained', False),
+            'user_lang': metadata.get('user_lang'),
+            'translated_query': metadata.get('translated_query'),
+            'sources': [
+                {
+                    'file_name': doc.get('metadata', {}).get('file_name'),
+                    'page_number': doc.get('metadata', {}).get('page_number'),
+                    'similarity': doc.get('similarity'),
+                }
+                for doc in result.get('context', [])
+            ],
+            'fields': item['fields'],
+        }
+
+    def run(self, questions: List[Dict[str, Any]], progress_callback=None) -> Dict[str, Any]:
+        """
+        A még meg nem válaszolt kérdések feldolgozása
+
+        Args:
+            questions: read_questions kimenete
+            progress_callback: fn(done, total) minden batch után (opcionális)
+
+        Returns:
+            Összesítő: total, skipped (korábbi futásból), answered, abstained, failed (ID-k), wall_time
+        """
+        done = self.completed_ids()
+        pending = [item for item in questions if item['id'] not in done]
+        summary = {
+            'total': len(questions),
+            'skipped': len(questions) - len(pending),
+            'answered': 0,
+            'abstained': 0,
+            'failed': [],
+        }
+        if summary['skipped']:
+            logger.info(f"Folytatás checkpointból: {summary['skipped']} kérdés már kész")
+
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        start = time.time()
+        with open(self.output_path, 'a', encoding='utf-8') as out:
+            for offset in range(0, len(pending), self.batch_size):
+                batch = pending[offset:offset + self.batch_size]
+                results = self.rag_system.query_batch(
+                    [item['question'] for item in batch],
+                    top_k=self.top_k,
+                    max_workers=self.max_workers
+                )
+                for item, result in zip(batch, results):
+                    if result.get('error'):
+                        summary['failed'].append(item['id'])
+                        continue
+                    out.write(json.dumps(self._record(item, result), ensure_ascii=False) + "\n")
+                    summary['answered'] += 1
+                    summary['abstained'] += bool(result.get('metadata', {}).get('abstained'))
+                # Checkpoint: a batch eredményei a lemezen vannak, mielőtt a következő indul
+                out.flush()
+                os.fsync(out.fileno())
+
+                processed = summary['skipped'] + offset + len(batch)
+                logger.info(f"Batch Q&A: {processed}/{len(questions)} kérdés feldolgozva")
+                if progress_callback is not None:
+                    progress_callback(processed, len(questions))
+
+        summary['wall_time'] = time.time() - start
+        summary['questions_per_sec'] = (
+            (summary['answered'] + len(summary['failed'])) / summary['wall_time']
+            if summary['wall_time'] > 0 else 0.0
+        )
+        return summary
@@ -0,0 +1,15 @@
+"""
+Benchmark modulok
+"""
+
+from .synthetic import SyntheticCorpus
+from .suite import BenchmarkSuite, STAGES, compare_results, load_results, save_results
+
+__all__ = [
+    "SyntheticCorpus",
+    "BenchmarkSuite",
+    "STAGES",
+    "compare_results",
+    "load_results",
+    "save_results",
+]
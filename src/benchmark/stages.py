@@ -0,0 +1,225 @@
+"""
+Stage szintű micro-benchmarkok
+Minden függvény egy pipeline lépést mér izoláltan, és lapos
+{metrika: érték} dict-et ad vissza. A metrika név utótagja jelzi az
+irányt: *_per_sec = nagyobb a jobb, *_ms = kisebb a jobb.
+"""
+
+import time
+import logging
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence
+
+import numpy as np
+
+from .synthetic import SyntheticCorpus
+
+logger = logging.getLogger(__name__)
+
+
+def _percentiles_ms(samples: Sequence[float], prefix: str) -> Dict[str, float]:
+    """Latency minták (mp) p50 / p95 / átlag értékei ms-ban"""
+    values = np.array(samples, dtype=float) * 1000.0
+    return {
+        f'{prefix}_p50_ms': float(np.percentile(values, 50)),
+        f'{prefix}_p95_ms': float(np.percentile(values, 95)),
+        f'{prefix}_mean_ms': float(values.mean()),
+    }
+
+
+def _best_of(fn: Callable[[], Any], repeat: int) -> float:
+    """A legjobb futási idő `repeat` ismétlésből (zaj csökkentése)"""
+    best = float('inf')
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_document_processing(corpus: SyntheticCorpus, pages: int, repeat: int = 3) -> Dict[str, float]:
+    """DocumentProcessor: szintetikus PDF és TXT feldolgozás oldal/mp-ben"""
+    from src.rag.document_processor import DocumentProcessor
+
+    processor = DocumentProcessor()
+    results: Dict[str, float] = {'pages': pages}
+    with tempfile.TemporaryDirectory(prefix="rag-bench-") as tmp:
+        txt_path = corpus.write_txt(Path(tmp) / "manual.txt", pages)
+        results['txt_pages_per_sec'] = pages / _best_of(lambda: processor.process_file(str(txt_path)), repeat)
+        try:
+            pdf_path = corpus.write_pdf(Path(tmp) / "manual.pdf", pages)
+            results['pdf_pages_per_sec'] = pages / _best_of(lambda: processor.process_file(str(pdf_path)), repeat)
+        except ImportError as e:
+            logger.warning(f"PDF benchmark kihagyva: {e}")
+    return results
+
+
+def bench_chunking(corpus: SyntheticCorpus, pages: int, chunk_size: int, chunk_overlap: int,
+                   repeat: int = 3) -> Dict[str, float]:
+    """ChunkingStrategy: MB/mp és chunk/mp"""
+    from src.rag.chunking import ChunkingStrategy
+
+    chunking = ChunkingStrategy(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    document = {'text': corpus.document(pages), 'metadata': {'file_name': 'manual.pdf'}}
+    megabytes = len(document['text'].encode('utf-8')) / (1024 * 1024)
+
+    chunks: List[Dict[str, Any]] = []
+
+    def run():
+        chunks[:] = chunking.chunk_document(document)
+
+    seconds = _best_of(run, repeat)
+    return {
+        'megabytes': megabytes,
+        'chunks': len(chunks),
+        'mb_per_sec': megabytes / seconds,
+        'chunks_per_sec': len(chunks) / seconds,
+    }
+
+
+def bench_embedding(embedding_model, corpus: SyntheticCorpus, num_texts: int, batch_size: int = 64,
+                    repeat: int = 1) -> Dict[str, float]:
+    """EmbeddingModel: szöveg/mp batch-ben, és egyedi (query) embedding latency"""
+    texts = corpus.chunk_texts(num_texts)
+
+    def run():
+        for start in range(0, len(texts), batch_size):
+            embedding_model.embed_texts(texts[start:start + batch_size])
+
+    seconds = _best_of(run, repeat)
+    single = []
+    for query in corpus.queries(20):
+        start = time.perf_counter()
+        embedding_model.embed_text(query)
+        single.append(time.perf_counter() - start)
+
+    results = {'texts': num_texts, 'batch_size': batch_size, 'texts_per_sec': num_texts / seconds}
+    results.update(_percentiles_ms(single, 'query'))
+    return results
+
+
+def _random_unit_vectors(rng: np.random.Generator, count: int, dim: int) -> np.ndarray:
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def bench_vector_store(corpus: SyntheticCorpus, sizes: Sequence[int], dim: int, num_queries: int = 50,
+                       top_k: int = 5, batch_size: int = 5000) -> Dict[str, float]:
+    """
+    VectorStore: add_documents és search latency a korpusz méretének (N) függvényében.
+
+    A collection lépcsőzetesen nő a megadott méretekig; minden lépcsőn
+    keresési latency készül. A vektorok véletlen egységvektorok (a vektor
+    adatbázist méri, nem az embedding modellt).
+    """
+    from src.rag.vector_store import VectorStore
+
+    rng = np.random.default_rng(corpus.seed)
+    queries = _random_unit_vectors(rng, num_queries, dim).tolist()
+    results: Dict[str, float] = {'dim': dim}
+
+    with tempfile.TemporaryDirectory(prefix="rag-bench-db-") as tmp:
+        store = VectorStore(collection_name="benchmark", persist_directory=tmp)
+        current = 0
+        add_seconds = 0.0
+        for size in sorted(sizes):
+            while current < size:
+                count = min(batch_size, size - current)
+                texts = corpus.chunk_texts(count, sentences=2)
+                embeddings = _random_unit_vectors(rng, count, dim).tolist()
+                metadatas = [{'chunk_index': current + i} for i in range(count)]
+                ids = [f"bench_{current + i}" for i in range(count)]
+                start = time.perf_counter()
+                store.add_documents(texts=texts, embeddings=embeddings, metadatas=metadatas, ids=ids)
+                add_seconds += time.perf_counter() - start
+                current += count
+
+            results[f'add_n{size}_docs_per_sec'] = current / add_seconds if add_seconds > 0 else 0.0
+            latencies = []
+            for query in queries:
+                start = time.perf_counter()
+                store.search(query, top_k=top_k)
+                latencies.append(time.perf_counter() - start)
+            results.update(_percentiles_ms(latencies, f'search_n{size}'))
+            logger.info(f"VectorStore benchmark: N={size} kész")
+    return results
+
+
+def bench_reranker(reranker, corpus: SyntheticCorpus, num_queries: int = 20, candidates: int = 20
+                   ) -> Dict[str, float]:
+    """Reranker: query-dokumentum pár/mp"""
+    if not reranker.use_reranking:
+        logger.warning("Reranking kikapcsolva, a reranker benchmark kihagyva")
+        return {}
+    documents = [{'text': text} for text in corpus.chunk_texts(candidates)]
+    queries = corpus.queries(num_queries)
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        reranker.rerank(query, documents)
+        latencies.append(time.perf_counter() - start)
+    results = {'pairs': num_queries * candidates, 'pairs_per_sec': num_queries * candidates / sum(latencies)}
+    results.update(_percentiles_ms(latencies, 'rerank'))
+    return results
+
+
+def ingest_chunks(rag_system, texts: List[str], batch_size: int = 256):
+    """Szintetikus chunkok betöltése egy RAGSystem-be (embedding + vektor tároló)"""
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        rag_system.vector_store.add_documents(
+            texts=batch,
+            embeddings=rag_system.embedding_model.embed_texts(batch),
+            metadatas=[{'chunk_index': start + i, 'page_number': (start + i) // 4 + 1} for i in range(len(batch))],
+            ids=[f"bench_{start + i}" for i in range(len(batch))]
+        )
+
+
+def bench_end_to_end(
+    rag_system,
+    corpus: SyntheticCorpus,
+    num_queries: int = 20,
+    warmup: int = 3
+) -> Dict[str, float]:
+    """
+    RAGSystem.query: teljes pipeline latency (sima és streaming válasz)
+
+    A mérés előtt `warmup` (nem mért) sima és streaming lekérdezés fut, így a
+    lusta modell betöltés, a kapcsolat felépítés és az első hívások költsége
+    nem torzítja a percentiliseket.
+    """
+    queries = corpus.queries((num_queries + warmup) * 2)
+    warmup_queries = queries[num_queries * 2:]
+    for query in warmup_queries[:warmup]:
+        rag_system.query(query)
+    for query in warmup_queries[warmup:]:
+        for _ in rag_system.query(query, stream=True).get('generator') or ():
+            pass
+
+    plain, streamed, first_token = [], [], []
+    abstained = 0
+
+    for query in queries[:num_queries]:
+        start = time.perf_counter()
+        result = rag_system.query(query)
+        plain.append(time.perf_counter() - start)
+        abstained += bool(result.get('metadata', {}).get('abstained'))
+
+    for query in queries[num_queries:]:
+        start = time.perf_counter()
+        result = rag_system.query(query, stream=True)
+        first = None
+        for _ in result.get('generator') or ():
+            if first is None:
+                first = time.perf_counter() - start
+        streamed.append(time.perf_counter() - start)
+        if first is not None:
+            first_token.append(first)
+
+    results = {'queries': num_queries, 'abstain_rate': abstained / num_queries}
+    results.update(_percentiles_ms(plain, 'query'))
+    results.update(_percentiles_ms(streamed, 'stream_total'))
+    if first_token:
+        results.update(_percentiles_ms(first_token, 'stream_first_token'))
+    return results
@@ -0,0 +1,208 @@
+"""
+Benchmark suite futtatás, mentés és baseline összehasonlítás
+"""
+
+import os
+import json
+import time
+import shutil
+import platform
+import logging
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from .synthetic import SyntheticCorpus
+from . import stages
+
+logger = logging.getLogger(__name__)
+
+STAGES = ['document_processing', 'chunking', 'embedding', 'vector_store', 'reranker', 'end_to_end']
+
+
+def metric_direction(name: str) -> Optional[str]:
+    """'higher' (áteresztőképesség), 'lower' (latency), vagy None (nem összehasonlítandó)"""
+    if name.endswith('_per_sec'):
+        return 'higher'
+    if name.endswith('_ms'):
+        return 'lower'
+    return None
+
+
+class BenchmarkSuite:
+    """A kiválasztott stage-ek futtatása egy szintetikus korpuszon"""
+
+    def __init__(
+        self,
+        pages: int = 50,
+        vector_sizes: Sequence[int] = (1000, 10000),
+        embed_texts: int = 256,
+        queries: int = 20,
+        seed: int = 42,
+        chunk_size: int = None,
+        chunk_overlap: int = None,
+        vector_db_path: str = None
+    ):
+        """
+        Args:
+            pages: Szintetikus kézikönyv oldalszáma (feldolgozás, chunking)
+            vector_sizes: VectorStore méretek (chunkok száma, akár 1M)
+            embed_texts: Embedding benchmark szövegeinek száma
+            queries: Lekérdezések száma a latency mérésekhez
+            seed: Korpusz seed
+            chunk_size: Chunk méret (alapértelmezett: CHUNK_SIZE)
+            chunk_overlap: Chunk átfedés (alapértelmezett: CHUNK_OVERLAP)
+            vector_db_path: A benchmark RAGSystem vektor adatbázisa
+                (alapértelmezett: ideiglenes könyvtár, az éles adatbázis érintetlen marad)
+
+        A benchmark RAGSystem metrikái is ideiglenes fájlba kerülnek; a run()
+        végén (vagy close()-zal) az ideiglenes könyvtárak törlődnek.
+        """
+        self.corpus = SyntheticCorpus(seed=seed)
+        self.pages = pages
+        self.vector_sizes = list(vector_sizes)
+        self.embed_texts = embed_texts
+        self.queries = queries
+        self.chunk_size = chunk_size or int(os.getenv('CHUNK_SIZE', 1000))
+        self.chunk_overlap = chunk_overlap or int(os.getenv('CHUNK_OVERLAP', 200))
+        self.vector_db_path = vector_db_path
+        self._rag_system = None
+        self._temp_dirs: List[str] = []
+
+    def _temp_dir(self, prefix: str) -> str:
+        path = tempfile.mkdtemp(prefix=prefix)
+        self._temp_dirs.append(path)
+        return path
+
+    def _system(self):
+        """Egy RAGSystem a modell alapú stage-ekhez (lusta, egyszer épül fel)"""
+        if self._rag_system is None:
+            from src.rag_system import RAGSystem
+            # A RAGSystem a konstruktorban olvassa a VECTOR_DB_PATH / METRICS_FILE értékét:
+            # a szintetikus chunkok és a benchmark metrikák ne kerüljenek az éles fájlokba
+            overrides = {
+                'VECTOR_DB_PATH': self.vector_db_path or self._temp_dir("rag-bench-db-"),
+                'METRICS_FILE': os.path.join(self._temp_dir("rag-bench-metrics-"), 'metrics.json'),
+            }
+            previous = {key: os.environ.get(key) for key in overrides}
+            os.environ.update(overrides)
+            try:
+                self._rag_system = RAGSystem()
+            finally:
+                for key, value in previous.items():
+                    if value is None:
+                        os.environ.pop(key, None)
+                    else:
+                        os.environ[key] = value
+        return self._rag_system
+
+    def close(self):
+        """A benchmark RAGSystem leállítása és az ideiglenes könyvtárak törlése"""
+        if self._rag_system is not None:
+            self._rag_system.close()
+            self._rag_system = None
+        for path in self._temp_dirs:
+            shutil.rmtree(path, ignore_errors=True)
+        self._temp_dirs = []
+
+    def run_stage(self, stage: str) -> Dict[str, float]:
+        if stage == 'document_processing':
+            return stages.bench_document_processing(self.corpus, self.pages)
+        if stage == 'chunking':
+            return stages.bench_chunking(self.corpus, self.pages, self.chunk_size, self.chunk_overlap)
+        if stage == 'embedding':
+            return stages.bench_embedding(self._system().embedding_model, self.corpus, self.embed_texts)
+        if stage == 'vector_store':
+            dim = len(self._system().embedding_model.embed_text("dimenzió"))
+            return stages.bench_vector_store(self.corpus, self.vector_sizes, dim, num_queries=self.queries)
+        if stage == 'reranker':
+            return stages.bench_reranker(self._system().reranker, self.corpus, num_queries=self.queries)
+        if stage == 'end_to_end':
+            system = self._system()
+            stages.ingest_chunks(system, self.corpus.chunk_texts(max(self.embed_texts, 200)))
+            return stages.bench_end_to_end(system, self.corpus, num_queries=self.queries)
+        raise ValueError(f"Ismeretlen benchmark stage: {stage}")
+
+    def run(self, selected: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Stage-ek futtatása
+
+        Args:
+            selected: Stage nevek (None = mind)
+
+        Returns:
+            {'meta': {...}, 'stages': {stage: {metrika: érték}}}
+        """
+        results: Dict[str, Any] = {
+            'meta': {
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'model_backend': os.getenv('MODEL_BACKEND', 'real'),
+                'pages': self.pages,
+                'vector_sizes': self.vector_sizes,
+                'embed_texts': self.embed_texts,
+                'queries': self.queries,
+                'seed': self.corpus.seed,
+            },
+            'stages': {}
+        }
+        try:
+            for stage in selected or STAGES:
+                logger.info(f"Benchmark stage: {stage}")
+                start = time.perf_counter()
+                results['stages'][stage] = self.run_stage(stage)
+                results['stages'][stage]['stage_seconds'] = time.perf_counter() - start
+        finally:
+            self.close()
+        return results
+
+
+def save_results(results: Dict[str, Any], file_path: str):
+    """Eredmények mentése JSON-ba"""
+    Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+def load_results(file_path: str) -> Dict[str, Any]:
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare_results(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float = 0.1
+) -> List[Dict[str, Any]]:
+    """
+    Összehasonlítás egy tárolt baseline-nal.
+
+    Args:
+        current: Aktuális eredmények
+        baseline: Baseline eredmények
+        tolerance: Megengedett relatív romlás (0.1 = 10%)
+
+    Returns:
+        Metrikánkénti összehasonlítás; 'regression': True ha a romlás a tolerancián túl van
+    """
+    rows = []
+    for stage, metrics in current.get('stages', {}).items():
+        base_metrics = baseline.get('stages', {}).get(stage, {})
+        for name, value in metrics.items():
+            direction = metric_direction(name)
+            base = base_metrics.get(name)
+            if direction is None or not base:
+                continue
+            change = (value - base) / base
+            # Romlás: áteresztőképesség csökken / latency nő
+            worse = -change if direction == 'higher' else change
+            rows.append({
+                'stage': stage,
+                'metric': name,
+                'baseline': base,
+                'current': value,
+                'change': change,
+                'regression': worse > tolerance
+            })
+    return rows
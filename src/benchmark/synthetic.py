@@ -0,0 +1,159 @@
+"""
+Szintetikus kézikönyv korpusz benchmarkokhoz
+Determinisztikus (seed alapú) oldalak, chunkok és kérdések tetszőleges
+méretben, valamint TXT / PDF fájlok a DocumentProcessor méréséhez.
+
+A szókincs autós kézikönyv jellegű, így a retrieval / rerank lépések
+(és a fake backend hasonlóságai) valósághű találatokat adnak.
+"""
+
+import random
+from pathlib import Path
+from typing import List
+
+TOPICS = [
+    "akkumulator", "toltes", "gumiabroncs", "ablaktorlo", "legkondicionalo",
+    "ajtozar", "kijelzo", "navigacio", "fekrendszer", "autopilot",
+    "ules", "tukor", "vilagitas", "biztonsagi ov", "karbantartas",
+]
+
+SUBJECTS = [
+    "A jarmu", "A vezeto", "A rendszer", "Az erintokepernyo", "A mobilalkalmazas",
+    "A szervizkozpont", "A felhasznalo", "Az ugyfelszolgalat",
+]
+
+VERBS = [
+    "ellenorzi", "beallitja", "kikapcsolja", "bekapcsolja", "megjeleniti",
+    "frissiti", "figyelmeztet", "rogziti", "kalibralja", "aktivalja",
+]
+
+DETAILS = [
+    "a kozepso kijelzon", "menet kozben", "parkolaskor", "hideg idoben",
+    "a Beallitasok menuben", "minden inditaskor", "szoftverfrissites utan",
+    "a kormanyon levo gombokkal", "hangvezerlessel", "toltes kozben",
+]
+
+
+class SyntheticCorpus:
+    """Determinisztikus szintetikus kézikönyv generátor"""
+
+    def __init__(self, seed: int = 42, sentences_per_page: int = 30):
+        """
+        Args:
+            seed: Véletlen seed (azonos seed = azonos korpusz)
+            sentences_per_page: Mondatok száma oldalanként (~2 KB szöveg)
+        """
+        self.seed = seed
+        self.sentences_per_page = sentences_per_page
+
+    def _sentence(self, rng: random.Random, topic: str) -> str:
+        return (
+            f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} a(z) {topic} funkciot "
+            f"{rng.choice(DETAILS)}, {rng.randint(1, 99)} masodperc alatt."
+        )
+
+    def page_text(self, page: int) -> str:
+        """Egy oldal szövege (témafejléc + mondatok)"""
+        rng = random.Random(self.seed * 1_000_003 + page)
+        topic = TOPICS[page % len(TOPICS)]
+        lines = [f"{page}. fejezet: {topic.capitalize()}"]
+        lines.extend(self._sentence(rng, topic) for _ in range(self.sentences_per_page))
+        return "\n".join(lines)
+
+    def pages(self, num_pages: int) -> List[str]:
+        return [self.page_text(page) for page in range(1, num_pages + 1)]
+
+    def document(self, num_pages: int) -> str:
+        """Teljes dokumentum [PAGE X] markerekkel (ahogy a PDF feldolgozás adja)"""
+        return "\n\n".join(f"[PAGE {page}]\n{self.page_text(page)}" for page in range(1, num_pages + 1))
+
+    def chunk_texts(self, count: int, sentences: int = 6) -> List[str]:
+        """
+        Chunk méretű szövegek közvetlenül (oldal generálás nélkül, nagy N-hez)
+
+        Args:
+            count: Chunkok száma
+            sentences: Mondatok száma chunkonként (~500 karakter)
+        """
+        rng = random.Random(self.seed)
+        texts = []
+        for i in range(count):
+            topic = TOPICS[i % len(TOPICS)]
+            texts.append(" ".join(self._sentence(rng, topic) for _ in range(sentences)))
+        return texts
+
+    def queries(self, count: int) -> List[str]:
+        """A korpusz szókincséből épített kérdések (különbözőek, így nem cache találatok)"""
+        rng = random.Random(self.seed + 7)
+        return [
+            f"Hogyan {rng.choice(VERBS)} a(z) {rng.choice(TOPICS)} funkciot {rng.choice(DETAILS)}? ({i})"
+            for i in range(count)
+        ]
+
+    def keyword_tests(self, count: int) -> List[dict]:
+        """
+        Kulcsszó alapú retrieval teszt esetek (RAG_TEST_CASES['retrieval_tests'] formátum),
+        az elvárt kulcsszó a kérdezett téma
+        """
+        rng = random.Random(self.seed + 13)
+        tests = []
+        for i in range(count):
+            topic = TOPICS[i % len(TOPICS)]
+            tests.append({
+                'query': f"Hogyan {rng.choice(VERBS)} a(z) {topic} funkciot {rng.choice(DETAILS)}?",
+                'expected_keywords': [topic],
+                'category': topic,
+            })
+        return tests
+
+    def write_txt(self, path: str, num_pages: int) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(self.document(num_pages), encoding='utf-8')
+        return path
+
+    def write_pdf(self, path: str, num_pages: int) -> Path:
+        """Minimális, függőség nélküli PDF (Helvetica, oldalanként egy content stream)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        objects: List[bytes] = []
+        page_ids = []
+        # 1: catalog, 2: pages, 3: font; oldalanként page + content objektum
+        next_id = 4
+        for page in range(1, num_pages + 1):
+            lines = self.page_text(page).split("\n")
+            commands = ["BT", "/F1 9 Tf", "11 TL", "40 800 Td"]
+            for line in lines:
+                escaped = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+                commands.append(f"({escaped}) Tj T*")
+            commands.append("ET")
+            stream = "\n".join(commands).encode('latin-1', errors='replace')
+            page_ids.append(next_id)
+            objects.append(
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                f"/Resources << /Font << /F1 3 0 R >> >> /Contents {next_id + 1} 0 R >>".encode()
+            )
+            objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+            next_id += 2
+
+        kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+        header_objects = [
+            b"<< /Type /Catalog /Pages 2 0 R >>",
+            f"<< /Type /Pages /Kids [{kids}] /Count {num_pages} >>".encode(),
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        ]
+
+        output = bytearray(b"%PDF-1.4\n")
+        offsets = []
+        for obj_id, body in enumerate(header_objects + objects, 1):
+            offsets.append(len(output))
+            output += f"{obj_id} 0 obj\n".encode() + body + b"\nendobj\n"
+        xref_offset = len(output)
+        output += f"xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n".encode()
+        for offset in offsets:
+            output += f"{offset:010d} 00000 n \n".encode()
+        output += f"trailer\n<< /Size {len(offsets) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode()
+
+        path.write_bytes(bytes(output))
+        return path
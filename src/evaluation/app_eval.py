@@ -9,6 +9,8 @@ import time
 from pathlib import Path
 import json
 
+from .retrieval_memo import bypass_memo
+
 logger = logging.getLogger(__name__)
 
 
@@ -663,47 +665,157 @@ class AppEvaluator:
     def evaluate_latency(
         self,
         queries: List[str],
-        num_runs: int = 3
+        num_runs: int = 3,
+        streaming: bool = True,
+        warmup_runs: int = 1
     ) -> Dict[str, Any]:
         """
         Latency metrikák mérése
 
+        Streaming módban a valódi token streamet hajtja meg és minden tokent
+        időbélyegez: TTFT, inter-token latency eloszlás, teljes idő, valamint
+        retrieval (query() visszatéréséig) és generálás bontás. A warm-up
+        futások kimaradnak a statisztikából; minden query első futása üres
+        cache-sel (cold), a további `num_runs` futás meleg cache-sel (warm) megy.
+
         Args:
             queries: Teszt lekérdezések
-            num_runs: Hányszor futtassuk le
+            num_runs: Warm futások száma query-nként
+            streaming: Streaming útvonal mérése (False = blokkoló query(), TTFT nélkül)
+            warmup_runs: Eldobott bemelegítő futások (modell betöltés, kapcsolatok)
 
         Returns:
-            Latency statisztikák
+            Latency statisztikák (a felső szintű avg_* / p95_* kulcsok a warm futásokból)
         """
-        all_first_tokens = []
-        all_total_times = []
+        # Az evaluation retrieval memo a valódi retrieval időt takarná el
+        with bypass_memo(self.rag_system):
+            return self._evaluate_latency(queries, num_runs, streaming, warmup_runs)
 
-        for query in queries:
-            query_first_tokens = []
-            query_total_times = []
+    def _evaluate_latency(self, queries: List[str], num_runs: int, streaming: bool, warmup_runs: int) -> Dict[str, Any]:
+        if not streaming:
+            return self._evaluate_latency_blocking(queries, num_runs)
 
-            for _ in range(num_runs):
-                start = time.time()
-                response = self.rag_system.query(query, stream=False)
+        for i in range(warmup_runs if queries else 0):
+            self._measure_streaming(queries[i % len(queries)])
 
-                first_token = response.get('metadata', {}).get('first_token_time', 0)
-                total_time = time.time() - start
+        cold_runs: List[Dict[str, Any]] = []
+        warm_runs: List[Dict[str, Any]] = []
+        per_query = []
+        for query in queries:
+            self.rag_system.clear_caches()
+            cold = self._measure_streaming(query)
+            warm = [self._measure_streaming(query) for _ in range(num_runs)]
+            cold_runs.append(cold)
+            warm_runs.extend(warm)
+            per_query.append({
+                'query': query,
+                'cold': self._run_summary(cold),
+                'warm': self._aggregate_runs(warm)
+            })
+
+        warm_summary = self._aggregate_runs(warm_runs)
+        return {
+            'mode': 'streaming',
+            'num_queries': len(queries),
+            'num_runs_per_query': num_runs,
+            'warmup_runs': warmup_runs,
+            'avg_first_token_time': warm_summary['ttft']['mean'],
+            'avg_total_time': warm_summary['total_time']['mean'],
+            'p95_first_token_time': warm_summary['ttft']['p95'],
+            'p95_total_time': warm_summary['total_time']['p95'],
+            'cold': self._aggregate_runs(cold_runs),
+            'warm': warm_summary,
+            'per_query': per_query
+        }
 
-                query_first_tokens.append(first_token)
-                query_total_times.append(total_time)
+    def _measure_streaming(self, query: str) -> Dict[str, Any]:
+        """Egy streaming query futtatása tokenenkénti időbélyegekkel"""
+        start = time.perf_counter()
+        response = self.rag_system.query(query, stream=True)
+        pipeline_done = time.perf_counter()
 
-            all_first_tokens.extend(query_first_tokens)
-            all_total_times.extend(query_total_times)
+        token_times = []
+        generator = response.get('generator')
+        if generator is not None:
+            for _ in generator:
+                token_times.append(time.perf_counter())
+        else:
+            # Abstain: a válasz egyben érkezik, generálás nélkül
+            token_times.append(pipeline_done)
+        end = time.perf_counter()
+
+        metadata = response.get('metadata', {})
+        return {
+            'ttft': token_times[0] - start if token_times else None,
+            'total_time': end - start,
+            'retrieval_time': metadata.get('retrieval_time', pipeline_done - start),
+            'pre_generation_time': pipeline_done - start,
+            'generation_time': end - pipeline_done,
+            'tokens': len(token_times),
+            'inter_token_latencies': [b - a for a, b in zip(token_times, token_times[1:])],
+            'abstained': generator is None
+        }
 
+    @staticmethod
+    def _distribution(values: List[float]) -> Dict[str, Any]:
         import numpy as np
 
+        if not values:
+            return {'mean': 0, 'p50': 0, 'p95': 0, 'p99': 0, 'max': 0}
+        return {
+            'mean': float(np.mean(values)),
+            'p50': float(np.percentile(values, 50)),
+            'p95': float(np.percentile(values, 95)),
+            'p99': float(np.percentile(values, 99)),
+            'max': float(np.max(values))
+        }
+
+    def _run_summary(self, run: Dict[str, Any]) -> Dict[str, Any]:
+        """Egy futás összefoglalója (az egyedi inter-token minták nélkül)"""
+        summary = {k: v for k, v in run.items() if k != 'inter_token_latencies'}
+        summary['inter_token_latency'] = self._distribution(run['inter_token_latencies'])
+        return summary
+
+    def _aggregate_runs(self, runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Futások összesítése: eloszlások lépésenként és az összes inter-token latency-ből"""
+        return {
+            'runs': len(runs),
+            'ttft': self._distribution([r['ttft'] for r in runs if r['ttft'] is not None]),
+            'total_time': self._distribution([r['total_time'] for r in runs]),
+            'retrieval_time': self._distribution([r['retrieval_time'] for r in runs]),
+            'generation_time': self._distribution([r['generation_time'] for r in runs]),
+            'inter_token_latency': self._distribution(
+                [itl for r in runs for itl in r['inter_token_latencies']]
+            ),
+            'abstain_rate': sum(r['abstained'] for r in runs) / len(runs) if runs else 0.0
+        }
+
+    def _evaluate_latency_blocking(self, queries: List[str], num_runs: int) -> Dict[str, Any]:
+        """Blokkoló (stream=False) latency mérés: csak teljes idő és bontás, TTFT nincs"""
+        runs = []
+        for query in queries:
+            for _ in range(num_runs):
+                start = time.perf_counter()
+                response = self.rag_system.query(query, stream=False)
+                metadata = response.get('metadata', {})
+                runs.append({
+                    'total_time': time.perf_counter() - start,
+                    'retrieval_time': metadata.get('retrieval_time', 0),
+                    'generation_time': metadata.get('response_time', 0)
+                })
+
+        total = self._distribution([r['total_time'] for r in runs])
         return {
+            'mode': 'blocking',
             'num_queries': len(queries),
             'num_runs_per_query': num_runs,
-            'avg_first_token_time': np.mean(all_first_tokens) if all_first_tokens else 0,
-            'avg_total_time': np.mean(all_total_times) if all_total_times else 0,
-            'p95_first_token_time': np.percentile(all_first_tokens, 95) if all_first_tokens else 0,
-            'p95_total_time': np.percentile(all_total_times, 95) if all_total_times else 0
+            'avg_first_token_time': None,
+            'avg_total_time': total['mean'],
+            'p95_first_token_time': None,
+            'p95_total_time': total['p95'],
+            'total_time': total,
+            'retrieval_time': self._distribution([r['retrieval_time'] for r in runs]),
+            'generation_time': self._distribution([r['generation_time'] for r in runs])
         }
 
     def run_full_evaluation(
@@ -733,7 +845,8 @@ class AppEvaluator:
         if 'latency_tests' in test_cases:
             latency_results = self.evaluate_latency(
                 test_cases['latency_tests']['queries'],
-                test_cases['latency_tests'].get('num_runs', 3)
+                test_cases['latency_tests'].get('num_runs', 3),
+                warmup_runs=test_cases['latency_tests'].get('warmup_runs', 1)
             )
             results['latency'] = latency_results
 
@@ -0,0 +1,232 @@
+"""
+LLM-as-Judge réteg
+Több (kérdés, kontextus, válasz) elem pontozása egyetlen strukturált (JSON)
+judge hívásban, perzisztens cache-sel.
+
+A cache kulcsa a bemenetek + judge backend + judge modell + prompt verzió
+hash-e, így változatlan válaszokat újrafuttatáskor nem pontoz újra, a
+prompt, a modell vagy a backend (pl. MODEL_BACKEND=fake, más
+OPENAI_BASE_URL) cseréje viszont automatikusan érvényteleníti a régi
+ítéleteket.
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# A judge prompt verziója: a prompt módosításakor növelni kell
+PROMPT_VERSION = "batch-v1"
+
+METRICS = ('context_relevance', 'hallucination')
+
+BATCH_PROMPT = """Értékeld az alábbi elemeket. Minden elemhez két 0-1 közötti pontszámot adj:
+
+- context_relevance: mennyire releváns a válasz a kontextushoz és a kérdéshez
+  (1.0 = tökéletesen releváns, 0.5 = részben releváns, 0.0 = nem releváns)
+- hallucination: mennyi olyan információt tartalmaz a válasz, ami nincs a kontextusban
+  (0.0 = nincs hallucináció, 0.5 = részben, 1.0 = sok hallucináció)
+
+FONTOS SZABÁLY: Ha a válasz helyesen felismeri, hogy nincs elég információ a kontextusban
+és ezt kommunikálja ("nem tudom", "nincs adat"), akkor az TÖKÉLETESEN RELEVÁNS
+(context_relevance = 1.0) és NEM hallucináció (hallucination = 0.0).
+
+Elemek:
+{items}
+
+Válaszolj kizárólag JSON objektummal ebben a formában:
+{{"results": [{{"id": <elem id>, "context_relevance": <szám>, "hallucination": <szám>}}, ...]}}"""
+
+
+def judge_backend_id(client) -> str:
+    """
+    A judge backend azonosítója: a fake backend ítéletei (mindig tökéletes
+    pontszámok) nem keveredhetnek a valódi modell ítéleteivel
+    """
+    from src.utils.fake_backends import is_fake_backend
+    if is_fake_backend():
+        return 'fake'
+    base_url = getattr(client, 'base_url', None) or os.getenv('OPENAI_BASE_URL') or 'https://api.openai.com/v1'
+    return str(base_url).rstrip('/')
+
+
+class LLMJudge:
+    """Batch-elt, cache-elt LLM-as-Judge"""
+
+    def __init__(
+        self,
+        client,
+        model: str = "gpt-4o-mini",
+        cache_file: str = "./evaluations/judge_cache.json",
+        batch_size: int = 8,
+        backend: Optional[str] = None
+    ):
+        """
+        Args:
+            client: OpenAI kliens (None = nincs judge, minden pontszám None)
+            model: Judge modell
+            cache_file: Perzisztens ítélet cache
+            batch_size: Egy judge hívásba csomagolt elemek max. száma
+            backend: A judge backend azonosítója a cache kulcsban
+                (alapértelmezett: 'fake', vagy az OpenAI végpont URL-je)
+        """
+        self.client = client
+        self.model = model
+        self.backend = backend or judge_backend_id(client)
+        self.batch_size = max(1, batch_size)
+        self.cache_file = Path(cache_file)
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._cache: Dict[str, float] = self._load_cache()
+        self.stats = {'cache_hits': 0, 'judged_items': 0, 'api_calls': 0}
+
+    # ------------------------------------------------------------------
+    # Cache
+    # ------------------------------------------------------------------
+    def _load_cache(self) -> Dict[str, float]:
+        if not self.cache_file.exists():
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Judge cache betöltési hiba: {e}")
+            return {}
+
+    def save(self):
+        """Cache mentése (atomikus csere, párhuzamos batch-ek esetén is)"""
+        with self._save_lock:
+            with self._lock:
+                snapshot = dict(self._cache)
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_file.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            tmp_path.replace(self.cache_file)
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def cache_key(self, metric: str, query: str, context: str, answer: str) -> str:
+        payload = json.dumps(
+            [metric, query, context, answer, self.backend, self.model, PROMPT_VERSION],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def cached(self, metric: str, query: str, context: str, answer: str) -> Optional[float]:
+        with self._lock:
+            return self._cache.get(self.cache_key(metric, query, context, answer))
+
+    # ------------------------------------------------------------------
+    # Pontozás
+    # ------------------------------------------------------------------
+    def score(self, metric: str, query: str, context: str, answer: str) -> Optional[float]:
+        """
+        Egy elem egy metrikájának pontszáma (cache-ből, vagy egy judge hívással).
+
+        Args:
+            metric: 'context_relevance' vagy 'hallucination'
+            query: Kérdés
+            context: Formázott kontextus
+            answer: Válasz
+
+        Returns:
+            Pontszám (0-1), vagy None ha a judge nem elérhető / hibázott
+        """
+        return self.score_batch([{'query': query, 'context': context, 'answer': answer}])[0].get(metric)
+
+    def score_batch(self, items: List[Dict[str, str]]) -> List[Dict[str, Optional[float]]]:
+        """
+        Elemek pontozása: a cache-ben nem szereplőket batch_size-os JSON hívásokban.
+
+        Args:
+            items: [{'query': str, 'context': str, 'answer': str}]
+
+        Returns:
+            Elemenként {metrika: pontszám} a bemeneti sorrendben
+        """
+        results: List[Dict[str, Optional[float]]] = []
+        pending: List[int] = []
+        for index, item in enumerate(items):
+            scores = {m: self.cached(m, item['query'], item['context'], item['answer']) for m in METRICS}
+            if all(v is not None for v in scores.values()):
+                self._count('cache_hits')
+            else:
+                pending.append(index)
+            results.append(scores)
+
+        if not pending or self.client is None:
+            return results
+
+        for start in range(0, len(pending), self.batch_size):
+            chunk = pending[start:start + self.batch_size]
+            judged = self._judge([items[i] for i in chunk])
+            for local_id, index in enumerate(chunk):
+                scores = judged.get(local_id)
+                if scores is None:
+                    continue
+                item = items[index]
+                with self._lock:
+                    for metric, value in scores.items():
+                        self._cache[self.cache_key(metric, item['query'], item['context'], item['answer'])] = value
+                results[index] = scores
+                self._count('judged_items')
+
+        self.save()
+        return results
+
+    def _judge(self, items: List[Dict[str, str]]) -> Dict[int, Dict[str, float]]:
+        """Egy strukturált judge hívás; hibás / hiányos batch esetén elemenként újrapróbál"""
+        parsed = self._call(items)
+        missing = [i for i in range(len(items)) if i not in parsed]
+        if missing and len(items) > 1:
+            for i in missing:
+                single = self._call([items[i]])
+                if 0 in single:
+                    parsed[i] = single[0]
+        return parsed
+
+    def _call(self, items: List[Dict[str, str]]) -> Dict[int, Dict[str, float]]:
+        from src.utils.openai_client import remote_call
+        from src.utils.rate_limiter import estimate_tokens
+
+        formatted = "\n\n".join(
+            f"### Elem id={i}\nKérdés: {item['query']}\n\nKontextus:\n{item['context']}\n\nVálasz: {item['answer']}"
+            for i, item in enumerate(items)
+        )
+        messages = [{"role": "user", "content": BATCH_PROMPT.format(items=formatted)}]
+
+        try:
+            self._count('api_calls')
+            response = remote_call(
+                'judge',
+                lambda: self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0,
+                    response_format={"type": "json_object"}
+                ),
+                estimated_tokens=estimate_tokens(messages, max_tokens=40 * len(items))
+            )
+            data = json.loads(response.choices[0].message.content)
+        except Exception as e:
+            logger.error(f"Judge hívás hiba ({len(items)} elem): {e}")
+            return {}
+
+        parsed: Dict[int, Dict[str, float]] = {}
+        for entry in data.get('results', []):
+            try:
+                item_id = int(entry['id'])
+                parsed[item_id] = {
+                    metric: max(0.0, min(1.0, float(entry[metric]))) for metric in METRICS
+                }
+            except (KeyError, TypeError, ValueError):
+                continue
+        return {i: s for i, s in parsed.items() if 0 <= i < len(items)}
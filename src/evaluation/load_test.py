@@ -0,0 +1,287 @@
+"""
+Load teszt
+Az AppEvaluator user journey-k párhuzamos visszajátszása egy közös
+RAGSystem ellen, nyitott (érkezési ráta) vagy zárt (fix felhasználószám)
+terhelési modellel.
+
+Minden virtuális felhasználó saját AppEvaluator-t kap (a journey állapot
+felhasználónkénti), a RAGSystem és annak cache-ei, limiterei közösek.
+A terhelési szintek sorozatából készülő riport mutatja a telítődési
+pontot (ahol az áteresztőképesség már nem nő, a latency viszont igen).
+
+A journey-k kérdései fixek, ismételt visszajátszásuk a válasz / retrieval
+cache-ekből és a single-flight összevonásból szolgálódna ki, ami elfedné a
+telítődést. Ezért a query lépések egy (pl. SyntheticCorpus.queries) kérdés
+készletből kapnak minden alkalommal új kérdést.
+"""
+
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .app_eval import AppEvaluator
+
+logger = logging.getLogger(__name__)
+
+# A kérdés készletből új kérdést kapó journey lépések
+QUERY_ACTIONS = ('query', 'query_streaming')
+
+
+def _latency_stats(values: Sequence[float]) -> Dict[str, float]:
+    if not values:
+        return {'count': 0}
+    arr = np.array(values, dtype=float)
+    return {
+        'count': len(values),
+        'mean': float(arr.mean()),
+        'p50': float(np.percentile(arr, 50)),
+        'p95': float(np.percentile(arr, 95)),
+        'p99': float(np.percentile(arr, 99)),
+        'max': float(arr.max()),
+    }
+
+
+class LoadTestRunner:
+    """User journey-k párhuzamos futtatása terhelési szintenként"""
+
+    def __init__(
+        self,
+        rag_system,
+        journeys: List[Dict[str, Any]],
+        seed: int = 42,
+        queries: Optional[Sequence[str]] = None
+    ):
+        """
+        Args:
+            rag_system: Közös RAGSystem (minden virtuális felhasználó ezt használja)
+            journeys: User journey-k (test_cases.APP_TEST_CASES['user_journeys'])
+            seed: A journey választás és az érkezési idők seedje
+            queries: Kérdés készlet a query lépésekhez, sorban (körbe) kiosztva;
+                None = a journey-k saját (ismétlődő, cache-elhető) kérdései
+        """
+        if not journeys:
+            raise ValueError("Legalább egy user journey szükséges a load teszthez")
+        self.rag_system = rag_system
+        self.journeys = journeys
+        self.seed = seed
+        self.queries = list(queries) if queries else None
+        self._query_index = 0
+        self._lock = threading.Lock()
+
+    def _with_fresh_queries(self, journey: Dict[str, Any]) -> Dict[str, Any]:
+        """A journey másolata, a query lépésekben a készlet következő kérdéseivel"""
+        if not self.queries:
+            return journey
+        steps = []
+        for step in journey.get('steps', []):
+            if step.get('action') in QUERY_ACTIONS:
+                with self._lock:
+                    query = self.queries[self._query_index % len(self.queries)]
+                    self._query_index += 1
+                step = dict(step, input=query)
+            steps.append(step)
+        return dict(journey, steps=steps)
+
+    # ------------------------------------------------------------------
+    # Egy journey futtatása és a minták gyűjtése
+    # ------------------------------------------------------------------
+    def _run_journey(self, journey: Dict[str, Any], samples: Dict[str, List], queued_at: float):
+        """Journey futtatása egy friss AppEvaluator-ral; a minták a közös listákba kerülnek"""
+        started = time.time()
+        evaluator = AppEvaluator(self.rag_system)
+        try:
+            result = evaluator.evaluate_user_journey(self._with_fresh_queries(journey))
+            crashed = None
+        except Exception as e:
+            result, crashed = {'steps': []}, str(e)
+        finished = time.time()
+
+        with self._lock:
+            samples['journeys'].append({
+                'name': journey.get('name', ''),
+                'queue_wait': started - queued_at,
+                'latency': finished - queued_at,
+                'finished_at': finished,
+                'success_rate': result.get('success_rate', 0.0),
+                'error': crashed,
+            })
+            for step in result.get('steps', []):
+                samples['steps'].append({
+                    'action': step.get('action'),
+                    'latency': step.get('latency', 0.0),
+                    'success': bool(step.get('success')),
+                    # Elvárt hiba (pl. rossz fájlformátum) nem számít hibának
+                    'error': step.get('error') is not None and not step.get('error_expected', False),
+                })
+
+    @staticmethod
+    def _new_samples() -> Dict[str, List]:
+        return {'journeys': [], 'steps': []}
+
+    # ------------------------------------------------------------------
+    # Terhelési modellek
+    # ------------------------------------------------------------------
+    def run_closed(self, users: int, duration: float, think_time: float = 0.0) -> Dict[str, Any]:
+        """
+        Zárt modell: `users` felhasználó folyamatosan journey-ket futtat
+        (egy befejezése után `think_time` szünet, majd a következő).
+
+        Args:
+            users: Egyidejű felhasználók száma
+            duration: Mérési idő másodpercben (a folyamatban lévő journey-k befejeződnek)
+            think_time: Szünet két journey között (mp)
+        """
+        samples = self._new_samples()
+        deadline = time.time() + duration
+
+        def user_loop(user_id: int):
+            rng = random.Random(self.seed + user_id)
+            while time.time() < deadline:
+                self._run_journey(rng.choice(self.journeys), samples, time.time())
+                if think_time > 0:
+                    time.sleep(think_time)
+
+        start = time.time()
+        threads = [
+            threading.Thread(target=user_loop, args=(i,), name=f"load-user-{i}", daemon=True)
+            for i in range(users)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        report = self.summarize(samples, time.time() - start)
+        report.update({'mode': 'closed', 'level': users, 'users': users, 'think_time': think_time})
+        return report
+
+    def run_open(self, arrival_rate: float, duration: float, max_workers: int = 64) -> Dict[str, Any]:
+        """
+        Nyitott modell: journey-k Poisson érkezéssel `arrival_rate` / mp ütemben,
+        függetlenül attól, hogy a rendszer lépést tart-e (a sorban állás a latency része).
+
+        Args:
+            arrival_rate: Érkezések másodpercenként
+            duration: Érkezési időablak másodpercben
+            max_workers: Egyidejűleg futó journey-k felső korlátja
+        """
+        samples = self._new_samples()
+        rng = random.Random(self.seed)
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="load-open") as executor:
+            next_arrival = start
+            while next_arrival < start + duration:
+                delay = next_arrival - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self._run_journey, rng.choice(self.journeys), samples, next_arrival)
+                next_arrival += rng.expovariate(arrival_rate)
+        report = self.summarize(samples, time.time() - start)
+        report.update({'mode': 'open', 'level': arrival_rate, 'arrival_rate': arrival_rate})
+        return report
+
+    # ------------------------------------------------------------------
+    # Riport
+    # ------------------------------------------------------------------
+    @staticmethod
+    def summarize(samples: Dict[str, List], wall_time: float) -> Dict[str, Any]:
+        """Áteresztőképesség, lépés típusonkénti latency percentilisek, hibaarányok"""
+        journeys, steps = samples['journeys'], samples['steps']
+        by_action: Dict[str, List[Dict[str, Any]]] = {}
+        for step in steps:
+            by_action.setdefault(step['action'], []).append(step)
+
+        per_action = {}
+        for action, items in sorted(by_action.items()):
+            stats = _latency_stats([s['latency'] for s in items])
+            stats['error_rate'] = sum(s['error'] for s in items) / len(items)
+            stats['failure_rate'] = sum(not s['success'] for s in items) / len(items)
+            per_action[action] = stats
+
+        return {
+            'wall_time': wall_time,
+            'journeys_completed': len(journeys),
+            'steps_completed': len(steps),
+            'throughput_journeys_per_sec': len(journeys) / wall_time if wall_time > 0 else 0.0,
+            'throughput_steps_per_sec': len(steps) / wall_time if wall_time > 0 else 0.0,
+            'journey_latency': _latency_stats([j['latency'] for j in journeys]),
+            'queue_wait': _latency_stats([j['queue_wait'] for j in journeys]),
+            'journey_error_rate': sum(j['error'] is not None for j in journeys) / len(journeys) if journeys else 0.0,
+            'step_error_rate': sum(s['error'] for s in steps) / len(steps) if steps else 0.0,
+            'per_step': per_action,
+        }
+
+    def sweep(
+        self,
+        mode: str,
+        levels: Sequence[float],
+        duration: float,
+        think_time: float = 0.0,
+        max_workers: int = 64
+    ) -> Dict[str, Any]:
+        """
+        Terhelési szintek sorozata és a telítődési pont becslése
+
+        Args:
+            mode: 'open' (levels = érkezés/mp) vagy 'closed' (levels = felhasználók)
+            levels: Növekvő terhelési szintek
+            duration: Szintenkénti mérési idő (mp)
+            think_time: Zárt modellnél szünet két journey között
+            max_workers: Nyitott modellnél az egyidejű journey-k korlátja
+
+        Returns:
+            {'mode', 'levels': [szint riportok], 'knee': telítődési pont vagy None}
+        """
+        if mode not in ('open', 'closed'):
+            raise ValueError(f"Ismeretlen load teszt mód: {mode}")
+        reports = []
+        for level in levels:
+            logger.info(f"Load teszt: {mode} modell, szint={level}")
+            if mode == 'closed':
+                report = self.run_closed(int(level), duration, think_time)
+            else:
+                report = self.run_open(float(level), duration, max_workers)
+            reports.append(report)
+        return {'mode': mode, 'duration': duration, 'levels': reports, 'knee': find_knee(reports)}
+
+
+def find_knee(
+    reports: List[Dict[str, Any]],
+    min_gain: float = 0.5,
+    latency_factor: float = 2.0
+) -> Optional[Dict[str, Any]]:
+    """
+    Telítődési pont: az első szint, ahol a terhelés növelése már alig növeli
+    az áteresztőképességet (a terhelés arányos növekedésének < min_gain része),
+    vagy a p95 journey latency a legkisebb szintéhez képest latency_factor-szorosára nő.
+
+    Returns:
+        {'level', 'reason', 'throughput', 'p95_latency'} vagy None, ha nem telítődött
+    """
+    if len(reports) < 2:
+        return None
+    base_p95 = reports[0]['journey_latency'].get('p95')
+    for previous, current in zip(reports, reports[1:]):
+        prev_tp = previous['throughput_journeys_per_sec']
+        load_ratio = current['level'] / previous['level'] if previous['level'] else 0
+        tp_ratio = current['throughput_journeys_per_sec'] / prev_tp if prev_tp else 0
+        p95 = current['journey_latency'].get('p95')
+
+        reason = None
+        if load_ratio > 1 and (tp_ratio - 1) < min_gain * (load_ratio - 1):
+            reason = 'throughput_plateau'
+        elif base_p95 and p95 and p95 > latency_factor * base_p95:
+            reason = 'latency_growth'
+        if reason:
+            # A telítődés az előző szinten kezdődik: az a legnagyobb "egészséges" terhelés
+            return {
+                'level': previous['level'],
+                'reason': reason,
+                'throughput': prev_tp,
+                'p95_latency': previous['journey_latency'].get('p95'),
+            }
+    return None
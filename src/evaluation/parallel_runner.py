@@ -0,0 +1,188 @@
+"""
+Párhuzamos evaluation futtató
+Thread pool az I/O-kötött teszt esetekhez (retrieval, generálás, judge API
+hívások) suite-onkénti párhuzamossági limittel, process pool a teljes
+suite-okhoz (lokális modellek, GIL-kötött munka).
+
+Az eredmények mindig a bemeneti sorrendben térnek vissza, így a kimenet
+determinisztikus; a futás mellé wall-clock speedup és esetenkénti
+időmérés készül.
+"""
+
+import time
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def parse_suite_limits(spec: Optional[str]) -> Dict[str, int]:
+    """
+    Suite limit specifikáció feldolgozása
+
+    Args:
+        spec: pl. "rag=8,prompt=4"
+
+    Returns:
+        {'rag': 8, 'prompt': 4}
+    """
+    limits: Dict[str, int] = {}
+    for part in (spec or "").split(','):
+        if '=' in part:
+            name, value = part.split('=', 1)
+            limits[name.strip()] = int(value)
+    return limits
+
+
+class ParallelRunner:
+    """Teszt esetek párhuzamos futtatása determinisztikus sorrenddel"""
+
+    def __init__(self, max_workers: int = 4, suite_limits: Optional[Dict[str, int]] = None):
+        """
+        Args:
+            max_workers: Alapértelmezett szálszám suite-onként
+            suite_limits: Suite-onkénti felülírás (pl. {'prompt': 2} a judge API kímélésére)
+        """
+        self.max_workers = max(1, max_workers)
+        self.suite_limits = suite_limits or {}
+        self.timings: Dict[str, Dict[str, Any]] = {}
+
+    def workers_for(self, suite: str) -> int:
+        return max(1, self.suite_limits.get(suite, self.max_workers))
+
+    def map(self, suite: str, fn: Callable[[Any], Any], items: Sequence[Any]) -> List[Any]:
+        """
+        fn alkalmazása minden elemre párhuzamosan.
+
+        Az első hibát (a bemeneti sorrend szerint) tovább dobja, miután
+        minden eset lefutott.
+
+        Args:
+            suite: Suite neve (limit és riport kulcs)
+            fn: Egy teszt esetet feldolgozó függvény
+            items: Teszt esetek
+
+        Returns:
+            Eredmények a bemeneti sorrendben
+        """
+        workers = min(self.workers_for(suite), max(1, len(items)))
+        case_timings: List[Dict[str, Any]] = [None] * len(items)
+
+        def run(index: int, item: Any) -> Any:
+            start = time.time()
+            error = None
+            try:
+                return fn(item)
+            except Exception as e:
+                error = str(e)
+                raise
+            finally:
+                case_timings[index] = {
+                    'index': index,
+                    'duration': time.time() - start,
+                    'error': error
+                }
+
+        wall_start = time.time()
+        if workers == 1:
+            results = [run(i, item) for i, item in enumerate(items)]
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"eval-{suite}") as executor:
+                # A hívó kontextusa (pl. batch rate limit prioritás) minden szálon érvényes
+                futures = [
+                    executor.submit(contextvars.copy_context().run, run, i, item)
+                    for i, item in enumerate(items)
+                ]
+                outcomes: List[Tuple[Any, Optional[BaseException]]] = []
+                for future in futures:
+                    try:
+                        outcomes.append((future.result(), None))
+                    except Exception as e:
+                        outcomes.append((None, e))
+            for _, error in outcomes:
+                if error is not None:
+                    raise error
+            results = [result for result, _ in outcomes]
+
+        wall_time = time.time() - wall_start
+        self._record(suite, workers, wall_time, case_timings)
+        return results
+
+    def _record(self, suite: str, workers: int, wall_time: float, case_timings: List[Dict[str, Any]]):
+        total_case_time = sum(t['duration'] for t in case_timings if t)
+        timing = {
+            'suite': suite,
+            'workers': workers,
+            'num_cases': len(case_timings),
+            'wall_time': wall_time,
+            'total_case_time': total_case_time,
+            # Szekvenciális futás becsült ideje / tényleges wall time
+            'speedup': total_case_time / wall_time if wall_time > 0 else 1.0,
+            'cases': case_timings
+        }
+        previous = self.timings.get(suite)
+        if previous:
+            # Ugyanazon suite több map hívása összeadódik
+            timing['wall_time'] += previous['wall_time']
+            timing['total_case_time'] += previous['total_case_time']
+            timing['num_cases'] += previous['num_cases']
+            timing['cases'] = previous['cases'] + case_timings
+            timing['speedup'] = timing['total_case_time'] / timing['wall_time'] if timing['wall_time'] > 0 else 1.0
+        self.timings[suite] = timing
+        logger.info(
+            f"Evaluation suite '{suite}': {len(case_timings)} eset, {workers} szál, "
+            f"{wall_time:.2f}s (speedup {timing['speedup']:.2f}x)"
+        )
+
+    def timing_report(self, suite: str) -> Dict[str, Any]:
+        """Egy suite időmérési riportja (üres dict, ha nem futott)"""
+        return self.timings.get(suite, {})
+
+
+def run_suites_in_processes(
+    suites: Dict[str, Callable[[], Any]],
+    processes: int
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Teljes suite-ok futtatása külön processzekben.
+
+    A callable-öknek pickle-elhetőnek kell lenniük (modul szintű függvények
+    vagy functools.partial), minden process saját modelleket tölt be.
+
+    Args:
+        suites: {suite név: futtató függvény}
+        processes: Processzek száma
+
+    Returns:
+        (eredmények suite szerint a bemeneti sorrendben, időmérési riport)
+    """
+    wall_start = time.time()
+    results: Dict[str, Any] = {}
+    durations: Dict[str, float] = {}
+
+    with ProcessPoolExecutor(max_workers=max(1, processes)) as executor:
+        futures = {name: executor.submit(_timed_call, fn) for name, fn in suites.items()}
+        for name in suites:
+            result, duration = futures[name].result()
+            results[name] = result
+            durations[name] = duration
+
+    wall_time = time.time() - wall_start
+    total = sum(durations.values())
+    report = {
+        'processes': processes,
+        'wall_time': wall_time,
+        'total_suite_time': total,
+        'speedup': total / wall_time if wall_time > 0 else 1.0,
+        'suites': durations
+    }
+    logger.info(f"Suite-ok párhuzamosan: {wall_time:.2f}s (speedup {report['speedup']:.2f}x)")
+    return results, report
+
+
+def _timed_call(fn: Callable[[], Any]) -> Tuple[Any, float]:
+    start = time.time()
+    result = fn()
+    return result, time.time() - start
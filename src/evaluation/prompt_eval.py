@@ -15,25 +15,40 @@ logger = logging.getLogger(__name__)
 class PromptEvaluator:
     """Prompt szintű értékelő osztály"""
     
-    def __init__(self, llm_generator):
+    def __init__(self, llm_generator, runner=None, retrieval_engine=None):
         """
         Args:
             llm_generator: LLM generator
+            runner: ParallelRunner a teszt esetek párhuzamos futtatásához (opcionális)
+            retrieval_engine: Kontextus visszakeresése a 'context' nélküli teszt esetekhez
+                (opcionális, pl. RetrievalMemo-val burkolt engine)
         """
         self.llm_generator = llm_generator
+        self.runner = runner
+        self.retrieval_engine = retrieval_engine
         self._judge_client = None
+        self.judge = None
         self._init_judge()
     
     def _init_judge(self):
-        """LLM-as-Judge inicializálása"""
+        """LLM-as-Judge inicializálása (batch-elt, perzisztensen cache-elt)"""
         try:
-            from openai import OpenAI
-            api_key = os.getenv('OPENAI_API_KEY')
-            if api_key:
-                self._judge_client = OpenAI(api_key=api_key)
+            from src.utils.fake_backends import is_fake_backend
+            if os.getenv('OPENAI_API_KEY') or os.getenv('OPENAI_BASE_URL') or is_fake_backend():
+                from src.utils.openai_client import get_openai_client
+                from src.evaluation.judge import LLMJudge
+                self._judge_client = get_openai_client('judge')
+                # A fake judge ítéletei külön fájlba kerülnek (a kulcs is tartalmazza a backendet)
+                default_cache = './evaluations/judge_cache.fake.json' if is_fake_backend() else './evaluations/judge_cache.json'
+                self.judge = LLMJudge(
+                    self._judge_client,
+                    model=os.getenv('JUDGE_MODEL', 'gpt-4o-mini'),
+                    cache_file=os.getenv('JUDGE_CACHE_FILE', default_cache),
+                    batch_size=int(os.getenv('JUDGE_BATCH_SIZE', 8))
+                )
         except Exception as e:
             logger.warning(f"Judge inicializálás sikertelen: {e}")
-    
+
     def is_abstain(self, answer: str) -> bool:
         """
         Ellenőrzi, hogy a válasz abstain (nem tudom) válasz-e
@@ -66,7 +81,8 @@ class PromptEvaluator:
         self,
         query: str,
         context: List[Dict[str, Any]],
-        expected_answer: str = None
+        expected_answer: str = None,
+        answer: str = None
     ) -> Dict[str, Any]:
         """
         Single-turn értékelés
@@ -75,18 +91,20 @@ class PromptEvaluator:
             query: Kérdés
             context: Kontextus dokumentumok
             expected_answer: Várt válasz (opcionális)
+            answer: Már legenerált válasz (None = generálás)
 
         Returns:
             Értékelési eredmények
         """
         # Válasz generálása
-        answer = self.llm_generator.generate(query, context)
+        if answer is None:
+            answer = self.llm_generator.generate(query, context)
 
         results = {
             'query': query,
             'answer': answer,
             'context_relevance': self.evaluate_context_relevance(query, context, answer),
-            'hallucination_score': self.detect_hallucination(context, answer)
+            'hallucination_score': self.detect_hallucination(context, answer, query)
         }
 
         if expected_answer:
@@ -111,7 +129,7 @@ class PromptEvaluator:
         Returns:
             Relevance score (0-1)
         """
-        if not self._judge_client:
+        if not self.judge:
             # Egyszerű heurisztika ha nincs judge
             context_text = " ".join([doc.get('text', '')[:500] for doc in context])
             query_words = set(query.lower().split())
@@ -124,44 +142,17 @@ class PromptEvaluator:
             logger.info(f"Abstain válasz detektálva: '{answer[:50]}...' -> relevancia = 1.0")
             return 1.0
 
-        try:
-            prompt = f"""Értékeld, hogy a válasz mennyire releváns a kontextushoz és a kérdéshez.
-
-FONTOS: Ha a válasz helyesen felismeri, hogy nincs elég információ a kontextusban
-és ezt kommunikálja ("nem tudom", "nincs adat"), akkor az TÖKÉLETESEN RELEVÁNS
-válasz (1.0 pontszám), mert a rendszer helyesen működött.
-
-Kérdés: {query}
-
-Kontextus:
-{self._format_context(context)}
-
-Válasz: {answer}
-
-Adj egy 0-1 közötti relevancia pontszámot, ahol:
-- 1.0 = tökéletesen releváns (vagy helyes abstain válasz)
-- 0.5 = részben releváns
-- 0.0 = nem releváns
-
-Csak a számot add vissza."""
-
-            response = self._judge_client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0
-            )
-
-            score = float(response.choices[0].message.content.strip())
-            return max(0.0, min(1.0, score))
-        
-        except Exception as e:
-            logger.error(f"Hiba a context relevance értékelésénél: {e}")
+        score = self.judge.score('context_relevance', query, self._format_context(context), answer)
+        if score is None:
+            logger.error("Hiba a context relevance értékelésénél: nincs judge pontszám")
             return 0.5
+        return score
     
     def detect_hallucination(
         self,
         context: List[Dict[str, Any]],
-        answer: str
+        answer: str,
+        query: str = ""
     ) -> float:
         """
         Hallucináció detektálás
@@ -169,6 +160,7 @@ Csak a számot add vissza."""
         Args:
             context: Kontextus
             answer: Generált válasz
+            query: Kérdés (a judge cache kulcs része; a batch-elt judge hívás mindkét metrikát pontozza)
 
         Returns:
             Hallucináció score (0-1, ahol 0 = nincs hallucináció, 1 = sok hallucináció)
@@ -178,7 +170,7 @@ Csak a számot add vissza."""
             logger.info(f"Abstain válasz detektálva: '{answer[:50]}...' -> hallucináció = 0.0")
             return 0.0
 
-        if not self._judge_client:
+        if not self.judge:
             # Egyszerű heurisztika
             context_text = " ".join([doc.get('text', '') for doc in context]).lower()
             answer_words = set(answer.lower().split())
@@ -189,37 +181,11 @@ Csak a számot add vissza."""
             hallucination_ratio = len(unique_words) / len(answer_words) if answer_words else 0
             return min(hallucination_ratio, 1.0)
 
-        try:
-            prompt = f"""Értékeld, hogy a válasz mennyire tartalmaz hallucinációt (információt, ami nincs a kontextusban).
-
-FONTOS SZABÁLY: Ha a válasz azt mondja, hogy "nem tudom", "nincs információ",
-vagy hasonló abstain választ ad, akkor az NEM hallucináció, hanem HELYES viselkedés.
-Abstain válaszok esetén MINDIG adj 0.0 pontszámot.
-
-Kontextus:
-{self._format_context(context)}
-
-Válasz: {answer}
-
-Adj egy 0-1 közötti hallucináció pontszámot, ahol:
-- 0.0 = nincs hallucináció (vagy helyes abstain válasz)
-- 0.5 = részben hallucináció
-- 1.0 = sok hallucináció
-
-Csak a számot add vissza."""
-
-            response = self._judge_client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0
-            )
-
-            score = float(response.choices[0].message.content.strip())
-            return max(0.0, min(1.0, score))
-
-        except Exception as e:
-            logger.error(f"Hiba a hallucináció detektálásánál: {e}")
+        score = self.judge.score('hallucination', query, self._format_context(context), answer)
+        if score is None:
+            logger.error("Hiba a hallucináció detektálásánál: nincs judge pontszám")
             return 0.5
+        return score
     
     def compare_answers(self, answer1: str, answer2: str) -> float:
         """
@@ -263,29 +229,76 @@ Csak a számot add vissza."""
         Returns:
             Összesített eredmények
         """
-        results = []
-        
-        for test_case in test_cases:
-            result = self.evaluate_single_turn(
+        # Fix kontextus nélküli esetek: a kontextus a retrieval engine-ből (memo esetén egyszer keresve)
+        if self.retrieval_engine is not None:
+            test_cases = [
+                test_case if 'context' in test_case
+                else {**test_case, 'context': self.retrieval_engine.retrieve(test_case['query'])}
+                for test_case in test_cases
+            ]
+
+        def generate(test_case: Dict[str, Any]) -> str:
+            return self.llm_generator.generate(test_case['query'], test_case.get('context', []))
+
+        # Generálás I/O-kötött: runner esetén párhuzamosan fut
+        if self.runner is None:
+            answers = [generate(test_case) for test_case in test_cases]
+        else:
+            answers = self.runner.map('prompt', generate, test_cases)
+
+        # Judge pontozás batch-ekben előre (a cache-elt elemek nem kerülnek újra a judge elé),
+        # utána az esetenkénti metrikák már cache találatok
+        if self.judge:
+            self._prefetch_judgments(test_cases, answers)
+
+        results = [
+            self.evaluate_single_turn(
                 query=test_case['query'],
                 context=test_case.get('context', []),
-                expected_answer=test_case.get('expected_answer')
+                expected_answer=test_case.get('expected_answer'),
+                answer=answer
             )
-            results.append(result)
+            for test_case, answer in zip(test_cases, answers)
+        ]
         
         # Összesített metrikák
         avg_context_relevance = sum(r['context_relevance'] for r in results) / len(results)
         avg_hallucination = sum(r['hallucination_score'] for r in results) / len(results)
         
+        summary = {
+            'num_tests': len(results),
+            'avg_context_relevance': avg_context_relevance,
+            'avg_hallucination_score': avg_hallucination
+        }
+        if self.judge:
+            summary['judge'] = dict(self.judge.stats)
+
         return {
             'results': results,
-            'summary': {
-                'num_tests': len(results),
-                'avg_context_relevance': avg_context_relevance,
-                'avg_hallucination_score': avg_hallucination
-            }
+            'summary': summary
         }
     
+    def _prefetch_judgments(self, test_cases: List[Dict[str, Any]], answers: List[str]):
+        """Nem abstain esetek judge pontozása batch-ekben (runner esetén a batch-ek párhuzamosan)"""
+        items = [
+            {
+                'query': test_case['query'],
+                'context': self._format_context(test_case.get('context', [])),
+                'answer': answer
+            }
+            for test_case, answer in zip(test_cases, answers)
+            if not self.is_abstain(answer)
+        ]
+        batches = [
+            items[i:i + self.judge.batch_size]
+            for i in range(0, len(items), self.judge.batch_size)
+        ]
+        if self.runner is None:
+            for batch in batches:
+                self.judge.score_batch(batch)
+        else:
+            self.runner.map('prompt_judge', self.judge.score_batch, batches)
+
     def save_results(self, results: Dict[str, Any], file_path: str):
         """Eredmények mentése"""
         Path(file_path).parent.mkdir(parents=True, exist_ok=True)
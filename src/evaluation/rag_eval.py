@@ -12,21 +12,79 @@ import json
 logger = logging.getLogger(__name__)
 
 
+def _match_tensor(retrieved: List[List[Any]], expected: List[List[Any]], matches) -> np.ndarray:
+    """
+    Találat x elvárt elem egyezési tenzor (query, rank, elvárt elem), nullákkal kitöltve
+
+    Args:
+        retrieved: Query-nként a visszaadott elemek (ID-k vagy chunk szövegek) rang sorrendben
+        expected: Query-nként az elvárt elemek (ground truth ID-k vagy kulcsszavak)
+        matches: (visszaadott, elvárt) -> bool
+    """
+    num_ranks = max((len(r) for r in retrieved), default=0)
+    num_expected = max((len(e) for e in expected), default=0)
+    match = np.zeros((len(retrieved), num_ranks, num_expected), dtype=bool)
+    for q, (items, targets) in enumerate(zip(retrieved, expected)):
+        for rank, item in enumerate(items):
+            for j, target in enumerate(targets):
+                match[q, rank, j] = matches(item, target)
+    return match
+
+
+def ranking_metrics(
+    match: np.ndarray,
+    retrieved_counts: List[int],
+    expected_counts: List[int]
+) -> Dict[str, np.ndarray]:
+    """
+    Query-nkénti precision / recall / MRR egyben, az egyezési tenzorból
+
+    Args:
+        match: (query, rank, elvárt elem) bool tenzor
+        retrieved_counts: Visszaadott találatok száma query-nként
+        expected_counts: Elvárt elemek száma query-nként
+
+    Returns:
+        {'precision', 'recall', 'mrr'}: query-nkénti tömbök
+    """
+    retrieved_counts = np.asarray(retrieved_counts, dtype=float)
+    expected_counts = np.asarray(expected_counts, dtype=float)
+    relevant = match.any(axis=2)                    # (query, rank)
+    found = match.any(axis=1).sum(axis=1)           # megtalált elvárt elemek száma
+    has_relevant = relevant.any(axis=1)
+    # Üres rang dimenzión (egy query sem kapott találatot) az argmax nem értelmezett
+    first_rank = relevant.argmax(axis=1) + 1 if relevant.shape[1] else np.ones(len(relevant))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(retrieved_counts > 0, relevant.sum(axis=1) / retrieved_counts, 0.0)
+        recall = np.where(expected_counts > 0, found / expected_counts, 0.0)
+        mrr = np.where(has_relevant, 1.0 / first_rank, 0.0)
+    return {'precision': precision, 'recall': recall, 'mrr': mrr}
+
+
 class RAGEvaluator:
     """RAG szintű értékelő osztály"""
     
-    def __init__(self, vector_store, retrieval_engine, embedding_model, chunking_strategy=None):
+    def __init__(self, vector_store, retrieval_engine, embedding_model, chunking_strategy=None, runner=None):
         """
         Args:
             vector_store: Vektor adatbázis
             retrieval_engine: Retrieval engine
             embedding_model: Embedding modell
             chunking_strategy: Chunking stratégia (opcionális)
+            runner: ParallelRunner a teszt esetek párhuzamos futtatásához (opcionális)
         """
         self.vector_store = vector_store
         self.retrieval_engine = retrieval_engine
         self.embedding_model = embedding_model
         self.chunking_strategy = chunking_strategy
+        self.runner = runner
+
+    def _map(self, suite: str, fn, items: List[Any]) -> List[Any]:
+        """Teszt esetek futtatása (runner esetén párhuzamosan, sorrendtartóan)"""
+        if self.runner is None:
+            return [fn(item) for item in items]
+        return self.runner.map(suite, fn, items)
     
     def evaluate_retrieval(
         self,
@@ -46,35 +104,19 @@ class RAGEvaluator:
         if len(queries) != len(ground_truth):
             raise ValueError("A queries és ground_truth hossza nem egyezik")
         
-        precisions = []
-        recalls = []
-        mrr_scores = []
-        
-        for query, gt_ids in zip(queries, ground_truth):
-            # Retrieval futtatása
-            results = self.retrieval_engine.retrieve(query, top_k=10)
-            retrieved_ids = [r['id'] for r in results]
-            
-            # Precision és Recall számítása
-            relevant_retrieved = len(set(retrieved_ids) & set(gt_ids))
-            precision = relevant_retrieved / len(retrieved_ids) if retrieved_ids else 0
-            recall = relevant_retrieved / len(gt_ids) if gt_ids else 0
-            
-            precisions.append(precision)
-            recalls.append(recall)
-            
-            # MRR számítása
-            mrr = 0.0
-            for rank, result_id in enumerate(retrieved_ids, 1):
-                if result_id in gt_ids:
-                    mrr = 1.0 / rank
-                    break
-            mrr_scores.append(mrr)
+        # Retrieval futtatása (runner esetén párhuzamosan), a metrikák a végén egyben
+        results = self._map('rag_retrieval', lambda query: self.retrieval_engine.retrieve(query, top_k=10), queries)
+        retrieved_ids = [[r['id'] for r in query_results] for query_results in results]
+        gt_sets = [list(dict.fromkeys(gt_ids)) for gt_ids in ground_truth]
+
+        # match[q, rank, j]: a rank-adik találat a j-edik ground truth ID
+        match = _match_tensor(retrieved_ids, gt_sets, lambda result_id, gt_id: result_id == gt_id)
+        metrics = ranking_metrics(match, [len(ids) for ids in retrieved_ids], [len(gt) for gt in gt_sets])
         
         return {
-            'precision': np.mean(precisions),
-            'recall': np.mean(recalls),
-            'mrr': np.mean(mrr_scores),
+            'precision': float(metrics['precision'].mean()) if len(queries) else 0.0,
+            'recall': float(metrics['recall'].mean()) if len(queries) else 0.0,
+            'mrr': float(metrics['mrr'].mean()) if len(queries) else 0.0,
             'num_queries': len(queries)
         }
 
@@ -93,75 +135,57 @@ class RAGEvaluator:
         Returns:
             Metrikák dict (keyword_metrics, basic_retrieval, details)
         """
-        keyword_precisions = []
-        keyword_recalls = []
-        keyword_mrrs = []
-        basic_successes = []
-        details = []
-
-        for test in test_cases:
-            query = test['query']
-            expected_keywords = [kw.lower() for kw in test.get('expected_keywords', [])]
-
-            results = self.retrieval_engine.retrieve(query, top_k=top_k)
-
-            if not expected_keywords:
-                success = len(results) > 0
-                basic_successes.append(success)
-                details.append({
-                    'query': query,
-                    'category': test.get('category', ''),
-                    'type': 'basic',
-                    'success': success,
-                    'retrieved_count': len(results)
-                })
-                continue
-
-            relevant_count = 0
-            keywords_found = set()
-            first_relevant_rank = None
-
-            for rank, result in enumerate(results, 1):
-                text = (result.get('text', '') or '').lower()
-                is_relevant = False
-
-                for kw in expected_keywords:
-                    if kw in text:
-                        is_relevant = True
-                        keywords_found.add(kw)
+        results = self._map(
+            'rag_retrieval',
+            lambda test: self.retrieval_engine.retrieve(test['query'], top_k=top_k),
+            test_cases
+        )
 
-                if is_relevant:
-                    relevant_count += 1
-                    if first_relevant_rank is None:
-                        first_relevant_rank = rank
+        keyword_idx = [i for i, test in enumerate(test_cases) if test.get('expected_keywords')]
+        texts = [[(r.get('text', '') or '').lower() for r in results[i]] for i in keyword_idx]
+        keywords = [[kw.lower() for kw in test_cases[i]['expected_keywords']] for i in keyword_idx]
 
-            precision = relevant_count / len(results) if results else 0
-            recall = len(keywords_found) / len(expected_keywords)
-            mrr = 1.0 / first_relevant_rank if first_relevant_rank else 0
+        # match[q, rank, j]: a j-edik elvárt kulcsszó szerepel a rank-adik chunkban
+        match = _match_tensor(texts, keywords, lambda text, kw: kw in text)
+        metrics = ranking_metrics(match, [len(t) for t in texts], [len(kws) for kws in keywords])
+        relevant_counts = match.any(axis=2).sum(axis=1)
+        keyword_found = match.any(axis=1)
 
-            keyword_precisions.append(precision)
-            keyword_recalls.append(recall)
-            keyword_mrrs.append(mrr)
-
-            details.append({
-                'query': query,
+        details: List[Dict[str, Any]] = [None] * len(test_cases)
+        for row, i in enumerate(keyword_idx):
+            test = test_cases[i]
+            details[i] = {
+                'query': test['query'],
                 'category': test.get('category', ''),
                 'type': 'keyword',
-                'precision': round(precision, 3),
-                'recall': round(recall, 3),
-                'mrr': round(mrr, 3),
-                'retrieved_count': len(results),
-                'relevant_count': relevant_count,
-                'keywords_found': list(keywords_found),
+                'precision': round(float(metrics['precision'][row]), 3),
+                'recall': round(float(metrics['recall'][row]), 3),
+                'mrr': round(float(metrics['mrr'][row]), 3),
+                'retrieved_count': len(results[i]),
+                'relevant_count': int(relevant_counts[row]),
+                'keywords_found': [kw for j, kw in enumerate(keywords[row]) if keyword_found[row, j]],
                 'keywords_expected': test.get('expected_keywords', [])
-            })
+            }
+
+        basic_successes = []
+        for i, test in enumerate(test_cases):
+            if details[i] is None:
+                basic_successes.append(len(results[i]) > 0)
+                details[i] = {
+                    'query': test['query'],
+                    'category': test.get('category', ''),
+                    'type': 'basic',
+                    'success': len(results[i]) > 0,
+                    'retrieved_count': len(results[i])
+                }
 
+        num_keyword = len(keyword_idx)
         return {
             'keyword_metrics': {
-                'precision': float(np.mean(keyword_precisions)) if keyword_precisions else 0,
-                'recall': float(np.mean(keyword_recalls)) if keyword_recalls else 0,
-                'mrr': float(np.mean(keyword_mrrs)) if keyword_mrrs else 0,
-                'num_queries': len(keyword_precisions)
+                'precision': float(metrics['precision'].mean()) if num_keyword else 0,
+                'recall': float(metrics['recall'].mean()) if num_keyword else 0,
+                'mrr': float(metrics['mrr'].mean()) if num_keyword else 0,
+                'num_queries': num_keyword
             },
             'basic_retrieval': {
                 'success_rate': float(sum(basic_successes) / len(basic_successes)) if basic_successes else 0,
@@ -184,23 +208,16 @@ class RAGEvaluator:
         Returns:
             Embedding minőség metrikák
         """
-        predicted_similarities = []
-        true_similarities = []
-        
-        for pair in test_pairs:
-            text1 = pair['text1']
-            text2 = pair['text2']
-            true_sim = pair['similarity']
-            
+        def pair_similarity(pair: Dict[str, Any]) -> float:
             # Embedding generálás
-            emb1 = self.embedding_model.embed_text(text1)
-            emb2 = self.embedding_model.embed_text(text2)
-            
+            emb1 = self.embedding_model.embed_text(pair['text1'])
+            emb2 = self.embedding_model.embed_text(pair['text2'])
+
             # Cosine similarity számítása
-            cos_sim = np.dot(emb1, emb2) / (np.linalg.norm(emb1) * np.linalg.norm(emb2))
-            
-            predicted_similarities.append(cos_sim)
-            true_similarities.append(true_sim)
+            return np.dot(emb1, emb2) / (np.linalg.norm(emb1) * np.linalg.norm(emb2))
+
+        predicted_similarities = self._map('rag_embedding', pair_similarity, test_pairs)
+        true_similarities = [pair['similarity'] for pair in test_pairs]
         
         # Korreláció számítása
         correlation = np.corrcoef(predicted_similarities, true_similarities)[0, 1]
@@ -0,0 +1,149 @@
+"""
+Evaluation hatókörű retrieval memo
+A RAG, prompt és app suite-ok nagyrészt ugyanazokat a test_cases.py
+query-ket keresik vissza. A memo egy evaluation futás alatt minden
+(query, top_k, index verzió, retrieval konfiguráció) kulcsot egyszer
+számol ki (embedding + keresés + score/filter), a többi hívás a tárolt
+találatok másolatát kapja.
+
+Az index verzió a vektor tároló generation számlálójából és a
+dokumentumszámból áll, így egy feltöltés (pl. app journey) után a
+régi találatok nem kerülnek újra felhasználásra.
+"""
+
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Hashable, List, Optional
+
+from src.utils.single_flight import SingleFlight, normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+def index_version(vector_store) -> tuple:
+    """Az index azonosítója és verziója (adatbázis, collection, generation, dokumentumszám)"""
+    try:
+        count = vector_store.get_collection_info().get('document_count', 0)
+    except Exception:
+        count = None
+    return (
+        str(vector_store.persist_directory),
+        vector_store.collection_name,
+        getattr(vector_store, 'generation', 0),
+        count,
+    )
+
+
+class RetrievalMemo:
+    """Retrieval eredmények memoizálása egy evaluation futás idejére (thread-safe)"""
+
+    def __init__(self):
+        self._results: Dict[Hashable, List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        # Párhuzamos suite-okban az azonos kulcsú hiányzó query-k csak egyszer futnak
+        self._flight = SingleFlight('eval_retrieval')
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(retrieval_engine, query: str, top_k: int) -> tuple:
+        embedding_model = retrieval_engine.embedding_model
+        return (
+            normalize_query(query, casefold=False),
+            top_k,
+            index_version(retrieval_engine.vector_store),
+            getattr(embedding_model, 'model_name', type(embedding_model).__name__),
+            retrieval_engine.similarity_threshold,
+            retrieval_engine.min_results,
+            retrieval_engine.relative_threshold_ratio,
+        )
+
+    def retrieve(self, retrieval_engine, query: str, top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        retrieval_engine.retrieve memoizálva
+
+        Args:
+            retrieval_engine: A tényleges RetrievalEngine
+            query: Keresési lekérdezés
+            top_k: Találatok száma (None = az engine alapértéke)
+
+        Returns:
+            A találatok másolata (a hívó módosíthatja őket)
+        """
+        top_k = top_k or retrieval_engine.top_k
+        key = self.key(retrieval_engine, query, top_k)
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None:
+                self.hits += 1
+        if cached is None:
+            cached = self._flight.do(key, lambda: self._compute(key, retrieval_engine, query, top_k))
+        return [dict(result) for result in cached]
+
+    def _compute(self, key: tuple, retrieval_engine, query: str, top_k: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+        results = retrieval_engine.retrieve(query, top_k=top_k)
+        with self._lock:
+            self._results[key] = results
+            self.misses += 1
+        return results
+
+    def wrap(self, retrieval_engine) -> "MemoizedRetrievalEngine":
+        """A RetrievalEngine helyettesítője, amelynek retrieve() hívásai a memón mennek át"""
+        return MemoizedRetrievalEngine(retrieval_engine, self)
+
+    def attach(self, rag_system):
+        """A RAGSystem retrieval engine-jének lecserélése a memoizált változatra"""
+        if not isinstance(rag_system.retrieval_engine, MemoizedRetrievalEngine):
+            rag_system.retrieval_engine = self.wrap(rag_system.retrieval_engine)
+        return rag_system
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._results),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+
+class MemoizedRetrievalEngine:
+    """RetrievalEngine proxy: retrieve() a memón keresztül, minden más az eredeti engine-é"""
+
+    def __init__(self, retrieval_engine, memo: RetrievalMemo):
+        self._engine = retrieval_engine
+        self._memo = memo
+
+    def retrieve(self, query: str, top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        if not query or not query.strip():
+            return self._engine.retrieve(query, top_k=top_k)
+        return self._memo.retrieve(self._engine, query, top_k)
+
+    def __getattr__(self, name: str):
+        return getattr(self._engine, name)
+
+
+@contextmanager
+def bypass_memo(rag_system):
+    """
+    A memo ideiglenes kikapcsolása egy RAGSystem-en (pl. latency méréshez,
+    ahol a memo találat a valódi retrieval időt takarná el)
+    """
+    engine = rag_system.retrieval_engine
+    if isinstance(engine, MemoizedRetrievalEngine):
+        rag_system.retrieval_engine = engine._engine
+    try:
+        yield rag_system
+    finally:
+        rag_system.retrieval_engine = engine
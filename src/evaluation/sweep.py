@@ -0,0 +1,369 @@
+"""
+Paraméter sweep
+A chunk_size, chunk_overlap, top_k, similarity_threshold és reranking
+rácsán végigmenve minden index változat egy izolált, ideiglenes
+collection-be épül, a retrieval minőség pedig a RAGEvaluator kulcsszó
+metrikáival mérődik.
+
+- Index változat csak (chunk_size, chunk_overlap) páronként készül, a
+  top_k / küszöb / reranking konfigurációk ugyanazt az indexet használják
+- Az embeddingek szöveg hash szerint cache-elődnek: az azonos chunk
+  szövegek (és a teszt query-k) csak egyszer kerülnek a modellhez
+- A konfigurációk minőség kiértékelése ParallelRunner-rel párhuzamos; a
+  latency egy külön, soros menetben mérődik, hogy a párhuzamos futások
+  egymásra várakozása ne torzítsa
+- A kimenet Pareto tábla: minőség vs. latency vs. index méret
+"""
+
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from itertools import product
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .rag_eval import RAGEvaluator
+
+logger = logging.getLogger(__name__)
+
+GRID_KEYS = ['chunk_size', 'chunk_overlap', 'top_k', 'similarity_threshold', 'use_reranking']
+
+DEFAULT_GRID = {
+    'chunk_size': [500, 1000],
+    'chunk_overlap': [100, 200],
+    'top_k': [3, 5],
+    'similarity_threshold': [0.3],
+    'use_reranking': [False, True],
+}
+
+QUALITY_METRICS = ('precision', 'recall', 'mrr')
+
+
+def expand_grid(grid: Dict[str, Sequence[Any]]) -> List[Dict[str, Any]]:
+    """
+    A rács összes kombinációja (az overlap >= chunk_size kombinációk kimaradnak)
+
+    Args:
+        grid: {paraméter: [értékek]}; a hiányzó paraméterek a DEFAULT_GRID értékeit kapják
+
+    Returns:
+        Konfigurációk listája
+    """
+    values = [list(grid.get(key) or DEFAULT_GRID[key]) for key in GRID_KEYS]
+    configs = []
+    for combination in product(*values):
+        config = dict(zip(GRID_KEYS, combination))
+        if config['chunk_overlap'] >= config['chunk_size']:
+            logger.warning(f"Sweep: érvénytelen kombináció kihagyva ({config})")
+            continue
+        configs.append(config)
+    return configs
+
+
+class EmbeddingCache:
+    """
+    Szöveg hash -> embedding cache az EmbeddingModel előtt.
+    Ugyanazt a felületet adja (embed_text / embed_texts), így a
+    RetrievalEngine embedding modelljeként is használható.
+    """
+
+    def __init__(self, embedding_model, batch_size: int = 64):
+        """
+        Args:
+            embedding_model: A tényleges EmbeddingModel
+            batch_size: Egy modell hívás maximális szövegszáma
+        """
+        self.embedding_model = embedding_model
+        self.batch_size = batch_size
+        self._cache: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        with self._lock:
+            missing = {}
+            for key, text in zip(keys, texts):
+                if key not in self._cache:
+                    missing.setdefault(key, text)
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        pending = list(missing.items())
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            embeddings = self.embedding_model.embed_texts([text for _, text in batch])
+            with self._lock:
+                for (key, _), embedding in zip(batch, embeddings):
+                    self._cache[key] = embedding
+
+        with self._lock:
+            return [self._cache[key] for key in keys]
+
+    def embed_text(self, text: str) -> List[float]:
+        return self.embed_texts([text])[0]
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._cache),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+class _SweepRetriever:
+    """Retrieval + opcionális reranking egy konfigurációra, query latency méréssel"""
+
+    def __init__(self, retrieval_engine, reranker=None):
+        self.retrieval_engine = retrieval_engine
+        self.reranker = reranker
+        self.latencies: List[float] = []
+
+    def retrieve(self, query: str, top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        top_k = top_k or self.retrieval_engine.top_k
+        start = time.perf_counter()
+        if self.reranker is not None:
+            # Mint a RAGSystem: bővebb jelöltlista, a reranker vágja top_k-ra
+            candidates = self.retrieval_engine.retrieve(query, top_k=top_k * 2)
+            results = self.reranker.rerank(query, candidates, top_k=top_k)
+        else:
+            results = self.retrieval_engine.retrieve(query, top_k=top_k)
+        self.latencies.append(time.perf_counter() - start)
+        return results
+
+
+def pareto_front(
+    rows: List[Dict[str, Any]],
+    quality_key: str = 'mrr',
+    latency_key: str = 'latency_p95_ms',
+    size_key: str = 'index_bytes'
+) -> List[int]:
+    """
+    A nem dominált sorok indexei (minőség max, latency és index méret min)
+
+    Egy sor dominált, ha van másik, ami minden szempontból legalább olyan jó
+    és legalább egyben szigorúan jobb.
+    """
+    if not rows:
+        return []
+    # Minden oszlop "kisebb a jobb" irányba fordítva
+    points = np.array([[-row[quality_key], row[latency_key], row[size_key]] for row in rows], dtype=float)
+    front = []
+    for i, point in enumerate(points):
+        no_worse = np.all(points <= point, axis=1)
+        better = np.any(points < point, axis=1)
+        if not np.any(no_worse & better):
+            front.append(i)
+    return front
+
+
+class ParameterSweep:
+    """Paraméter rács kiértékelése izolált index változatokon"""
+
+    def __init__(
+        self,
+        embedding_model,
+        documents: List[Dict[str, Any]],
+        test_cases: List[Dict[str, Any]],
+        reranker=None,
+        runner=None,
+        workdir: str = None,
+        chunking_strategy: str = "recursive"
+    ):
+        """
+        Args:
+            embedding_model: EmbeddingModel (a cache mögött)
+            documents: Feldolgozott dokumentumok ({'text', 'metadata'}, DocumentProcessor kimenet)
+            test_cases: Kulcsszó alapú retrieval tesztek (RAG_TEST_CASES['retrieval_tests'] formátum)
+            reranker: Reranker a use_reranking=True konfigurációkhoz (None = lusta létrehozás)
+            runner: ParallelRunner a konfigurációk párhuzamos kiértékeléséhez (opcionális)
+            workdir: Az index változatok könyvtára (alapértelmezett: ideiglenes, futás után törlődik)
+            chunking_strategy: ChunkingStrategy stratégia
+        """
+        if not documents:
+            raise ValueError("Legalább egy dokumentum szükséges a sweep-hez")
+        if not test_cases:
+            raise ValueError("Legalább egy teszt eset szükséges a sweep-hez")
+        self.embeddings = EmbeddingCache(embedding_model)
+        self.documents = documents
+        self.test_cases = test_cases
+        self.reranker = reranker
+        self.runner = runner
+        self.workdir = workdir
+        self.chunking_strategy = chunking_strategy
+        self._indexes: Dict[tuple, Dict[str, Any]] = {}
+
+    # ------------------------------------------------------------------
+    # Index változatok
+    # ------------------------------------------------------------------
+    def _build_index(self, chunk_size: int, chunk_overlap: int, root: Path) -> Dict[str, Any]:
+        """Egy (chunk_size, chunk_overlap) index felépítése saját collection-ben és könyvtárban"""
+        from src.rag.chunking import ChunkingStrategy
+        from src.rag.vector_store import VectorStore
+
+        name = f"sweep_cs{chunk_size}_ov{chunk_overlap}"
+        start = time.perf_counter()
+        chunking = ChunkingStrategy(chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                                    strategy=self.chunking_strategy)
+        chunks = chunking.chunk_documents(self.documents)
+        texts = [chunk['text'] for chunk in chunks]
+
+        hits_before = self.embeddings.hits
+        embeddings = self.embeddings.embed_texts(texts)
+        store = VectorStore(collection_name=name, persist_directory=str(root / name))
+        for begin in range(0, len(texts), 1000):
+            end = begin + 1000
+            store.add_documents(
+                texts=texts[begin:end],
+                embeddings=embeddings[begin:end],
+                metadatas=[chunk['metadata'] for chunk in chunks[begin:end]],
+                ids=[f"sweep_{i}" for i in range(begin, min(end, len(texts)))]
+            )
+
+        storage = store.get_storage_info()
+        index = {
+            'name': name,
+            'chunk_size': chunk_size,
+            'chunk_overlap': chunk_overlap,
+            'chunks': len(chunks),
+            'build_seconds': time.perf_counter() - start,
+            'embedding_cache_hits': self.embeddings.hits - hits_before,
+            'index_bytes': storage['disk_bytes'],
+            'vector_bytes': storage['vector_bytes'],
+            'store': store,
+        }
+        logger.info(f"Sweep index kész: {name} ({len(chunks)} chunk)")
+        return index
+
+    def _reranker(self):
+        if self.reranker is None:
+            from src.rag.reranking import Reranker
+            self.reranker = Reranker(use_reranking=True)
+        return self.reranker
+
+    # ------------------------------------------------------------------
+    # Konfiguráció kiértékelés
+    # ------------------------------------------------------------------
+    def _retriever(self, config: Dict[str, Any]):
+        """A konfiguráció indexe és retrievere"""
+        from src.rag.retrieval import RetrievalEngine
+
+        index = self._indexes[(config['chunk_size'], config['chunk_overlap'])]
+        engine = RetrievalEngine(
+            vector_store=index['store'],
+            embedding_model=self.embeddings,
+            top_k=config['top_k'],
+            similarity_threshold=config['similarity_threshold']
+        )
+        return index, _SweepRetriever(engine, self._reranker() if config['use_reranking'] else None)
+
+    def evaluate_config(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        """Egy konfiguráció retrieval minősége a megfelelő indexen (párhuzamosan futtatható)"""
+        index, retriever = self._retriever(config)
+        evaluator = RAGEvaluator(index['store'], retriever, self.embeddings)
+        metrics = evaluator.evaluate_retrieval_by_keywords(self.test_cases, top_k=config['top_k'])
+
+        keyword = metrics['keyword_metrics']
+        return {
+            **config,
+            'precision': keyword['precision'],
+            'recall': keyword['recall'],
+            'mrr': keyword['mrr'],
+            'basic_success_rate': metrics['basic_retrieval']['success_rate'],
+            'chunks': index['chunks'],
+            'index_bytes': index['index_bytes'],
+            'vector_bytes': index['vector_bytes'],
+        }
+
+    def measure_latency(self, config: Dict[str, Any]) -> Dict[str, float]:
+        """
+        Egy konfiguráció query latency-je (soros futtatásra: más mérés ne fusson közben)
+
+        Returns:
+            {'latency_p50_ms', 'latency_p95_ms'}
+        """
+        _, retriever = self._retriever(config)
+        for test in self.test_cases:
+            retriever.retrieve(test['query'], top_k=config['top_k'])
+        latencies = np.array(retriever.latencies, dtype=float) * 1000.0
+        return {
+            'latency_p50_ms': float(np.percentile(latencies, 50)) if latencies.size else 0.0,
+            'latency_p95_ms': float(np.percentile(latencies, 95)) if latencies.size else 0.0,
+        }
+
+    def run(
+        self,
+        grid: Dict[str, Sequence[Any]] = None,
+        quality_key: str = 'mrr'
+    ) -> Dict[str, Any]:
+        """
+        A teljes rács kiértékelése
+
+        Args:
+            grid: {paraméter: [értékek]} (None = DEFAULT_GRID)
+            quality_key: A Pareto front minőség metrikája (precision / recall / mrr)
+
+        Returns:
+            {'meta', 'indexes', 'results' (minőség szerint rendezve, 'pareto' jelzővel),
+             'pareto', 'embedding_cache'}
+        """
+        if quality_key not in QUALITY_METRICS:
+            raise ValueError(f"Ismeretlen minőség metrika: {quality_key}")
+        configs = expand_grid(grid or DEFAULT_GRID)
+        owns_workdir = self.workdir is None
+        root = Path(self.workdir or tempfile.mkdtemp(prefix="rag-sweep-"))
+        start = time.time()
+
+        try:
+            # Az index változatok sorban épülnek, így a közös chunkok embeddingje a cache-ből jön
+            for chunk_size, chunk_overlap in dict.fromkeys((c['chunk_size'], c['chunk_overlap']) for c in configs):
+                self._indexes[(chunk_size, chunk_overlap)] = self._build_index(chunk_size, chunk_overlap, root)
+            if any(c['use_reranking'] for c in configs):
+                self._reranker()
+            # A query embeddingek előre, így a konfigurációk latency-je csak keresés + rerank
+            self.embeddings.embed_texts([test['query'] for test in self.test_cases])
+
+            if self.runner is not None:
+                rows = self.runner.map('sweep', self.evaluate_config, configs)
+            else:
+                rows = [self.evaluate_config(config) for config in configs]
+            # Latency: soros menet, a párhuzamos minőség kiértékelés után
+            for row, config in zip(rows, configs):
+                row.update(self.measure_latency(config))
+        finally:
+            indexes = [{k: v for k, v in index.items() if k != 'store'} for index in self._indexes.values()]
+            self._indexes.clear()
+            if owns_workdir:
+                shutil.rmtree(root, ignore_errors=True)
+
+        front = set(pareto_front(rows, quality_key=quality_key))
+        for i, row in enumerate(rows):
+            row['pareto'] = i in front
+        rows.sort(key=lambda r: (-r[quality_key], r['latency_p95_ms'], r['index_bytes']))
+
+        return {
+            'meta': {
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'grid': {key: list((grid or DEFAULT_GRID).get(key) or DEFAULT_GRID[key]) for key in GRID_KEYS},
+                'configs': len(configs),
+                'test_cases': len(self.test_cases),
+                'quality_metric': quality_key,
+                'wall_time': time.time() - start,
+            },
+            'indexes': indexes,
+            'results': rows,
+            'pareto': [row for row in rows if row['pareto']],
+            'embedding_cache': self.embeddings.stats(),
+        }
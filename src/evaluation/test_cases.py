@@ -813,6 +813,7 @@ APP_TEST_CASES = {
             'Mi a dokumentum szerzője?'
         ],
         'num_runs': 3,
+        'warmup_runs': 1,  # eldobott bemelegítő futások
         'expected_avg_latency': {
             'cpu': 15.0,  # másodperc CPU-n
             'gpu': 3.0    # másodperc GPU-n
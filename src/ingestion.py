@@ -0,0 +1,457 @@
+"""
+Háttérben futó dokumentum feldolgozó (ingestion) sor
+A feltöltött fájlok feldolgozása (parse -> chunk -> embed -> írás) worker
+szálakon fut, így a feltöltő felület (és a chat) közben használható marad.
+
+Minden job-nak van állapota (queued / running / completed / failed /
+cancelled), haladása (feldolgozott oldalak, embeddelt és kiírt chunkok) és
+megszakítható. A feltöltött fájlok a job saját könyvtárába kerülnek, amely
+a job végén (sikeres, hibás vagy megszakított) törlődik.
+
+A job lista egy JSON fájlban perzisztens: újraindításkor a befejezetlen
+job-ok, amelyeknek a fájljai még megvannak, újra sorba kerülnek. Minden sor
+tulajdonos (pl. a Streamlit app és a serve_api ingest processze) saját
+feltöltési könyvtárat és job lista fájlt kap (<INGEST_UPLOAD_DIR>/<owner>/,
+ingestion_jobs.<owner>.json), amelyet egy fájl lock a processz élettartamára
+kizárólagosan lefoglal; így a két sor nem törli egymás feltöltéseit, és nem
+írja felül egymás job listáját.
+
+A fájlonkénti checkpointok (IngestionCheckpoints) a tartalom hash-éhez
+tárolják a kiírt chunkok számát: egy megszakított job vagy ugyanannak a
+fájlnak az újbóli feltöltése a legutolsó kiírt batch után folytatódik.
+"""
+
+import os
+import json
+import time
+import hashlib
+import queue
+import shutil
+import logging
+import threading
+import uuid
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from .monitoring.openmetrics import REGISTRY, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_COUNTERS = ('pages_parsed', 'chunks_total', 'chunks_embedded', 'chunks_written')
+FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+
+
+class IngestionCancelled(Exception):
+    """A feldolgozás a cancel_event miatt leállt"""
+
+
+def file_content_hash(path: str) -> str:
+    """A fájl tartalmának rövid (16 hex) SHA-256 hash-e: chunk ID prefix és checkpoint kulcs"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+class IngestionCheckpoints:
+    """
+    Fájlonkénti ingestion checkpoint (tartalom hash -> kiírt chunkok száma)
+
+    Minden batch vektor adatbázisba írása után frissül (atomikusan), így egy
+    megszakadt feldolgozás a következő futáskor az utolsó kiírt chunk után
+    folytatódik, a már kifizetett embedding munka nem ismétlődik.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: A checkpoint JSON fájl (a vektor adatbázis mellett)
+        """
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._records: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._records = json.load(f)
+            except Exception as e:
+                logger.warning(f"Hiba az ingestion checkpointok betöltésénél: {e}")
+
+    def get(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            record = self._records.get(content_hash)
+            return dict(record) if record else None
+
+    def update(self, content_hash: str, **fields):
+        """Checkpoint mezők frissítése és mentése"""
+        with self._lock:
+            record = self._records.setdefault(content_hash, {})
+            record.update(fields, updated_at=time.time())
+            self._save()
+
+    def remove(self, content_hash: str):
+        with self._lock:
+            if self._records.pop(content_hash, None) is not None:
+                self._save()
+
+    def _save(self):
+        tmp_file = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self._records, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_file, self.path)
+
+
+class IngestionJob:
+    """Egy feldolgozási feladat állapota és haladása"""
+
+    def __init__(self, job_id: str, files: List[str], upload_dir: Optional[str] = None):
+        """
+        Args:
+            job_id: Azonosító
+            files: Feldolgozandó fájlok
+            upload_dir: A job saját (ideiglenes) könyvtára, a végén törlődik (opcionális)
+        """
+        self.job_id = job_id
+        self.files = files
+        self.upload_dir = upload_dir
+        self.status = 'queued'
+        self.progress: Dict[str, int] = {name: 0 for name in PROGRESS_COUNTERS}
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    @property
+    def fraction(self) -> float:
+        """Becsült készültség 0..1 (embedding + írás a chunkok számához mérve)"""
+        if self.status == 'completed':
+            return 1.0
+        total = self.progress['chunks_total']
+        if not total:
+            return 0.0
+        return (self.progress['chunks_embedded'] + self.progress['chunks_written']) / (2 * total)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.job_id,
+            'files': self.files,
+            'file_names': [Path(path).name for path in self.files],
+            'upload_dir': self.upload_dir,
+            'status': self.status,
+            'progress': dict(self.progress),
+            'fraction': self.fraction,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IngestionJob":
+        job = cls(data['job_id'], data.get('files', []), data.get('upload_dir'))
+        job.status = data.get('status', 'queued')
+        job.progress.update(data.get('progress', {}))
+        job.error = data.get('error')
+        job.created_at = data.get('created_at', job.created_at)
+        job.started_at = data.get('started_at')
+        job.finished_at = data.get('finished_at')
+        return job
+
+
+class IngestionQueue:
+    """Perzisztens háttér feldolgozó sor worker szálakkal"""
+
+    def __init__(
+        self,
+        target,
+        workers: int = None,
+        upload_root: str = None,
+        state_file: str = None,
+        max_history: int = 50,
+        owner: str = 'app',
+        registry: MetricsRegistry = REGISTRY
+    ):
+        """
+        Args:
+            target: RAGSystem, vagy SharedRAGService (a job idejére lease-eli a példányt)
+            workers: Worker szálak száma (alapértelmezett: INGEST_WORKERS vagy 1)
+            upload_root: A job-ok feltöltési könyvtárainak helye (alapértelmezett:
+                <INGEST_UPLOAD_DIR>/<owner>)
+            state_file: A job lista perzisztens JSON fájlja (alapértelmezett:
+                INGEST_STATE_FILE, a névben az owner-rel, pl. ingestion_jobs.app.json)
+            max_history: Megőrzött befejezett job-ok száma
+            owner: A sor tulajdonosa ('app', 'api'); tulajdonosonként külön könyvtár és job lista
+            registry: OpenMetrics regiszter a sor mélység gauge-hoz
+
+        Raises:
+            RuntimeError: Ha a feltöltési könyvtárat egy másik processz sora már használja
+        """
+        self.target = target
+        self.workers = workers or int(os.getenv('INGEST_WORKERS', 1))
+        self.owner = owner
+        self.upload_root = Path(upload_root or Path(os.getenv('INGEST_UPLOAD_DIR', './data/uploads')) / owner)
+        if state_file is None:
+            default_state = Path(os.getenv('INGEST_STATE_FILE', './data/ingestion_jobs.json'))
+            state_file = default_state.with_name(f"{default_state.stem}.{owner}{default_state.suffix}")
+        self.state_file = Path(state_file)
+        self.max_history = max_history
+        self.registry = registry
+        self.upload_root.mkdir(parents=True, exist_ok=True)
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        self._owner_lock = self._acquire_owner_lock()
+
+        self._jobs: Dict[str, IngestionJob] = {}
+        self._lock = threading.RLock()
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._load_state()
+        with self._lock:
+            self._set_queue_depth()
+        self.start()
+
+    def _acquire_owner_lock(self):
+        """Kizárólagos lock a feltöltési könyvtárra (a processz élettartamára); fcntl nélkül None"""
+        if fcntl is None:
+            return None
+        handle = open(self.upload_root / '.owner.lock', 'a')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            raise RuntimeError(
+                f"A(z) {self.upload_root} ingestion könyvtárat egy másik processz használja; "
+                f"adj meg külön INGEST_UPLOAD_DIR / INGEST_STATE_FILE értéket"
+            )
+        return handle
+
+    # ------------------------------------------------------------------
+    # Job beküldés / lekérdezés / megszakítás
+    # ------------------------------------------------------------------
+    def submit_uploads(self, uploads: Iterable[Tuple[str, bytes]]) -> IngestionJob:
+        """
+        Feltöltött fájlok (név, tartalom) mentése a job könyvtárába és sorba állítása
+
+        Minden fájl saját, sorszámozott alkönyvtárba kerül, így az azonos nevű
+        feltöltések nem írják felül egymást, a fájlnév (forrás hivatkozás) pedig
+        változatlan marad.
+
+        Returns:
+            A létrehozott job
+        """
+        job_id = uuid.uuid4().hex[:12]
+        upload_dir = self.upload_root / job_id
+        files = []
+        for index, (name, content) in enumerate(uploads):
+            path = upload_dir / str(index) / Path(name).name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(content)
+            files.append(str(path))
+        return self._enqueue(IngestionJob(job_id, files, str(upload_dir)))
+
+    def submit_files(self, file_paths: List[str]) -> IngestionJob:
+        """Meglévő fájlok sorba állítása (a fájlok a job végén megmaradnak)"""
+        return self._enqueue(IngestionJob(uuid.uuid4().hex[:12], [str(path) for path in file_paths]))
+
+    def _enqueue(self, job: IngestionJob) -> IngestionJob:
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._save_state()
+            self._set_queue_depth()
+        self._queue.put(job.job_id)
+        logger.info(f"Ingestion job sorba állítva: {job.job_id} ({len(job.files)} fájl)")
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def jobs(self, include_finished: bool = True) -> List[Dict[str, Any]]:
+        """Job-ok (legújabb elöl)"""
+        with self._lock:
+            jobs = sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)
+            return [job.to_dict() for job in jobs if include_finished or not job.finished]
+
+    def active_count(self) -> int:
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.finished)
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Job megszakítása: a sorban álló azonnal, a futó a következő lépés előtt áll le
+
+        Returns:
+            True, ha a job még nem fejeződött be
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return False
+            job.cancel_event.set()
+            if job.status == 'queued':
+                self._finish(job, 'cancelled')
+        logger.info(f"Ingestion job megszakítása: {job_id}")
+        return True
+
+    # ------------------------------------------------------------------
+    # Worker-ek
+    # ------------------------------------------------------------------
+    def start(self):
+        """Worker szálak indítása (ha még nem futnak)"""
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"ingestion-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None):
+        """Worker-ek leállítása a futó job-ok befejezése után, a könyvtár lock elengedése"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        if self._owner_lock is not None:
+            self._owner_lock.close()
+            self._owner_lock = None
+
+    @contextmanager
+    def _lease(self):
+        lease = getattr(self.target, 'lease', None)
+        with (lease() if lease is not None else nullcontext(self.target)) as rag_system:
+            yield rag_system
+
+    def _worker(self):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job.status != 'queued':
+                    continue
+                job.status = 'running'
+                job.started_at = time.time()
+                self._save_state()
+                self._set_queue_depth()
+            self._run(job)
+
+    def _run(self, job: IngestionJob):
+        def progress(counter: str, amount: int):
+            with self._lock:
+                job.progress[counter] = job.progress.get(counter, 0) + amount
+
+        try:
+            with self._lease() as rag_system:
+                added = rag_system.add_documents(job.files, progress_callback=progress, cancel_event=job.cancel_event)
+            if not added:
+                raise ValueError("Nincs feldolgozható dokumentum / chunk")
+            status, error = 'completed', None
+        except IngestionCancelled:
+            status, error = 'cancelled', None
+        except Exception as e:
+            logger.error(f"Ingestion job hiba ({job.job_id}): {e}", exc_info=True)
+            status, error = 'failed', str(e)
+        with self._lock:
+            self._finish(job, status, error)
+        logger.info(f"Ingestion job {job.job_id}: {status} ({job.progress})")
+
+    def _finish(self, job: IngestionJob, status: str, error: Optional[str] = None):
+        """Lezárás, a job könyvtárának törlése, perzisztálás (self._lock alatt)"""
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        if job.upload_dir:
+            shutil.rmtree(job.upload_dir, ignore_errors=True)
+        self._trim_history()
+        self._save_state()
+        self._set_queue_depth()
+
+    def _set_queue_depth(self):
+        """Sorban álló és futó job-ok gauge-a (self._lock alatt)"""
+        counts = {'queued': 0, 'running': 0}
+        for job in self._jobs.values():
+            if job.status in counts:
+                counts[job.status] += 1
+        for status, count in counts.items():
+            self.registry.set_gauge(
+                'rag_ingestion_queue_depth', count,
+                "Ingestion job-ok száma állapot szerint",
+                labels={'owner': self.owner, 'status': status}
+            )
+
+    # ------------------------------------------------------------------
+    # Perzisztencia
+    # ------------------------------------------------------------------
+    def _trim_history(self):
+        finished = sorted(
+            (job for job in self._jobs.values() if job.finished),
+            key=lambda job: job.finished_at or 0
+        )
+        for job in finished[:max(0, len(finished) - self.max_history)]:
+            del self._jobs[job.job_id]
+
+    def _save_state(self):
+        """Job lista atomi mentése (tmp fájl + os.replace), self._lock alatt"""
+        tmp_file = self.state_file.with_name(f".{self.state_file.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump([job.to_dict() for job in self._jobs.values()], f, indent=2, ensure_ascii=False)
+            os.replace(tmp_file, self.state_file)
+        except Exception as e:
+            logger.error(f"Hiba az ingestion állapot mentésénél: {e}")
+
+    def _load_state(self):
+        """
+        Korábbi job-ok betöltése; a félbemaradt job-ok (queued / running),
+        amelyeknek a fájljai megvannak, újra sorba kerülnek
+        """
+        if not self.state_file.exists():
+            return
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+        except Exception as e:
+            logger.warning(f"Hiba az ingestion állapot betöltésénél: {e}")
+            return
+
+        requeued = []
+        for record in records:
+            job = IngestionJob.from_dict(record)
+            if not job.finished:
+                if all(Path(path).exists() for path in job.files):
+                    job.status = 'queued'
+                    job.progress = {name: 0 for name in PROGRESS_COUNTERS}
+                    requeued.append(job.job_id)
+                else:
+                    job.status = 'failed'
+                    job.error = "A feldolgozás megszakadt (újraindítás), a fájlok már nem elérhetők"
+                    job.finished_at = time.time()
+                    if job.upload_dir:
+                        shutil.rmtree(job.upload_dir, ignore_errors=True)
+            self._jobs[job.job_id] = job
+        # A job-hoz már nem tartozó (pl. összeomlás előtti) feltöltési könyvtárak törlése
+        live_dirs = {str(Path(job.upload_dir)) for job in self._jobs.values() if job.upload_dir and not job.finished}
+        for path in self.upload_root.iterdir():
+            if path.is_dir() and str(path) not in live_dirs:
+                shutil.rmtree(path, ignore_errors=True)
+        with self._lock:
+            self._save_state()
+        for job_id in requeued:
+            self._queue.put(job_id)
+        if requeued:
+            logger.info(f"{len(requeued)} félbemaradt ingestion job újra sorba állítva")
@@ -7,7 +7,10 @@ from typing import List, Dict, Any, Optional
 import logging
 from dotenv import load_dotenv
 from src.utils.hf_auth import ensure_hf_token_env
-import torch
+from src.utils.openai_client import get_openai_client, remote_call
+from src.utils.rate_limiter import estimate_tokens
+from src.utils.fake_backends import is_fake_backend
+from src.utils.inference_guard import InferenceGuard
 
 load_dotenv()
 
@@ -39,9 +42,14 @@ class LLMGenerator:
         self._pipeline = None
         self._tokenizer = None
         self._init_model()
+        # Lokális modell: egyszerre egy generálás (az OpenAI / fake kódutat a rate limiter korlátozza)
+        self._inference_guard = InferenceGuard('llm', default_concurrency=0 if self.use_openai else 1)
     
     def _init_model(self):
         """LLM modell inicializálása (Qwen-4B vagy OpenAI)"""
+        if is_fake_backend():
+            # Offline helyettesítő: a chat API kódút fut a fake kliensen (nincs modell letöltés)
+            self.use_openai = True
         if self.use_openai:
             self._init_openai()
         else:
@@ -50,15 +58,10 @@ class LLMGenerator:
     def _init_openai(self):
         """OpenAI client inicializálása"""
         try:
-            from openai import OpenAI
-            api_key = os.getenv('OPENAI_API_KEY')
-            if not api_key:
-                raise ValueError("OPENAI_API_KEY nincs beállítva a .env fájlban")
-            
-            self._client = OpenAI(api_key=api_key)
+            self._client = get_openai_client('chat')
             logger.info(f"OpenAI LLM inicializálva: {self.model_name}")
         except ImportError:
-            raise ImportError("openai nincs telepítve. Telepítsd: pip install openai")
+            raise
         except Exception as e:
             logger.error(f"Hiba az OpenAI inicializálásánál: {e}")
             raise
@@ -128,11 +131,16 @@ class LLMGenerator:
         messages = self._build_messages(prompt, context, system_message, conversation_history)
         
         try:
-            response = self._client.chat.completions.create(
-                model=self.model_name,
-                messages=messages,
-                temperature=self.temperature,
-                max_tokens=self.max_tokens
+            response = remote_call(
+                'chat',
+                lambda: self._client.chat.completions.create(
+                    model=self.model_name,
+                    messages=messages,
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens
+                ),
+                estimated_tokens=estimate_tokens(messages, max_tokens=self.max_tokens),
+                hedge=True
             )
             
             answer = response.choices[0].message.content
@@ -146,6 +154,8 @@ class LLMGenerator:
     
     def _generate_local(self, prompt: str, context: Optional[List[Dict[str, Any]]], system_message: Optional[str], conversation_history: Optional[List[Dict[str, str]]] = None) -> str:
         """Lokális Qwen modelllel generálás"""
+        import torch
+
         try:
             # Conversation history formázása
             history_text = ""
@@ -161,23 +171,24 @@ class LLMGenerator:
             else:
                 full_prompt = f"{system_message or ''}\n\n{history_text}Kérdés: {prompt}\n\nVálasz:"
             
-            # Tokenizálás
-            inputs = self._tokenizer(full_prompt, return_tensors="pt")
-            if self._pipeline.device.type == "cuda":
-                inputs = {k: v.to("cuda") for k, v in inputs.items()}
-            
-            # Generálás
-            with torch.no_grad():
-                outputs = self._pipeline.generate(
-                    **inputs,
-                    max_new_tokens=self.max_tokens,
-                    temperature=self.temperature,
-                    do_sample=True if self.temperature > 0 else False,
-                    pad_token_id=self._tokenizer.eos_token_id
-                )
-            
-            # Dekódolás
-            generated_text = self._tokenizer.decode(outputs[0], skip_special_tokens=True)
+            with self._inference_guard:
+                # Tokenizálás
+                inputs = self._tokenizer(full_prompt, return_tensors="pt")
+                if self._pipeline.device.type == "cuda":
+                    inputs = {k: v.to("cuda") for k, v in inputs.items()}
+
+                # Generálás
+                with torch.no_grad():
+                    outputs = self._pipeline.generate(
+                        **inputs,
+                        max_new_tokens=self.max_tokens,
+                        temperature=self.temperature,
+                        do_sample=True if self.temperature > 0 else False,
+                        pad_token_id=self._tokenizer.eos_token_id
+                    )
+
+                # Dekódolás
+                generated_text = self._tokenizer.decode(outputs[0], skip_special_tokens=True)
             
             # Csak a válasz részt kinyerni (az eredeti prompt után)
             answer = generated_text[len(full_prompt):].strip()
@@ -260,14 +271,17 @@ mondd el, hogy nem tudod megválaszolni a kérdést a rendelkezésre álló info
         """
         try:
             if self.use_openai:
-                from openai import OpenAI
                 messages = self._build_messages(prompt, context, system_message)
                 
-                response = self._client.chat.completions.create(
-                    model=self.model_name,
-                    messages=messages,
-                    temperature=self.temperature,
-                    max_tokens=self.max_tokens
+                response = remote_call(
+                    'chat',
+                    lambda: self._client.chat.completions.create(
+                        model=self.model_name,
+                        messages=messages,
+                        temperature=self.temperature,
+                        max_tokens=self.max_tokens
+                    ),
+                    estimated_tokens=estimate_tokens(messages, max_tokens=self.max_tokens)
                 )
                 
                 answer = response.choices[0].message.content
@@ -3,16 +3,239 @@ Streaming válaszgenerálás modul
 """
 
 import os
-from typing import List, Dict, Any, Optional, Iterator
+import time
+import queue
+import weakref
+import threading
+from typing import List, Dict, Any, Optional, Iterator, Callable
 import logging
 from dotenv import load_dotenv
 from src.utils.hf_auth import ensure_hf_token_env
+from src.utils.openai_client import get_openai_client, remote_call
+from src.utils.rate_limiter import estimate_tokens
+from src.utils.fake_backends import is_fake_backend
+from src.utils.inference_guard import InferenceGuard
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
 
+class StreamStats:
+    """Egy streaming válasz időzítési és token statisztikái"""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.start_time: Optional[float] = None
+        self.first_token_time: Optional[float] = None
+        self.end_time: Optional[float] = None
+        self.inter_token_latencies: List[float] = []
+        self.chunks = 0
+        self.text = ""
+        # Pontos token számok (OpenAI usage vagy tokenizer), ha elérhetők
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self.status = 'pending'  # pending | completed | abandoned | error
+
+    @property
+    def ttft(self) -> Optional[float]:
+        """Time-to-first-token másodpercben"""
+        if self.start_time is None or self.first_token_time is None:
+            return None
+        return self.first_token_time - self.start_time
+
+    @property
+    def total_time(self) -> Optional[float]:
+        if self.start_time is None or self.end_time is None:
+            return None
+        return self.end_time - self.start_time
+
+    @property
+    def tokens_per_sec(self) -> Optional[float]:
+        """Generálási sebesség az első token után"""
+        if self.first_token_time is None or self.end_time is None:
+            return None
+        tokens = self.completion_tokens if self.completion_tokens is not None else self.chunks
+        duration = self.end_time - self.first_token_time
+        return tokens / duration if duration > 0 else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        itl = sorted(self.inter_token_latencies)
+
+        def _pct(p: float) -> Optional[float]:
+            if not itl:
+                return None
+            return itl[min(int(round(p * (len(itl) - 1))), len(itl) - 1)]
+
+        return {
+            'model': self.model,
+            'status': self.status,
+            'first_token_time': self.ttft,
+            'total_time': self.total_time,
+            'tokens_per_sec': self.tokens_per_sec,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'chunks': self.chunks,
+            'inter_token_latency_p50': _pct(0.5),
+            'inter_token_latency_p95': _pct(0.95),
+            'inter_token_latency_max': itl[-1] if itl else None,
+        }
+
+
+class _DeferredCloser:
+    """
+    Háttérszál a fogyasztó által eldobott (GC-zett) streamek lezárására.
+
+    A GC finalizer tetszőleges szálon, tetszőleges zárak birtokában futhat,
+    ezért ott csak egy sorba tesszük a lezárást (SimpleQueue.put reentráns);
+    a forrás lezárása és a metrika rögzítés (fájl írás, zárak) ezen a szálon fut.
+    """
+
+    def __init__(self):
+        self._queue: "queue.SimpleQueue[Callable[[], None]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        """A szál indítása (normál kontextusból, nem finalizerből)"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stream-closer", daemon=True)
+                self._thread.start()
+
+    def submit(self, fn: Callable[[], None]):
+        self._queue.put(fn)
+
+    def _run(self):
+        while True:
+            fn = self._queue.get()
+            try:
+                fn()
+            except Exception as e:
+                logger.warning(f"Eldobott stream lezárási hiba: {e}")
+
+
+_deferred_closer = _DeferredCloser()
+
+
+class _StreamState:
+    """Az InstrumentedStream lezárásához szükséges állapot (a finalizer nem hivatkozhat a streamre)"""
+
+    def __init__(self, source: Iterator[str], stats: StreamStats, on_finish):
+        self.source = source
+        self.stats = stats
+        self.on_finish = on_finish
+        self.parts: List[str] = []
+        self.finished = False
+
+    def close(self):
+        if self.finished:
+            return
+        close = getattr(self.source, 'close', None)
+        if close is not None:
+            try:
+                close()
+            except Exception as e:
+                logger.debug(f"Stream forrás lezárási hiba: {e}")
+        self.finish('abandoned')
+
+    def finish(self, status: str):
+        if self.finished:
+            return
+        self.finished = True
+        stats = self.stats
+        stats.text = "".join(self.parts)
+        stats.status = status
+        stats.end_time = time.time()
+        if stats.start_time is None:
+            stats.start_time = stats.end_time
+        if self.on_finish is not None:
+            try:
+                self.on_finish(stats)
+            except Exception as e:
+                logger.warning(f"Streaming metrika rögzítési hiba: {e}")
+
+
+def _close_abandoned(state: _StreamState):
+    # GC finalizer: csak ütemez, a lezárás a háttérszálon fut
+    if not state.finished:
+        _deferred_closer.submit(state.close)
+
+
+class InstrumentedStream:
+    """
+    Streaming iterator wrapper: tokenenként időbélyegez, és a stream végén
+    (vagy ha a fogyasztó elhagyja / bezárja) egyszer meghívja az on_finish callback-et.
+
+    A teljes szöveg (stats.text) a stream végén áll össze. Ha a fogyasztó
+    lezárás nélkül eldobja a streamet, a lezárás és a rögzítés a GC után egy
+    háttérszálon történik.
+    """
+
+    def __init__(
+        self,
+        source: Iterator[str],
+        stats: StreamStats,
+        on_finish: Optional[Callable[[StreamStats], None]] = None
+    ):
+        self.stats = stats
+        self._state = _StreamState(source, stats, on_finish)
+        self._last_token_time: Optional[float] = None
+        _deferred_closer.ensure_started()
+        self._finalizer = weakref.finalize(self, _close_abandoned, self._state)
+        self._finalizer.atexit = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if self._state.finished:
+            raise StopIteration
+        if self.stats.start_time is None:
+            self.stats.start_time = time.time()
+        try:
+            chunk = next(self._state.source)
+        except StopIteration:
+            self._finish('completed')
+            raise
+        except Exception:
+            self._finish('error')
+            raise
+
+        now = time.time()
+        if self.stats.first_token_time is None:
+            self.stats.first_token_time = now
+        else:
+            self.stats.inter_token_latencies.append(now - self._last_token_time)
+        self._last_token_time = now
+        self.stats.chunks += 1
+        self._state.parts.append(chunk)
+        return chunk
+
+    def close(self):
+        """Stream lezárása (pl. a fogyasztó megszakította)"""
+        self._finalizer.detach()
+        self._state.close()
+
+    def _finish(self, status: str):
+        self._finalizer.detach()
+        self._state.finish(status)
+
+
+def _stop_on_event(event: threading.Event):
+    """StoppingCriteriaList, ami a következő tokennél leállítja a generálást, ha az event be van állítva"""
+    import torch
+    from transformers import StoppingCriteria, StoppingCriteriaList
+
+    class _StopOnEvent(StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs):
+            return torch.full((input_ids.shape[0],), event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+    return StoppingCriteriaList([_StopOnEvent()])
+
+
 class StreamingGenerator:
     """Streaming LLM válaszgeneráló osztály (Qwen-4B lokális modell)"""
     
@@ -21,7 +244,8 @@ class StreamingGenerator:
         model_name: str = None,
         temperature: float = 0.7,
         max_tokens: int = 1000,
-        use_openai: bool = False
+        use_openai: bool = False,
+        metrics_collector=None
     ):
         """
         Args:
@@ -29,8 +253,11 @@ class StreamingGenerator:
             temperature: Temperature paraméter
             max_tokens: Maximális token szám
             use_openai: Használjon-e OpenAI API-t (False = lokális Qwen)
+            metrics_collector: MetricsCollector, ami a stream végén automatikusan
+                megkapja a TTFT / token / sebesség metrikákat (opcionális)
         """
         self.use_openai = use_openai
+        self.metrics_collector = metrics_collector
         self.model_name = model_name or os.getenv('LLM_MODEL', 'gpt-3.5-turbo')
         self.temperature = temperature
         self.max_tokens = max_tokens
@@ -38,9 +265,14 @@ class StreamingGenerator:
         self._pipeline = None
         self._tokenizer = None
         self._init_model()
+        # Lokális modell: egyszerre egy generálás (az OpenAI / fake kódutat a rate limiter korlátozza)
+        self._inference_guard = InferenceGuard('llm_streaming', default_concurrency=0 if self.use_openai else 1)
     
     def _init_model(self):
         """LLM modell inicializálása (Qwen-4B vagy OpenAI)"""
+        if is_fake_backend():
+            # Offline helyettesítő: a chat API kódút fut a fake kliensen (nincs modell letöltés)
+            self.use_openai = True
         if self.use_openai:
             self._init_openai()
         else:
@@ -49,15 +281,10 @@ class StreamingGenerator:
     def _init_openai(self):
         """OpenAI client inicializálása"""
         try:
-            from openai import OpenAI
-            api_key = os.getenv('OPENAI_API_KEY')
-            if not api_key:
-                raise ValueError("OPENAI_API_KEY nincs beállítva a .env fájlban")
-            
-            self._client = OpenAI(api_key=api_key)
+            self._client = get_openai_client('stream')
             logger.info(f"OpenAI Streaming LLM inicializálva: {self.model_name}")
         except ImportError:
-            raise ImportError("openai nincs telepítve. Telepítsd: pip install openai")
+            raise
         except Exception as e:
             logger.error(f"Hiba az OpenAI inicializálásánál: {e}")
             raise
@@ -104,10 +331,15 @@ class StreamingGenerator:
         context: Optional[List[Dict[str, Any]]] = None,
         system_message: str = None,
         conversation_history: Optional[List[Dict[str, str]]] = None
-    ) -> Iterator[str]:
+    ) -> InstrumentedStream:
         """
         Streaming válasz generálása
 
+        A visszaadott iterator méri a TTFT-t, az inter-token latency-t és a
+        tokens/sec értéket, és a stream végén (vagy megszakításakor) automatikusan
+        rögzíti őket a metrics_collector-ban. A statisztikák a `.stats` attribútumon
+        is elérhetők.
+
         Args:
             prompt: Felhasználói prompt
             context: Kontextus dokumentumok listája
@@ -117,34 +349,73 @@ class StreamingGenerator:
         Yields:
             Válasz chunkok
         """
+        stats = StreamStats(self.model_name)
         if self.use_openai:
-            yield from self._generate_stream_openai(prompt, context, system_message, conversation_history)
+            source = self._generate_stream_openai(prompt, context, system_message, conversation_history, stats=stats)
         else:
-            yield from self._generate_stream_local(prompt, context, system_message, conversation_history)
-    
-    def _generate_stream_openai(self, prompt: str, context: Optional[List[Dict[str, Any]]], system_message: Optional[str], conversation_history: Optional[List[Dict[str, str]]] = None) -> Iterator[str]:
+            source = self._generate_stream_local(prompt, context, system_message, conversation_history, stats=stats)
+        return InstrumentedStream(source, stats, on_finish=self._record_stream_metrics)
+
+    def _record_stream_metrics(self, stats: StreamStats):
+        """Stream metrikák rögzítése a MetricsCollector-ban"""
+        if stats.completion_tokens is None and self._tokenizer is not None:
+            stats.completion_tokens = len(self._tokenizer.encode(stats.text))
+
+        if self.metrics_collector is None:
+            return
+
+        prompt_tokens = stats.prompt_tokens or 0
+        completion_tokens = stats.completion_tokens
+        if completion_tokens is None:
+            # Utolsó fallback: szó alapú becslés
+            completion_tokens = int(len(stats.text.split()) * 1.3)
+
+        cost = self.metrics_collector.calculate_cost(self.model_name, prompt_tokens, completion_tokens)
+        self.metrics_collector.record_llm_call(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            model=self.model_name,
+            first_token_time=stats.ttft,
+            total_time=stats.total_time,
+            cost=cost
+        )
+        if stats.total_time is not None:
+            self.metrics_collector.record_stage_latency('generation', stats.total_time)
+        self.metrics_collector.record_pipeline_event(event_type='stream', data=stats.to_dict())
+
+    def _generate_stream_openai(self, prompt: str, context: Optional[List[Dict[str, Any]]], system_message: Optional[str], conversation_history: Optional[List[Dict[str, str]]] = None, stats: Optional[StreamStats] = None) -> Iterator[str]:
         """OpenAI streaming generálás"""
         messages = self._build_messages(prompt, context, system_message, conversation_history)
         
         try:
-            stream = self._client.chat.completions.create(
-                model=self.model_name,
-                messages=messages,
-                temperature=self.temperature,
-                max_tokens=self.max_tokens,
-                stream=True
+            stream = remote_call(
+                'stream',
+                lambda: self._client.chat.completions.create(
+                    model=self.model_name,
+                    messages=messages,
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                ),
+                estimated_tokens=estimate_tokens(messages, max_tokens=self.max_tokens)
             )
             
             for chunk in stream:
-                if chunk.choices[0].delta.content is not None:
+                # include_usage esetén az utolsó chunk üres choices-szal hozza a usage-et
+                if chunk.usage is not None and stats is not None:
+                    stats.prompt_tokens = chunk.usage.prompt_tokens
+                    stats.completion_tokens = chunk.usage.completion_tokens
+                if chunk.choices and chunk.choices[0].delta.content is not None:
                     yield chunk.choices[0].delta.content
         
         except Exception as e:
             logger.error(f"Hiba a streaming válasz generálásánál: {e}")
             raise
     
-    def _generate_stream_local(self, prompt: str, context: Optional[List[Dict[str, Any]]], system_message: Optional[str], conversation_history: Optional[List[Dict[str, str]]] = None) -> Iterator[str]:
+    def _generate_stream_local(self, prompt: str, context: Optional[List[Dict[str, Any]]], system_message: Optional[str], conversation_history: Optional[List[Dict[str, str]]] = None, stats: Optional[StreamStats] = None) -> Iterator[str]:
         """Lokális Qwen streaming generálás"""
+        thread = None
         try:
             from transformers import TextIteratorStreamer
             import torch
@@ -164,39 +435,63 @@ class StreamingGenerator:
             else:
                 full_prompt = f"{system_message or ''}\n\n{history_text}Kérdés: {prompt}\n\nVálasz:"
             
-            # Tokenizálás
-            inputs = self._tokenizer(full_prompt, return_tensors="pt")
-            if self._pipeline.device.type == "cuda":
-                inputs = {k: v.to("cuda") for k, v in inputs.items()}
-            
-            # Streamer létrehozása
-            streamer = TextIteratorStreamer(
-                self._tokenizer,
-                skip_prompt=True,
-                skip_special_tokens=True
-            )
-            
-            # Generálás külön szálon
-            generation_kwargs = {
-                **inputs,
-                "max_new_tokens": self.max_tokens,
-                "temperature": self.temperature,
-                "do_sample": True if self.temperature > 0 else False,
-                "pad_token_id": self._tokenizer.eos_token_id,
-                "streamer": streamer
-            }
-            
-            thread = Thread(target=self._pipeline.generate, kwargs=generation_kwargs)
-            thread.start()
+            # Tokenizálás (a slotot a generáló szál a generálás végén adja vissza)
+            self._inference_guard.acquire()
+            try:
+                inputs = self._tokenizer(full_prompt, return_tensors="pt")
+                if stats is not None:
+                    stats.prompt_tokens = int(inputs["input_ids"].shape[-1])
+                if self._pipeline.device.type == "cuda":
+                    inputs = {k: v.to("cuda") for k, v in inputs.items()}
+
+                # Streamer létrehozása
+                streamer = TextIteratorStreamer(
+                    self._tokenizer,
+                    skip_prompt=True,
+                    skip_special_tokens=True
+                )
+
+                # Generálás külön szálon; a stop_event a stream elhagyásakor leállítja
+                stop_event = threading.Event()
+                generation_kwargs = {
+                    **inputs,
+                    "max_new_tokens": self.max_tokens,
+                    "temperature": self.temperature,
+                    "do_sample": True if self.temperature > 0 else False,
+                    "pad_token_id": self._tokenizer.eos_token_id,
+                    "streamer": streamer,
+                    "stopping_criteria": _stop_on_event(stop_event)
+                }
+
+                def _generate():
+                    try:
+                        self._pipeline.generate(**generation_kwargs)
+                    finally:
+                        self._inference_guard.release()
+
+                thread = Thread(target=_generate)
+                thread.start()
+            except BaseException:
+                self._inference_guard.release()
+                raise
             
             # Tokenek streamelése
-            for token in streamer:
-                yield token
+            try:
+                for token in streamer:
+                    yield token
+            finally:
+                # Lezárt / elhagyott stream (GeneratorExit) vagy hiba esetén a generálás
+                # nem fut max_new_tokens-ig az inference slotot fogva
+                stop_event.set()
             
             thread.join()
             
         except Exception as e:
             logger.error(f"Hiba a Qwen streaming generálásánál: {e}")
+            # A fallback csak a generáló szál után, saját inference slottal fut
+            # (a szál a végén adja vissza a slotot; addig a modell foglalt)
+            if thread is not None and thread.is_alive():
+                thread.join()
             # Fallback: egyszerű generálás
             try:
                 answer = self._generate_simple_local(prompt, context, system_message)
@@ -206,7 +501,7 @@ class StreamingGenerator:
                 raise
     
     def _generate_simple_local(self, prompt: str, context: Optional[List[Dict[str, Any]]], system_message: Optional[str]) -> str:
-        """Egyszerű lokális generálás (fallback)"""
+        """Egyszerű lokális generálás (fallback, a streaming inference slotja alatt)"""
         import torch
         
         if context:
@@ -215,20 +510,21 @@ class StreamingGenerator:
         else:
             full_prompt = f"{system_message or ''}\n\nKérdés: {prompt}\n\nVálasz:"
         
-        inputs = self._tokenizer(full_prompt, return_tensors="pt")
-        if self._pipeline.device.type == "cuda":
-            inputs = {k: v.to("cuda") for k, v in inputs.items()}
-        
-        with torch.no_grad():
-            outputs = self._pipeline.generate(
-                **inputs,
-                max_new_tokens=self.max_tokens,
-                temperature=self.temperature,
-                do_sample=True if self.temperature > 0 else False,
-                pad_token_id=self._tokenizer.eos_token_id
-            )
-        
-        generated_text = self._tokenizer.decode(outputs[0], skip_special_tokens=True)
+        with self._inference_guard:
+            inputs = self._tokenizer(full_prompt, return_tensors="pt")
+            if self._pipeline.device.type == "cuda":
+                inputs = {k: v.to("cuda") for k, v in inputs.items()}
+
+            with torch.no_grad():
+                outputs = self._pipeline.generate(
+                    **inputs,
+                    max_new_tokens=self.max_tokens,
+                    temperature=self.temperature,
+                    do_sample=True if self.temperature > 0 else False,
+                    pad_token_id=self._tokenizer.eos_token_id
+                )
+
+            generated_text = self._tokenizer.decode(outputs[0], skip_special_tokens=True)
         answer = generated_text[len(full_prompt):].strip()
         return answer
     
@@ -300,69 +596,35 @@ mondd el, hogy nem tudod megválaszolni a kérdést a rendelkezésre álló info
         Yields:
             Dict-ek tartalmazva a chunk-ot és metadata-t
         """
-        messages = self._build_messages(prompt, context, system_message)
-        
+        stream = self.generate_stream(prompt, context, system_message)
+        stats = stream.stats
+        full_response = ""
+
         try:
-            import time
-            start_time = time.time()
-            full_response = ""
-            first_token_time = None
-            
-            if self.use_openai:
-                messages = self._build_messages(prompt, context, system_message)
-                stream = self._client.chat.completions.create(
-                    model=self.model_name,
-                    messages=messages,
-                    temperature=self.temperature,
-                    max_tokens=self.max_tokens,
-                    stream=True
-                )
-                
-                for chunk in stream:
-                    if chunk.choices[0].delta.content is not None:
-                        content = chunk.choices[0].delta.content
-                        full_response += content
-                        
-                        if first_token_time is None:
-                            first_token_time = time.time() - start_time
-                        
-                        yield {
-                            'chunk': content,
-                            'full_response': full_response,
-                            'first_token_time': first_token_time,
-                            'timestamp': time.time()
-                        }
-            else:
-                # Lokális streaming
-                for chunk in self._generate_stream_local(prompt, context, system_message):
-                    full_response += chunk
-                    
-                    if first_token_time is None:
-                        first_token_time = time.time() - start_time
-                    
-                    yield {
-                        'chunk': chunk,
-                        'full_response': full_response,
-                        'first_token_time': first_token_time,
-                        'timestamp': time.time()
-                    }
-            
+            for chunk in stream:
+                full_response += chunk
+                yield {
+                    'chunk': chunk,
+                    'full_response': full_response,
+                    'first_token_time': stats.ttft,
+                    'timestamp': time.time()
+                }
+
             # Végleges metadata
-            end_time = time.time()
-            total_time = end_time - start_time
-            
             yield {
                 'chunk': None,  # Végjel
                 'full_response': full_response,
-                'first_token_time': first_token_time,
-                'total_time': total_time,
+                'first_token_time': stats.ttft,
+                'total_time': stats.total_time,
                 'metadata': {
                     'model': self.model_name,
-                    'total_chars': len(full_response)
+                    'total_chars': len(full_response),
+                    **stats.to_dict()
                 }
             }
-        
+
         except Exception as e:
             logger.error(f"Hiba a streaming válasz generálásánál: {e}")
             raise
-
+        finally:
+            stream.close()
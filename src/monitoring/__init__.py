@@ -2,8 +2,10 @@
 Monitoring és analitika modulok
 """
 
-from .metrics import MetricsCollector
+from .metrics import MetricsCollector, MetricsSnapshot
 from .analytics import Analytics
+from .openmetrics import MetricsRegistry, MetricsExporter
+from .resources import ResourceMonitor
 
-__all__ = ["MetricsCollector", "Analytics"]
+__all__ = ["MetricsCollector", "MetricsSnapshot", "Analytics", "MetricsRegistry", "MetricsExporter", "ResourceMonitor"]
 
@@ -1,11 +1,14 @@
 """
 Analitika modul
 Vizualizációk és jelentések generálása
+
+Az adatokat a MetricsCollector.query_events-en keresztül olvassa, ami az
+oszlopos (Parquet) tárolóból csak a szükséges oszlopokat és napokat tölti be.
+A nyers retention-nél régebbi időszakot a rollup sorok (query_rollups) adják.
 """
 
 from typing import Dict, Any, List
 import pandas as pd
-from datetime import datetime, timedelta
 import logging
 
 logger = logging.getLogger(__name__)
@@ -20,6 +23,25 @@ class Analytics:
             metrics_collector: MetricsCollector példány
         """
         self.metrics_collector = metrics_collector
+
+    def _with_rollups(self, df: pd.DataFrame, event_type: str, dimension: str = None, days: int = None) -> pd.DataFrame:
+        """
+        Nyers eventek kiegészítése a rollup sorokkal.
+
+        Minden sor kap egy 'count' oszlopot (nyers event = 1), így az
+        aggregálások darabszám helyett a count összegét használják.
+        """
+        df = df.copy()
+        df['count'] = 1
+        rollups = self.metrics_collector.query_rollups(event_type, days=days)
+        if rollups.empty:
+            return df
+        if dimension:
+            rollups = rollups.rename(columns={'dimension': dimension})
+        rollups = rollups[[c for c in rollups.columns if c in df.columns]]
+        if df.empty:
+            return rollups.reset_index(drop=True)
+        return pd.concat([df, rollups], ignore_index=True)
     
     def get_daily_usage(self, days: int = 30) -> pd.DataFrame:
         """
@@ -31,19 +53,14 @@ class Analytics:
         Returns:
             DataFrame napi statisztikákkal
         """
-        cutoff_date = datetime.now() - timedelta(days=days)
-        
-        recent_metrics = [
-            m for m in self.metrics_collector.metrics
-            if m['type'] == 'llm_call' and datetime.fromisoformat(m['timestamp']) >= cutoff_date
-        ]
-
-        if not recent_metrics:
-            return pd.DataFrame(columns=['date', 'total_tokens', 'cost'])
-
         try:
-            df = pd.DataFrame(recent_metrics)
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
+            df = self.metrics_collector.query_events(
+                'llm_call', columns=['total_tokens', 'cost'], days=days
+            )
+            df = self._with_rollups(df, 'llm_call', days=days)
+            if df.empty:
+                return pd.DataFrame(columns=['date', 'total_tokens', 'cost'])
+
             df['date'] = df['timestamp'].dt.date
 
             # Fill missing values with 0
@@ -74,13 +91,13 @@ class Analytics:
         Returns:
             Dict modell statisztikákkal
         """
-        llm_calls = [m for m in self.metrics_collector.metrics if m['type'] == 'llm_call']
-
-        if not llm_calls:
-            return {}
-
         try:
-            df = pd.DataFrame(llm_calls)
+            df = self.metrics_collector.query_events(
+                'llm_call', columns=['model', 'total_tokens', 'cost']
+            )
+            df = self._with_rollups(df, 'llm_call', dimension='model')
+            if df.empty:
+                return {}
 
             # Fill missing values with 0
             if 'total_tokens' not in df.columns:
@@ -96,8 +113,8 @@ class Analytics:
             model_stats = df.groupby('model').agg({
                 'total_tokens': 'sum',
                 'cost': 'sum',
-                'model': 'count'
-            }).rename(columns={'model': 'count'}).to_dict('index')
+                'count': 'sum'
+            }).to_dict('index')
 
             return model_stats
         except Exception as e:
@@ -114,18 +131,13 @@ class Analytics:
         Returns:
             DataFrame latency trendekkel
         """
-        cutoff_date = datetime.now() - timedelta(days=days)
-        
-        recent_metrics = [
-            m for m in self.metrics_collector.metrics
-            if m['type'] == 'llm_call' and datetime.fromisoformat(m['timestamp']) >= cutoff_date
-        ]
-        
-        if not recent_metrics:
+        df = self.metrics_collector.query_events(
+            'llm_call', columns=['first_token_time', 'total_time'], days=days
+        )
+
+        if df.empty:
             return pd.DataFrame()
-        
-        df = pd.DataFrame(recent_metrics)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
+
         df['date'] = df['timestamp'].dt.date
         
         latency_stats = df.groupby('date').agg({
@@ -145,22 +157,16 @@ class Analytics:
         Returns:
             DataFrame feedback trendekkel
         """
-        cutoff_date = datetime.now() - timedelta(days=days)
-
-        feedbacks = [
-            m for m in self.metrics_collector.metrics
-            if m['type'] == 'user_feedback' and datetime.fromisoformat(m['timestamp']) >= cutoff_date
-        ]
+        df = self.metrics_collector.query_events('user_feedback', columns=['rating'], days=days)
+        df = self._with_rollups(df, 'user_feedback', dimension='rating', days=days)
 
-        if not feedbacks:
+        if df.empty:
             return pd.DataFrame()
 
-        df = pd.DataFrame(feedbacks)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
         df['date'] = df['timestamp'].dt.date
 
         # Napi feedback aggregálás
-        daily_feedback = df.groupby(['date', 'rating']).size().unstack(fill_value=0).reset_index()
+        daily_feedback = df.groupby(['date', 'rating'])['count'].sum().unstack(fill_value=0).reset_index()
 
         return daily_feedback
 
@@ -171,13 +177,13 @@ class Analytics:
         Returns:
             Dict feedback eloszlással
         """
-        feedbacks = [m for m in self.metrics_collector.metrics if m['type'] == 'user_feedback']
+        df = self.metrics_collector.query_events('user_feedback', columns=['rating'])
+        df = self._with_rollups(df, 'user_feedback', dimension='rating')
 
-        if not feedbacks:
+        if df.empty:
             return {'positive': 0, 'negative': 0, 'neutral': 0}
 
-        df = pd.DataFrame(feedbacks)
-        distribution = df['rating'].value_counts().to_dict()
+        distribution = {k: int(v) for k, v in df.groupby('rating')['count'].sum().items()}
 
         # Ensure all categories exist
         for rating in ['positive', 'negative', 'neutral']:
@@ -0,0 +1,371 @@
+"""
+Oszlopos metrika tároló modul
+A metrics.json eseményeit típusos Parquet fájlokba tömöríti,
+event típus és nap szerint particionálva (hive layout):
+
+    <root>/type=llm_call/date=2026-10-19/part-<uuid>.parquet
+
+Az Analytics lekérdezések csak a szükséges oszlopokat és partíciókat olvassák,
+az időablakra predicate pushdown-nal szűrve.
+
+A kiírt eventek határa (watermark) a MetricsCollector által kiosztott,
+monoton növekvő sorszám ('seq'), nem az időbélyeg: egy párhuzamosan, a
+korábbi időbélyeggel később hozzáfűzött event így sem marad ki.
+
+Egy tároló könyvtárat egyszerre egyetlen processz írhat (az állapot fájlt és a
+partíciókat nem fésüli össze több író). Ezt egy kizárólagos lock fájl
+érvényesíti (POSIX rendszereken); aki nem kapja meg, csak olvas. Több
+processzes futtatásnál processzenként külön könyvtár kell (METRICS_COLUMNAR_DIR,
+ahogy a serve_api.py worker-ei kapják).
+"""
+
+import json
+import uuid
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pc = None
+    ds = None
+    pq = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def _event_schemas() -> Dict[str, "pa.Schema"]:
+    """Típusos sémák az ismert event típusokhoz"""
+    common = [('timestamp', pa.timestamp('us'))]
+    return {
+        'llm_call': pa.schema(common + [
+            ('model', pa.string()),
+            ('prompt_tokens', pa.int64()),
+            ('completion_tokens', pa.int64()),
+            ('total_tokens', pa.int64()),
+            ('first_token_time', pa.float64()),
+            ('total_time', pa.float64()),
+            ('cost', pa.float64()),
+        ]),
+        'embedding_call': pa.schema(common + [
+            ('model', pa.string()),
+            ('input_tokens', pa.int64()),
+            ('cost', pa.float64()),
+        ]),
+        'retrieval': pa.schema(common + [
+            ('query', pa.string()),
+            ('num_results', pa.int64()),
+            ('retrieval_time', pa.float64()),
+        ]),
+        'user_feedback': pa.schema(common + [
+            ('message_id', pa.string()),
+            ('rating', pa.string()),
+            ('comment', pa.string()),
+            ('query', pa.string()),
+            ('response', pa.string()),
+        ]),
+    }
+
+
+# Ismeretlen (pl. pipeline_*) eventek: a mezők JSON payload oszlopba kerülnek
+def _generic_schema() -> "pa.Schema":
+    return pa.schema([('timestamp', pa.timestamp('us')), ('payload', pa.string())])
+
+
+def _coerce(value: Any, arrow_type: "pa.DataType") -> Any:
+    if value is None:
+        return None
+    try:
+        if pa.types.is_integer(arrow_type):
+            return int(value)
+        if pa.types.is_floating(arrow_type):
+            return float(value)
+        if pa.types.is_string(arrow_type):
+            return str(value)
+    except (TypeError, ValueError):
+        return None
+    return value
+
+
+class ColumnarMetricsStore:
+    """Parquet alapú, particionált metrika tároló"""
+
+    STATE_FILE = "_state.json"
+    WRITER_LOCK_FILE = "_writer.lock"
+
+    def __init__(self, root: str = "./data/metrics_columnar"):
+        """
+        Args:
+            root: A particionált Parquet fájlok gyökérkönyvtára
+        """
+        if pa is None:
+            raise ImportError("pyarrow nincs telepítve. Telepítsd: pip install pyarrow")
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._schemas = _event_schemas()
+        self._lock = threading.Lock()
+        self._writer_lock = self._acquire_writer_lock()
+        self.read_only = self._writer_lock is None and fcntl is not None
+        if self.read_only:
+            logger.warning(f"A(z) {self.root} oszlopos tárolót egy másik író használja, ez a példány csak olvas")
+        self._state = self._load_state()
+
+    def _acquire_writer_lock(self):
+        """Kizárólagos író lock (a processz élettartamára); None, ha más már tartja"""
+        if fcntl is None:
+            return None
+        handle = open(self.root / self.WRITER_LOCK_FILE, 'a')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return None
+        return handle
+
+    # ------------------------------------------------------------------
+    # Állapot (watermark)
+    # ------------------------------------------------------------------
+    def _load_state(self) -> Dict[str, Any]:
+        state_path = self.root / self.STATE_FILE
+        if state_path.exists():
+            try:
+                with open(state_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.warning(f"Columnar state betöltési hiba: {e}")
+        return {'watermark': None, 'seq': 0}
+
+    def _save_state(self):
+        state_path = self.root / self.STATE_FILE
+        tmp_path = state_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._state, f)
+        tmp_path.replace(state_path)
+
+    @property
+    def watermark(self) -> Optional[str]:
+        """A legkésőbbi már kiírt event időbélyege (ISO string, tájékoztató)"""
+        return self._state.get('watermark')
+
+    @property
+    def flushed_seq(self) -> int:
+        """Az utolsó kiírt event sorszáma"""
+        return self._state.get('seq') or 0
+
+    def unflushed(self, events: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        A még ki nem írt eventek (sorszám alapján)
+
+        A sorszám nélküli, régi állapot fájlnál egyszer még az időbélyeg
+        watermark dönt; az első flush után a tároló sorszámra áll át.
+        """
+        last_seq = self._state.get('seq')
+        if last_seq is None:
+            watermark = self.watermark
+            return [
+                e for e in events
+                if e.get('timestamp') and (watermark is None or e['timestamp'] > watermark)
+            ]
+        return [e for e in events if e.get('timestamp') and e.get('seq', 0) > last_seq]
+
+    def schema_for(self, event_type: str) -> "pa.Schema":
+        return self._schemas.get(event_type, _generic_schema())
+
+    # ------------------------------------------------------------------
+    # Írás
+    # ------------------------------------------------------------------
+    def flush(self, events: Iterable[Dict[str, Any]]) -> int:
+        """
+        A watermark utáni eventek kiírása Parquet partíciókba.
+
+        Args:
+            events: Metrika eventek sorszám szerint (MetricsCollector.metrics formátum)
+
+        Returns:
+            Kiírt eventek száma
+        """
+        if self.read_only:
+            return 0
+        events = list(events)
+        with self._lock:
+            pending = self.unflushed(events)
+            last_seq = max((e.get('seq', 0) for e in events), default=0)
+            if not pending:
+                if self._state.get('seq') is None:
+                    self._state['seq'] = last_seq
+                    self._save_state()
+                return 0
+
+            groups: Dict[tuple, List[Dict[str, Any]]] = {}
+            for event in pending:
+                groups.setdefault((event.get('type', 'unknown'), event['timestamp'][:10]), []).append(event)
+
+            for (event_type, date), group in groups.items():
+                self._write_partition(event_type, date, group)
+
+            self._state['seq'] = max(self._state.get('seq') or 0, last_seq)
+            self._state['watermark'] = max([e['timestamp'] for e in pending] + [self.watermark or ''])
+            self._save_state()
+            logger.info(f"{len(pending)} metrika event kiírva oszlopos tárolóba ({len(groups)} partíció)")
+            return len(pending)
+
+    def _write_partition(self, event_type: str, date: str, events: List[Dict[str, Any]]):
+        schema = self.schema_for(event_type)
+        columns: Dict[str, List[Any]] = {name: [] for name in schema.names}
+        for event in events:
+            columns['timestamp'].append(datetime.fromisoformat(event['timestamp']))
+            if 'payload' in columns:
+                payload = {k: v for k, v in event.items() if k not in ('timestamp', 'type', 'seq')}
+                columns['payload'].append(json.dumps(payload, ensure_ascii=False, default=str))
+                continue
+            for field in schema:
+                if field.name != 'timestamp':
+                    columns[field.name].append(_coerce(event.get(field.name), field.type))
+
+        table = pa.table(columns, schema=schema)
+        partition_dir = self._partition_dir(event_type, date)
+        partition_dir.mkdir(parents=True, exist_ok=True)
+        pq.write_table(table, partition_dir / f"part-{uuid.uuid4().hex}.parquet")
+
+    def _partition_dir(self, event_type: str, date: str) -> Path:
+        return self.root / f"type={event_type}" / f"date={date}"
+
+    def compact(self, min_files: int = 4) -> int:
+        """
+        Kis part fájlok összefésülése partíciónként egyetlen fájlba.
+
+        Args:
+            min_files: Ennyi part fájl felett tömörít egy partíciót
+
+        Returns:
+            Tömörített partíciók száma
+        """
+        if self.read_only:
+            return 0
+        compacted = 0
+        with self._lock:
+            for partition_dir in self.root.glob("type=*/date=*"):
+                parts = sorted(partition_dir.glob("part-*.parquet"))
+                if len(parts) < min_files:
+                    continue
+                table = pa.concat_tables([pq.read_table(p) for p in parts]).sort_by('timestamp')
+                target = partition_dir / f"part-{uuid.uuid4().hex}.parquet"
+                pq.write_table(table, target)
+                for p in parts:
+                    p.unlink()
+                compacted += 1
+        if compacted:
+            logger.info(f"{compacted} metrika partíció tömörítve")
+        return compacted
+
+    def delete_before(self, event_type: Optional[str], cutoff: datetime) -> int:
+        """
+        Az időpont előtti eventek törlése (retention).
+
+        A cutoff napja előtti partíciók egészben törlődnek; a cutoff napjának
+        partíciójából csak a cutoff előtti sorok (újraírással), így a tároló
+        pontosan a nyers retention határáig tart, és a rollup-olt órákat nem
+        számoljuk kétszer.
+
+        Args:
+            event_type: Event típus (None = minden típus)
+            cutoff: Az ennél korábbi eventek törlődnek
+
+        Returns:
+            Törölt vagy újraírt partíciók száma
+        """
+        if self.read_only:
+            return 0
+        pattern = f"type={event_type}/date=*" if event_type else "type=*/date=*"
+        cutoff_date = cutoff.date().isoformat()
+        cutoff_ts = pa.scalar(cutoff, pa.timestamp('us'))
+        removed = 0
+        with self._lock:
+            for partition_dir in self.root.glob(pattern):
+                date = partition_dir.name.split('=', 1)[1]
+                if date < cutoff_date:
+                    for p in partition_dir.glob("*.parquet"):
+                        p.unlink()
+                    partition_dir.rmdir()
+                    removed += 1
+                elif date == cutoff_date:
+                    removed += self._delete_rows_before(partition_dir, cutoff_ts)
+        return removed
+
+    def _delete_rows_before(self, partition_dir: Path, cutoff_ts: "pa.Scalar") -> int:
+        """Egy partíció cutoff előtti sorainak törlése (_lock alatt); 1, ha változott"""
+        parts = sorted(partition_dir.glob("part-*.parquet"))
+        if not parts:
+            return 0
+        table = pa.concat_tables([pq.read_table(p) for p in parts])
+        keep = table.filter(pc.greater_equal(table['timestamp'], cutoff_ts))
+        if keep.num_rows == table.num_rows:
+            return 0
+        if keep.num_rows:
+            pq.write_table(keep.sort_by('timestamp'), partition_dir / f"part-{uuid.uuid4().hex}.parquet")
+        for p in parts:
+            p.unlink()
+        if not keep.num_rows:
+            partition_dir.rmdir()
+        return 1
+
+    # ------------------------------------------------------------------
+    # Olvasás
+    # ------------------------------------------------------------------
+    def read(
+        self,
+        event_type: str,
+        columns: Optional[List[str]] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ):
+        """
+        Eventek olvasása pandas DataFrame-be.
+
+        Csak az adott típus partícióit nyitja meg, a dátum partíciókat a
+        time window alapján vágja le, és a timestamp szűrést a Parquet
+        olvasóra bízza (predicate pushdown).
+
+        Args:
+            event_type: Event típus (pl. 'llm_call')
+            columns: Olvasandó oszlopok (None = mind); a 'timestamp' mindig benne van
+            start: Időablak kezdete (inkluzív)
+            end: Időablak vége (exkluzív)
+
+        Returns:
+            pandas.DataFrame
+        """
+        schema = self.schema_for(event_type)
+        wanted = list(dict.fromkeys(['timestamp'] + [c for c in (columns or schema.names) if c in schema.names]))
+
+        type_dir = self.root / f"type={event_type}"
+        if not type_dir.exists() or not any(type_dir.glob("date=*/*.parquet")):
+            return schema.empty_table().select(wanted).to_pandas()
+
+        dataset = ds.dataset(
+            str(type_dir),
+            format='parquet',
+            schema=schema.append(pa.field('date', pa.string())),
+            partitioning=ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive')
+        )
+
+        expr = None
+        if start is not None:
+            expr = (ds.field('date') >= start.date().isoformat()) & (ds.field('timestamp') >= pa.scalar(start, pa.timestamp('us')))
+        if end is not None:
+            end_expr = (ds.field('date') <= end.date().isoformat()) & (ds.field('timestamp') < pa.scalar(end, pa.timestamp('us')))
+            expr = end_expr if expr is None else expr & end_expr
+
+        return dataset.to_table(columns=wanted, filter=expr).to_pandas()
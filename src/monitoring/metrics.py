@@ -4,26 +4,259 @@ Token használat, latency, költség tracking
 """
 
 from typing import Dict, Any, List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
+import os
 import json
+import time
+import atexit
 import logging
+import threading
+import weakref
 from pathlib import Path
 
+from .openmetrics import REGISTRY, MetricsRegistry
+from .retention import RetentionPolicy, RollupStore, rollup_events
+
 logger = logging.getLogger(__name__)
 
 
+def _flush_at_exit(ref: "weakref.ref[MetricsCollector]"):
+    """Processz leállításkor a függő eventek mentése (a karbantartó szál daemon)"""
+    collector = ref()
+    if collector is not None:
+        collector.flush()
+
+
 class MetricsCollector:
     """Metrikák gyűjtő osztály"""
     
-    def __init__(self, metrics_file: str = "./data/metrics.json"):
+    def __init__(self, metrics_file: str = "./data/metrics.json", registry: MetricsRegistry = REGISTRY):
         """
         Args:
             metrics_file: Metrikák mentési fájlja
+            registry: OpenMetrics regiszter (élő counterek / histogramok)
         """
+        self.registry = registry
         self.metrics_file = Path(metrics_file)
         self.metrics_file.parent.mkdir(parents=True, exist_ok=True)
         self.metrics: List[Dict[str, Any]] = []
+        self._lock = threading.RLock()
+        # Fájl írás: egyszerre egy író; a változás számláló alapján a párhuzamos
+        # append-ek egyetlen mentésbe olvadnak (group commit)
+        self._save_lock = threading.Lock()
+        self._version = 0
+        self._saved_version = 0
+        # Monoton event sorszám (az oszlopos tároló watermark-ja)
+        self._next_seq = 1
         self._load_metrics()
+
+        # Oszlopos (Parquet) tároló az analitikai lekérdezésekhez (pyarrow esetén)
+        self.columnar_store = self._init_columnar_store()
+        if self.columnar_store is not None:
+            # Törölt / visszaállított metrics.json után se kapjon új event már kiírt sorszámot
+            self._next_seq = max(self._next_seq, self.columnar_store.flushed_seq + 1)
+
+        # Retention szintek: nyers -> órás -> napi rollup
+        self.retention = RetentionPolicy.from_env()
+        self.rollups = RollupStore(str(self.metrics_file.parent / 'metrics_rollups.json'))
+        if self.retention.enabled:
+            self.enforce_retention()
+
+        # Az eventek a karbantartó szálon kerülnek a metrics.json-ba (0 = minden event után)
+        self.save_interval = float(os.getenv('METRICS_SAVE_INTERVAL', 5))
+        self._maintenance_stop = threading.Event()
+        interval = float(os.getenv('METRICS_COMPACT_INTERVAL', 300))
+        if interval > 0 or self.save_interval > 0:
+            self._start_maintenance_thread(interval)
+        atexit.register(_flush_at_exit, weakref.ref(self))
+
+    def _init_columnar_store(self):
+        """Oszlopos tároló inicializálása (opcionális, pyarrow szükséges)"""
+        if os.getenv('METRICS_COLUMNAR', '1') == '0':
+            return None
+        try:
+            from .columnar_store import ColumnarMetricsStore
+            root = os.getenv('METRICS_COLUMNAR_DIR') or str(self.metrics_file.parent / 'metrics_columnar')
+            return ColumnarMetricsStore(root)
+        except ImportError:
+            logger.info("pyarrow nincs telepítve, oszlopos metrika tároló kikapcsolva")
+            return None
+        except Exception as e:
+            logger.warning(f"Oszlopos metrika tároló inicializálási hiba: {e}")
+            return None
+
+    def _start_maintenance_thread(self, interval: float):
+        """
+        Periodikus karbantartó szál (weakref, így nem tartja életben a collectort):
+        save_interval-onként menti a függő eventeket, interval-onként tömörít
+
+        Args:
+            interval: Tömörítés / retention gyakorisága másodpercben (0 = kikapcsolva)
+        """
+        ref = weakref.ref(self)
+        stop = self._maintenance_stop
+        tick = min(value for value in (self.save_interval, interval) if value > 0)
+
+        def _loop():
+            next_maintenance = time.monotonic() + interval
+            while not stop.wait(tick):
+                collector = ref()
+                if collector is None:
+                    return
+                try:
+                    collector.flush()
+                    if interval > 0 and time.monotonic() >= next_maintenance:
+                        next_maintenance = time.monotonic() + interval
+                        collector.run_maintenance()
+                except Exception as e:
+                    logger.warning(f"Metrika karbantartási hiba: {e}")
+                del collector
+
+        threading.Thread(target=_loop, name="metrics-maintenance", daemon=True).start()
+
+    def run_maintenance(self):
+        """
+        Periodikus karbantartás: friss eventek kiírása oszlopos formába,
+        retention szintek érvényesítése, partíciók tömörítése
+        """
+        self.flush_columnar()
+        if self.retention.enabled:
+            self.enforce_retention()
+        if self.columnar_store is not None:
+            self.columnar_store.compact()
+
+    def enforce_retention(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Retention szintek érvényesítése.
+
+        A nyers retention-nél régebbi eventek órás rollup-ba kerülnek (a szöveges
+        mezők, pl. query / response elvesznek), a lejárt órás rollup-ok napi
+        rollup-ba, a lejárt napi rollup-ok törlődnek.
+
+        Args:
+            now: Referencia időpont (alapértelmezett: most)
+
+        Returns:
+            Átforgatott / törölt elemek száma szintenként
+        """
+        now = now or datetime.now()
+        raw_cutoff = (now - timedelta(days=self.retention.raw_days)).replace(
+            minute=0, second=0, microsecond=0
+        )
+        raw_cutoff_iso = raw_cutoff.isoformat()
+
+        with self._lock:
+            expired = [m for m in self.metrics if m.get('timestamp', '') < raw_cutoff_iso]
+            if expired:
+                self.metrics = [m for m in self.metrics if m.get('timestamp', '') >= raw_cutoff_iso]
+                self.rollups.add('hourly', rollup_events(expired, 'hourly'))
+                self._version += 1
+        if expired:
+            self._save_metrics()
+
+        result = {'raw_to_hourly': len(expired), **self.rollups.enforce(self.retention, now)}
+        if expired or any(result.values()):
+            self.rollups.save()
+
+        if self.columnar_store is not None:
+            # Ugyanaz a határ, mint a nyers -> órás rollup-nál (a rollup-olt órák sorai törlődnek)
+            result['columnar_partitions_dropped'] = self.columnar_store.delete_before(None, raw_cutoff)
+
+        if any(result.values()):
+            logger.info(f"Metrika retention: {result}")
+        return result
+
+    def flush_columnar(self) -> int:
+        """
+        Még ki nem írt eventek mentése az oszlopos tárolóba
+
+        Returns:
+            Kiírt eventek száma
+        """
+        if self.columnar_store is None:
+            return 0
+        return self.columnar_store.flush(list(self.metrics))
+
+    def query_rollups(self, event_type: str, days: Optional[int] = None):
+        """
+        A retention által rollup-olt (órás / napi) sorok lekérdezése
+
+        Args:
+            event_type: Event típus (pl. 'llm_call')
+            days: Hány napra visszamenőleg (None = teljes történet)
+
+        Returns:
+            pandas.DataFrame: timestamp (bucket kezdete), dimension, count és az összegzett mezők
+        """
+        import pandas as pd
+
+        cutoff = (datetime.now() - timedelta(days=days)).isoformat() if days is not None else None
+        rows = self.rollups.rows_since(cutoff, [event_type])
+        df = pd.DataFrame(rows)
+        if df.empty:
+            return pd.DataFrame(columns=['timestamp', 'dimension', 'count'])
+        df['timestamp'] = pd.to_datetime(df['bucket'])
+        return df.drop(columns=['bucket', 'type'])
+
+    def stop_maintenance(self):
+        """Karbantartó szál leállítása, a függő eventek mentése"""
+        self._maintenance_stop.set()
+        self.flush()
+
+    def flush(self):
+        """A még nem mentett eventek kiírása a metrics.json-ba"""
+        self._save_metrics()
+
+    def query_events(
+        self,
+        event_type: str,
+        columns: Optional[List[str]] = None,
+        days: Optional[int] = None
+    ):
+        """
+        Eventek lekérdezése DataFrame-ként (analitikához).
+
+        A már tömörített eventeket az oszlopos tárolóból olvassa (csak a kért
+        oszlopok és az időablakba eső partíciók), a még ki nem írt friss
+        eventeket a memóriából fűzi hozzá.
+
+        Args:
+            event_type: Event típus (pl. 'llm_call')
+            columns: Szükséges oszlopok ('timestamp' mindig benne van)
+            days: Időablak napokban (None = teljes történet)
+
+        Returns:
+            pandas.DataFrame 'timestamp' (datetime) oszloppal
+        """
+        import pandas as pd
+
+        start = datetime.now() - timedelta(days=days) if days is not None else None
+        wanted = list(dict.fromkeys(['timestamp'] + list(columns or [])))
+
+        frames = []
+        tail = list(self.metrics)
+        if self.columnar_store is not None:
+            tail = self.columnar_store.unflushed(tail)
+            stored = self.columnar_store.read(event_type, columns=columns, start=start)
+            if not stored.empty:
+                frames.append(stored)
+
+        start_iso = start.isoformat() if start is not None else None
+        tail = [
+            m for m in tail
+            if m.get('type') == event_type
+            and (start_iso is None or m['timestamp'] >= start_iso)
+        ]
+        if tail:
+            df_tail = pd.DataFrame(tail)
+            if columns is not None:
+                df_tail = df_tail.reindex(columns=wanted)
+            df_tail['timestamp'] = pd.to_datetime(df_tail['timestamp'])
+            frames.append(df_tail)
+
+        if not frames:
+            return pd.DataFrame(columns=wanted)
+        return pd.concat(frames, ignore_index=True)
     
     def _load_metrics(self):
         """Metrikák betöltése fájlból"""
@@ -32,19 +265,58 @@ class MetricsCollector:
                 with open(self.metrics_file, 'r', encoding='utf-8') as f:
                     self.metrics = json.load(f)
                 logger.info(f"{len(self.metrics)} metrika betöltve")
+                # Sorszám nélküli (régi) eventek: sorszám a fájlbeli sorrendben
+                next_seq = max((m.get('seq', 0) for m in self.metrics), default=0) + 1
+                for metric in self.metrics:
+                    if 'seq' not in metric:
+                        metric['seq'] = next_seq
+                        next_seq += 1
+                self._next_seq = next_seq
             except Exception as e:
                 logger.warning(f"Hiba a metrikák betöltésénél: {e}")
                 self.metrics = []
         else:
             self.metrics = []
     
+    def _append(self, metric: Dict[str, Any]):
+        """
+        Event hozzáfűzése; a fájlba a karbantartó szál menti (save_interval),
+        így a hívó nem sorosodik a teljes lista szerializálására
+        """
+        with self._lock:
+            metric['seq'] = self._next_seq
+            self._next_seq += 1
+            self.metrics.append(metric)
+            self._version += 1
+        if self.save_interval <= 0:
+            self._save_metrics()
+
     def _save_metrics(self):
-        """Metrikák mentése fájlba"""
-        try:
-            with open(self.metrics_file, 'w', encoding='utf-8') as f:
-                json.dump(self.metrics, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            logger.error(f"Hiba a metrikák mentésénél: {e}")
+        """
+        Metrikák mentése fájlba, atomikusan (ideiglenes fájl + os.replace).
+
+        Párhuzamos hívóknál az író a zár megszerzésekor az addig felgyűlt
+        összes eventet kiírja; a várakozók, akiknek az eventje már a fájlban
+        van, nem írnak újra. Az olvasó soha nem lát félig írt fájlt.
+        """
+        with self._save_lock:
+            with self._lock:
+                if self._version == self._saved_version and self.metrics_file.exists():
+                    return
+                version = self._version
+                snapshot = list(self.metrics)
+            tmp_file = self.metrics_file.with_name(f".{self.metrics_file.name}.{os.getpid()}.tmp")
+            try:
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(snapshot, f, indent=2, ensure_ascii=False)
+                os.replace(tmp_file, self.metrics_file)
+                self._saved_version = version
+            except Exception as e:
+                logger.error(f"Hiba a metrikák mentésénél: {e}")
+                try:
+                    tmp_file.unlink()
+                except OSError:
+                    pass
     
     def record_llm_call(
         self,
@@ -78,8 +350,22 @@ class MetricsCollector:
             'cost': cost
         }
         
-        self.metrics.append(metric)
-        self._save_metrics()
+        self._append(metric)
+
+        labels = {'model': model}
+        self.registry.inc('rag_llm_calls', "LLM hívások száma", labels=labels)
+        self.registry.inc('rag_llm_tokens', "LLM tokenek száma", value=prompt_tokens,
+                          labels={**labels, 'kind': 'prompt'})
+        self.registry.inc('rag_llm_tokens', "LLM tokenek száma", value=completion_tokens,
+                          labels={**labels, 'kind': 'completion'})
+        if cost:
+            self.registry.inc('rag_llm_cost_usd', "LLM költség USD-ben", value=cost, labels=labels)
+        if first_token_time is not None:
+            self.registry.observe('rag_llm_first_token_seconds', first_token_time,
+                                  "Time-to-first-token", labels=labels)
+        if total_time is not None:
+            self.registry.observe('rag_llm_response_seconds', total_time,
+                                  "Teljes LLM válaszidő", labels=labels)
         logger.debug(f"LLM metrika rögzítve: {metric}")
     
     def record_embedding_call(
@@ -104,8 +390,11 @@ class MetricsCollector:
             'cost': cost
         }
         
-        self.metrics.append(metric)
-        self._save_metrics()
+        self._append(metric)
+
+        self.registry.inc('rag_embedding_calls', "Embedding hívások száma", labels={'model': model})
+        self.registry.inc('rag_embedding_tokens', "Embedding input tokenek", value=input_tokens,
+                          labels={'model': model})
         logger.debug(f"Embedding metrika rögzítve: {metric}")
     
     def record_retrieval(
@@ -130,8 +419,11 @@ class MetricsCollector:
             'retrieval_time': retrieval_time
         }
 
-        self.metrics.append(metric)
-        self._save_metrics()
+        self._append(metric)
+
+        self.registry.inc('rag_queries', "Feldolgozott query-k száma")
+        self.registry.observe('rag_retrieval_results', num_results, "Retrieval találatok száma",
+                              buckets=(0, 1, 2, 5, 10, 20, 50))
         logger.debug(f"Retrieval metrika rögzítve")
 
     def record_pipeline_event(
@@ -153,8 +445,7 @@ class MetricsCollector:
             **(data or {})
         }
 
-        self.metrics.append(metric)
-        self._save_metrics()
+        self._append(metric)
         logger.debug(f"Pipeline event rögzítve: {event_type}")
 
     def record_user_feedback(
@@ -185,10 +476,33 @@ class MetricsCollector:
             'response': response[:200] if response else None
         }
 
-        self.metrics.append(metric)
-        self._save_metrics()
+        self._append(metric)
+
+        self.registry.inc('rag_feedback', "Felhasználói feedbackek", labels={'rating': rating})
         logger.info(f"Felhasználói feedback rögzítve: {rating}")
 
+    def record_stage_latency(self, stage: str, seconds: float):
+        """
+        Pipeline lépés latency-jének rögzítése (csak memóriában, fájl I/O nélkül)
+
+        Args:
+            stage: Lépés neve (pl. 'translation', 'retrieval', 'rerank', 'generation')
+            seconds: Időtartam másodpercben
+        """
+        self.registry.observe('rag_stage_latency_seconds', seconds,
+                              "Pipeline lépések latency-je", labels={'stage': stage})
+
+    def record_cache_access(self, cache: str, hit: bool):
+        """
+        Cache találat / tévesztés rögzítése (csak memóriában)
+
+        Args:
+            cache: Cache neve ('translation', 'retrieval')
+            hit: Találat volt-e
+        """
+        self.registry.inc('rag_cache_requests', "Cache lekérdezések eredmény szerint",
+                          labels={'cache': cache, 'result': 'hit' if hit else 'miss'})
+
     def get_feedback_statistics(self, days: int = 30) -> Dict[str, Any]:
         """
         Feedback statisztikák lekérdezése
@@ -206,8 +520,13 @@ class MetricsCollector:
             m for m in self.metrics
             if m['type'] == 'user_feedback' and datetime.fromisoformat(m['timestamp']) >= cutoff_date
         ]
+        # Retention után a régebbi feedbackek rating szerinti rollup-ként élnek tovább
+        rolled_up = self.rollups.rows_since(cutoff_date.isoformat(), ['user_feedback'])
+        rolled_counts = {}
+        for row in rolled_up:
+            rolled_counts[row.get('dimension')] = rolled_counts.get(row.get('dimension'), 0) + row['count']
 
-        if not feedbacks:
+        if not feedbacks and not rolled_counts:
             return {
                 'total_feedbacks': 0,
                 'positive': 0,
@@ -217,12 +536,12 @@ class MetricsCollector:
                 'recent_comments': []
             }
 
-        positive = sum(1 for f in feedbacks if f.get('rating') == 'positive')
-        negative = sum(1 for f in feedbacks if f.get('rating') == 'negative')
-        neutral = sum(1 for f in feedbacks if f.get('rating') == 'neutral')
+        positive = sum(1 for f in feedbacks if f.get('rating') == 'positive') + rolled_counts.get('positive', 0)
+        negative = sum(1 for f in feedbacks if f.get('rating') == 'negative') + rolled_counts.get('negative', 0)
+        neutral = sum(1 for f in feedbacks if f.get('rating') == 'neutral') + rolled_counts.get('neutral', 0)
 
         # Satisfaction score: (positive - negative) / total
-        total = len(feedbacks)
+        total = len(feedbacks) + sum(rolled_counts.values())
         satisfaction_score = ((positive - negative) / total) * 100 if total > 0 else 0
 
         # Legutóbbi kommentek (max 5)
@@ -267,32 +586,36 @@ class MetricsCollector:
         llm_calls = [m for m in recent_metrics if m['type'] == 'llm_call']
         embedding_calls = [m for m in recent_metrics if m['type'] == 'embedding_call']
         retrievals = [m for m in recent_metrics if m['type'] == 'retrieval']
-        
-        total_prompt_tokens = sum(m.get('prompt_tokens', 0) for m in llm_calls)
-        total_completion_tokens = sum(m.get('completion_tokens', 0) for m in llm_calls)
+
+        # A retention által már rollup-olt időszak aggregátumai
+        rollup_rows = self.rollups.rows_since(cutoff_date.isoformat())
+        llm_rollups = [r for r in rollup_rows if r['type'] == 'llm_call']
+
+        def rollup_count(event_type: str) -> int:
+            return sum(r['count'] for r in rollup_rows if r['type'] == event_type)
+
+        total_prompt_tokens = sum(m.get('prompt_tokens', 0) for m in llm_calls) + sum(r.get('prompt_tokens', 0) for r in llm_rollups)
+        total_completion_tokens = sum(m.get('completion_tokens', 0) for m in llm_calls) + sum(r.get('completion_tokens', 0) for r in llm_rollups)
         total_tokens = total_prompt_tokens + total_completion_tokens
-        total_cost = sum(m.get('cost', 0) or 0 for m in recent_metrics)
-        
-        avg_first_token_time = None
-        if llm_calls:
-            first_token_times = [m.get('first_token_time') for m in llm_calls if m.get('first_token_time')]
-            if first_token_times:
-                avg_first_token_time = sum(first_token_times) / len(first_token_times)
-        
-        avg_total_time = None
-        if llm_calls:
-            total_times = [m.get('total_time') for m in llm_calls if m.get('total_time')]
-            if total_times:
-                avg_total_time = sum(total_times) / len(total_times)
+        total_cost = sum(m.get('cost', 0) or 0 for m in recent_metrics) + sum(r.get('cost', 0) or 0 for r in rollup_rows)
+
+        def average(field: str) -> Optional[float]:
+            values = [m.get(field) for m in llm_calls if m.get(field)]
+            value_sum = sum(values) + sum(r.get(f'{field}_sum', 0) for r in llm_rollups)
+            value_count = len(values) + sum(r.get(f'{field}_count', 0) for r in llm_rollups)
+            return value_sum / value_count if value_count else None
+
+        avg_first_token_time = average('first_token_time')
+        avg_total_time = average('total_time')
         
         # Feedback statisztikák
         feedback_stats = self.get_feedback_statistics(days=days)
 
         return {
             'period_days': days,
-            'total_llm_calls': len(llm_calls),
-            'total_embedding_calls': len(embedding_calls),
-            'total_retrievals': len(retrievals),
+            'total_llm_calls': len(llm_calls) + rollup_count('llm_call'),
+            'total_embedding_calls': len(embedding_calls) + rollup_count('embedding_call'),
+            'total_retrievals': len(retrievals) + rollup_count('retrieval'),
             'total_prompt_tokens': total_prompt_tokens,
             'total_completion_tokens': total_completion_tokens,
             'total_tokens': total_tokens,
@@ -329,3 +652,32 @@ class MetricsCollector:
         cost = (prompt_tokens * model_pricing['prompt']) + (completion_tokens * model_pricing['completion'])
         return cost
 
+
+class MetricsSnapshot:
+    """
+    Csak olvasható nézet egy vagy több metrika fájlra (pl. a serve_api.py
+    worker-enkénti fájljaira): az eventek és a rollup-ok összefésülve, a
+    MetricsCollector statisztika metódusaival lekérdezhetők.
+    """
+
+    get_feedback_statistics = MetricsCollector.get_feedback_statistics
+    get_statistics = MetricsCollector.get_statistics
+
+    def __init__(self, metrics_files: List[str]):
+        """
+        Args:
+            metrics_files: Metrika fájlok (mellettük a metrics_rollups.json)
+        """
+        self.metrics_files = [Path(f) for f in metrics_files]
+        self.metrics: List[Dict[str, Any]] = []
+        self.rollups = RollupStore(None)
+        for metrics_file in self.metrics_files:
+            try:
+                with open(metrics_file, 'r', encoding='utf-8') as f:
+                    self.metrics.extend(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Metrika fájl nem olvasható ({metrics_file}): {e}")
+                continue
+            source = RollupStore(str(metrics_file.parent / 'metrics_rollups.json'))
+            for tier, rows in source.tiers.items():
+                self.rollups.add(tier, rows)
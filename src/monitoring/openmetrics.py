@@ -0,0 +1,326 @@
+"""
+OpenMetrics exporter modul
+Process szintű counter / gauge / histogram regiszter és Prometheus-kompatibilis
+HTTP végpont (/metrics) a RAG folyamathoz.
+
+A regisztert a MetricsCollector tölti (memóriában, I/O nélkül), az exporter
+külön daemon szálon fut, így a scrape nem érinti a request path-t.
+"""
+
+import os
+import math
+import threading
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Prometheus alapértelmezett latency bucketek (másodperc)
+DEFAULT_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Optional[Dict[str, str]]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in (labels or {}).items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(key: LabelKey, extra: Iterable[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value is None or math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Histogram:
+    """Egy label-kombináció histogram állapota"""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class MetricsRegistry:
+    """Thread-safe metrika regiszter OpenMetrics renderrel"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # name -> (type, help)
+        self._families: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+        # name -> {label_key: callback}
+        self._gauge_callbacks: Dict[str, Dict[LabelKey, Callable[[], Optional[float]]]] = {}
+
+    def _declare(self, name: str, metric_type: str, help_text: str):
+        existing = self._families.get(name)
+        if existing and existing[0] != metric_type:
+            raise ValueError(f"A(z) {name} metrika már {existing[0]} típusként regisztrálva")
+        if not existing:
+            self._families[name] = (metric_type, help_text)
+
+    def inc(self, name: str, help_text: str = "", value: float = 1.0, labels: Optional[Dict[str, str]] = None):
+        """Counter növelése (a név `_total` utótag nélkül értendő)"""
+        key = _label_key(labels)
+        with self._lock:
+            self._declare(name, 'counter', help_text)
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, help_text: str = "", labels: Optional[Dict[str, str]] = None):
+        """Gauge beállítása"""
+        key = _label_key(labels)
+        with self._lock:
+            self._declare(name, 'gauge', help_text)
+            self._gauges.setdefault(name, {})[key] = float(value)
+
+    def add_gauge(self, name: str, delta: float, help_text: str = "", labels: Optional[Dict[str, str]] = None):
+        """Gauge relatív módosítása (pl. in-flight számláló)"""
+        key = _label_key(labels)
+        with self._lock:
+            self._declare(name, 'gauge', help_text)
+            series = self._gauges.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + delta
+
+    def gauge_callback(
+        self,
+        name: str,
+        callback: Callable[[], Optional[float]],
+        help_text: str = "",
+        labels: Optional[Dict[str, str]] = None
+    ):
+        """
+        Gauge regisztrálása callback-kel, ami csak scrape-kor fut le.
+        Ugyanarra a név + label párosra az utolsó regisztráció érvényes.
+        """
+        key = _label_key(labels)
+        with self._lock:
+            self._declare(name, 'gauge', help_text)
+            self._gauge_callbacks.setdefault(name, {})[key] = callback
+
+    def observe(
+        self,
+        name: str,
+        value: float,
+        help_text: str = "",
+        labels: Optional[Dict[str, str]] = None,
+        buckets: Tuple[float, ...] = DEFAULT_LATENCY_BUCKETS
+    ):
+        """Histogram megfigyelés rögzítése"""
+        key = _label_key(labels)
+        with self._lock:
+            self._declare(name, 'histogram', help_text)
+            bounds = self._buckets.setdefault(name, tuple(sorted(buckets)))
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = _Histogram(bounds)
+            hist.observe(value)
+
+    def get_counter(self, name: str, labels: Optional[Dict[str, str]] = None) -> float:
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0.0)
+
+    def get_gauge(self, name: str, labels: Optional[Dict[str, str]] = None) -> Optional[float]:
+        with self._lock:
+            return self._gauges.get(name, {}).get(_label_key(labels))
+
+    def render(self) -> str:
+        """Regiszter renderelése OpenMetrics szöveges formátumba"""
+        with self._lock:
+            families = dict(self._families)
+            counters = {n: dict(s) for n, s in self._counters.items()}
+            gauges = {n: dict(s) for n, s in self._gauges.items()}
+            histograms = {
+                n: {k: (list(h.counts), h.count, h.sum, h.buckets) for k, h in s.items()}
+                for n, s in self._histograms.items()
+            }
+            callbacks = {n: dict(s) for n, s in self._gauge_callbacks.items()}
+
+        # Callback-ek a lock-on kívül futnak (lassúak lehetnek, pl. Chroma count)
+        for name, series in callbacks.items():
+            target = gauges.setdefault(name, {})
+            for key, callback in series.items():
+                try:
+                    value = callback()
+                except Exception as e:
+                    logger.debug(f"Gauge callback hiba ({name}): {e}")
+                    continue
+                if value is not None:
+                    target[key] = float(value)
+
+        lines: List[str] = []
+        for name in sorted(families):
+            metric_type, help_text = families[name]
+            lines.append(f"# TYPE {name} {metric_type}")
+            if help_text:
+                lines.append(f"# HELP {name} {_escape(help_text)}")
+
+            if metric_type == 'counter':
+                for key, value in sorted(counters.get(name, {}).items()):
+                    lines.append(f"{name}_total{_format_labels(key)} {_format_value(value)}")
+            elif metric_type == 'gauge':
+                for key, value in sorted(gauges.get(name, {}).items()):
+                    lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+            elif metric_type == 'histogram':
+                for key, (counts, count, total, bounds) in sorted(histograms.get(name, {}).items()):
+                    for bound, bucket_count in zip(bounds, counts):
+                        le = (('le', repr(float(bound))),)
+                        lines.append(f"{name}_bucket{_format_labels(key, le)} {bucket_count}")
+                    lines.append(f"{name}_bucket{_format_labels(key, (('le', '+Inf'),))} {count}")
+                    lines.append(f"{name}_count{_format_labels(key)} {count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {_format_value(total)}")
+
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+def process_resident_memory_bytes() -> Optional[float]:
+    """Process RSS bájtban (psutil, /proc fallback-kel)"""
+    try:
+        import psutil
+        return float(psutil.Process().memory_info().rss)
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            resident_pages = int(f.read().split()[1])
+        return float(resident_pages * os.sysconf('SC_PAGE_SIZE'))
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+# Process szintű alapértelmezett regiszter
+REGISTRY = MetricsRegistry()
+REGISTRY.gauge_callback(
+    'process_resident_memory_bytes', process_resident_memory_bytes,
+    help_text="Process resident memory (RSS) bájtban"
+)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("metrics exporter: " + format % args)
+
+
+class MetricsExporter:
+    """OpenMetrics HTTP exporter külön daemon szálon"""
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY, host: str = "0.0.0.0", port: int = 9464):
+        """
+        Args:
+            registry: Exportálandó regiszter
+            host: Bind cím
+            port: Port (0 = véletlen szabad port)
+        """
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> int:
+        """Exporter indítása, visszaadja a ténylegesen használt portot"""
+        if self._server is not None:
+            return self.port
+
+        handler = type('MetricsHandler', (_MetricsHandler,), {'registry': self.registry})
+        self._server = ThreadingHTTPServer((self.host, self.port), handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            name="openmetrics-exporter",
+            daemon=True
+        )
+        self._thread.start()
+        logger.info(f"OpenMetrics exporter elindítva: http://{self.host}:{self.port}/metrics")
+        return self.port
+
+    def stop(self):
+        """Exporter leállítása"""
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        self._thread = None
+
+
+_exporter: Optional[MetricsExporter] = None
+_exporter_lock = threading.Lock()
+
+
+def start_exporter(port: Optional[int] = None, host: Optional[str] = None) -> Optional[MetricsExporter]:
+    """
+    Process szintű exporter indítása (idempotens).
+
+    A portot a METRICS_EXPORTER_PORT környezeti változóból olvassa, ha nincs
+    megadva; ha egyik sincs beállítva, az exporter nem indul el.
+
+    Returns:
+        A futó exporter, vagy None ha ki van kapcsolva / nem indítható
+    """
+    global _exporter
+    if port is None:
+        env_port = os.getenv('METRICS_EXPORTER_PORT')
+        if not env_port:
+            return None
+        port = int(env_port)
+    host = host or os.getenv('METRICS_EXPORTER_HOST', '0.0.0.0')
+
+    with _exporter_lock:
+        if _exporter is not None:
+            return _exporter
+        exporter = MetricsExporter(REGISTRY, host=host, port=port)
+        try:
+            exporter.start()
+        except OSError as e:
+            logger.warning(f"OpenMetrics exporter nem indítható ({host}:{port}): {e}")
+            return None
+        _exporter = exporter
+        return _exporter
+
@@ -0,0 +1,321 @@
+"""
+Erőforrás telemetria modul
+Periodikusan mintavételezi a process RSS-t, a betöltött modellek paraméter
+memóriáját, a vektor adatbázis méretét és a cache-ek méretét.
+
+Konfigurálható küszöbök (RSS, cache méret) túllépésekor a regisztrált
+cache-eket zsugorítja, mielőtt a node memóriája elfogyna.
+
+Az RSS a felszabadított Python objektumok után sem feltétlenül csökken (az
+allokátor megtartja a lapokat), ezért az RSS küszöb miatti zsugorítás
+hiszterézissel működik: egy zsugorítás után csak akkor jön újabb, ha az RSS
+közben a küszöb alá esett (limit * (1 - hiszterézis)), vagy letelt a
+cooldown. A cache-ek akkor sem zsugorodnak, ha az RSS-nek csak elenyésző
+részét adják (a zsugorítás úgysem segítene).
+"""
+
+import os
+import sys
+import time
+import logging
+import threading
+import weakref
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from .openmetrics import REGISTRY, MetricsRegistry, process_resident_memory_bytes
+
+logger = logging.getLogger(__name__)
+
+
+def model_parameter_bytes(model) -> Optional[int]:
+    """Torch modell paramétereinek memóriája bájtban (None, ha nincs betöltve)"""
+    if model is None:
+        return None
+    # CrossEncoder / FlagModel a belső torch modellt .model attribútumban tartja
+    module = model if hasattr(model, 'parameters') else getattr(model, 'model', None)
+    if module is None or not hasattr(module, 'parameters'):
+        return None
+    try:
+        return sum(p.numel() * p.element_size() for p in module.parameters())
+    except Exception:
+        return None
+
+
+def directory_size_bytes(path: str) -> int:
+    """Könyvtár teljes mérete bájtban (rekurzívan)"""
+    total = 0
+    root = Path(path)
+    if not root.exists():
+        return 0
+    for file_path in root.rglob('*'):
+        try:
+            if file_path.is_file():
+                total += file_path.stat().st_size
+        except OSError:
+            continue
+    return total
+
+
+def estimate_size_bytes(obj: Any) -> int:
+    """Python konténer becsült mérete (a tárolt kulcsok / értékek sekély méretével)"""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += sys.getsizeof(key) + estimate_size_bytes(value)
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(estimate_size_bytes(item) for item in obj)
+    return size
+
+
+class ResourceMonitor:
+    """
+    Process erőforrás mintavételező.
+
+    A komponensek getter függvényekkel regisztrálhatók, így a monitor nem
+    tartja életben őket. A cache-eknek `__len__`, `size_bytes()` és
+    `shrink(fraction)` metódust kell biztosítaniuk.
+    """
+
+    def __init__(
+        self,
+        registry: MetricsRegistry = REGISTRY,
+        interval: float = None,
+        rss_limit_mb: float = None,
+        cache_limit_mb: float = None,
+        shrink_fraction: float = None,
+        shrink_cooldown: float = None,
+        rss_hysteresis: float = None,
+        min_cache_share: float = None
+    ):
+        """
+        Args:
+            registry: OpenMetrics regiszter a gauge-ekhez
+            interval: Mintavételezési periódus másodpercben (0 = nincs háttérszál)
+            rss_limit_mb: RSS küszöb MB-ban, felette minden cache zsugorodik (0 = nincs)
+            cache_limit_mb: Cache-enkénti méret küszöb MB-ban (0 = nincs)
+            shrink_fraction: A cache bejegyzések ekkora hányada törlődik zsugorításkor
+            shrink_cooldown: Két RSS miatti zsugorítás közötti minimális idő másodpercben
+            rss_hysteresis: Az RSS küszöb alatti sáv (arány), amit elérve a zsugorítás újra élesedik
+            min_cache_share: RSS túllépéskor csak akkor zsugorít, ha a cache-ek az RSS
+                legalább ekkora hányadát adják
+        """
+        self.registry = registry
+        self.interval = interval if interval is not None else float(os.getenv('RESOURCE_SAMPLE_INTERVAL', 60))
+        self.rss_limit_bytes = (rss_limit_mb if rss_limit_mb is not None
+                                else float(os.getenv('RESOURCE_RSS_LIMIT_MB', 0))) * 1024 * 1024
+        self.cache_limit_bytes = (cache_limit_mb if cache_limit_mb is not None
+                                  else float(os.getenv('RESOURCE_CACHE_LIMIT_MB', 0))) * 1024 * 1024
+        self.shrink_fraction = shrink_fraction if shrink_fraction is not None else float(
+            os.getenv('RESOURCE_CACHE_SHRINK_FRACTION', 0.5)
+        )
+        self.shrink_cooldown = shrink_cooldown if shrink_cooldown is not None else float(
+            os.getenv('RESOURCE_SHRINK_COOLDOWN', 300)
+        )
+        self.rss_hysteresis = rss_hysteresis if rss_hysteresis is not None else float(
+            os.getenv('RESOURCE_RSS_HYSTERESIS', 0.1)
+        )
+        self.min_cache_share = min_cache_share if min_cache_share is not None else float(
+            os.getenv('RESOURCE_CACHE_MIN_SHARE', 0.05)
+        )
+        # RSS miatti zsugorítás állapota (hiszterézis + cooldown)
+        self._rss_armed = True
+        self._last_rss_shrink = 0.0
+
+        self._models: Dict[str, Callable[[], Any]] = {}
+        self._caches: Dict[str, Callable[[], Any]] = {}
+        self._sizes: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._last_sample: Dict[str, Any] = {}
+        self._shrink_events = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # Regisztráció
+    # ------------------------------------------------------------------
+    def register_model(self, name: str, getter: Callable[[], Any]):
+        """Modell regisztrálása (a getter a betöltött modellt vagy None-t ad vissza)"""
+        self._models[name] = getter
+
+    def register_cache(self, name: str, getter: Callable[[], Any]):
+        """Cache regisztrálása (len / size_bytes / shrink interfész)"""
+        self._caches[name] = getter
+
+    def register_size(self, name: str, getter: Callable[[], Dict[str, Any]]):
+        """Tetszőleges méret-információ regisztrálása (pl. vektor adatbázis)"""
+        self._sizes[name] = getter
+
+    # ------------------------------------------------------------------
+    # Mintavételezés
+    # ------------------------------------------------------------------
+    def sample(self) -> Dict[str, Any]:
+        """
+        Egy mintavétel: RSS, modellek, méretek, cache-ek; küszöb esetén zsugorítás.
+
+        Returns:
+            Erőforrás snapshot dict
+        """
+        snapshot: Dict[str, Any] = {
+            'timestamp': time.time(),
+            'rss_bytes': process_resident_memory_bytes(),
+            'models': {},
+            'caches': {},
+        }
+
+        for name, getter in self._models.items():
+            try:
+                snapshot['models'][name] = model_parameter_bytes(getter())
+            except Exception as e:
+                logger.debug(f"Modell méret hiba ({name}): {e}")
+                snapshot['models'][name] = None
+
+        for name, getter in self._sizes.items():
+            try:
+                snapshot[name] = getter()
+            except Exception as e:
+                logger.debug(f"Méret lekérdezési hiba ({name}): {e}")
+                snapshot[name] = {}
+
+        for name, getter in self._caches.items():
+            snapshot['caches'][name] = self._cache_info(getter())
+
+        snapshot['shrunk'] = self._enforce_thresholds(snapshot)
+        if snapshot['shrunk']:
+            snapshot['caches'] = {name: self._cache_info(getter()) for name, getter in self._caches.items()}
+
+        self._publish(snapshot)
+        with self._lock:
+            self._last_sample = snapshot
+        return snapshot
+
+    def _cache_info(self, cache) -> Dict[str, Any]:
+        if cache is None:
+            return {'entries': 0, 'bytes': 0}
+        try:
+            return {'entries': len(cache), 'bytes': cache.size_bytes()}
+        except Exception as e:
+            logger.debug(f"Cache méret hiba: {e}")
+            return {'entries': 0, 'bytes': 0}
+
+    def _enforce_thresholds(self, snapshot: Dict[str, Any]) -> Dict[str, int]:
+        """Cache-ek zsugorítása a küszöbök túllépésekor"""
+        shrunk: Dict[str, int] = {}
+        rss = snapshot.get('rss_bytes') or 0
+        over_rss = self._rss_shrink_due(rss, snapshot['caches'])
+
+        for name, getter in self._caches.items():
+            info = snapshot['caches'].get(name, {})
+            over_cache = self.cache_limit_bytes > 0 and info.get('bytes', 0) > self.cache_limit_bytes
+            if not (over_rss or over_cache) or not info.get('entries'):
+                continue
+            cache = getter()
+            if cache is None:
+                continue
+            removed = cache.shrink(self.shrink_fraction)
+            if removed:
+                shrunk[name] = removed
+                self.registry.inc(
+                    'rag_cache_evictions', "Erőforrás küszöb miatt törölt cache bejegyzések",
+                    value=removed, labels={'cache': name}
+                )
+
+        if shrunk:
+            self._shrink_events += 1
+            reason = f"RSS {rss / 1024 / 1024:.0f} MB" if over_rss else "cache méret küszöb"
+            logger.warning(f"Cache zsugorítás ({reason}): {shrunk}")
+        return shrunk
+
+    def _rss_shrink_due(self, rss: int, caches: Dict[str, Dict[str, Any]]) -> bool:
+        """Kell-e most az RSS küszöb miatt zsugorítani (hiszterézis, cooldown, cache arány)"""
+        if self.rss_limit_bytes <= 0:
+            return False
+        if rss < self.rss_limit_bytes * (1 - self.rss_hysteresis):
+            self._rss_armed = True
+        if rss <= self.rss_limit_bytes:
+            return False
+        now = time.time()
+        if not self._rss_armed and now - self._last_rss_shrink < self.shrink_cooldown:
+            return False
+        # Ez a túllépés kezelve: a következő csak újraélesedés vagy cooldown után
+        self._rss_armed = False
+        self._last_rss_shrink = now
+        cache_bytes = sum(info.get('bytes', 0) for info in caches.values())
+        if cache_bytes < self.min_cache_share * rss:
+            logger.warning(
+                f"RSS {rss / 1024 / 1024:.0f} MB a küszöb felett, de a cache-ek csak "
+                f"{cache_bytes / 1024 / 1024:.1f} MB-ot foglalnak, nincs zsugorítás"
+            )
+            return False
+        return True
+
+    def _publish(self, snapshot: Dict[str, Any]):
+        """Snapshot gauge-ek frissítése a regiszterben"""
+        for name, value in snapshot['models'].items():
+            if value is not None:
+                self.registry.set_gauge(
+                    'rag_model_parameter_bytes', value,
+                    "Betöltött modellek paraméter memóriája bájtban", labels={'model': name}
+                )
+        for name, info in snapshot['caches'].items():
+            self.registry.set_gauge('rag_cache_entries', info['entries'],
+                                    "Cache bejegyzések száma", labels={'cache': name})
+            self.registry.set_gauge('rag_cache_bytes', info['bytes'],
+                                    "Cache becsült mérete bájtban", labels={'cache': name})
+        for name in self._sizes:
+            for key, value in (snapshot.get(name) or {}).items():
+                if key.endswith('_bytes') and value is not None:
+                    self.registry.set_gauge(
+                        f'rag_{name}_{key}', value, f"{name} {key.replace('_', ' ')}"
+                    )
+
+    @property
+    def last_sample(self) -> Dict[str, Any]:
+        """Utolsó mintavétel (üres dict, ha még nem volt)"""
+        with self._lock:
+            return dict(self._last_sample)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Friss snapshot, ha a háttérszál még nem vett mintát"""
+        sample = self.last_sample
+        if not sample or self._thread is None:
+            sample = self.sample()
+        sample['shrink_events'] = self._shrink_events
+        sample['thresholds'] = {
+            'rss_limit_bytes': self.rss_limit_bytes or None,
+            'cache_limit_bytes': self.cache_limit_bytes or None,
+            'shrink_fraction': self.shrink_fraction,
+            'shrink_cooldown': self.shrink_cooldown,
+            'rss_hysteresis': self.rss_hysteresis,
+            'min_cache_share': self.min_cache_share,
+        }
+        return sample
+
+    # ------------------------------------------------------------------
+    # Háttérszál
+    # ------------------------------------------------------------------
+    def start(self):
+        """Periodikus mintavételező szál indítása (weakref, nem tartja életben a monitort)"""
+        if self._thread is not None or self.interval <= 0:
+            return
+        ref = weakref.ref(self)
+        stop = self._stop
+        interval = self.interval
+
+        def _loop():
+            while not stop.wait(interval):
+                monitor = ref()
+                if monitor is None:
+                    return
+                try:
+                    monitor.sample()
+                except Exception as e:
+                    logger.warning(f"Erőforrás mintavételezési hiba: {e}")
+                del monitor
+
+        self._thread = threading.Thread(target=_loop, name="resource-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Mintavételező szál leállítása"""
+        self._stop.set()
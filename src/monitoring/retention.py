@@ -0,0 +1,211 @@
+"""
+Metrika retention modul
+Retention szintek: nyers eventek N napig, utána órás, majd napi rollup-ok.
+
+A szintek diszjunktak: egy event vagy nyersen, vagy pontosan egy rollup
+sorban szerepel, így a szintek összege adja a teljes történetet.
+"""
+
+import os
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Rollup sorokban összegzett numerikus mezők event típusonként
+SUM_FIELDS = {
+    'llm_call': ['prompt_tokens', 'completion_tokens', 'total_tokens', 'cost'],
+    'embedding_call': ['input_tokens', 'cost'],
+    'retrieval': ['num_results'],
+}
+
+# Átlagolható mezők: <mező>_sum és <mező>_count formában tároljuk
+MEAN_FIELDS = {
+    'llm_call': ['first_token_time', 'total_time'],
+    'retrieval': ['retrieval_time'],
+}
+
+# Csoportosító dimenziók event típusonként (a szöveges mezők elvesznek)
+DIMENSIONS = {
+    'llm_call': 'model',
+    'embedding_call': 'model',
+    'user_feedback': 'rating',
+}
+
+
+class RetentionPolicy:
+    """Retention szintek konfigurációja (napokban)"""
+
+    def __init__(self, raw_days: int = 7, hourly_days: int = 90, daily_days: int = 0):
+        """
+        Args:
+            raw_days: Nyers eventek megőrzése (0 = retention kikapcsolva)
+            hourly_days: Órás rollup-ok megőrzése, utána napi rollup-ba kerülnek
+            daily_days: Napi rollup-ok megőrzése (0 = örökre)
+        """
+        self.raw_days = raw_days
+        self.hourly_days = max(hourly_days, raw_days)
+        self.daily_days = daily_days
+
+    @classmethod
+    def from_env(cls) -> "RetentionPolicy":
+        return cls(
+            raw_days=int(os.getenv('METRICS_RAW_RETENTION_DAYS', 7)),
+            hourly_days=int(os.getenv('METRICS_HOURLY_RETENTION_DAYS', 90)),
+            daily_days=int(os.getenv('METRICS_DAILY_RETENTION_DAYS', 0)),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.raw_days > 0
+
+
+def _bucket_start(timestamp: str, granularity: str) -> str:
+    ts = datetime.fromisoformat(timestamp)
+    if granularity == 'hourly':
+        ts = ts.replace(minute=0, second=0, microsecond=0)
+    else:
+        ts = ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    return ts.isoformat()
+
+
+def _row_key(row: Dict[str, Any]) -> Tuple[str, str, Optional[str]]:
+    return row['bucket'], row['type'], row.get('dimension')
+
+
+def _merge_into(target: Dict[str, Any], source: Dict[str, Any]):
+    for key, value in source.items():
+        if key in ('bucket', 'type', 'dimension'):
+            continue
+        target[key] = (target.get(key) or 0) + (value or 0)
+
+
+def rollup_events(events: Iterable[Dict[str, Any]], granularity: str) -> List[Dict[str, Any]]:
+    """
+    Nyers eventek aggregálása időbucketekbe.
+
+    Args:
+        events: Nyers metrika eventek
+        granularity: 'hourly' vagy 'daily'
+
+    Returns:
+        Rollup sorok
+    """
+    rows: Dict[tuple, Dict[str, Any]] = {}
+    for event in events:
+        event_type = event.get('type', 'unknown')
+        dim_field = DIMENSIONS.get(event_type)
+        row = {
+            'bucket': _bucket_start(event['timestamp'], granularity),
+            'type': event_type,
+            'dimension': event.get(dim_field) if dim_field else None,
+            'count': 1,
+        }
+        for field in SUM_FIELDS.get(event_type, []):
+            row[field] = event.get(field) or 0
+        for field in MEAN_FIELDS.get(event_type, []):
+            value = event.get(field)
+            row[f'{field}_sum'] = value or 0
+            row[f'{field}_count'] = 1 if value else 0
+
+        key = _row_key(row)
+        if key in rows:
+            _merge_into(rows[key], row)
+        else:
+            rows[key] = row
+    return list(rows.values())
+
+
+def rollup_rows(rows: Iterable[Dict[str, Any]], granularity: str) -> List[Dict[str, Any]]:
+    """Finomabb rollup sorok újra-aggregálása durvább bucketekbe (órás -> napi)"""
+    merged: Dict[tuple, Dict[str, Any]] = {}
+    for row in rows:
+        new_row = dict(row, bucket=_bucket_start(row['bucket'], granularity))
+        key = _row_key(new_row)
+        if key in merged:
+            _merge_into(merged[key], new_row)
+        else:
+            merged[key] = new_row
+    return list(merged.values())
+
+
+class RollupStore:
+    """Órás és napi rollup-ok JSON tárolója"""
+
+    def __init__(self, rollup_file: Optional[str]):
+        """
+        Args:
+            rollup_file: Rollup-ok mentési fájlja (None = csak memóriában, pl. összesítéshez)
+        """
+        self.rollup_file = Path(rollup_file) if rollup_file is not None else None
+        self._lock = threading.Lock()
+        self.tiers: Dict[str, List[Dict[str, Any]]] = {'hourly': [], 'daily': []}
+        self._load()
+
+    def _load(self):
+        if self.rollup_file is None or not self.rollup_file.exists():
+            return
+        try:
+            with open(self.rollup_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.tiers['hourly'] = data.get('hourly', [])
+            self.tiers['daily'] = data.get('daily', [])
+        except Exception as e:
+            logger.warning(f"Hiba a rollup-ok betöltésénél: {e}")
+
+    def save(self):
+        if self.rollup_file is None:
+            return
+        tmp_path = self.rollup_file.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.tiers, f, ensure_ascii=False)
+        tmp_path.replace(self.rollup_file)
+
+    def add(self, tier: str, rows: List[Dict[str, Any]]):
+        """Rollup sorok additív beolvasztása egy szintbe"""
+        with self._lock:
+            index = {_row_key(r): r for r in self.tiers[tier]}
+            for row in rows:
+                key = _row_key(row)
+                if key in index:
+                    _merge_into(index[key], row)
+                else:
+                    index[key] = dict(row)
+                    self.tiers[tier].append(index[key])
+
+    def pop_before(self, tier: str, cutoff: str) -> List[Dict[str, Any]]:
+        """A cutoff előtti bucketek eltávolítása és visszaadása"""
+        with self._lock:
+            old = [r for r in self.tiers[tier] if r['bucket'] < cutoff]
+            self.tiers[tier] = [r for r in self.tiers[tier] if r['bucket'] >= cutoff]
+            return old
+
+    def rows_since(self, cutoff: Optional[str], event_types: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Minden szint sorai a cutoff óta (opcionálisan típusra szűrve)"""
+        types = set(event_types) if event_types else None
+        with self._lock:
+            return [
+                r for tier in ('daily', 'hourly') for r in self.tiers[tier]
+                if (cutoff is None or r['bucket'] >= cutoff)
+                and (types is None or r['type'] in types)
+            ]
+
+    def enforce(self, policy: RetentionPolicy, now: datetime) -> Dict[str, int]:
+        """Órás -> napi átforgatás és a napi szint lejárt sorainak törlése"""
+        hourly_cutoff = (now - timedelta(days=policy.hourly_days)).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        ).isoformat()
+        expired_hourly = self.pop_before('hourly', hourly_cutoff)
+        if expired_hourly:
+            self.add('daily', rollup_rows(expired_hourly, 'daily'))
+
+        dropped = 0
+        if policy.daily_days > 0:
+            daily_cutoff = (now - timedelta(days=policy.daily_days)).isoformat()
+            dropped = len(self.pop_before('daily', daily_cutoff))
+
+        return {'hourly_to_daily': len(expired_hourly), 'daily_dropped': dropped}
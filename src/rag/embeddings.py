@@ -8,6 +8,10 @@ from typing import List, Union
 import logging
 from dotenv import load_dotenv
 from src.utils.hf_auth import ensure_hf_token_env
+from src.utils.openai_client import get_openai_client, remote_call
+from src.utils.rate_limiter import estimate_tokens
+from src.utils.fake_backends import FakeSentenceEmbedder, is_fake_backend
+from src.utils.inference_guard import InferenceGuard
 
 load_dotenv()
 
@@ -31,6 +35,8 @@ class EmbeddingModel:
         self.model_name = model_name or os.getenv('EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
         self._model = None
         self._openai_client = None
+        # A lokális modellt párhuzamos kérések osztják meg (a fake backend thread-safe)
+        self._inference_guard = InferenceGuard('embedding', default_concurrency=0 if is_fake_backend() else 1)
         
         if use_openai:
             self._init_openai()
@@ -40,21 +46,21 @@ class EmbeddingModel:
     def _init_openai(self):
         """OpenAI embedding inicializálása"""
         try:
-            from openai import OpenAI
-            api_key = os.getenv('OPENAI_API_KEY')
-            if not api_key:
-                raise ValueError("OPENAI_API_KEY nincs beállítva a .env fájlban")
-            
-            self._openai_client = OpenAI(api_key=api_key)
+            self._openai_client = get_openai_client('embeddings')
             logger.info(f"OpenAI embedding modell inicializálva: {self.model_name}")
         except ImportError:
-            raise ImportError("openai nincs telepítve. Telepítsd: pip install openai")
+            raise
         except Exception as e:
             logger.error(f"Hiba az OpenAI inicializálásánál: {e}")
             raise
     
     def _init_local(self):
         """Lokális embedding modell inicializálása"""
+        if is_fake_backend():
+            self._model = FakeSentenceEmbedder()
+            logger.info(f"Fake embedding modell inicializálva (dim={self._model.dim})")
+            return
+
         try:
             # Public models (sentence-transformers/*) don't need HF token
             is_public = self.model_name.startswith("sentence-transformers/")
@@ -116,9 +122,14 @@ class EmbeddingModel:
     def _embed_openai(self, texts: List[str]) -> List[List[float]]:
         """OpenAI API használata embedding generáláshoz"""
         try:
-            response = self._openai_client.embeddings.create(
-                model=self.model_name,
-                input=texts
+            response = remote_call(
+                'embeddings',
+                lambda: self._openai_client.embeddings.create(
+                    model=self.model_name,
+                    input=texts
+                ),
+                estimated_tokens=estimate_tokens(text=texts),
+                hedge=True
             )
             embeddings = [item.embedding for item in response.data]
             return embeddings
@@ -130,12 +141,13 @@ class EmbeddingModel:
         """Lokális modell használata embedding generáláshoz"""
         try:
             # BGE-M3 esetén külön kezelés
-            if hasattr(self._model, 'encode_queries') and 'bge-m3' in self.model_name.lower():
-                # BGE-M3 query encoding (dokumentumokhoz is használjuk)
-                embeddings = self._model.encode_queries(texts)
-            else:
-                # Általános encode
-                embeddings = self._model.encode(texts, show_progress_bar=False)
+            with self._inference_guard:
+                if hasattr(self._model, 'encode_queries') and 'bge-m3' in self.model_name.lower():
+                    # BGE-M3 query encoding (dokumentumokhoz is használjuk)
+                    embeddings = self._model.encode_queries(texts)
+                else:
+                    # Általános encode
+                    embeddings = self._model.encode(texts, show_progress_bar=False)
             
             # Numpy array konverzió listára
             if hasattr(embeddings, 'tolist'):
@@ -165,6 +177,9 @@ class EmbeddingModel:
             if self._model is None:
                 self._init_local()
             
+            if isinstance(self._model, FakeSentenceEmbedder):
+                return self._model.get_sentence_embedding_dimension()
+            
             # Known model dimensions
             dim_map = {
                 'bge-m3': 1024,
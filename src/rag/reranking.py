@@ -7,6 +7,9 @@ from typing import List, Dict, Any, Optional
 import logging
 import os
 
+from src.utils.fake_backends import FakeCrossEncoder, is_fake_backend
+from src.utils.inference_guard import InferenceGuard
+
 logger = logging.getLogger(__name__)
 
 
@@ -26,12 +29,18 @@ class Reranker:
         self.use_reranking = use_reranking
         self.model_name = model_name
         self._model = None
+        self._inference_guard = InferenceGuard('reranker', default_concurrency=0 if is_fake_backend() else 1)
         
         if use_reranking:
             self._init_model()
     
     def _init_model(self):
         """Reranking modell inicializálása"""
+        if is_fake_backend():
+            self._model = FakeCrossEncoder()
+            logger.info("Fake reranking modell inicializálva")
+            return
+
         try:
             from sentence_transformers import CrossEncoder
             self._model = CrossEncoder(self.model_name)
@@ -74,7 +83,8 @@ class Reranker:
             pairs = [[query, doc['text']] for doc in documents]
             
             # Reranking scores számítása
-            scores = self._model.predict(pairs)
+            with self._inference_guard:
+                scores = self._model.predict(pairs)
             
             # Dokumentumok score-okkal párosítása
             scored_docs = []
@@ -100,6 +110,52 @@ class Reranker:
                 return documents[:top_k]
             return documents
     
+    def rerank_batch(
+        self,
+        queries: List[str],
+        documents_lists: List[List[Dict[str, Any]]],
+        top_k: Optional[int] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Több query dokumentumainak újrarangsorolása egyetlen modell hívással
+
+        Args:
+            queries: Keresési lekérdezések
+            documents_lists: Query-nként a dokumentumok listája
+            top_k: Query-nként visszaadandó eredmények száma
+
+        Returns:
+            Query-nként a rerankelt dokumentumok (mint rerank())
+        """
+        if not self.use_reranking or self._model is None:
+            return [documents[:top_k] if top_k else documents for documents in documents_lists]
+
+        pairs = [[query, doc['text']] for query, documents in zip(queries, documents_lists) for doc in documents]
+        if not pairs:
+            return [[] for _ in documents_lists]
+
+        try:
+            with self._inference_guard:
+                scores = self._model.predict(pairs)
+        except Exception as e:
+            logger.error(f"Hiba a batch reranking során: {e}")
+            return [documents[:top_k] if top_k else documents for documents in documents_lists]
+
+        results = []
+        offset = 0
+        for documents in documents_lists:
+            scored_docs = []
+            for doc, score in zip(documents, scores[offset:offset + len(documents)]):
+                doc_copy = doc.copy()
+                doc_copy['rerank_score'] = float(score)
+                scored_docs.append(doc_copy)
+            offset += len(documents)
+            scored_docs.sort(key=lambda x: x['rerank_score'], reverse=True)
+            results.append(scored_docs[:top_k] if top_k else scored_docs)
+
+        logger.info(f"Batch reranking: {len(pairs)} pár, {len(documents_lists)} query")
+        return results
+
     def rerank_with_metadata(
         self,
         query: str,
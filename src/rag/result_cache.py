@@ -0,0 +1,99 @@
+"""
+Retrieval eredmény cache
+(normalizált query, top_k, küszöb, ...) -> rerankelt kontextus LRU cache,
+a vektor tároló korpusz verziójához (generation) kötve.
+
+Ha a korpusz változik (add_documents / delete_collection), a következő
+hozzáférés az összes régi bejegyzést eldobja; egy régi verzióval még
+folyamatban lévő számítás eredménye nem kerül be a cache-be.
+"""
+
+import copy
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from src.monitoring.resources import estimate_size_bytes
+
+
+class RetrievalResultCache:
+    """Thread-safe LRU cache korpusz verzió alapú invalidálással"""
+
+    def __init__(self, max_size: int = 1000):
+        """
+        Args:
+            max_size: Maximális bejegyzésszám (0 = kikapcsolva)
+        """
+        self.max_size = max_size
+        self._cache: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._generation: Optional[int] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def _sync_generation(self, generation: int) -> bool:
+        """Újabb verziónál a régi bejegyzések törlése; False, ha a kért verzió elavult"""
+        if self._generation is None or generation > self._generation:
+            if self._cache:
+                self.invalidations += 1
+            self._cache.clear()
+            self._generation = generation
+        return generation == self._generation
+
+    def get(self, key: Hashable, generation: int) -> Optional[Any]:
+        """A tárolt érték másolata, vagy None (nincs / elavult)"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            if self._sync_generation(generation) and key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                value = self._cache[key]
+            else:
+                self.misses += 1
+                return None
+        # A hívó módosíthatja a kontextus dict-eket (pl. rerank score, metaadat)
+        return copy.deepcopy(value)
+
+    def put(self, key: Hashable, generation: int, value: Any):
+        """Érték tárolása; elavult (régebbi verziójú) eredmény nem kerül be"""
+        if not self.enabled:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            if not self._sync_generation(generation):
+                return
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            return estimate_size_bytes(self._cache)
+
+    def clear(self):
+        """Összes bejegyzés törlése (a hit/miss számlálók megmaradnak)"""
+        with self._lock:
+            self._cache.clear()
+
+    def shrink(self, fraction: float) -> int:
+        """A legrégebben használt bejegyzések adott hányadának törlése"""
+        with self._lock:
+            to_remove = int(len(self._cache) * fraction)
+            for _ in range(to_remove):
+                self._cache.popitem(last=False)
+            return to_remove
@@ -7,6 +7,7 @@ from typing import List, Dict, Any, Optional
 import logging
 from .vector_store import VectorStore
 from .embeddings import EmbeddingModel
+from src.utils.single_flight import SingleFlight, normalize_query
 
 logger = logging.getLogger(__name__)
 
@@ -51,6 +52,8 @@ class RetrievalEngine:
         self.similarity_threshold = similarity_threshold
         self.min_results = min_results
         self.relative_threshold_ratio = relative_threshold_ratio
+        # Azonos, egyidejű query-k embeddingje egyszer számolódik
+        self._embed_flight = SingleFlight('query_embedding')
 
     def _score_and_filter(
         self,
@@ -123,7 +126,10 @@ class RetrievalEngine:
         top_k = top_k or self.top_k
 
         try:
-            query_embedding = self.embedding_model.embed_text(query)
+            query_embedding = self._embed_flight.do(
+                normalize_query(query, casefold=False),
+                lambda: self.embedding_model.embed_text(query)
+            )
 
             results = self.vector_store.search(
                 query_embedding=query_embedding,
@@ -149,7 +155,10 @@ class RetrievalEngine:
         top_k = top_k or self.top_k
 
         try:
-            query_embedding = self.embedding_model.embed_text(query)
+            query_embedding = self._embed_flight.do(
+                normalize_query(query, casefold=False),
+                lambda: self.embedding_model.embed_text(query)
+            )
 
             results = self.vector_store.search(
                 query_embedding=query_embedding,
@@ -162,3 +171,32 @@ class RetrievalEngine:
         except Exception as e:
             logger.error(f"Hiba a metadata szűréses retrieval során: {e}")
             return []
+
+    def retrieve_batch(self, queries: List[str], top_k: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Több query visszakeresése: egy embedding hívás és egy adatbázis lekérdezés
+        a teljes batch-re (az ismétlődő query-k egyszer számolódnak)
+
+        Args:
+            queries: Keresési lekérdezések
+            top_k: Query-nként visszaadandó eredmények száma (opcionális)
+
+        Returns:
+            Query-nként a találatok (mint retrieve(); üres query -> üres lista)
+        """
+        top_k = top_k or self.top_k
+        unique = list(dict.fromkeys(q for q in queries if q and q.strip()))
+        if not unique:
+            return [[] for _ in queries]
+
+        try:
+            embeddings = self.embedding_model.embed_texts(unique)
+            searched = self.vector_store.search_batch(query_embeddings=embeddings, top_k=top_k)
+            by_query = {query: self._score_and_filter(results) for query, results in zip(unique, searched)}
+            logger.info(f"Batch retrieval: {len(unique)} egyedi query ({len(queries)} kérés)")
+            # Ismétlődő query-k saját (sekély) másolatot kapnak
+            return [[dict(r) for r in by_query[q]] if q in by_query else [] for q in queries]
+
+        except Exception as e:
+            logger.error(f"Hiba a batch retrieval során: {e}")
+            return [[] for _ in queries]
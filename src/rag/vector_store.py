@@ -4,6 +4,7 @@ ChromaDB használata vektor tároláshoz
 """
 
 import os
+import threading
 from typing import List, Dict, Any, Optional
 import logging
 from pathlib import Path
@@ -13,6 +14,10 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# A még nem publikált (félig ingestált fájlhoz tartozó) chunkok kiszűrése a keresésből;
+# a $ne a pending mező nélküli (régebbi) chunkokat is átengedi
+VISIBLE_FILTER = {'pending': {'$ne': True}}
+
 
 class VectorStore:
     """Vektor adatbázis osztály ChromaDB-vel"""
@@ -38,7 +43,76 @@ class VectorStore:
         
         self._client = None
         self._collection = None
+        # Korpusz verzió: minden módosítás növeli (cache / single-flight kulcsokhoz).
+        # A collection melletti fájlban tárolódik, így újraindítás után is monoton,
+        # és az ugyanazt az adatbázist használó processzek is látják egymás módosításait.
+        self._generation_file = Path(self.persist_directory) / f"{self.collection_name}.generation"
+        self._generation_lock = threading.Lock()
+        # A megnyitáskori verzió: ennél újabb, más processz által írt verzió esetén
+        # a memóriában tartott HNSW index elavult, a collection újranyitandó
+        self._generation = self._read_generation()
+        self._generation_mtime = None
+        self._stale = False
+        self._reopen_lock = threading.Lock()
+        # Írások (add / delete) sorosítva; a keresések párhuzamosan futhatnak
+        # (a Chroma HNSW szegmens saját olvasó/író zárral védi az indexet)
+        self._write_lock = threading.Lock()
         self._init_db()
+
+    @property
+    def generation(self) -> int:
+        """Monoton növekvő korpusz verzió (add_documents / delete_collection növeli)"""
+        try:
+            mtime = self._generation_file.stat().st_mtime_ns
+        except OSError:
+            return self._generation
+        if mtime != self._generation_mtime:
+            with self._generation_lock:
+                on_disk = self._read_generation()
+                if on_disk > self._generation:
+                    # Más processz (pl. a különálló ingestion worker) írt az adatbázisba
+                    self._generation = on_disk
+                    self._stale = True
+                self._generation_mtime = mtime
+        return self._generation
+
+    def _reopen_if_stale(self):
+        """
+        A collection újranyitása, ha más processz módosította az adatbázist
+
+        A Chroma kliens processzenként gyorsítótárazza a HNSW indexet, így egy
+        csak olvasó processz (pl. több API worker) a saját példányán keresztül
+        nem látja a más processzben kiírt chunkokat. A folyamatban lévő
+        keresések a régi collection objektumon zavartalanul befejeződnek.
+        """
+        self.generation
+        if not self._stale:
+            return
+        with self._reopen_lock:
+            if not self._stale:
+                return
+            self._stale = False
+            from chromadb.api.client import SharedSystemClient
+            SharedSystemClient.clear_system_cache()
+            self._init_db()
+            logger.info(f"Collection újranyitva (korpusz verzió: {self._generation})")
+
+    def _read_generation(self) -> int:
+        try:
+            return int(self._generation_file.read_text(encoding='utf-8').strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _bump_generation(self) -> int:
+        """Verzió növelése és atomi mentése (tmp fájl + rename)"""
+        with self._generation_lock:
+            generation = max(self._generation, self._read_generation()) + 1
+            tmp_path = self._generation_file.with_name(f"{self._generation_file.name}.{os.getpid()}.tmp")
+            tmp_path.write_text(str(generation), encoding='utf-8')
+            os.replace(tmp_path, self._generation_file)
+            self._generation = generation
+            self._generation_mtime = self._generation_file.stat().st_mtime_ns
+        return generation
     
     def _init_db(self):
         """ChromaDB inicializálása"""
@@ -70,7 +144,9 @@ class VectorStore:
         texts: List[str],
         embeddings: List[List[float]],
         metadatas: List[Dict[str, Any]] = None,
-        ids: List[str] = None
+        ids: List[str] = None,
+        upsert: bool = False,
+        pending: bool = False
     ):
         """
         Dokumentumok hozzáadása a vektor adatbázishoz
@@ -80,6 +156,8 @@ class VectorStore:
             embeddings: Embedding vektorok listája
             metadatas: Metaadatok listája
             ids: Dokumentum ID-k listája
+            upsert: A már létező ID-k felülírása (idempotens, újrapróbálható írás)
+            pending: A chunkok a publish() hívásig nem kereshetők (a korpusz verzió sem nő)
         """
         if not texts or not embeddings:
             logger.warning("Üres lista hozzáadása a vektor adatbázishoz")
@@ -95,15 +173,22 @@ class VectorStore:
         # Metaadatok beállítása
         if metadatas is None:
             metadatas = [{}] * len(texts)
+        if pending:
+            metadatas = [{**metadata, 'pending': True} for metadata in metadatas]
         
         try:
-            self._collection.add(
-                embeddings=embeddings,
-                documents=texts,
-                metadatas=metadatas,
-                ids=ids
-            )
-            logger.info(f"{len(texts)} dokumentum hozzáadva a vektor adatbázishoz")
+            with self._write_lock:
+                write = self._collection.upsert if upsert else self._collection.add
+                write(
+                    embeddings=embeddings,
+                    documents=texts,
+                    metadatas=metadatas,
+                    ids=ids
+                )
+                # A rejtett chunkok nem változtatják a kereshető korpuszt
+                if not pending:
+                    self._bump_generation()
+            logger.info(f"{len(texts)} dokumentum hozzáadva a vektor adatbázishoz" + (" (publikálásra vár)" if pending else ""))
         except Exception as e:
             logger.error(f"Hiba a dokumentumok hozzáadásánál: {e}")
             raise
@@ -125,37 +210,105 @@ class VectorStore:
         Returns:
             Találatok listája
         """
+        return self.search_batch([query_embedding], top_k=top_k, filter_dict=filter_dict)[0]
+
+    def publish(self, filter_dict: Dict[str, Any]) -> int:
+        """
+        A szűrőnek megfelelő, pending állapotú chunkok kereshetővé tétele egyszerre
+
+        A korpusz verzió egyszer nő, így a cache-ek és a többi processz egy
+        lépésben látja a teljes fájlt.
+
+        Args:
+            filter_dict: Metaadat szűrő (pl. {'content_hash': ...})
+
+        Returns:
+            A publikált chunkok száma
+        """
+        try:
+            with self._write_lock:
+                ids = self._collection.get(where={'$and': [filter_dict, {'pending': True}]}, include=[])['ids']
+                if ids:
+                    self._collection.update(ids=ids, metadatas=[{'pending': False}] * len(ids))
+                self._bump_generation()
+            return len(ids)
+        except Exception as e:
+            logger.error(f"Hiba a chunkok publikálásánál: {e}")
+            raise
+
+    def search_batch(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 5,
+        filter_dict: Dict[str, Any] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Több query keresése egyetlen adatbázis hívással
+
+        Args:
+            query_embeddings: Query embedding vektorok
+            top_k: Query-nként visszaadandó eredmények száma
+            filter_dict: Szűrési feltételek
+
+        Returns:
+            Query-nként a találatok listája (a bemenet sorrendjében)
+        """
+        if not query_embeddings:
+            return []
+        self._reopen_if_stale()
         try:
             results = self._collection.query(
-                query_embeddings=[query_embedding],
+                query_embeddings=query_embeddings,
                 n_results=top_k,
-                where=filter_dict if filter_dict else None
+                where={'$and': [filter_dict, VISIBLE_FILTER]} if filter_dict else VISIBLE_FILTER
             )
             
             # Eredmények formázása
-            documents = []
-            if results['ids'] and len(results['ids'][0]) > 0:
-                for i in range(len(results['ids'][0])):
+            batches = []
+            for q in range(len(query_embeddings)):
+                documents = []
+                ids = results['ids'][q] if results['ids'] else []
+                for i in range(len(ids)):
                     doc = {
-                        'id': results['ids'][0][i],
-                        'text': results['documents'][0][i],
-                        'metadata': results['metadatas'][0][i] if results['metadatas'] else {},
-                        'distance': results['distances'][0][i] if results['distances'] else None
+                        'id': ids[i],
+                        'text': results['documents'][q][i],
+                        'metadata': results['metadatas'][q][i] if results['metadatas'] else {},
+                        'distance': results['distances'][q][i] if results['distances'] else None
                     }
                     documents.append(doc)
+                batches.append(documents)
             
-            return documents
+            return batches
         
         except Exception as e:
             logger.error(f"Hiba a keresésnél: {e}")
             raise
     
+    def existing_ids(self, ids: List[str]) -> set:
+        """A megadott ID-k közül az adatbázisban már szereplők"""
+        if not ids:
+            return set()
+        result = self._collection.get(ids=list(ids), include=[])
+        return set(result.get('ids') or [])
+
+    def delete_where(self, filter_dict: Dict[str, Any]):
+        """Metaadat szűrőnek megfelelő dokumentumok törlése"""
+        try:
+            with self._write_lock:
+                self._collection.delete(where=filter_dict)
+                self._bump_generation()
+        except Exception as e:
+            logger.error(f"Hiba a dokumentumok törlésénél: {e}")
+            raise
+
     def delete_collection(self):
         """Collection törlése"""
         try:
-            self._client.delete_collection(name=self.collection_name)
-            logger.info(f"Collection törölve: {self.collection_name}")
-            self._init_db()  # Új collection létrehozása
+            with self._write_lock:
+                self._client.delete_collection(name=self.collection_name)
+                self._bump_generation()
+                logger.info(f"Collection törölve: {self.collection_name}")
+                self._init_db()  # Új collection létrehozása
         except Exception as e:
             logger.error(f"Hiba a collection törlésénél: {e}")
             raise
@@ -167,6 +320,7 @@ class VectorStore:
         Returns:
             Collection információk
         """
+        self._reopen_if_stale()
         try:
             count = self._collection.count()
             return {
@@ -182,3 +336,26 @@ class VectorStore:
                 'persist_directory': self.persist_directory
             }
 
+    def get_storage_info(self) -> Dict[str, Any]:
+        """
+        Vektor adatbázis méret információk
+
+        Returns:
+            disk_bytes: A persist könyvtár mérete a lemezen
+            vector_bytes: A vektorok becsült memóriaigénye (float32, HNSW index nélkül)
+        """
+        from ..monitoring.resources import directory_size_bytes
+
+        info = {'disk_bytes': directory_size_bytes(self.persist_directory), 'vector_bytes': None}
+        try:
+            count = self._collection.count()
+            if count:
+                sample = self._collection.get(limit=1, include=['embeddings'])
+                embeddings = sample.get('embeddings')
+                if embeddings is not None and len(embeddings) > 0:
+                    info['vector_bytes'] = count * len(embeddings[0]) * 4
+            else:
+                info['vector_bytes'] = 0
+        except Exception as e:
+            logger.debug(f"Vektor méret becslési hiba: {e}")
+        return info
@@ -16,7 +16,11 @@ import os
 import json
 import time
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+import weakref
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Any, Optional, Tuple
 from pathlib import Path
 from collections import OrderedDict
 from dotenv import load_dotenv
@@ -27,9 +31,17 @@ from .rag.embeddings import EmbeddingModel
 from .rag.vector_store import VectorStore
 from .rag.retrieval import RetrievalEngine
 from .rag.reranking import Reranker
+from .rag.result_cache import RetrievalResultCache
 from .llm.generator import LLMGenerator
 from .llm.streaming import StreamingGenerator
 from .monitoring.metrics import MetricsCollector
+from .monitoring.openmetrics import start_exporter
+from .monitoring.resources import ResourceMonitor, estimate_size_bytes
+from .utils.openai_client import get_openai_client, remote_call
+from .utils.rate_limiter import estimate_tokens
+from .utils.single_flight import SingleFlight, StreamSingleFlight, normalize_query, history_digest
+from .utils.pipeline import PipelineStage, StagedPipeline
+from .ingestion import IngestionCancelled, IngestionCheckpoints, file_content_hash
 
 load_dotenv()
 
@@ -40,7 +52,7 @@ logger = logging.getLogger(__name__)
 # P1: Translation cache with TTL + max size
 # ---------------------------------------------------------------------------
 class TranslationCache:
-    """LRU cache with TTL for query translations."""
+    """LRU cache with TTL for query translations (thread-safe)."""
 
     def __init__(self, max_size: int = 500, ttl_seconds: int = 3600):
         self._cache: OrderedDict[str, Tuple[str, float]] = OrderedDict()
@@ -48,31 +60,54 @@ class TranslationCache:
         self.ttl = ttl_seconds
         self.hits = 0
         self.misses = 0
+        self._lock = threading.Lock()
 
     def get(self, key: str) -> Optional[str]:
-        if key in self._cache:
-            value, ts = self._cache[key]
-            if time.time() - ts < self.ttl:
-                self._cache.move_to_end(key)
-                self.hits += 1
-                return value
-            else:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                value, ts = entry
+                if time.time() - ts < self.ttl:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    return value
                 del self._cache[key]
-        self.misses += 1
-        return None
+            self.misses += 1
+            return None
 
     def put(self, key: str, value: str):
-        if key in self._cache:
-            self._cache.move_to_end(key)
-        self._cache[key] = (value, time.time())
-        if len(self._cache) > self.max_size:
-            self._cache.popitem(last=False)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+            self._cache[key] = (value, time.time())
+            if len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
 
     @property
     def hit_rate(self) -> float:
         total = self.hits + self.misses
         return self.hits / total if total > 0 else 0.0
 
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            return estimate_size_bytes(self._cache)
+
+    def clear(self):
+        """Összes bejegyzés törlése (a hit/miss számlálók megmaradnak)"""
+        with self._lock:
+            self._cache.clear()
+
+    def shrink(self, fraction: float) -> int:
+        """A legrégebben használt bejegyzések adott hányadának törlése"""
+        with self._lock:
+            to_remove = int(len(self._cache) * fraction)
+            for _ in range(to_remove):
+                self._cache.popitem(last=False)
+            return to_remove
+
 
 # ---------------------------------------------------------------------------
 # P0: Robust language detection
@@ -138,6 +173,46 @@ ABSTAIN_MESSAGE = (
 )
 
 
+def checkpoints_path(persist_directory: str, collection_name: str) -> Path:
+    """Az ingestion checkpoint fájl helye (a vektor adatbázis mellett)"""
+    return Path(persist_directory) / f"{collection_name}.checkpoints.json"
+
+
+def create_shared_components() -> Dict[str, Any]:
+    """
+    Folyamat szinten megosztandó, fájlba író komponensek
+
+    A metrika gyűjtő (metrics.json, rollup-ok, oszlopos tároló állapota) és
+    az ingestion checkpoint tároló a teljes fájlt a saját memóriabeli
+    állapotából írja újra, ezért egy fájlhoz folyamatonként csak egy példány
+    tartozhat; az újraépített RAGSystem példányok ezeket kapják meg
+    (RAGSystem(**create_shared_components())).
+    """
+    return {
+        'metrics_collector': MetricsCollector(os.getenv('METRICS_FILE', './data/metrics.json')),
+        'ingestion_checkpoints': IngestionCheckpoints(
+            checkpoints_path(os.getenv('VECTOR_DB_PATH', './data/vector_db'), 'documents')
+        ),
+    }
+
+
+class _IngestFile:
+    """Egy fájl állapota az ingestion pipeline-ban (a lépcsők között átadva)"""
+
+    def __init__(self, path: str, content_hash: str):
+        self.path = path
+        self.name = Path(path).name
+        self.content_hash = content_hash
+        self.document: Optional[Dict[str, Any]] = None
+        self.total = 0
+        # Hiánytalanul kiírt chunkok száma; a sorrenden kívül kiírt batch-ek: kezdő index -> méret
+        self.committed = 0
+        self.written: Dict[int, int] = {}
+        self.resumed = False
+        self.completed = False
+        self.lock = threading.Lock()
+
+
 class RAGSystem:
     """Teljes RAG rendszer osztály"""
 
@@ -146,8 +221,20 @@ class RAGSystem:
         chunk_size: int = None,
         chunk_overlap: int = None,
         top_k: int = None,
-        use_reranking: bool = True
+        use_reranking: bool = True,
+        metrics_collector: Optional[MetricsCollector] = None,
+        ingestion_checkpoints: Optional[IngestionCheckpoints] = None
     ):
+        """
+        Args:
+            chunk_size: Chunk méret (alapértelmezett: CHUNK_SIZE)
+            chunk_overlap: Chunk átfedés (alapértelmezett: CHUNK_OVERLAP)
+            top_k: Visszaadott dokumentumok száma (alapértelmezett: TOP_K)
+            use_reranking: Cross-encoder reranking
+            metrics_collector: Folyamat szintű, megosztott metrika gyűjtő; None esetén
+                saját példány (egy fájlra csak egy collector írhat, lásd create_shared_components)
+            ingestion_checkpoints: Megosztott ingestion checkpoint tároló (None = saját)
+        """
         # Konfiguráció
         config = load_config()
 
@@ -170,6 +257,12 @@ class RAGSystem:
         )
         self.embedding_model = EmbeddingModel(use_openai=use_openai_embedding, model_name=embedding_model)
         self.vector_store = VectorStore()
+        # Fájlonkénti ingestion checkpointok a vektor adatbázis mellett
+        self.ingestion_checkpoints = ingestion_checkpoints or IngestionCheckpoints(
+            checkpoints_path(self.vector_store.persist_directory, self.vector_store.collection_name)
+        )
+        # Az utolsó add_documents pipeline lépcsőnkénti statisztikája
+        self.last_ingestion_stats: Optional[Dict[str, Any]] = None
 
         self.similarity_threshold = float(
             config.get('similarity_threshold')
@@ -183,9 +276,15 @@ class RAGSystem:
             similarity_threshold=self.similarity_threshold
         )
         self.reranker = Reranker(use_reranking=use_reranking)
+        # A kívülről kapott (megosztott) collector karbantartó szálát a tulajdonosa állítja le
+        self._owns_metrics_collector = metrics_collector is None
+        self.metrics_collector = metrics_collector or MetricsCollector(os.getenv('METRICS_FILE', './data/metrics.json'))
         self.llm_generator = LLMGenerator(use_openai=use_openai_llm, model_name=llm_model)
-        self.streaming_generator = StreamingGenerator(use_openai=use_openai_llm, model_name=llm_model)
-        self.metrics_collector = MetricsCollector()
+        self.streaming_generator = StreamingGenerator(
+            use_openai=use_openai_llm,
+            model_name=llm_model,
+            metrics_collector=self.metrics_collector
+        )
 
         # P1: Translation cache
         self._translation_cache = TranslationCache(
@@ -193,15 +292,87 @@ class RAGSystem:
             ttl_seconds=int(os.getenv('TRANSLATION_CACHE_TTL', 3600))
         )
 
+        # Retrieval eredmény cache (query -> rerankelt kontextus), korpusz verzióval invalidálva
+        self._retrieval_cache = RetrievalResultCache(
+            max_size=int(os.getenv('RETRIEVAL_CACHE_SIZE', 1000))
+        )
+
         # P1: Rate limit state for translation API
         self._translate_backoff = 0.0
         self._translate_last_error_time = 0.0
+        # A backoff állapotot párhuzamos kérések olvassák / írják
+        self._translate_state_lock = threading.Lock()
+
+        # Azonos, egyidejű kérések összevonása (fordítás, válasz, stream)
+        self._translation_flight = SingleFlight('translation')
+        self._answer_flight = SingleFlight('answer')
+        self._stream_flight = StreamSingleFlight('answer_stream')
 
         # Tesla System Prompt betöltése
         self.system_message = self._load_system_prompt()
 
+        # OpenMetrics gauge-ek + exporter (METRICS_EXPORTER_PORT esetén)
+        self._register_gauges()
+        start_exporter()
+
+        # Erőforrás telemetria (RSS, modellek, index, cache-ek) küszöb alapú zsugorítással
+        self.resource_monitor = self._init_resource_monitor()
+
         logger.info("RAG rendszer inicializálva")
 
+    def _register_gauges(self):
+        """
+        Scrape-kori gauge callback-ek regisztrálása.
+        Weakref-et használ, hogy a regiszter ne tartsa életben a rendszert.
+        """
+        registry = self.metrics_collector.registry
+        ref = weakref.ref(self)
+
+        def _gauge(fn):
+            def callback():
+                system = ref()
+                return fn(system) if system is not None else None
+            return callback
+
+        registry.gauge_callback(
+            'rag_vector_store_documents',
+            _gauge(lambda s: s.vector_store.get_collection_info().get('document_count', 0)),
+            help_text="Chunkok száma a vektor adatbázisban"
+        )
+
+    def _init_resource_monitor(self) -> ResourceMonitor:
+        """
+        Erőforrás monitor felépítése; a getter-ek weakref-en keresztül érik el
+        a komponenseket, így a monitor szála nem tartja életben a rendszert.
+        """
+        monitor = ResourceMonitor(registry=self.metrics_collector.registry)
+        ref = weakref.ref(self)
+
+        def _getter(fn):
+            def getter():
+                system = ref()
+                return fn(system) if system is not None else None
+            return getter
+
+        models = {
+            'embedding': lambda s: s.embedding_model._model,
+            'reranker': lambda s: s.reranker._model,
+            'llm': lambda s: s.llm_generator._pipeline,
+            'llm_streaming': lambda s: s.streaming_generator._pipeline,
+        }
+        for name, fn in models.items():
+            monitor.register_model(name, _getter(fn))
+
+        monitor.register_cache('translation', _getter(lambda s: s._translation_cache))
+        monitor.register_cache('retrieval', _getter(lambda s: s._retrieval_cache))
+        monitor.register_size('vector_store', _getter(lambda s: s.vector_store.get_storage_info()))
+        monitor.register_size('metrics', _getter(lambda s: {
+            'events': len(s.metrics_collector.metrics),
+            'memory_bytes': estimate_size_bytes(s.metrics_collector.metrics),
+        }))
+        monitor.start()
+        return monitor
+
     def _load_system_prompt(self) -> str:
         """Tesla System Prompt betöltése"""
         try:
@@ -232,36 +403,47 @@ class RAGSystem:
         """
         # Check cache first
         cached = self._translation_cache.get(query)
+        self.metrics_collector.record_cache_access('translation', cached is not None)
         if cached is not None:
             return cached
 
         # P1: Backoff check
-        if self._translate_backoff > 0:
-            elapsed = time.time() - self._translate_last_error_time
-            if elapsed < self._translate_backoff:
-                logger.warning(f"Translation API backoff active ({self._translate_backoff:.1f}s)")
-                return None
+        if self._translate_backoff_active():
+            return None
 
+        # Egyidejű azonos kérdések egyetlen fordítási hívást osztanak meg
+        return self._translation_flight.do(
+            normalize_query(query, casefold=False),
+            lambda: self._translate_remote(query)
+        )
+
+    def _translate_remote(self, query: str) -> Optional[str]:
+        """A tényleges fordítási API hívás (cache + backoff kezeléssel)"""
         t0 = time.time()
         try:
-            from openai import OpenAI
-            client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "You are a translation engine. Translate the user's text to English. "
-                            "Output ONLY the English translation, nothing else. "
-                            "Do not explain, do not add notes."
-                        )
-                    },
-                    {"role": "user", "content": query}
-                ],
-                temperature=0,  # P0: Deterministic
-                max_tokens=150
+            client = get_openai_client('translation')
+            messages = [
+                {
+                    "role": "system",
+                    "content": (
+                        "You are a translation engine. Translate the user's text to English. "
+                        "Output ONLY the English translation, nothing else. "
+                        "Do not explain, do not add notes."
+                    )
+                },
+                {"role": "user", "content": query}
+            ]
+
+            response = remote_call(
+                'translation',
+                lambda: client.chat.completions.create(
+                    model="gpt-3.5-turbo",
+                    messages=messages,
+                    temperature=0,  # P0: Deterministic
+                    max_tokens=150
+                ),
+                estimated_tokens=estimate_tokens(messages, max_tokens=150),
+                hedge=True
             )
 
             translated = response.choices[0].message.content.strip()
@@ -270,10 +452,11 @@ class RAGSystem:
             self._translation_cache.put(query, translated)
 
             # Reset backoff on success
-            self._translate_backoff = 0.0
+            self._translate_succeeded()
 
             # P1: Observability
             translate_latency = time.time() - t0
+            self.metrics_collector.record_stage_latency('translation', translate_latency)
             self.metrics_collector.record_pipeline_event(
                 event_type='translation',
                 data={
@@ -288,11 +471,108 @@ class RAGSystem:
             return translated
 
         except Exception as e:
-            # P1: Exponential backoff (1s, 2s, 4s, 8s, max 30s)
+            backoff = self._translate_failed()
+            logger.warning(f"Fordítási hiba (backoff={backoff:.1f}s): {e}")
+            return None
+
+    def _translate_backoff_active(self) -> bool:
+        """Igaz, ha egy korábbi fordítási hiba utáni backoff még tart"""
+        with self._translate_state_lock:
+            backoff = self._translate_backoff
+            active = backoff > 0 and time.time() - self._translate_last_error_time < backoff
+        if active:
+            logger.warning(f"Translation API backoff active ({backoff:.1f}s)")
+        return active
+
+    def _translate_succeeded(self):
+        with self._translate_state_lock:
+            self._translate_backoff = 0.0
+
+    def _translate_failed(self) -> float:
+        """P1: Exponential backoff (1s, 2s, 4s, 8s, max 30s); az új backoff értéke"""
+        with self._translate_state_lock:
             self._translate_backoff = min(max(self._translate_backoff * 2, 1.0), 30.0)
             self._translate_last_error_time = time.time()
-            logger.warning(f"Fordítási hiba (backoff={self._translate_backoff:.1f}s): {e}")
-            return None
+            return self._translate_backoff
+
+    def _translate_batch(self, queries: List[str]) -> Dict[str, Optional[str]]:
+        """
+        Több query fordítása: cache találatok helyben, a hiányzók
+        TRANSLATION_BATCH_SIZE-os csoportokban egy-egy API hívással.
+        A batch válaszból hiányzó elemek egyenként fordítódnak.
+
+        Returns:
+            {query: fordítás vagy None (sikertelen fordítás)}
+        """
+        translations: Dict[str, Optional[str]] = {}
+        pending = []
+        for query in dict.fromkeys(queries):
+            cached = self._translation_cache.get(query)
+            self.metrics_collector.record_cache_access('translation', cached is not None)
+            if cached is not None:
+                translations[query] = cached
+            else:
+                pending.append(query)
+
+        batch_size = int(os.getenv('TRANSLATION_BATCH_SIZE', 20))
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            if self._translate_backoff_active():
+                break
+            translated = self._translate_remote_batch(chunk)
+            for query in chunk:
+                translations[query] = translated.get(query) or self._translate_to_english(query)
+        return translations
+
+    def _translate_remote_batch(self, queries: List[str]) -> Dict[str, str]:
+        """Több query fordítása egyetlen (JSON) API hívással; hiba esetén üres dict + backoff"""
+        t0 = time.time()
+        try:
+            client = get_openai_client('translation')
+            numbered = "\n".join(f"[{i}] {' '.join(query.split())}" for i, query in enumerate(queries))
+            messages = [
+                {
+                    "role": "system",
+                    "content": (
+                        "You are a translation engine. Translate each numbered user text to English. "
+                        'Respond with a JSON object: {"translations": [{"id": <number>, "text": "<English>"}]}. '
+                        "Do not explain, do not add notes."
+                    )
+                },
+                {"role": "user", "content": numbered}
+            ]
+            max_tokens = 150 * len(queries)
+
+            response = remote_call(
+                'translation',
+                lambda: client.chat.completions.create(
+                    model="gpt-3.5-turbo",
+                    messages=messages,
+                    temperature=0,  # P0: Deterministic
+                    max_tokens=max_tokens,
+                    response_format={"type": "json_object"}
+                ),
+                estimated_tokens=estimate_tokens(messages, max_tokens=max_tokens)
+            )
+
+            items = json.loads(response.choices[0].message.content).get('translations', [])
+            translations = {}
+            for item in items:
+                index = int(item.get('id', -1))
+                text = (item.get('text') or '').strip()
+                if 0 <= index < len(queries) and text:
+                    translations[queries[index]] = text
+                    self._translation_cache.put(queries[index], text)
+
+            self._translate_succeeded()
+            self.metrics_collector.record_stage_latency('translation_batch', time.time() - t0)
+            logger.info(f"Batch fordítás: {len(translations)}/{len(queries)} query ({time.time() - t0:.2f}s)")
+            return translations
+
+        except Exception as e:
+            backoff = self._translate_failed()
+            logger.warning(f"Batch fordítási hiba (backoff={backoff:.1f}s): {e}")
+            return {}
 
     # ------------------------------------------------------------------
     # Pipeline 6: Dual-query retrieval
@@ -318,21 +598,52 @@ class RAGSystem:
         if translated_query and translated_query.lower() != original_query.lower():
             results_trans = self.retrieval_engine.retrieve(translated_query, top_k=top_k * 2)
 
-        # Union + dedupe by chunk id (keep highest similarity)
+        merged = self._merge_retrieved(results_orig, results_trans)
+
+        logger.info(
+            f"Dual-retrieve: {len(results_orig)} orig + {len(results_trans)} trans "
+            f"-> {len(merged)} merged"
+        )
+
+        return merged
+
+    @staticmethod
+    def _merge_retrieved(
+        results_orig: List[Dict[str, Any]],
+        results_trans: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Union + dedupe by chunk id (keep highest similarity), sorted by similarity desc"""
         seen: Dict[str, Dict[str, Any]] = {}
         for r in results_orig + results_trans:
             chunk_id = r.get('id', '')
             if chunk_id not in seen or r.get('similarity', 0) > seen[chunk_id].get('similarity', 0):
                 seen[chunk_id] = r
 
-        # Sort by similarity descending
-        merged = sorted(seen.values(), key=lambda x: x.get('similarity', 0), reverse=True)
-
-        logger.info(
-            f"Dual-retrieve: {len(results_orig)} orig + {len(results_trans)} trans "
-            f"-> {len(merged)} merged"
-        )
+        return sorted(seen.values(), key=lambda x: x.get('similarity', 0), reverse=True)
 
+    def _dual_retrieve_batch(
+        self,
+        original_queries: List[str],
+        translated_queries: List[Optional[str]],
+        top_k: int
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        _dual_retrieve a teljes batch-re: az eredeti és a fordított query-k
+        egyetlen embedding + keresés hívásban mennek a retrieval engine-hez.
+        """
+        use_translated = [
+            bool(translated) and translated.lower() != original.lower()
+            for original, translated in zip(original_queries, translated_queries)
+        ]
+        retrieval_queries = list(original_queries) + [
+            translated for translated, use in zip(translated_queries, use_translated) if use
+        ]
+        results = self.retrieval_engine.retrieve_batch(retrieval_queries, top_k=top_k * 2)
+
+        merged = []
+        trans_results = iter(results[len(original_queries):])
+        for results_orig, use in zip(results, use_translated):
+            merged.append(self._merge_retrieved(results_orig, next(trans_results) if use else []))
         return merged
 
     # ------------------------------------------------------------------
@@ -348,37 +659,208 @@ class RAGSystem:
     # ------------------------------------------------------------------
     # Document management
     # ------------------------------------------------------------------
-    def add_documents(self, file_paths: List[str]):
-        """Dokumentumok hozzáadása a rendszerhez"""
-        documents = self.document_processor.process_multiple_files(file_paths)
-        if not documents:
+    def add_documents(
+        self,
+        file_paths: List[str],
+        progress_callback: Optional[Callable[[str, int], None]] = None,
+        cancel_event: Optional[threading.Event] = None
+    ) -> int:
+        """
+        Dokumentumok hozzáadása a rendszerhez, lépcsőzetes pipeline-on
+
+        A parse -> chunk -> embed -> írás lépcsők korlátos sorokon keresztül,
+        átfedésben futnak (lépcsőnként INGEST_<LÉPCSŐ>_WORKERS szállal), így
+        pl. a következő fájl parse-olása és a már kész chunkok embeddelése
+        egyszerre halad. A chunkok INGEST_EMBED_BATCH_SIZE-os batch-ekben
+        embeddelődnek és íródnak ki; a fájl checkpointja (tartalom hash +
+        hiánytalanul kiírt chunkok száma) minden írás után frissül. A kiírt
+        chunkok a fájl utolsó batch-éig rejtettek (pending), a keresés a
+        korábbi korpuszon fut; a kész fájl chunkjai egyszerre, egy korpusz
+        verzió növeléssel válnak kereshetővé. A chunk ID-k determinisztikusak
+        ({hash}_{index}), így egy megszakadt vagy újra feltöltött fájl
+        feldolgozása az utolsó kiírt chunk után folytatódik, a már teljesen
+        feldolgozott fájl kimarad.
+
+        Args:
+            file_paths: Fájl elérési utak
+            progress_callback: fn(számláló, növekmény), több szálról hívva; számlálók:
+                pages_parsed, chunks_total, chunks_embedded, chunks_written (opcionális)
+            cancel_event: Beállítása esetén a feldolgozás a következő elem előtt
+                IngestionCancelled kivétellel leáll; a már kiírt batch-ek
+                rejtve megmaradnak, és a következő futás onnan folytatja (opcionális)
+
+        Returns:
+            A fájlok indexben lévő chunkjainak száma (a korábban már kiírtakkal együtt)
+        """
+        def report(counter: str, amount: int):
+            if progress_callback is not None and amount:
+                progress_callback(counter, amount)
+
+        def check_cancel():
+            if cancel_event is not None and cancel_event.is_set():
+                raise IngestionCancelled("A dokumentum feldolgozás megszakítva")
+
+        params = {
+            'chunk_size': self.chunk_size,
+            'chunk_overlap': self.chunk_overlap,
+            'embedding_model': self.embedding_model.model_name,
+        }
+        batch_size = max(1, int(os.getenv('INGEST_EMBED_BATCH_SIZE', 64)))
+        files: Dict[str, _IngestFile] = {}
+        files_lock = threading.Lock()
+
+        def parse(file_path: str) -> Optional[_IngestFile]:
+            check_cancel()
+            try:
+                content_hash = file_content_hash(file_path)
+                with files_lock:
+                    # Azonos tartalmú fájl egy futáson belül csak egyszer
+                    if content_hash in files:
+                        return None
+                    task = files[content_hash] = _IngestFile(file_path, content_hash)
+                checkpoint = self._valid_checkpoint(content_hash, params)
+                if checkpoint and checkpoint.get('completed'):
+                    logger.info(f"{task.name} már az indexben van ({checkpoint['chunks_total']} chunk), kihagyva")
+                    task.total = task.committed = checkpoint['chunks_total']
+                    task.completed = True
+                    return None
+                task.committed = checkpoint['committed'] if checkpoint else 0
+                task.resumed = checkpoint is not None
+                task.document = self.document_processor.process_file(file_path)
+            except Exception as e:
+                logger.error(f"Hiba a {file_path} feldolgozásánál: {e}")
+                return None
+            report('pages_parsed', task.document['metadata'].get('num_pages', 1))
+            return task
+
+        def chunk(task: _IngestFile) -> List[Tuple[_IngestFile, int, List[Dict[str, Any]]]]:
+            check_cancel()
+            chunks = self.chunking.chunk_document(task.document)
+            task.document = None
+            if not chunks:
+                logger.warning(f"Nincs chunk generálva: {task.path}")
+                return []
+            task.total = len(chunks)
+            report('chunks_total', task.total)
+            if task.committed:
+                logger.info(f"{task.name}: folytatás a checkpointból ({task.committed}/{task.total} chunk kész)")
+                report('chunks_embedded', task.committed)
+                report('chunks_written', task.committed)
+            self.ingestion_checkpoints.update(
+                task.content_hash,
+                file_name=task.name,
+                params=params,
+                chunks_total=task.total,
+                committed=task.committed,
+                completed=False
+            )
+            if task.committed >= task.total:
+                self._commit_ingested(task, 0, 0)
+                return []
+            return [
+                (task, start, chunks[start:start + batch_size])
+                for start in range(task.committed, task.total, batch_size)
+            ]
+
+        def embed(batch):
+            check_cancel()
+            task, start, chunks = batch
+            ids = [f"{task.content_hash}_{start + i}" for i in range(len(chunks))]
+            # Folytatásnál a checkpoint mentése előtt már kiírt chunkok nem embeddelődnek újra
+            existing = self.vector_store.existing_ids(ids) if task.resumed else set()
+            pending = [(chunk_id, chunk) for chunk_id, chunk in zip(ids, chunks) if chunk_id not in existing]
+            embeddings = self.embedding_model.embed_texts([chunk['text'] for _, chunk in pending]) if pending else []
+            report('chunks_embedded', len(chunks))
+            return task, start, len(chunks), pending, embeddings
+
+        def write(batch):
+            task, start, size, pending, embeddings = batch
+            if pending:
+                metadatas = []
+                for chunk_id, chunk in pending:
+                    metadata = chunk.get('metadata', {}).copy()
+                    metadata['chunk_index'] = chunk.get('chunk_index', int(chunk_id.rsplit('_', 1)[1]))
+                    metadata['content_hash'] = task.content_hash
+                    metadatas.append(metadata)
+                self.vector_store.add_documents(
+                    texts=[chunk['text'] for _, chunk in pending],
+                    embeddings=embeddings,
+                    metadatas=metadatas,
+                    ids=[chunk_id for chunk_id, _ in pending],
+                    upsert=True,
+                    pending=True
+                )
+            report('chunks_written', size)
+            self._commit_ingested(task, start, size)
+
+        pipeline = StagedPipeline(
+            'ingestion',
+            [
+                PipelineStage('parse', parse, workers=int(os.getenv('INGEST_PARSE_WORKERS', 2))),
+                PipelineStage('chunk', chunk, workers=int(os.getenv('INGEST_CHUNK_WORKERS', 1)), fan_out=True),
+                PipelineStage('embed', embed, workers=int(os.getenv('INGEST_EMBED_WORKERS', 1))),
+                PipelineStage('write', write, workers=int(os.getenv('INGEST_WRITE_WORKERS', 1))),
+            ],
+            queue_size=int(os.getenv('INGEST_QUEUE_SIZE', 8))
+        )
+        stats = pipeline.run(file_paths)
+        self.last_ingestion_stats = stats
+        logger.info(
+            f"Ingestion pipeline: {stats['wall_sec']:.2f}s, szűk keresztmetszet: {stats['bottleneck']} "
+            + ", ".join(
+                f"{name}={stage['items_in']} elem/{stage['utilization']:.0%}"
+                for name, stage in stats['stages'].items()
+            )
+        )
+
+        total_chunks = sum(task.total for task in files.values() if task.completed)
+        if not total_chunks:
             logger.warning("Nincs feldolgozható dokumentum")
-            return
+        return total_chunks
 
-        chunks = self.chunking.chunk_documents(documents)
-        if not chunks:
-            logger.warning("Nincs chunk generálva")
-            return
+    def _commit_ingested(self, task: "_IngestFile", start: int, size: int):
+        """
+        Egy kiírt batch rögzítése a fájl checkpointjában
 
-        texts = [chunk['text'] for chunk in chunks]
-        embeddings = self.embedding_model.embed_texts(texts)
-
-        metadatas = []
-        ids = []
-        for i, chunk in enumerate(chunks):
-            metadata = chunk.get('metadata', {}).copy()
-            metadata['chunk_index'] = chunk.get('chunk_index', i)
-            metadatas.append(metadata)
-            ids.append(f"chunk_{i}")
-
-        self.vector_store.add_documents(
-            texts=texts,
-            embeddings=embeddings,
-            metadatas=metadatas,
-            ids=ids
-        )
+        Párhuzamos embed / írás worker-ek mellett a batch-ek sorrendje
+        felcserélődhet; a checkpoint csak a hiánytalanul kiírt előtagig lép előre.
+        """
+        with task.lock:
+            if size:
+                task.written[start] = size
+            while task.committed in task.written:
+                task.committed += task.written.pop(task.committed)
+            if not task.completed and task.committed >= task.total:
+                # A fájl összes chunkja egyszerre válik kereshetővé (a checkpoint előtt,
+                # hogy egy közbeni leállás után a következő futás újra publikáljon)
+                self.vector_store.publish({'content_hash': task.content_hash})
+            task.completed = task.committed >= task.total
+            self.ingestion_checkpoints.update(
+                task.content_hash, committed=task.committed, completed=task.completed
+            )
+        if task.completed:
+            logger.info(f"{task.name}: {task.total} chunk az indexben")
 
-        logger.info(f"{len(chunks)} chunk hozzáadva a rendszerhez")
+    def _valid_checkpoint(self, content_hash: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        A fájl checkpointja, ha még érvényes: azonos chunking / embedding
+        beállítások, és az utolsó kiírt chunk ténylegesen az indexben van
+        (pl. egy collection törlés után nincs). Eltérő beállításoknál a fájl
+        korábbi chunkjai törlődnek, és a feldolgozás elölről indul.
+        """
+        checkpoint = self.ingestion_checkpoints.get(content_hash)
+        if not checkpoint:
+            return None
+        if checkpoint.get('params') != params:
+            logger.info(f"{checkpoint.get('file_name')}: megváltozott chunking / embedding beállítás, újrafeldolgozás")
+            self.vector_store.delete_where({'content_hash': content_hash})
+            self.ingestion_checkpoints.remove(content_hash)
+            return None
+        committed = checkpoint.get('committed', 0)
+        if committed and not self.vector_store.existing_ids([f"{content_hash}_{committed - 1}"]):
+            self.ingestion_checkpoints.remove(content_hash)
+            return None
+        return checkpoint
 
     # ------------------------------------------------------------------
     # Main query pipeline
@@ -407,9 +889,122 @@ class RAGSystem:
             top_k: Visszaadott dokumentumok száma
             conversation_history: Korábbi üzenetek [{'role': 'user'|'assistant', 'content': str}]
         """
+        # Single-flight: azonos (normalizált) kérdés + előzmény + korpusz verzió
+        # esetén az egyidejű kérések egy pipeline futást osztanak meg
+        flight_key = (
+            normalize_query(query),
+            history_digest(conversation_history),
+            self.vector_store.generation,
+            top_k or self.top_k,
+        )
+
+        def run():
+            return self._run_query(query, stream, top_k, conversation_history)
+
+        if stream:
+            # A followerek a leader token streamjére csatlakoznak
+            result = self._stream_flight.do(flight_key, run)
+        else:
+            result = dict(self._answer_flight.do(flight_key, run))
+        # Hívásonként egy query event: a retrieval cache találat és a
+        # single-flight follower is beleszámít a query volumenbe
+        self.metrics_collector.record_retrieval(
+            query, len(result.get('context') or []), result.get('metadata', {}).get('retrieval_time', 0.0)
+        )
+        return result
+
+    def _run_query(
+        self,
+        query: str,
+        stream: bool,
+        top_k: Optional[int],
+        conversation_history: Optional[list]
+    ) -> Dict[str, Any]:
+        """A query pipeline egy tényleges futása (lásd query)"""
         start_time = time.time()
         effective_top_k = top_k or self.top_k
 
+        # Retrieval eredmény cache: azonos kérdés változatlan korpuszon -> kész kontextus
+        generation = self.vector_store.generation
+        cache_key = self._retrieval_cache_key(query, effective_top_k)
+        cached = self._retrieval_cache.get(cache_key, generation)
+        self.metrics_collector.record_cache_access('retrieval', cached is not None)
+        if cached is not None:
+            user_lang = cached['user_lang']
+            translated_query = cached['translated_query']
+            reranked = cached['context']
+            retrieval_time = time.time() - start_time
+            self.metrics_collector.record_stage_latency('retrieval', retrieval_time)
+        else:
+            user_lang, translated_query, reranked, retrieval_time = self._retrieve_context(
+                query, effective_top_k, start_time
+            )
+            self._cache_context(cache_key, generation, user_lang, translated_query, reranked)
+
+        # 5. Abstain check
+        if self._should_abstain(reranked):
+            return self._abstain_result(query, reranked, retrieval_time, start_time, user_lang)
+
+        # 6. LLM generation - ORIGINAL query (answer in user's language)
+        if stream:
+            return {
+                'query': query,
+                'context': reranked,
+                'stream': True,
+                'generator': self.streaming_generator.generate_stream(
+                    query, reranked, system_message=self.system_message,
+                    conversation_history=conversation_history
+                ),
+                'metadata': {
+                    'retrieval_time': retrieval_time,
+                    'user_lang': user_lang,
+                    'translated_query': translated_query,
+                    'reranked_count': len(reranked),
+                    'abstained': False
+                }
+            }
+        return self._generate_result(
+            query, reranked, conversation_history, retrieval_time, start_time, user_lang, translated_query
+        )
+
+    def _retrieval_cache_key(self, query: str, top_k: int) -> tuple:
+        """Retrieval cache kulcs (a korpusz verziót a cache külön kezeli)"""
+        return (
+            normalize_query(query),
+            top_k,
+            self.retrieval_engine.similarity_threshold,
+            self.reranker.use_reranking,
+        )
+
+    def _cache_context(
+        self,
+        cache_key: tuple,
+        generation: int,
+        user_lang: str,
+        translated_query: Optional[str],
+        context: List[Dict[str, Any]]
+    ):
+        """Kontextus cache-elése; sikertelen fordítás (degradált retrieval) nem kerül be"""
+        if user_lang != 'en' and translated_query is None:
+            return
+        self._retrieval_cache.put(cache_key, generation, {
+            'user_lang': user_lang,
+            'translated_query': translated_query,
+            'context': context,
+        })
+
+    def _retrieve_context(
+        self,
+        query: str,
+        effective_top_k: int,
+        start_time: float
+    ) -> Tuple[str, Optional[str], List[Dict[str, Any]], float]:
+        """
+        Pipeline 1-4. lépés: nyelvfelismerés, fordítás, dual retrieval, rerank
+
+        Returns:
+            (user_lang, translated_query, rerankelt kontextus, retrieval_time)
+        """
         # 1. Detect language
         user_lang = self._detect_language(query)
         translated_query = None
@@ -424,7 +1019,7 @@ class RAGSystem:
         retrieval_time = time.time() - start_time
 
         # P1: Observability
-        self.metrics_collector.record_retrieval(query, len(all_retrieved), retrieval_time)
+        self.metrics_collector.record_stage_latency('retrieval', retrieval_time)
         self.metrics_collector.record_pipeline_event(
             event_type='retrieval_detail',
             data={
@@ -440,76 +1035,218 @@ class RAGSystem:
         # 4. Rerank with English query
         rerank_query = translated_query or query
         if self.reranker.use_reranking and all_retrieved:
+            rerank_start = time.time()
             reranked = self.reranker.rerank(rerank_query, all_retrieved, top_k=effective_top_k)
-            # Fallback if reranker gives very negative scores
-            if reranked and reranked[0].get('rerank_score', 0) < -5:
-                logger.warning("Reranking negative scores, falling back to similarity order")
-                reranked = all_retrieved[:effective_top_k]
+            self.metrics_collector.record_stage_latency('rerank', time.time() - rerank_start)
+            reranked = self._rerank_fallback(reranked, all_retrieved, effective_top_k)
         else:
             reranked = all_retrieved[:effective_top_k]
 
-        # 5. Abstain check
-        if self._should_abstain(reranked):
-            logger.info(f"Abstain: no relevant evidence for '{query[:40]}'")
-            return {
-                'query': query,
-                'answer': ABSTAIN_MESSAGE,
-                'context': reranked,
-                'metadata': {
-                    'retrieval_time': retrieval_time,
-                    'response_time': 0,
-                    'total_time': time.time() - start_time,
-                    'abstained': True,
-                    'user_lang': user_lang
-                }
-            }
+        return user_lang, translated_query, reranked, retrieval_time
 
-        # 6. LLM generation - ORIGINAL query (answer in user's language)
-        if stream:
-            return {
-                'query': query,
-                'context': reranked,
-                'stream': True,
-                'generator': self.streaming_generator.generate_stream(
-                    query, reranked, system_message=self.system_message,
-                    conversation_history=conversation_history
-                )
+    def _rerank_fallback(
+        self,
+        reranked: List[Dict[str, Any]],
+        all_retrieved: List[Dict[str, Any]],
+        top_k: int
+    ) -> List[Dict[str, Any]]:
+        """Fallback if reranker gives very negative scores"""
+        if reranked and reranked[0].get('rerank_score', 0) < -5:
+            logger.warning("Reranking negative scores, falling back to similarity order")
+            return all_retrieved[:top_k]
+        return reranked
+
+    def _abstain_result(
+        self,
+        query: str,
+        context: List[Dict[str, Any]],
+        retrieval_time: float,
+        start_time: float,
+        user_lang: str
+    ) -> Dict[str, Any]:
+        """Abstain válasz (nincs releváns forrás)"""
+        logger.info(f"Abstain: no relevant evidence for '{query[:40]}'")
+        self.metrics_collector.record_stage_latency('total', time.time() - start_time)
+        return {
+            'query': query,
+            'answer': ABSTAIN_MESSAGE,
+            'context': context,
+            'metadata': {
+                'retrieval_time': retrieval_time,
+                'response_time': 0,
+                'total_time': time.time() - start_time,
+                'abstained': True,
+                'user_lang': user_lang
             }
-        else:
-            response_start = time.time()
-            answer = self.llm_generator.generate(query, reranked, system_message=self.system_message, conversation_history=conversation_history)
-            response_time = time.time() - response_start
-
-            # Token estimation & cost
-            estimated_tokens = len(answer.split()) * 1.3
-            cost = self.metrics_collector.calculate_cost(
-                self.llm_generator.model_name,
-                int(estimated_tokens * 0.7),
-                int(estimated_tokens * 0.3)
-            )
+        }
 
-            self.metrics_collector.record_llm_call(
-                prompt_tokens=int(estimated_tokens * 0.7),
-                completion_tokens=int(estimated_tokens * 0.3),
-                model=self.llm_generator.model_name,
-                total_time=response_time,
-                cost=cost
-            )
+    def _generate_result(
+        self,
+        query: str,
+        context: List[Dict[str, Any]],
+        conversation_history: Optional[list],
+        retrieval_time: float,
+        start_time: float,
+        user_lang: str,
+        translated_query: Optional[str]
+    ) -> Dict[str, Any]:
+        """Blokkoló LLM generálás + metrikák, a query() nem streaming válasza"""
+        response_start = time.time()
+        answer = self.llm_generator.generate(query, context, system_message=self.system_message, conversation_history=conversation_history)
+        response_time = time.time() - response_start
+        self.metrics_collector.record_stage_latency('generation', response_time)
+        self.metrics_collector.record_stage_latency('total', time.time() - start_time)
+
+        # Token estimation & cost
+        estimated_tokens = len(answer.split()) * 1.3
+        cost = self.metrics_collector.calculate_cost(
+            self.llm_generator.model_name,
+            int(estimated_tokens * 0.7),
+            int(estimated_tokens * 0.3)
+        )
 
-            return {
-                'query': query,
-                'answer': answer,
-                'context': reranked,
-                'metadata': {
-                    'retrieval_time': retrieval_time,
-                    'response_time': response_time,
-                    'total_time': time.time() - start_time,
-                    'user_lang': user_lang,
-                    'translated_query': translated_query,
-                    'reranked_count': len(reranked),
-                    'abstained': False
-                }
+        self.metrics_collector.record_llm_call(
+            prompt_tokens=int(estimated_tokens * 0.7),
+            completion_tokens=int(estimated_tokens * 0.3),
+            model=self.llm_generator.model_name,
+            total_time=response_time,
+            cost=cost
+        )
+
+        return {
+            'query': query,
+            'answer': answer,
+            'context': context,
+            'metadata': {
+                'retrieval_time': retrieval_time,
+                'response_time': response_time,
+                'total_time': time.time() - start_time,
+                'user_lang': user_lang,
+                'translated_query': translated_query,
+                'reranked_count': len(context),
+                'abstained': False
             }
+        }
+
+    # ------------------------------------------------------------------
+    # Batch Q&A
+    # ------------------------------------------------------------------
+    def query_batch(
+        self,
+        queries: List[str],
+        top_k: Optional[int] = None,
+        max_workers: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Több kérdés megválaszolása egyben (offline tömeges feldolgozás).
+
+        A nyelvfelismerés, a fordítás, a query embedding + keresés és a
+        reranking a teljes batch-re egyben fut; a generálás max_workers
+        szálon, korlátozott párhuzamossággal. Előzmény és streaming nincs.
+
+        Args:
+            queries: Kérdések
+            top_k: Visszaadott dokumentumok száma
+            max_workers: Párhuzamos generálások száma (alapértelmezett: BATCH_QA_WORKERS)
+
+        Returns:
+            Kérdésenként a query() (nem streaming) formátumú eredmény, a bemenet
+            sorrendjében; sikertelen generálásnál 'error' kulccsal
+        """
+        if not queries:
+            return []
+        start_time = time.time()
+        effective_top_k = top_k or self.top_k
+        max_workers = max(1, max_workers or int(os.getenv('BATCH_QA_WORKERS', 4)))
+
+        # Retrieval cache: a változatlan korpuszon már látott kérdések kontextusa kész
+        generation = self.vector_store.generation
+        unique = list(dict.fromkeys(queries))
+        prepared: Dict[str, Dict[str, Any]] = {}
+        for query in unique:
+            cached = self._retrieval_cache.get(self._retrieval_cache_key(query, effective_top_k), generation)
+            self.metrics_collector.record_cache_access('retrieval', cached is not None)
+            if cached is not None:
+                prepared[query] = cached
+        missing = [query for query in unique if query not in prepared]
+
+        if missing:
+            # 1-2. Nyelvfelismerés és fordítás (ismétlődő kérdések egyszer)
+            user_langs = [self._detect_language(query) for query in missing]
+            translations = self._translate_batch([q for q, lang in zip(missing, user_langs) if lang != 'en'])
+            translated_queries = [
+                translations.get(query) if lang != 'en' else None
+                for query, lang in zip(missing, user_langs)
+            ]
+
+            # 3. Dual-query retrieval: egy embedding és egy keresés hívás a teljes batch-re
+            retrieval_start = time.time()
+            all_retrieved = self._dual_retrieve_batch(missing, translated_queries, effective_top_k)
+            self.metrics_collector.record_stage_latency('retrieval_batch', time.time() - retrieval_start)
+
+            # 4. Rerank: egy modell hívás a teljes batch-re
+            if self.reranker.use_reranking:
+                rerank_start = time.time()
+                reranked_lists = self.reranker.rerank_batch(
+                    [translated or query for query, translated in zip(missing, translated_queries)],
+                    all_retrieved,
+                    top_k=effective_top_k
+                )
+                self.metrics_collector.record_stage_latency('rerank_batch', time.time() - rerank_start)
+                reranked_lists = [
+                    self._rerank_fallback(reranked, retrieved, effective_top_k)
+                    for reranked, retrieved in zip(reranked_lists, all_retrieved)
+                ]
+            else:
+                reranked_lists = [retrieved[:effective_top_k] for retrieved in all_retrieved]
+
+            for query, lang, translated, context in zip(missing, user_langs, translated_queries, reranked_lists):
+                prepared[query] = {'user_lang': lang, 'translated_query': translated, 'context': context}
+                self._cache_context(
+                    self._retrieval_cache_key(query, effective_top_k), generation, lang, translated, context
+                )
+
+        retrieval_time = time.time() - start_time
+        logger.info(
+            f"Batch előkészítés: {len(queries)} kérdés, {len(unique)} egyedi, "
+            f"{len(unique) - len(missing)} cache találat, {retrieval_time:.2f}s"
+        )
+
+        # 5-6. Abstain vagy generálás, korlátozott párhuzamossággal
+        def answer(index: int) -> Dict[str, Any]:
+            query = queries[index]
+            item = prepared[query]
+            # Ismétlődő kérdések saját másolatot kapnak a kontextusból
+            context = [dict(doc) for doc in item['context']]
+            try:
+                if self._should_abstain(context):
+                    return self._abstain_result(query, context, retrieval_time, start_time, item['user_lang'])
+                return self._generate_result(
+                    query, context, None, retrieval_time, start_time,
+                    item['user_lang'], item['translated_query']
+                )
+            except Exception as e:
+                logger.error(f"Batch generálási hiba ('{query[:40]}'): {e}")
+                return {'query': query, 'answer': None, 'context': context, 'error': str(e)}
+
+        if max_workers == 1:
+            return [answer(i) for i in range(len(queries))]
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch-qa") as executor:
+            # A hívó kontextusa (pl. batch rate limit prioritás) minden szálon érvényes
+            futures = [executor.submit(contextvars.copy_context().run, answer, i) for i in range(len(queries))]
+            return [future.result() for future in futures]
+
+    def clear_caches(self):
+        """Válasz cache-ek ürítése (pl. cold cache latency méréshez)"""
+        self._translation_cache.clear()
+        self._retrieval_cache.clear()
+        logger.info("RAG cache-ek ürítve")
+
+    def close(self):
+        """Háttérszálak leállítása (pl. a megosztott példány reload utáni lecserélésekor)"""
+        self.resource_monitor.stop()
+        if self._owns_metrics_collector:
+            self.metrics_collector.stop_maintenance()
 
     def get_stats(self) -> Dict[str, Any]:
         """Rendszer statisztikák"""
@@ -523,5 +1260,14 @@ class RAGSystem:
                 'hit_rate': self._translation_cache.hit_rate,
                 'size': len(self._translation_cache._cache),
                 'max_size': self._translation_cache.max_size
-            }
+            },
+            'retrieval_cache': {
+                'hit_rate': self._retrieval_cache.hit_rate,
+                'size': len(self._retrieval_cache),
+                'max_size': self._retrieval_cache.max_size,
+                'invalidations': self._retrieval_cache.invalidations,
+                'generation': self.vector_store.generation
+            },
+            'resources': self.resource_monitor.get_stats(),
+            'ingestion_pipeline': self.last_ingestion_stats
         }
@@ -0,0 +1,213 @@
+"""
+Folyamat szintű, megosztott RAG kiszolgáló mag
+Egy RAGSystem példány (embedding modell, reranker, LLM-ek, Chroma kliens,
+metrikák) folyamatonként egyszer töltődik be, és a felhasználói session-ök
+csak "bérlik" (lease) egy-egy kérés idejére. A session-ök saját állapota
+(chat history, kapcsolók) a hívónál marad.
+
+A reload() új példányt épít (pl. konfiguráció változás után), majd
+atomikusan lecseréli az aktuálisat. A régi példányon még futó kérések
+(pl. félig olvasott stream) zavartalanul befejeződnek; a régi példány az
+utolsó lease visszaadásakor áll le.
+
+A fájlba író, folyamat szintű komponensek (metrika gyűjtő, ingestion
+checkpointok) nem épülnek újra: a szolgáltatás egyszer hozza létre őket, és
+minden új példány ugyanezeket kapja, így a lecserélt és az új példány nem
+írja felül egymás metrikáit.
+"""
+
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Slot:
+    """Egy RAGSystem példány és a rajta élő lease-ek száma"""
+
+    def __init__(self, system, version: int):
+        self.system = system
+        self.version = version
+        self.leases = 0
+        self.created_at = time.time()
+
+
+class SharedRAGService:
+    """Megosztott, lease alapon használt RAGSystem, kérés-megőrző reload-dal"""
+
+    def __init__(self, factory: Optional[Callable[..., Any]] = None):
+        """
+        Args:
+            factory: RAGSystem konstruktor, amely a megosztott komponenseket kulcsszavas
+                argumentumként kapja (metrics_collector, ingestion_checkpoints);
+                alapértelmezett: RAGSystem
+        """
+        self._factory = factory or self._default_factory
+        self._shared: Optional[Dict[str, Any]] = None
+        self._cond = threading.Condition()
+        self._current: Optional[_Slot] = None
+        self._retired: List[_Slot] = []
+        self._version = 0
+        # Egyszerre csak egy példány épül (párhuzamos első lease / reload)
+        self._build_lock = threading.Lock()
+
+    @staticmethod
+    def _default_factory(**shared):
+        from src.rag_system import RAGSystem
+        return RAGSystem(**shared)
+
+    def _build(self):
+        """Új példány a folyamat szintű, megosztott komponensekkel (_build_lock alatt)"""
+        if self._shared is None:
+            from src.rag_system import create_shared_components
+            self._shared = create_shared_components()
+        return self._factory(**self._shared)
+
+    def _ensure_current(self) -> _Slot:
+        """Az aktuális példány, szükség esetén (első használat) felépítve"""
+        with self._cond:
+            if self._current is not None:
+                return self._current
+        with self._build_lock:
+            with self._cond:
+                if self._current is not None:
+                    return self._current
+            system = self._build()
+            with self._cond:
+                self._version += 1
+                self._current = _Slot(system, self._version)
+                logger.info(f"Megosztott RAG rendszer betöltve (v{self._version})")
+                return self._current
+
+    @property
+    def system(self):
+        """
+        Az aktuális RAGSystem lease nélkül (rövid, állapotmentes hívásokra,
+        pl. statisztika); hosszabb vagy streamelt kérésekhez a lease() való
+        """
+        return self._ensure_current().system
+
+    @contextmanager
+    def lease(self) -> Iterator[Any]:
+        """
+        Az aktuális RAGSystem kölcsönzése egy kérés idejére
+
+        Egy reload a lease alatt nem állítja le a kölcsönzött példányt;
+        streamelt válasznál a generátort a with blokkon belül kell végigolvasni.
+        """
+        while True:
+            slot = self._ensure_current()
+            with self._cond:
+                # A lease felvétele előtt lecserélt példányt nem adjuk ki
+                if slot is self._current:
+                    slot.leases += 1
+                    break
+        try:
+            yield slot.system
+        finally:
+            self._release(slot)
+
+    def _release(self, slot: _Slot):
+        with self._cond:
+            slot.leases -= 1
+            drained = slot.leases == 0 and slot in self._retired
+            if drained:
+                self._retired.remove(slot)
+            self._cond.notify_all()
+        if drained:
+            self._dispose(slot)
+
+    def reload(self, factory: Optional[Callable[..., Any]] = None, reload_env: bool = False,
+               wait: bool = False, timeout: Optional[float] = None) -> int:
+        """
+        Új RAGSystem építése és az aktuális lecserélése
+
+        Az új kérések azonnal az új példányt kapják; a régi a folyamatban lévő
+        kérései után áll le.
+
+        Args:
+            factory: Új konstruktor (pl. módosított paraméterekkel, a megosztott
+                komponenseket kulcsszavas argumentumként kapja); None = a meglévő
+            reload_env: A .env újraolvasása (felülírja a folyamat környezeti változóit)
+            wait: Várakozás, amíg a régi példány összes kérése befejeződik
+            timeout: A várakozás felső korlátja másodpercben (wait=True esetén)
+
+        Returns:
+            Az új példány verziószáma
+        """
+        with self._build_lock:
+            if factory is not None:
+                self._factory = factory
+            if reload_env:
+                from dotenv import load_dotenv
+                load_dotenv(override=True)
+            # A (lassú) modell betöltés alatt a régi példány tovább szolgál ki.
+            # A megosztott komponensek (pl. METRICS_FILE) a .env újraolvasásakor sem cserélődnek.
+            system = self._build()
+            with self._cond:
+                old = self._current
+                self._version += 1
+                self._current = _Slot(system, self._version)
+                version = self._version
+                dispose_now = old is not None and old.leases == 0
+                if old is not None and not dispose_now:
+                    self._retired.append(old)
+        logger.info(
+            f"Megosztott RAG rendszer újratöltve (v{version})"
+            + (f", a régi példányon {old.leases} kérés fut még" if old is not None and not dispose_now else "")
+        )
+        if dispose_now:
+            self._dispose(old)
+        elif old is not None and wait:
+            self.drain(old.version, timeout)
+        return version
+
+    def drain(self, version: int, timeout: Optional[float] = None) -> bool:
+        """
+        Várakozás, amíg a megadott verziójú (lecserélt) példány kérései befejeződnek
+
+        Returns:
+            True, ha a példány leállt (vagy már nem él)
+        """
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: all(slot.version != version for slot in self._retired),
+                timeout=timeout
+            )
+
+    def close(self):
+        """Az aktuális és a lecserélt példányok leállítása (folyamat leállításakor)"""
+        with self._build_lock:
+            with self._cond:
+                slots = ([self._current] if self._current is not None else []) + self._retired
+                self._current = None
+                self._retired = []
+        for slot in slots:
+            self._dispose(slot)
+        if self._shared is not None:
+            self._shared['metrics_collector'].stop_maintenance()
+
+    @staticmethod
+    def _dispose(slot: _Slot):
+        try:
+            close = getattr(slot.system, 'close', None)
+            if close is not None:
+                close()
+            logger.info(f"Régi RAG rendszer leállítva (v{slot.version})")
+        except Exception as e:
+            logger.warning(f"Hiba a régi RAG rendszer leállításánál (v{slot.version}): {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Verzió, aktív és lecserélt (még kiszolgáló) példányok lease-ei"""
+        with self._cond:
+            current = self._current
+            return {
+                'version': current.version if current else None,
+                'loaded': current is not None,
+                'active_leases': current.leases if current else 0,
+                'uptime_sec': time.time() - current.created_at if current else 0.0,
+                'retired': [{'version': slot.version, 'leases': slot.leases} for slot in self._retired],
+            }
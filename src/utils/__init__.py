@@ -3,6 +3,7 @@ Utility modulok
 """
 
 from .session_manager import SessionManager
+from .openai_client import get_openai_client
 
-__all__ = ["SessionManager"]
+__all__ = ["SessionManager", "get_openai_client"]
 
@@ -0,0 +1,218 @@
+"""
+Offline, determinisztikus helyettesítő backend-ek
+MODEL_BACKEND=fake esetén az OpenAI kliens, a lokális embedding modell és a
+cross-encoder reranker helyére lépnek, így a benchmarkok és load tesztek
+hálózat, API kulcs és GPU nélkül is a valódi RAGSystem.query kódutakat
+futtatják (rate limiter, single-flight, cache-ek, streaming metrikák).
+
+- FakeOpenAIClient: chat (sima és streaming), embeddings, fordítás, judge JSON
+- FakeSentenceEmbedder: karakter trigram hash alapú, normalizált embeddingek
+- FakeCrossEncoder: átfedés + hossz alapú rerank score-ok
+
+A válaszidők szimulálhatók (FAKE_LATENCY, FAKE_FIRST_TOKEN_DELAY,
+FAKE_TOKEN_DELAY), hogy a mért overhead realisztikus terhelés mellett látsszon.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def is_fake_backend() -> bool:
+    """MODEL_BACKEND=fake esetén minden modell és API hívás helyettesítve van"""
+    return os.getenv('MODEL_BACKEND', 'real').lower() == 'fake'
+
+
+def _tokens(text: str) -> List[str]:
+    return _WORD.findall((text or "").lower())
+
+
+def _stable_hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode('utf-8')).digest()[:8], 'little')
+
+
+@lru_cache(maxsize=65536)
+def _feature_vector(feature: str, dim: int) -> np.ndarray:
+    rng = np.random.default_rng(_stable_hash(feature))
+    return rng.standard_normal(dim).astype(np.float32)
+
+
+def hash_embedding(text: str, dim: int) -> List[float]:
+    """
+    Determinisztikus embedding: a szavak karakter trigramjai hash-seedelt
+    véletlen vektorok, a szöveg vektora ezek normalizált összege
+    (közös szavak / szótövek -> nagyobb koszinusz hasonlóság).
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in _tokens(text) or [""]:
+        padded = f"#{word}#"
+        for i in range(max(1, len(padded) - 2)):
+            vector += _feature_vector(padded[i:i + 3], dim)
+    norm = float(np.linalg.norm(vector))
+    return (vector / norm if norm > 0 else vector).tolist()
+
+
+class FakeSentenceEmbedder:
+    """SentenceTransformer helyettesítő (encode / get_sentence_embedding_dimension)"""
+
+    def __init__(self, dim: int = None):
+        self.dim = dim or int(os.getenv('FAKE_EMBEDDING_DIM', 384))
+
+    def encode(self, texts: Sequence[str], show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        return np.array([hash_embedding(text, self.dim) for text in texts], dtype=np.float32)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+
+class FakeCrossEncoder:
+    """CrossEncoder helyettesítő: szóátfedés + enyhe hossz bónusz"""
+
+    def predict(self, pairs: Sequence[Sequence[str]], **kwargs) -> np.ndarray:
+        scores = []
+        for query, text in pairs:
+            query_words = set(_tokens(query))
+            text_words = _tokens(text)
+            overlap = len(query_words & set(text_words)) / len(query_words) if query_words else 0.0
+            scores.append(overlap + min(len(text_words), 200) / 1000.0)
+        return np.array(scores, dtype=np.float32)
+
+
+def _usage(prompt_tokens: int, completion_tokens: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=prompt_tokens + completion_tokens
+    )
+
+
+class _FakeChatCompletions:
+    def __init__(self, client: "FakeOpenAIClient"):
+        self._client = client
+
+    def create(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        stream: bool = False,
+        response_format: Optional[Dict[str, str]] = None,
+        max_tokens: Optional[int] = None,
+        **kwargs
+    ):
+        content = self._client.reply(messages, response_format)
+        words = content.split(" ")
+        if max_tokens:
+            words = words[:max_tokens]
+        prompt_tokens = sum(len(_tokens(m.get('content') or "")) for m in messages)
+
+        if stream:
+            return self._client.stream(words, prompt_tokens)
+
+        self._client.sleep(self._client.latency + self._client.token_delay * len(words))
+        message = SimpleNamespace(role="assistant", content=" ".join(words))
+        return SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")],
+            usage=_usage(prompt_tokens, len(words))
+        )
+
+
+class _FakeEmbeddings:
+    def __init__(self, client: "FakeOpenAIClient"):
+        self._client = client
+
+    def create(self, model: str, input, **kwargs):
+        texts = [input] if isinstance(input, str) else list(input)
+        self._client.sleep(self._client.latency)
+        data = [
+            SimpleNamespace(index=i, embedding=hash_embedding(text, self._client.embedding_dim))
+            for i, text in enumerate(texts)
+        ]
+        return SimpleNamespace(data=data, usage=_usage(sum(len(_tokens(t)) for t in texts), 0))
+
+
+class FakeOpenAIClient:
+    """
+    openai.OpenAI helyettesítő a projektben használt felületre
+    (chat.completions.create, embeddings.create, with_options).
+    """
+
+    def __init__(
+        self,
+        latency: float = None,
+        first_token_delay: float = None,
+        token_delay: float = None,
+        embedding_dim: int = None
+    ):
+        """
+        Args:
+            latency: Nem streaming hívások alap válaszideje (mp)
+            first_token_delay: Streaming első token előtti késleltetés (mp)
+            token_delay: Tokenenkénti késleltetés (mp)
+            embedding_dim: embeddings.create vektorainak dimenziója
+        """
+        self.latency = latency if latency is not None else float(os.getenv('FAKE_LATENCY', 0.0))
+        self.first_token_delay = (
+            first_token_delay if first_token_delay is not None
+            else float(os.getenv('FAKE_FIRST_TOKEN_DELAY', 0.0))
+        )
+        self.token_delay = token_delay if token_delay is not None else float(os.getenv('FAKE_TOKEN_DELAY', 0.0))
+        # Az OpenAI embedding modellek alapértelmezett dimenziója (EmbeddingModel dim_map)
+        self.embedding_dim = embedding_dim or 1536
+        self.chat = SimpleNamespace(completions=_FakeChatCompletions(self))
+        self.embeddings = _FakeEmbeddings(self)
+
+    def with_options(self, **kwargs) -> "FakeOpenAIClient":
+        return self
+
+    @staticmethod
+    def sleep(seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def reply(self, messages: List[Dict[str, str]], response_format: Optional[Dict[str, str]] = None) -> str:
+        """Determinisztikus válasz a kérés típusa szerint (fordítás, judge, chat)"""
+        system = next((m.get('content') or "" for m in messages if m.get('role') == 'system'), "")
+        user = next((m.get('content') or "" for m in reversed(messages) if m.get('role') == 'user'), "")
+
+        if system.startswith("You are a translation engine"):
+            if response_format and response_format.get('type') == 'json_object':
+                # Batch fordítás: "[id] szöveg" soronként
+                items = re.findall(r"^\[(\d+)\] (.*)$", user, re.MULTILINE)
+                return json.dumps({'translations': [
+                    {'id': int(i), 'text': f"{text} (english)"} for i, text in items
+                ]}, ensure_ascii=False)
+            return f"{user} (english)"
+
+        if response_format and response_format.get('type') == 'json_object':
+            ids = [int(i) for i in re.findall(r"### Elem id=(\d+)", user)]
+            return json.dumps({'results': [
+                {'id': i, 'context_relevance': 1.0, 'hallucination': 0.0} for i in ids
+            ]})
+
+        # Chat: a kontextus első szavaiból összerakott, determinisztikus válasz
+        words = _tokens(user)
+        digest = hashlib.md5(user.encode('utf-8')).hexdigest()[:8]
+        return f"Szimulált válasz ({digest}): " + " ".join(words[:60])
+
+    def stream(self, words: List[str], prompt_tokens: int) -> Iterator[SimpleNamespace]:
+        """Scriptelt token stream, az utolsó chunk a usage-et hozza (include_usage)"""
+        self.sleep(self.first_token_delay)
+        for i, word in enumerate(words):
+            if i:
+                self.sleep(self.token_delay)
+            delta = SimpleNamespace(content=word if i == 0 else " " + word)
+            yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=delta)], usage=None)
+        yield SimpleNamespace(choices=[], usage=_usage(prompt_tokens, len(words)))
@@ -0,0 +1,238 @@
+"""
+Hedged request modul
+Tail latency csökkentése távoli hívásoknál: ha egy hívás nem tér vissza
+az adott végpont latency eloszlásának percentilise alapján számolt időn
+belül, egy duplikált kérés indul, és az elsőként sikeresen visszatérő
+eredmény nyer.
+
+A duplikált kérések arányát egy budget korlátozza (pl. a hívások 10%-a),
+hogy a hedging lassú API esetén se duplázza meg a terhelést.
+
+A latency minták és a hedge késleltetés csak magát a hívást mérik: a rate
+limiter engedélyére várás az időmérés előtt történik. Ha hedge nem indulhat
+(nincs elég minta vagy elfogyott a budget), a hívás a hívó szálán fut; a
+hedge-elt hívások végpontonként külön, a connection pool méretéhez igazított
+szál poolt kapnak, így egy lassú végpont nem foglalja le a többiek szálait.
+"""
+
+import os
+import time
+import logging
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Deque, Dict, Optional
+
+from ..monitoring.openmetrics import REGISTRY, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """Végpontonkénti csúszó ablakos latency minták"""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, latency: float):
+        with self._lock:
+            self._samples.setdefault(endpoint, deque(maxlen=self.window)).append(latency)
+
+    def percentile(self, endpoint: str, q: float) -> Optional[float]:
+        """q-percentilis (0-1), None ha nincs minta"""
+        with self._lock:
+            samples = sorted(self._samples.get(endpoint, ()))
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(q * len(samples)))
+        return samples[index]
+
+    def count(self, endpoint: str) -> int:
+        with self._lock:
+            return len(self._samples.get(endpoint, ()))
+
+
+class Hedger:
+    """
+    Adaptív késleltetésű hedged hívások végrehajtója.
+
+    A hedge késleltetés a végpont megfigyelt latency-jének `percentile`
+    percentilise (min_delay / max_delay közé szorítva). Amíg nincs elég minta,
+    nem indul hedge.
+    """
+
+    def __init__(
+        self,
+        percentile: float = None,
+        min_delay: float = None,
+        max_delay: float = None,
+        budget_ratio: float = None,
+        min_samples: int = 20,
+        max_workers: Optional[int] = None,
+        registry: MetricsRegistry = REGISTRY
+    ):
+        """
+        Args:
+            percentile: Hedge késleltetés percentilise (pl. 0.95)
+            min_delay: Minimális hedge késleltetés másodpercben
+            max_delay: Maximális hedge késleltetés másodpercben
+            budget_ratio: Extra kérések max. aránya az összes híváshoz képest
+            min_samples: Ennyi latency minta kell a hedge bekapcsolásához
+            max_workers: Hedge-elt hívásokat futtató szálak száma végpontonként
+                (alapértelmezett: HEDGE_MAX_WORKERS_<VÉGPONT>, HEDGE_MAX_WORKERS
+                vagy OPENAI_MAX_CONNECTIONS)
+            registry: OpenMetrics regiszter
+        """
+        self.percentile = percentile if percentile is not None else float(os.getenv('HEDGE_PERCENTILE', 0.95))
+        self.min_delay = min_delay if min_delay is not None else float(os.getenv('HEDGE_MIN_DELAY', 0.05))
+        self.max_delay = max_delay if max_delay is not None else float(os.getenv('HEDGE_MAX_DELAY', 10.0))
+        self.budget_ratio = budget_ratio if budget_ratio is not None else float(os.getenv('HEDGE_BUDGET_RATIO', 0.1))
+        self.min_samples = min_samples
+        self.registry = registry
+        self.tracker = LatencyTracker()
+        self.max_workers = max_workers
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _endpoint_stats(self, endpoint: str) -> Dict[str, int]:
+        return self._stats.setdefault(endpoint, {'calls': 0, 'hedges': 0, 'hedge_wins': 0})
+
+    def hedge_delay(self, endpoint: str) -> Optional[float]:
+        """Aktuális hedge késleltetés (None = még nincs elég minta)"""
+        if self.tracker.count(endpoint) < self.min_samples:
+            return None
+        value = self.tracker.percentile(endpoint, self.percentile)
+        return min(self.max_delay, max(self.min_delay, value))
+
+    def _has_budget(self, endpoint: str) -> bool:
+        with self._lock:
+            stats = self._endpoint_stats(endpoint)
+            return stats['hedges'] + 1 <= self.budget_ratio * stats['calls']
+
+    def _take_budget(self, endpoint: str) -> bool:
+        """Engedélyez-e a budget egy újabb hedge kérést"""
+        with self._lock:
+            stats = self._endpoint_stats(endpoint)
+            if stats['hedges'] + 1 > self.budget_ratio * stats['calls']:
+                return False
+            stats['hedges'] += 1
+            return True
+
+    def _executor_for(self, endpoint: str) -> ThreadPoolExecutor:
+        """A végpont saját szál poolja (első használatkor létrehozva)"""
+        with self._lock:
+            executor = self._executors.get(endpoint)
+            if executor is None:
+                workers = self.max_workers or int(
+                    os.getenv(f'HEDGE_MAX_WORKERS_{endpoint.upper()}')
+                    or os.getenv('HEDGE_MAX_WORKERS')
+                    or os.getenv('OPENAI_MAX_CONNECTIONS', 20)
+                )
+                executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"hedge-{endpoint}")
+                self._executors[endpoint] = executor
+            return executor
+
+    def _timed(self, endpoint: str, fn: Callable[[], Any]) -> Any:
+        """A hívás futtatása; a latency minta csak az fn() idejét méri"""
+        start = time.time()
+        result = fn()
+        self.tracker.record(endpoint, time.time() - start)
+        return result
+
+    def _hedge_task(self, endpoint: str, fn: Callable[[], Any], acquire: Optional[Callable[[], Any]]):
+        # A hívó kontextusa (pl. rate limit prioritás) a worker szálon is érvényes
+        ctx = contextvars.copy_context()
+
+        def run():
+            if acquire is not None:
+                acquire()
+            return self._timed(endpoint, fn)
+        return lambda: ctx.run(run)
+
+    def call(self, endpoint: str, fn: Callable[[], Any], acquire: Optional[Callable[[], Any]] = None) -> Any:
+        """
+        Hívás végrehajtása hedging-gel.
+
+        Args:
+            endpoint: Végpont neve (a latency eloszlás kulcsa)
+            fn: Idempotens, argumentum nélküli hívás
+            acquire: Minden (eredeti és hedge) kérés előtt hívott engedélyezés,
+                pl. rate limiter; az ideje nem számít bele a latency-be
+
+        Returns:
+            Az elsőként sikeresen visszatérő hívás eredménye
+        """
+        with self._lock:
+            self._endpoint_stats(endpoint)['calls'] += 1
+        labels = {'endpoint': endpoint}
+        self.registry.inc('rag_hedge_calls', "Hedging-gel futtatott hívások", labels=labels)
+
+        if acquire is not None:
+            acquire()
+        delay = self.hedge_delay(endpoint)
+        if delay is None or not self._has_budget(endpoint):
+            # Hedge nem indulhat: közvetlen hívás, szálváltás nélkül
+            return self._timed(endpoint, fn)
+
+        executor = self._executor_for(endpoint)
+        ctx = contextvars.copy_context()
+        primary = executor.submit(ctx.run, self._timed, endpoint, fn)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._take_budget(endpoint):
+            return primary.result()
+
+        self.registry.inc('rag_hedge_requests', "Indított hedge (duplikált) kérések", labels=labels)
+        hedge = executor.submit(self._hedge_task(endpoint, fn, acquire))
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                # A vesztes kérés best-effort megszakítása: ha még nem indult el,
+                # nem is fut le; egy már futó HTTP kérés eredménye eldobódik
+                for loser in pending:
+                    loser.cancel()
+                if future is hedge:
+                    with self._lock:
+                        self._endpoint_stats(endpoint)['hedge_wins'] += 1
+                    self.registry.inc('rag_hedge_wins', "Hedge kérés nyert az eredetivel szemben", labels=labels)
+                return future.result()
+        raise error
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Végpontonkénti hedge rate / win rate és aktuális késleltetés"""
+        with self._lock:
+            snapshot = {name: dict(stats) for name, stats in self._stats.items()}
+        for endpoint, stats in snapshot.items():
+            stats['hedge_rate'] = stats['hedges'] / stats['calls'] if stats['calls'] else 0.0
+            stats['win_rate'] = stats['hedge_wins'] / stats['hedges'] if stats['hedges'] else 0.0
+            stats['delay'] = self.hedge_delay(endpoint)
+        return snapshot
+
+
+_hedger: Optional[Hedger] = None
+_hedger_lock = threading.Lock()
+
+
+def hedging_enabled(endpoint: str) -> bool:
+    """HEDGE_ENABLED=1 és a végpont szerepel a HEDGE_ENDPOINTS listában"""
+    if os.getenv('HEDGE_ENABLED', '0') != '1':
+        return False
+    endpoints = os.getenv('HEDGE_ENDPOINTS', 'translation,chat,embeddings')
+    return endpoint in [e.strip() for e in endpoints.split(',')]
+
+
+def get_hedger() -> Hedger:
+    """Process szintű hedger"""
+    global _hedger
+    with _hedger_lock:
+        if _hedger is None:
+            _hedger = Hedger()
+        return _hedger
@@ -0,0 +1,59 @@
+"""
+Modell inferencia párhuzamosság korlátozó
+Egy betöltött lokális modell (sentence-transformers, cross-encoder, HF LLM)
+példányát párhuzamos kérések osztják meg. A fast tokenizer-ek és a GPU
+memória nem bírják a korlátlan egyidejű hívást ("Already borrowed", OOM),
+ezért modellenként legfeljebb N hívás futhat egyszerre (N=1: lock).
+
+A korlát modellenként a <NÉV>_INFERENCE_CONCURRENCY környezeti változóval
+állítható (0 = korlátlan, pl. a thread-safe fake backend-eknél).
+"""
+
+import os
+import time
+import threading
+from typing import Optional
+
+from ..monitoring.openmetrics import REGISTRY, MetricsRegistry
+
+
+class InferenceGuard:
+    """Modellenkénti inferencia lock / pool (context manager)"""
+
+    def __init__(self, name: str, default_concurrency: int = 1, registry: MetricsRegistry = REGISTRY):
+        """
+        Args:
+            name: Modell szerep (pl. 'embedding', 'reranker', 'llm'); metrika label és env prefix
+            default_concurrency: Egyidejű hívások száma, ha az env nem adja meg (0 = korlátlan)
+            registry: OpenMetrics regiszter
+        """
+        self.name = name
+        self.registry = registry
+        self.concurrency = int(os.getenv(f'{name.upper()}_INFERENCE_CONCURRENCY', default_concurrency))
+        self._semaphore: Optional[threading.BoundedSemaphore] = (
+            threading.BoundedSemaphore(self.concurrency) if self.concurrency > 0 else None
+        )
+
+    def acquire(self):
+        """Slot foglalása (blokkol, amíg nincs szabad)"""
+        if self._semaphore is None:
+            return
+        t0 = time.perf_counter()
+        self._semaphore.acquire()
+        self.registry.observe(
+            'rag_inference_wait_seconds', time.perf_counter() - t0,
+            "Várakozás a modell inferencia slotra", labels={'model': self.name}
+        )
+
+    def release(self):
+        """Slot felszabadítása (pl. egy háttérszálon futó generálás végén)"""
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
@@ -0,0 +1,302 @@
+"""
+Megosztott OpenAI kliens modul
+Egyetlen process szintű, connection pool-lal és keep-alive-val hangolt
+httpx kliensre épülő OpenAI kliens, amit minden komponens használ
+(fordítás, embedding, generálás, streaming, LLM-as-Judge).
+
+Végpontonként külön timeout állítható, a pool kihasználtsága OpenMetrics
+gauge-eken / histogramokon látszik. OPENAI_BASE_URL-lel lokális
+helyettesítő szerverre irányítható (pl. tesztekhez).
+
+A hívások a remote_call rétegen mennek át, ami a közös rate limiterrel
+(requests/perc, tokens/perc, prioritás) engedélyezi őket, és opcionálisan
+hedged kérésként futtatja őket (lásd hedging.py).
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from ..monitoring.openmetrics import REGISTRY
+from .rate_limiter import get_rate_limiter
+from .hedging import get_hedger, hedging_enabled
+from .fake_backends import FakeOpenAIClient, is_fake_backend
+
+logger = logging.getLogger(__name__)
+
+# Alapértelmezett timeout-ok végpontonként (másodperc), OPENAI_TIMEOUT_<VÉGPONT> felülírja
+ENDPOINT_TIMEOUTS = {
+    'default': 60.0,
+    'chat': 60.0,
+    'stream': 120.0,
+    'embeddings': 30.0,
+    'translation': 10.0,
+    'judge': 60.0,
+}
+
+_client = None
+_endpoint_clients: Dict[str, object] = {}
+_transport = None
+_lock = threading.Lock()
+
+
+def _endpoint_timeout(endpoint: str) -> float:
+    env_value = os.getenv(f'OPENAI_TIMEOUT_{endpoint.upper()}')
+    if env_value:
+        return float(env_value)
+    return ENDPOINT_TIMEOUTS.get(endpoint, ENDPOINT_TIMEOUTS['default'])
+
+
+def _build_transport(max_connections: int, max_keepalive: int, keepalive_expiry: float):
+    """Pool kihasználtságot mérő httpx transport"""
+    import httpx
+
+    class _TrackedStream(httpx.SyncByteStream):
+        """Response body wrapper: a kérés a body lezárásáig számít in-flight-nak"""
+
+        def __init__(self, stream, on_close):
+            self._stream = stream
+            self._on_close = on_close
+            self._closed = False
+
+        def __iter__(self):
+            yield from self._stream
+
+        def close(self):
+            try:
+                self._stream.close()
+            finally:
+                if not self._closed:
+                    self._closed = True
+                    self._on_close()
+
+    class InstrumentedTransport(httpx.HTTPTransport):
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self.max_connections = max_connections
+            self._in_flight = 0
+            self._counter_lock = threading.Lock()
+
+        @property
+        def in_flight(self) -> int:
+            return self._in_flight
+
+        def _change_in_flight(self, delta: int):
+            with self._counter_lock:
+                self._in_flight += delta
+                REGISTRY.set_gauge(
+                    'rag_http_pool_in_flight', self._in_flight,
+                    "Folyamatban lévő OpenAI HTTP kérések"
+                )
+
+        def connection_counts(self) -> Dict[str, int]:
+            connections = list(getattr(self._pool, 'connections', []))
+            idle = sum(1 for c in connections if c.is_idle())
+            return {'open': len(connections), 'idle': idle, 'active': len(connections) - idle}
+
+        def handle_request(self, request):
+            labels = {'path': request.url.path}
+            self._change_in_flight(1)
+            start = time.time()
+            try:
+                response = super().handle_request(request)
+            except Exception:
+                self._change_in_flight(-1)
+                REGISTRY.inc('rag_http_requests', "OpenAI HTTP kérések",
+                              labels={**labels, 'status': 'error'})
+                raise
+
+            REGISTRY.observe('rag_http_response_header_seconds', time.time() - start,
+                             "OpenAI HTTP válasz fejléc latency", labels=labels)
+            REGISTRY.inc('rag_http_requests', "OpenAI HTTP kérések",
+                         labels={**labels, 'status': str(response.status_code)})
+            return httpx.Response(
+                status_code=response.status_code,
+                headers=response.headers,
+                stream=_TrackedStream(response.stream, lambda: self._change_in_flight(-1)),
+                extensions=response.extensions,
+                request=request
+            )
+
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive,
+        keepalive_expiry=keepalive_expiry
+    )
+    return InstrumentedTransport(limits=limits)
+
+
+def _register_pool_gauges(transport):
+    REGISTRY.gauge_callback(
+        'rag_http_pool_max_connections', lambda: transport.max_connections,
+        help_text="OpenAI HTTP pool maximális kapcsolatszáma"
+    )
+    for state in ('open', 'idle', 'active'):
+        REGISTRY.gauge_callback(
+            'rag_http_pool_connections',
+            lambda state=state: transport.connection_counts()[state],
+            help_text="OpenAI HTTP pool kapcsolatai állapot szerint",
+            labels={'state': state}
+        )
+    REGISTRY.gauge_callback(
+        'rag_http_pool_utilization',
+        lambda: transport.in_flight / transport.max_connections if transport.max_connections else None,
+        help_text="In-flight kérések aránya a pool méretéhez képest"
+    )
+
+
+def _create_client():
+    """A process szintű OpenAI kliens felépítése"""
+    try:
+        import httpx
+        from openai import OpenAI
+    except ImportError:
+        raise ImportError("openai nincs telepítve. Telepítsd: pip install openai")
+
+    global _transport
+    base_url = os.getenv('OPENAI_BASE_URL') or None
+    api_key = os.getenv('OPENAI_API_KEY')
+    if not api_key:
+        if not base_url:
+            raise ValueError("OPENAI_API_KEY nincs beállítva a .env fájlban")
+        # Lokális helyettesítő szerverhez nem kell valódi kulcs
+        api_key = "local"
+
+    max_connections = int(os.getenv('OPENAI_MAX_CONNECTIONS', 20))
+    _transport = _build_transport(
+        max_connections=max_connections,
+        max_keepalive=int(os.getenv('OPENAI_MAX_KEEPALIVE', 10)),
+        keepalive_expiry=float(os.getenv('OPENAI_KEEPALIVE_EXPIRY', 60))
+    )
+    _register_pool_gauges(_transport)
+
+    http_client = httpx.Client(
+        transport=_transport,
+        timeout=httpx.Timeout(_endpoint_timeout('default'), connect=5.0)
+    )
+    client = OpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        http_client=http_client,
+        max_retries=int(os.getenv('OPENAI_MAX_RETRIES', 2))
+    )
+    logger.info(
+        f"Megosztott OpenAI kliens inicializálva (pool={max_connections}"
+        f"{', base_url=' + base_url if base_url else ''})"
+    )
+    return client
+
+
+def get_openai_client(endpoint: str = 'default'):
+    """
+    Process szintű OpenAI kliens lekérése.
+
+    Minden végpont ugyanazt a connection pool-t használja, csak a timeout
+    különbözik (with_options másolat, saját pool nélkül).
+
+    Args:
+        endpoint: Végpont neve ('chat', 'stream', 'embeddings', 'translation', 'judge')
+
+    Returns:
+        openai.OpenAI kliens (MODEL_BACKEND=fake esetén FakeOpenAIClient)
+    """
+    global _client
+    with _lock:
+        if _client is None:
+            # MODEL_BACKEND=fake: offline, determinisztikus helyettesítő (benchmark, load teszt)
+            _client = FakeOpenAIClient() if is_fake_backend() else _create_client()
+        client = _endpoint_clients.get(endpoint)
+        if client is None:
+            client = _client.with_options(timeout=_endpoint_timeout(endpoint))
+            _endpoint_clients[endpoint] = client
+        return client
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """429-es hiba esetén a Retry-After fejléc (vagy alapértelmezett) értéke"""
+    if getattr(error, 'status_code', None) != 429:
+        return None
+    response = getattr(error, 'response', None)
+    try:
+        return float(response.headers.get('retry-after'))
+    except (AttributeError, TypeError, ValueError):
+        return 5.0
+
+
+def remote_call(
+    endpoint: str,
+    fn: Callable[[], Any],
+    estimated_tokens: int = 0,
+    hedge: bool = False
+) -> Any:
+    """
+    Távoli OpenAI hívás végrehajtása a közös rate limiteren keresztül.
+
+    A kérés sorba áll, amíg a requests/perc és tokens/perc keretbe belefér
+    (az aktuális prioritási osztály szerint), majd a tényleges usage-dzsel
+    korrigálja a becslést. 429 esetén a limiter a Retry-After idejére szünetel.
+
+    Args:
+        endpoint: Végpont neve (metrika label)
+        fn: A tényleges hívás (argumentum nélküli callable)
+        estimated_tokens: Becsült token igény (prompt + max válasz)
+        hedge: Idempotens hívás, hedging engedélyezett (HEDGE_ENABLED esetén)
+
+    Returns:
+        A hívás eredménye
+    """
+    limiter = get_rate_limiter()
+
+    def acquire():
+        limiter.acquire(estimated_tokens)
+
+    def attempt():
+        try:
+            result = fn()
+        except Exception as e:
+            retry_after = _retry_after_seconds(e)
+            if retry_after is not None:
+                REGISTRY.inc('rag_rate_limited_responses', "429-es válaszok az OpenAI API-tól",
+                             labels={'endpoint': endpoint})
+                limiter.pause(retry_after)
+            raise
+
+        usage = getattr(result, 'usage', None)
+        if usage is not None:
+            limiter.record_usage(estimated_tokens, getattr(usage, 'total_tokens', None))
+        return result
+
+    if hedge and hedging_enabled(endpoint):
+        # Hedge esetén a duplikált kérés is a limiteren megy át (a latency mérésen kívül)
+        return get_hedger().call(endpoint, attempt, acquire=acquire)
+    acquire()
+    return attempt()
+
+
+def get_pool_stats() -> Dict[str, Optional[float]]:
+    """
+    Connection pool kihasználtság
+
+    Returns:
+        max_connections, in_flight, open / idle / active kapcsolatok
+    """
+    if _transport is None:
+        return {}
+    return {
+        'max_connections': _transport.max_connections,
+        'in_flight': _transport.in_flight,
+        **_transport.connection_counts()
+    }
+
+
+def reset_openai_client():
+    """A megosztott kliens lezárása (pl. konfiguráció váltás vagy teszt után)"""
+    global _client, _transport
+    with _lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+        _transport = None
+        _endpoint_clients.clear()
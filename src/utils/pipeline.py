@@ -0,0 +1,225 @@
+"""
+Többlépcsős (staged) producer / consumer pipeline
+A lépcsők között korlátos méretű sorok vannak, minden lépcső saját worker
+szálakon fut, így pl. a dokumentum parse-olás (CPU), az embedding (modell /
+API) és a vektor adatbázis írás (I/O) átfedésben halad: a teljes futásidő a
+leglassabb lépcsőhöz közelít, nem a lépcsők összegéhez. A korlátos sorok
+miatt egy gyors lépcső nem halmoz fel korlátlan mennyiségű köztes adatot.
+
+Lépcsőnként mért adatok (a visszaadott statisztikában és az OpenMetrics
+regiszterben): feldolgozott elemek, foglalt idő, kihasználtság és a bemeneti
+sor mélysége. A legmagasabb kihasználtságú lépcső a szűk keresztmetszet.
+"""
+
+import time
+import queue
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List
+
+from ..monitoring.openmetrics import REGISTRY, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+# Sor lezáró jel (a forrás / az előző lépcső elfogyott)
+_DONE = object()
+
+# Várakozási szelet a sorokon; ennyi időn belül veszik észre a worker-ek a leállást
+_POLL_INTERVAL = 0.1
+
+
+class PipelineStage:
+    """Egy pipeline lépcső: feldolgozó függvény és worker szám"""
+
+    def __init__(self, name: str, fn: Callable[[Any], Any], workers: int = 1, fan_out: bool = False):
+        """
+        Args:
+            name: Lépcső neve (statisztika és metrika label)
+            fn: Elemenkénti feldolgozó függvény; None visszatérés = az elem eldobva
+            workers: Párhuzamos worker szálak száma
+            fan_out: Az fn több kimeneti elemet ad vissza (iterable), pl. fájl -> batch-ek
+        """
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, int(workers))
+        self.fan_out = fan_out
+
+
+class _StageStats:
+    """Egy lépcső futás közbeni számlálói (a pipeline lock-ja alatt frissül)"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.items_in = 0
+        self.items_out = 0
+        self.busy_sec = 0.0
+        self.max_queue_depth = 0
+        self.running_workers = workers
+
+
+class StagedPipeline:
+    """Korlátos sorokkal összekötött, lépcsőnként párhuzamos feldolgozó pipeline"""
+
+    def __init__(
+        self,
+        name: str,
+        stages: List[PipelineStage],
+        queue_size: int = 8,
+        registry: MetricsRegistry = REGISTRY
+    ):
+        """
+        Args:
+            name: Pipeline neve (metrika label)
+            stages: Lépcsők sorrendben; az utolsó kimenete eldobódik
+            queue_size: A lépcsők közötti sorok maximális mérete
+            registry: OpenMetrics regiszter
+        """
+        if not stages:
+            raise ValueError("A pipeline-nak legalább egy lépcső kell")
+        self.name = name
+        self.stages = stages
+        self.queue_size = max(1, int(queue_size))
+        self.registry = registry
+
+    def run(self, items: Iterable[Any]) -> Dict[str, Any]:
+        """
+        A forrás elemeinek végigfuttatása a lépcsőkön (blokkol a végéig)
+
+        Bármely lépcső (vagy a forrás) kivétele leállítja a teljes pipeline-t,
+        és a hívónál újra kiváltódik (az első hiba).
+
+        Args:
+            items: Forrás elemek (lustán olvasva, a sor telítettségéhez igazodva)
+
+        Returns:
+            Futásidő és lépcsőnkénti statisztika
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        stats = {stage.name: _StageStats(stage.workers) for stage in self.stages}
+        lock = threading.Lock()
+        stop = threading.Event()
+        errors: List[BaseException] = []
+
+        def fail(error: BaseException):
+            with lock:
+                errors.append(error)
+            stop.set()
+
+        def put(index: int, item: Any) -> bool:
+            """Elem a(z) index. lépcső sorába; False, ha a pipeline leállt"""
+            while not stop.is_set():
+                try:
+                    queues[index].put(item, timeout=_POLL_INTERVAL)
+                except queue.Full:
+                    continue
+                self._record_depth(index, queues[index], stats, lock)
+                return True
+            return False
+
+        def feed():
+            try:
+                for item in items:
+                    if not put(0, item):
+                        return
+                put(0, _DONE)
+            except BaseException as e:
+                fail(e)
+
+        def work(index: int):
+            stage = self.stages[index]
+            stage_stats = stats[stage.name]
+            last = index == len(self.stages) - 1
+            while not stop.is_set():
+                try:
+                    item = queues[index].get(timeout=_POLL_INTERVAL)
+                except queue.Empty:
+                    continue
+                if item is _DONE:
+                    # A lezáró jel a testvér worker-eknek is szól
+                    put(index, _DONE)
+                    break
+                self._record_depth(index, queues[index], stats, lock)
+                t0 = time.perf_counter()
+                try:
+                    result = stage.fn(item)
+                    if stage.fan_out:
+                        outputs = list(result or ())
+                    else:
+                        outputs = [] if result is None else [result]
+                except BaseException as e:
+                    fail(e)
+                    return
+                elapsed = time.perf_counter() - t0
+                with lock:
+                    stage_stats.items_in += 1
+                    stage_stats.items_out += len(outputs)
+                    stage_stats.busy_sec += elapsed
+                self.registry.observe(
+                    'rag_pipeline_stage_seconds', elapsed, "Pipeline lépcső feldolgozási ideje elemenként",
+                    labels={'pipeline': self.name, 'stage': stage.name}
+                )
+                self.registry.inc(
+                    'rag_pipeline_stage_items', "Pipeline lépcső által feldolgozott elemek",
+                    labels={'pipeline': self.name, 'stage': stage.name}
+                )
+                if not last:
+                    for output in outputs:
+                        if not put(index + 1, output):
+                            return
+            with lock:
+                stage_stats.running_workers -= 1
+                drained = stage_stats.running_workers == 0
+            # Az utolsó kilépő worker zárja le a következő lépcső sorát
+            if drained and not last and not stop.is_set():
+                put(index + 1, _DONE)
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=feed, name=f"{self.name}-source", daemon=True)]
+        for index, stage in enumerate(self.stages):
+            threads.extend(
+                threading.Thread(target=work, args=(index,), name=f"{self.name}-{stage.name}-{n}", daemon=True)
+                for n in range(stage.workers)
+            )
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+
+        for index, stage in enumerate(self.stages):
+            self.registry.set_gauge(
+                'rag_pipeline_queue_depth', 0, "Pipeline lépcső bemeneti sorának mélysége",
+                labels={'pipeline': self.name, 'stage': stage.name}
+            )
+        result = self._summary(stats, wall)
+        if errors:
+            raise errors[0]
+        return result
+
+    def _record_depth(self, index: int, stage_queue: queue.Queue, stats: Dict[str, _StageStats], lock: threading.Lock):
+        stage = self.stages[index]
+        depth = stage_queue.qsize()
+        with lock:
+            stage_stats = stats[stage.name]
+            stage_stats.max_queue_depth = max(stage_stats.max_queue_depth, depth)
+        self.registry.set_gauge(
+            'rag_pipeline_queue_depth', depth, "Pipeline lépcső bemeneti sorának mélysége",
+            labels={'pipeline': self.name, 'stage': stage.name}
+        )
+
+    def _summary(self, stats: Dict[str, _StageStats], wall: float) -> Dict[str, Any]:
+        stages = {}
+        for stage in self.stages:
+            s = stats[stage.name]
+            stages[stage.name] = {
+                'workers': s.workers,
+                'items_in': s.items_in,
+                'items_out': s.items_out,
+                'busy_sec': round(s.busy_sec, 4),
+                'items_per_sec': round(s.items_in / wall, 2) if wall > 0 else 0.0,
+                # 1.0 közeli érték: a lépcső worker-ei végig dolgoztak (szűk keresztmetszet)
+                'utilization': round(s.busy_sec / (wall * s.workers), 3) if wall > 0 else 0.0,
+                'max_queue_depth': s.max_queue_depth,
+            }
+        bottleneck = max(stages, key=lambda name: stages[name]['utilization']) if stages else None
+        return {'wall_sec': round(wall, 4), 'bottleneck': bottleneck, 'stages': stages}
@@ -0,0 +1,353 @@
+"""
+Rate limiter modul
+Token bucket limiter a külső LLM API hívásokhoz (requests/perc és
+tokens/perc keret), prioritási osztályokkal.
+
+A kérések nem buknak el a keret kimerülésekor, hanem sorba állnak. Egy
+processzen belül az interaktív (chat) kérések mindig megelőzik a batch
+(evaluation) kéréseket. A várakozási idő OpenMetrics histogramként látszik.
+
+A bucketek állapota (és a 429 utáni szünet) egy fájl lock alatt írt
+állapotfájlban közös az összes processz között (OPENAI_RATE_LIMIT_STATE),
+így pl. a Streamlit app, a serve_api worker-ek és a run_evaluation.py
+suite processzei együtt sem lépik túl a keretet. Processzek között a
+prioritás tartalékként érvényes: batch kérés nem fogyaszthatja el a keret
+utolsó OPENAI_BATCH_RESERVE hányadát, az az interaktív forgalomé marad.
+fcntl nélkül (Windows) vagy üres OPENAI_RATE_LIMIT_STATE esetén a keret
+processzenként külön érvényes.
+"""
+
+import os
+import json
+import time
+import heapq
+import itertools
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+from ..monitoring.openmetrics import REGISTRY, MetricsRegistry
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Prioritási osztályok (kisebb = előrébb a sorban)
+PRIORITIES = {
+    'interactive': 0,
+    'batch': 1,
+}
+
+WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_current_priority: contextvars.ContextVar[str] = contextvars.ContextVar(
+    'llm_request_priority', default='interactive'
+)
+
+
+@contextmanager
+def request_priority(priority: str):
+    """
+    Prioritási osztály beállítása az adott kontextus LLM hívásaira.
+
+    Példa:
+        with request_priority('batch'):
+            evaluator.run_evaluation(...)
+    """
+    if priority not in PRIORITIES:
+        raise ValueError(f"Ismeretlen prioritás: {priority} (lehetséges: {', '.join(PRIORITIES)})")
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority() -> str:
+    """Az aktuális kontextus prioritási osztálya"""
+    return _current_priority.get()
+
+
+def estimate_tokens(messages=None, text: str = None, max_tokens: int = 0) -> int:
+    """
+    Durva token becslés a limiterhez (~4 karakter / token) + a válasz keret.
+
+    Args:
+        messages: Chat üzenetek
+        text: Szöveg vagy szövegek listája (pl. embedding input)
+        max_tokens: A válaszra foglalt tokenek
+
+    Returns:
+        Becsült token szám
+    """
+    chars = 0
+    for message in messages or []:
+        chars += len(str(message.get('content') or ''))
+    if isinstance(text, str):
+        chars += len(text)
+    elif text:
+        chars += sum(len(t) for t in text)
+    return chars // 4 + 1 + (max_tokens or 0)
+
+
+class TokenBucket:
+    """Egyszerű token bucket (percenkénti kerettel, folyamatos utántöltéssel)"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        # Falióra idő: a megosztott állapotot több processz olvassa
+        self.updated = time.time()
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = now
+
+    def load(self, state: Dict[str, float]):
+        """Állapot betöltése a megosztott állapotfájlból"""
+        self.tokens = min(self.capacity, float(state.get('tokens', self.tokens)))
+        self.updated = float(state.get('updated', self.updated))
+
+    def dump(self) -> Dict[str, float]:
+        return {'tokens': self.tokens, 'updated': self.updated}
+
+    def time_until(self, amount: float) -> float:
+        """Ennyi másodperc múlva lesz elég token (0, ha már most van)"""
+        missing = amount - self.tokens
+        return 0.0 if missing <= 0 else missing / self.rate
+
+
+class SharedBucketState:
+    """Processzek között közös limiter állapot egy fcntl lock alatt írt JSON fájlban"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._handle = os.fdopen(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644), 'r+', encoding='utf-8')
+
+    @contextmanager
+    def locked(self) -> Iterator[Dict[str, Any]]:
+        """Az állapot olvasása, módosítása és visszaírása kizárólagos lock alatt"""
+        fcntl.flock(self._handle, fcntl.LOCK_EX)
+        try:
+            self._handle.seek(0)
+            raw = self._handle.read()
+            try:
+                state = json.loads(raw) if raw.strip() else {}
+            except ValueError:
+                logger.warning(f"Sérült rate limit állapotfájl, újrakezdve: {self.path}")
+                state = {}
+            yield state
+            self._handle.seek(0)
+            self._handle.truncate()
+            json.dump(state, self._handle)
+            self._handle.flush()
+        finally:
+            fcntl.flock(self._handle, fcntl.LOCK_UN)
+
+    def close(self):
+        self._handle.close()
+
+
+class RateLimiter:
+    """
+    Requests/perc + tokens/perc limiter prioritásos várakozási sorral.
+
+    Mindig csak a sor elején álló kérés fogyaszthat a keretből, így egy nagy
+    batch kérés nem éheztetheti ki a mögötte álló interaktív kéréseket, és
+    egy azonos osztályon belül a sorrend FIFO.
+    """
+
+    def __init__(
+        self,
+        rpm: float = 0,
+        tpm: float = 0,
+        registry: MetricsRegistry = REGISTRY,
+        state_file: Optional[str] = None,
+        batch_reserve: float = 0.0
+    ):
+        """
+        Args:
+            rpm: Requests / perc keret (0 = nincs limit)
+            tpm: Tokens / perc keret (0 = nincs limit)
+            registry: OpenMetrics regiszter a várakozási metrikákhoz
+            state_file: Processzek között közös állapotfájl (None = processzen belüli keret)
+            batch_reserve: A keret ekkora hányada csak interaktív kéréseknek jár (0-1)
+        """
+        self.registry = registry
+        self._requests = TokenBucket(rpm) if rpm > 0 else None
+        self._tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.batch_reserve = min(max(float(batch_reserve), 0.0), 1.0)
+        self._shared: Optional[SharedBucketState] = None
+        if state_file and self.enabled:
+            if fcntl is None:
+                logger.warning("fcntl nem elérhető: a rate limit keret processzenként külön érvényes")
+            else:
+                self._shared = SharedBucketState(state_file)
+        self._cond = threading.Condition()
+        self._queue = []
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        return cls(
+            rpm=float(os.getenv('OPENAI_RPM_LIMIT', 0)),
+            tpm=float(os.getenv('OPENAI_TPM_LIMIT', 0)),
+            state_file=os.getenv('OPENAI_RATE_LIMIT_STATE', './data/rate_limit_state.json') or None,
+            batch_reserve=float(os.getenv('OPENAI_BATCH_RESERVE', 0.2))
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self._requests is not None or self._tokens is not None
+
+    def acquire(self, tokens: int = 0, priority: Optional[str] = None) -> float:
+        """
+        Keret foglalása egy kéréshez; blokkol, amíg sorra nem kerül.
+
+        Args:
+            tokens: Becsült token igény
+            priority: Prioritási osztály (None = aktuális kontextus)
+
+        Returns:
+            Várakozással töltött idő másodpercben
+        """
+        priority = priority or current_priority()
+        if not self.enabled:
+            return 0.0
+
+        tokens = self._charged_tokens(tokens)
+        reserve = self.batch_reserve if priority == 'batch' else 0.0
+
+        start = time.monotonic()
+        entry = (PRIORITIES.get(priority, 0), next(self._seq))
+        with self._cond:
+            heapq.heappush(self._queue, entry)
+            self._set_queue_depth()
+            try:
+                while True:
+                    if self._queue[0] == entry:
+                        with self._bucket_state():
+                            wait = self._time_until_admitted(tokens, time.time(), reserve)
+                            if wait <= 0:
+                                self._consume(tokens)
+                        if wait <= 0:
+                            break
+                    else:
+                        wait = None
+                    # Más processz fogyasztása / visszatérítése miatt a várakozás után újraszámolunk
+                    self._cond.wait(wait)
+            finally:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._set_queue_depth()
+                self._cond.notify_all()
+
+        waited = time.monotonic() - start
+        self.registry.observe(
+            'rag_rate_limit_wait_seconds', waited,
+            "Rate limiter miatti várakozás az LLM API hívások előtt",
+            labels={'priority': priority}, buckets=WAIT_BUCKETS
+        )
+        if waited > 1.0:
+            logger.info(f"Rate limit várakozás ({priority}): {waited:.2f}s")
+        return waited
+
+    def _charged_tokens(self, tokens: int) -> int:
+        """A bucketből ténylegesen foglalt token szám"""
+        if self._tokens is None:
+            return tokens
+        # A keretnél nagyobb kérés soha nem férne bele: legfeljebb egy teljes keretet foglal
+        return min(tokens, int(self._tokens.capacity))
+
+    @contextmanager
+    def _bucket_state(self):
+        """
+        A bucketek és a szünet aktuális állapota (self._cond alatt hívandó);
+        megosztott módban a fájlból töltve, és a blokk végén visszaírva
+        """
+        if self._shared is None:
+            yield
+            return
+        with self._shared.locked() as state:
+            for name, bucket in (('requests', self._requests), ('tokens', self._tokens)):
+                if bucket is not None and name in state:
+                    bucket.load(state[name])
+            self._paused_until = float(state.get('paused_until', 0.0))
+            yield
+            for name, bucket in (('requests', self._requests), ('tokens', self._tokens)):
+                if bucket is not None:
+                    state[name] = bucket.dump()
+            state['paused_until'] = self._paused_until
+
+    def _time_until_admitted(self, tokens: int, now: float, reserve: float = 0.0) -> float:
+        wait = max(0.0, self._paused_until - now)
+        for bucket, amount in ((self._requests, 1), (self._tokens, tokens)):
+            if bucket is not None:
+                bucket.refill(now)
+                # A tartalék csak annyi lehet, hogy a kérés egy teli bucketbe még beférjen
+                held_back = min(reserve * bucket.capacity, max(0.0, bucket.capacity - amount))
+                wait = max(wait, bucket.time_until(amount + held_back))
+        return wait
+
+    def _consume(self, tokens: int):
+        if self._requests is not None:
+            self._requests.tokens -= 1
+        if self._tokens is not None:
+            self._tokens.tokens -= tokens
+
+    def _set_queue_depth(self):
+        counts = {name: 0 for name in PRIORITIES}
+        rank_to_name = {rank: name for name, rank in PRIORITIES.items()}
+        for rank, _ in self._queue:
+            counts[rank_to_name.get(rank, 'interactive')] += 1
+        for name, count in counts.items():
+            self.registry.set_gauge(
+                'rag_rate_limit_queue_depth', count,
+                "Rate limiterre váró LLM API kérések", labels={'priority': name}
+            )
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int):
+        """
+        A becsült és a tényleges token felhasználás különbségének elszámolása
+        (a bucket negatívba is mehet, ilyenkor a következő kérések várnak).
+        """
+        if self._tokens is None or actual_tokens is None:
+            return
+        with self._cond:
+            with self._bucket_state():
+                # Az acquire a keretre vágott becslést foglalta le, azt számoljuk el
+                self._tokens.tokens -= (actual_tokens - self._charged_tokens(estimated_tokens))
+            self._cond.notify_all()
+
+    def pause(self, seconds: float):
+        """Minden admisszió szüneteltetése (pl. 429 / Retry-After után, az összes processzben)"""
+        with self._cond:
+            with self._bucket_state():
+                self._paused_until = max(self._paused_until, time.time() + seconds)
+            self._cond.notify_all()
+        logger.warning(f"LLM API rate limit: admisszió szüneteltetve {seconds:.1f}s-ig")
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    Process szintű limiter (OPENAI_RPM_LIMIT / OPENAI_TPM_LIMIT alapján), a
+    keret az OPENAI_RATE_LIMIT_STATE állapotfájlon keresztül processzek között közös
+    """
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter.from_env()
+        return _limiter
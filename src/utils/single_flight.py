@@ -0,0 +1,319 @@
+"""
+Single-flight modul
+Azonos, egyidejű munkák összevonása: ugyanarra a kulcsra csak egy
+számítás fut (leader), a közben érkező kérések (followerek) megvárják
+és megkapják annak eredményét.
+
+Streaming válaszoknál a followerek a leader token streamjére csatlakoznak:
+a stream egy közös bufferbe íródik, minden feliratkozó az elejétől kapja;
+ha minden feliratkozó kilépett, a forrás stream lezárul.
+"""
+
+import re
+import json
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional
+
+from ..monitoring.openmetrics import REGISTRY, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str, casefold: bool = True) -> str:
+    """Kulcs normalizálás: whitespace összevonás, opcionálisan kisbetűsítés"""
+    text = _WHITESPACE.sub(" ", (text or "").strip())
+    return text.casefold() if casefold else text
+
+
+def history_digest(history: Optional[List[Dict[str, str]]]) -> str:
+    """Beszélgetési előzmények rövid hash-e (üres előzmény = üres string)"""
+    if not history:
+        return ""
+    payload = json.dumps(history, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """Kulcs alapú deduplikáció egyidejű, azonos hívásokra"""
+
+    def __init__(self, name: str, registry: MetricsRegistry = REGISTRY):
+        """
+        Args:
+            name: Réteg neve (metrika label, pl. 'translation')
+            registry: OpenMetrics regiszter
+        """
+        self.name = name
+        self.registry = registry
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        fn futtatása, vagy csatlakozás az azonos kulcsú folyamatban lévő híváshoz.
+
+        Args:
+            key: Deduplikációs kulcs
+            fn: A számítás (argumentum nélküli callable)
+
+        Returns:
+            A (megosztott) eredmény; a leader kivétele a followereknél is dobódik
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.followers += 1
+
+        role = 'leader' if leader else 'follower'
+        self.registry.inc(
+            'rag_single_flight_requests', "Single-flight kérések szerep szerint",
+            labels={'layer': self.name, 'role': role}
+        )
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.done.set()
+                if call.followers:
+                    logger.info(f"Single-flight ({self.name}): {call.followers} kérés összevonva")
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+class StreamBroadcaster:
+    """
+    Egy forrás stream megosztása több olvasó között.
+
+    Egy pump szál olvassa a forrást a közös bufferbe. Ha minden olvasó
+    kilépett (stop()), a pump a következő chunk után abbahagyja az olvasást,
+    és lezárja a forrást (a generálás, az API / GPU költség nem fut tovább).
+    """
+
+    def __init__(self, source: Iterator[str], on_finish: Optional[Callable[[], None]] = None):
+        self._source = source
+        self._on_finish = on_finish
+        self._buffer: List[str] = []
+        self._finished = False
+        self._stopped = False
+        self._error: Optional[BaseException] = None
+        self._cond = threading.Condition()
+        threading.Thread(target=self._pump, name="stream-broadcast", daemon=True).start()
+
+    def _pump(self):
+        try:
+            for chunk in self._source:
+                with self._cond:
+                    self._buffer.append(chunk)
+                    self._cond.notify_all()
+                    if self._stopped:
+                        break
+        except BaseException as e:
+            self._error = e
+        finally:
+            # A forrás lezárása ugyanazon a szálon, amelyik olvassa
+            close = getattr(self._source, 'close', None)
+            if close is not None:
+                close()
+            with self._cond:
+                self._finished = True
+                self._cond.notify_all()
+            if self._on_finish is not None:
+                self._on_finish()
+
+    def stop(self):
+        """A forrás olvasásának leállítása (nincs több olvasó)"""
+        with self._cond:
+            self._stopped = True
+
+    def subscribe(self, on_close: Optional[Callable[[], None]] = None) -> "_Subscription":
+        """
+        Olvasó a stream elejétől; a végéig (vagy a forrás hibájáig) blokkol
+
+        Args:
+            on_close: Egyszer hívódik, amikor az olvasó végzett vagy lezárták
+        """
+        return _Subscription(self, on_close)
+
+    def _read(self, index: int):
+        """A(z) index utáni chunkok (blokkol, amíg nincs új); None = vége"""
+        with self._cond:
+            while index >= len(self._buffer) and not self._finished:
+                self._cond.wait()
+            if index < len(self._buffer):
+                return self._buffer[index:]
+            if self._error is not None:
+                raise self._error
+            return None
+
+
+class _Subscription:
+    """
+    Egy olvasó a közös streamen (iterator, nem generátor: a close() el sem
+    indított feliratkozásnál is lefut, így a feliratkozók száma pontos marad)
+    """
+
+    def __init__(self, broadcaster: StreamBroadcaster, on_close: Optional[Callable[[], None]]):
+        self._broadcaster = broadcaster
+        self._on_close = on_close
+        self._pending: List[str] = []
+        self._index = 0
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if self._closed:
+            raise StopIteration
+        if not self._pending:
+            try:
+                chunks = self._broadcaster._read(self._index)
+            except BaseException:
+                self.close()
+                raise
+            if chunks is None:
+                self.close()
+                raise StopIteration
+            self._pending = list(chunks)
+            self._index += len(chunks)
+        return self._pending.pop(0)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._on_close is not None:
+            self._on_close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class _StreamCall:
+    def __init__(self):
+        self.ready = threading.Event()
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[BaseException] = None
+        self.broadcaster: Optional[StreamBroadcaster] = None
+        # Élő feliratkozók (a leader is); 0 esetén a közös stream leáll
+        self.subscribers = 1
+
+
+class StreamSingleFlight:
+    """
+    Single-flight stream-et tartalmazó eredményekre (pl. RAGSystem.query stream=True).
+
+    Ha a leader számítása alatt azonos kérések csatlakoztak, a stream egy
+    közös bufferen keresztül oszlik meg, és a kulcs addig marad regisztrálva,
+    amíg a stream tart (a később érkező azonos kérések is csatlakoznak).
+    Follower nélkül a leader közvetlenül a forrás streamet kapja (nincs
+    pump szál), a kulcs pedig azonnal felszabadul. Ha minden olvasó
+    kilépett, a forrás lezárul.
+    """
+
+    def __init__(self, name: str, stream_field: str = 'generator', registry: MetricsRegistry = REGISTRY):
+        """
+        Args:
+            name: Réteg neve (metrika label)
+            stream_field: Az eredmény dict stream mezője
+            registry: OpenMetrics regiszter
+        """
+        self.name = name
+        self.stream_field = stream_field
+        self.registry = registry
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _StreamCall] = {}
+
+    def _release(self, key: Hashable, call: _StreamCall):
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+
+    def _unsubscribe(self, key: Hashable, call: _StreamCall):
+        with self._lock:
+            call.subscribers -= 1
+            idle = call.subscribers == 0
+            if idle and self._calls.get(key) is call:
+                # Új azonos kérés már nem csatlakozhat a leálló streamre
+                del self._calls[key]
+        if idle and call.broadcaster is not None:
+            call.broadcaster.stop()
+
+    def do(self, key: Hashable, fn: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Args:
+            key: Deduplikációs kulcs
+            fn: A számítás, ami dict-et ad vissza (opcionálisan stream mezővel)
+
+        Returns:
+            Az eredmény másolata; a stream mező a forrás (follower nélkül),
+            vagy egy saját feliratkozás a közös streamre
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _StreamCall()
+            else:
+                call.subscribers += 1
+
+        self.registry.inc(
+            'rag_single_flight_requests', "Single-flight kérések szerep szerint",
+            labels={'layer': self.name, 'role': 'leader' if leader else 'follower'}
+        )
+
+        if leader:
+            try:
+                call.result = fn()
+                source = call.result.get(self.stream_field)
+                with self._lock:
+                    shared = source is not None and call.subscribers > 1
+                    if not shared:
+                        self._calls.pop(key, None)
+                if shared:
+                    call.broadcaster = StreamBroadcaster(source, on_finish=lambda: self._release(key, call))
+                    logger.info(f"Single-flight ({self.name}): {call.subscribers - 1} stream kérés összevonva")
+            except BaseException as e:
+                call.error = e
+                self._release(key, call)
+            finally:
+                call.ready.set()
+        else:
+            call.ready.wait()
+
+        if call.error is not None:
+            raise call.error
+        view = dict(call.result)
+        if call.broadcaster is not None:
+            view[self.stream_field] = call.broadcaster.subscribe(on_close=lambda: self._unsubscribe(key, call))
+        return view
@@ -0,0 +1,244 @@
+"""
+HTTP API teszt (fake backend)
+Ellenőrzi a headless API végpontjait egy ideiglenes könyvtárban létrehozott
+vektor adatbázison:
+  - ingest (base64 feltöltés -> háttér job -> completed),
+  - blokkoló és SSE streamelt query (context / token / done eventek),
+  - feedback és stats,
+  - a párhuzamossági korlát (telítettségnél 503 + Retry-After).
+
+--multi esetén a serve_api.py-t több worker processzel indítja, és azt is
+ellenőrzi, hogy a query worker-ek látják az ingest processz által írt
+dokumentumokat, és hogy a /stats összesíti a worker-ek metrikáit.
+
+    python test_api.py
+    python test_api.py --multi --workers 2
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+
+project_dir = Path(__file__).parent.absolute()
+sys.path.insert(0, str(project_dir))
+
+DOCUMENT = "\n".join(
+    f"A(z) {i}. fejezet: a töltőkábel csatlakoztatása előtt ellenőrizze az akkumulátor "
+    f"töltöttségét, majd a klíma beállítását. Chapter {i}: check the charging cable connector."
+    for i in range(40)
+)
+
+
+def _setup_env(workdir: str):
+    os.environ['MODEL_BACKEND'] = 'fake'
+    os.environ.setdefault('FAKE_LATENCY', '0.05')
+    os.environ['VECTOR_DB_PATH'] = os.path.join(workdir, 'vector_db')
+    os.environ['INGEST_UPLOAD_DIR'] = os.path.join(workdir, 'uploads')
+    os.environ['INGEST_STATE_FILE'] = os.path.join(workdir, 'ingestion_jobs.json')
+    os.environ['METRICS_FILE'] = os.path.join(workdir, 'metrics.json')
+    os.environ['METRICS_COMPACT_INTERVAL'] = '0'
+    # A /stats cluster_metrics a worker-ek által már kiírt metrika fájlokat olvassa
+    os.environ['METRICS_SAVE_INTERVAL'] = '0.2'
+    os.environ['METRICS_EXPORTER_PORT'] = ''
+
+
+def _upload_payload(name: str = 'kezikonyv.txt') -> dict:
+    return {'files': [{'name': name, 'content_base64': base64.b64encode(DOCUMENT.encode('utf-8')).decode('ascii')}]}
+
+
+def _parse_sse(lines) -> list:
+    events, event = [], None
+    for line in lines:
+        if line.startswith('event: '):
+            event = line[len('event: '):]
+        elif line.startswith('data: '):
+            events.append((event, json.loads(line[len('data: '):])))
+    return events
+
+
+def _wait_for_job(get_job, job_id: str, timeout: float = 60.0) -> dict:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = get_job(job_id)
+        if job['status'] in ('completed', 'failed', 'cancelled'):
+            return job
+        time.sleep(0.2)
+    raise AssertionError(f"A(z) {job_id} job nem fejeződött be {timeout}s alatt")
+
+
+def run_in_process(failures: list):
+    from fastapi.testclient import TestClient
+    from src.api import create_app
+    from src.serving import SharedRAGService
+    from src.monitoring.openmetrics import REGISTRY
+
+    os.environ['API_MAX_CONCURRENCY'] = '2'
+    os.environ['API_QUEUE_TIMEOUT'] = '0.2'
+    service = SharedRAGService()
+    with TestClient(create_app(service, role='all')) as client:
+        print("\n[1] Ingest")
+        response = client.post('/ingest', json=_upload_payload())
+        if response.status_code != 202:
+            failures.append(f"/ingest: {response.status_code} {response.text}")
+            return
+        job = _wait_for_job(lambda job_id: client.get(f'/ingest/jobs/{job_id}').json(), response.json()['job_id'])
+        print(f"    {job['status']}: {job['progress']}")
+        if job['status'] != 'completed':
+            failures.append(f"Az ingest job nem sikerült: {job}")
+        depth = {status: REGISTRY.get_gauge('rag_ingestion_queue_depth', {'owner': 'api', 'status': status})
+                 for status in ('queued', 'running')}
+        if depth != {'queued': 0, 'running': 0}:
+            failures.append(f"Hibás ingestion sor mélység gauge a job után: {depth}")
+        if client.post('/ingest', json=_upload_payload('virus.exe')).status_code != 415:
+            failures.append("Nem támogatott fájl típus elfogadva")
+
+        print("[2] Blokkoló query")
+        answer = client.post('/query', json={'query': 'Hogyan csatlakoztassam a töltőkábelt?'}).json()
+        print(f"    {answer.get('answer', '')[:80]!r}, {len(answer.get('context') or [])} forrás")
+        if not answer.get('answer') or not answer.get('message_id'):
+            failures.append(f"Hiányos /query válasz: {answer}")
+
+        print("[3] SSE query")
+        with client.stream('POST', '/query/stream', json={'query': 'How do I check the charging cable?'}) as stream:
+            events = _parse_sse(stream.iter_lines())
+        kinds = [kind for kind, _ in events]
+        print(f"    eventek: {kinds.count('token')} token, {kinds[0] if kinds else None} ... {kinds[-1] if kinds else None}")
+        if not kinds or kinds[0] != 'context' or kinds[-1] != 'done':
+            failures.append(f"Hibás SSE event sorrend: {kinds}")
+        elif ''.join(data['text'] for kind, data in events if kind == 'token') != events[-1][1]['answer']:
+            failures.append("A token eventek nem adják ki a teljes választ")
+
+        print("[4] Feedback + stats")
+        message_id = events[0][1]['message_id'] if events else 'x'
+        if client.post('/feedback', json={'message_id': message_id, 'rating': 'positive'}).status_code != 200:
+            failures.append("/feedback hiba")
+        stats = client.get('/stats').json()
+        print(f"    {stats['vector_db']['document_count']} chunk, api: {stats['api']['concurrency']}")
+        if not stats['vector_db']['document_count']:
+            failures.append("A /stats üres indexet mutat")
+
+        print("[5] Párhuzamossági korlát")
+        rag_system = service.system
+        original_query = rag_system.query
+
+        def slow_query(*args, **kwargs):
+            time.sleep(1.0)
+            return original_query(*args, **kwargs)
+
+        rag_system.query = slow_query
+        statuses = []
+
+        def call(i):
+            statuses.append(client.post('/query', json={'query': f'Mi a klíma beállítása ({i})?'}).status_code)
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        rag_system.query = original_query
+        print(f"    státuszok: {sorted(statuses)}")
+        if 503 not in statuses or 200 not in statuses:
+            failures.append(f"A korlát nem érvényesült: {sorted(statuses)}")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def run_multi(workers: int, failures: list):
+    import httpx
+
+    port, ingest_port = _free_port(), _free_port()
+    server = subprocess.Popen(
+        [sys.executable, str(project_dir / 'serve_api.py'), '--workers', str(workers),
+         '--port', str(port), '--ingest-port', str(ingest_port), '--log-level', 'warning'],
+        cwd=str(project_dir)
+    )
+    query_url, ingest_url = f'http://127.0.0.1:{port}', f'http://127.0.0.1:{ingest_port}'
+    try:
+        deadline = time.time() + 120
+        while time.time() < deadline:
+            try:
+                httpx.get(f'{query_url}/health', timeout=1).raise_for_status()
+                httpx.get(f'{ingest_url}/health', timeout=1).raise_for_status()
+                break
+            except httpx.HTTPError:
+                time.sleep(0.5)
+        else:
+            failures.append("A szerver nem indult el")
+            return
+
+        def ask(i: int):
+            response = httpx.post(f'{query_url}/query', json={'query': f'töltőkábel csatlakozó ({i})'}, timeout=30).json()
+            return len(response.get('context') or [])
+
+        # A query worker-ek az üres indexet már megnyitották, mielőtt az ingest ír
+        before = [ask(i) for i in range(workers * 4)]
+        pids = {httpx.get(f'{query_url}/health', timeout=30).json()['worker']['pid'] for _ in range(workers * 4)}
+        print(f"\n[M1] {workers} query worker + ingest worker fut, források az ingest előtt: {before}")
+        job = httpx.post(f'{ingest_url}/ingest', json=_upload_payload(), timeout=30).json()
+        job = _wait_for_job(lambda job_id: httpx.get(f'{ingest_url}/ingest/jobs/{job_id}').json(), job['job_id'])
+        print(f"[M2] ingest: {job['status']}, {job['progress'].get('chunks_written')} chunk")
+
+        counts = [ask(100 + i) for i in range(workers * 4)]
+        print(f"[M3] query worker-ek ({len(pids)} pid): források száma: {counts}")
+        if job['status'] != 'completed' or not all(counts):
+            failures.append("A query worker-ek nem látják az ingest processz által írt dokumentumokat")
+        if httpx.post(f'{query_url}/ingest', json=_upload_payload()).status_code != 404:
+            failures.append("A query worker ingest végpontot is kiszolgál")
+
+        time.sleep(0.5)
+        stats = httpx.get(f'{query_url}/stats', timeout=30).json()
+        own, cluster = stats['metrics']['total_retrievals'], stats.get('cluster_metrics', {})
+        print(f"[M4] retrieval-ök: kiszolgáló worker {own}, összesítve {cluster.get('total_retrievals')} "
+              f"({', '.join(cluster.get('workers', []))})")
+        if len(pids) > 1 and not cluster.get('total_retrievals', 0) > own:
+            failures.append("A /stats cluster_metrics nem összesíti a worker-ek metrikáit")
+    finally:
+        server.terminate()
+        server.wait(60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless HTTP API teszt (fake backend)')
+    parser.add_argument('--multi', action='store_true', help='Több worker processzes futtatás is')
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='rag_api_')
+    _setup_env(workdir)
+
+    print("=" * 60)
+    print("HTTP API TESZT")
+    print("=" * 60)
+    print(f"Munkakönyvtár: {workdir}")
+
+    failures = []
+    run_in_process(failures)
+    if args.multi:
+        os.environ['VECTOR_DB_PATH'] = os.path.join(workdir, 'vector_db_multi')
+        os.environ['INGEST_STATE_FILE'] = os.path.join(workdir, 'ingestion_jobs_multi.json')
+        os.environ['INGEST_UPLOAD_DIR'] = os.path.join(workdir, 'uploads_multi')
+        run_multi(args.workers, failures)
+
+    print("\n" + "=" * 60)
+    if failures:
+        for failure in failures:
+            print(f"HIBA: {failure}")
+        sys.exit(1)
+    print("OK: minden végpont a várt módon működik")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Párhuzamos query stressz teszt
+Egy megosztott RAGSystem-et sok szálról hív (sima és streamelt query),
+majd ellenőrzi, hogy
+  - egyik kérés sem dobott kivételt,
+  - az áteresztőképesség nő a szálak számával,
+  - a metrics.json érvényes JSON, és minden event benne van,
+  - a fordítási / retrieval cache-ek konzisztensek maradtak,
+  - a cache-ből kiszolgált ismételt kérdés is query-nek számít,
+  - egy elhagyott lokális stream nem fogja a modell inference slotját
+    (transformers / torch szükséges, egyébként kihagyva).
+
+Offline fut (MODEL_BACKEND=fake, szimulált API késleltetéssel), egy
+ideiglenes könyvtárban létrehozott vektor adatbázison.
+
+    python test_concurrent_query.py
+    python test_concurrent_query.py --threads 16 --queries 400
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+project_dir = Path(__file__).parent.absolute()
+sys.path.insert(0, str(project_dir))
+
+
+def _setup_env(workdir: str):
+    os.environ['MODEL_BACKEND'] = 'fake'
+    os.environ.setdefault('FAKE_LATENCY', '0.1')
+    os.environ.setdefault('FAKE_FIRST_TOKEN_DELAY', '0.1')
+    os.environ.setdefault('FAKE_TOKEN_DELAY', '0.002')
+    os.environ['VECTOR_DB_PATH'] = os.path.join(workdir, 'vector_db')
+    os.environ['METRICS_COMPACT_INTERVAL'] = '0'
+    os.environ['METRICS_EXPORTER_PORT'] = ''
+    # A metrics.json és a többi relatív útvonal az ideiglenes könyvtárba kerül
+    os.chdir(workdir)
+
+
+def _index_corpus(rag, chunks: int = 60):
+    topics = ['akkumulátor', 'gumiabroncs', 'ablaktörlő', 'klíma', 'ajtó', 'töltőkábel']
+    texts = [
+        f"{topics[i % len(topics)]} karbantartás {i}. lépés: ellenőrizze a(z) "
+        f"{topics[(i + 1) % len(topics)]} csatlakozóját, majd indítsa újra a rendszert. "
+        f"The {i}. maintenance step checks the connector and restarts the system."
+        for i in range(chunks)
+    ]
+    metadatas = [{'file_name': 'stress.pdf', 'page_number': i // 3 + 1, 'chunk_index': i} for i in range(chunks)]
+    embeddings = rag.embedding_model.embed_texts(texts)
+    rag.vector_store.add_documents(texts, embeddings, metadatas, ids=[f"stress_{i}" for i in range(chunks)])
+
+
+def _queries(count: int, offset: int):
+    # Egyedi kérdések: a cache / single-flight ne takarja el a párhuzamos futást
+    templates = [
+        "Hogyan kell karbantartani az akkumulátort ({n})?",
+        "How do I check the tire pressure ({n})?",
+        "Mit tegyek, ha nem működik a klíma ({n})?",
+        "Where is the charging cable connector ({n})?",
+    ]
+    return [templates[i % len(templates)].format(n=offset + i) for i in range(count)]
+
+
+def _run_one(rag, query: str, stream: bool) -> int:
+    response = rag.query(query, stream=stream)
+    if stream and 'generator' in response:
+        answer = "".join(response['generator'])
+    else:
+        answer = response.get('answer', '')
+    if not answer:
+        raise AssertionError(f"Üres válasz: {query}")
+    return len(answer)
+
+
+def _run(rag, threads: int, count: int, offset: int):
+    queries = _queries(count, offset)
+    errors = []
+
+    def task(index: int):
+        try:
+            _run_one(rag, queries[index], stream=index % 2 == 1)
+        except Exception as e:
+            errors.append(f"{queries[index]}: {e!r}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(task, range(count)))
+    wall = time.perf_counter() - start
+    return count / wall, errors
+
+
+def _check_abandoned_local_stream(failures: list):
+    """Elhagyott lokális stream: a generálás leáll, az inference slot gyorsan felszabadul"""
+    try:
+        import torch
+        from transformers import TextIteratorStreamer  # noqa: F401
+    except ImportError:
+        print("[7] Elhagyott lokális stream: transformers / torch nincs telepítve, kihagyva")
+        return
+    import gc
+    import threading
+    from src.llm.streaming import StreamingGenerator
+
+    steps = []
+
+    class _Tokenizer:
+        eos_token_id = 0
+
+        def __call__(self, text, return_tensors=None):
+            return {'input_ids': torch.tensor([[1, 2, 3]])}
+
+        def encode(self, text, **kwargs):
+            return text.split()
+
+        def decode(self, ids, **kwargs):
+            return "szó " * len(ids)
+
+    class _SlowModel:
+        """Lassú lokális modell helyettesítő: tokenenként 10 ms, a stopping criteria-t tiszteli"""
+        device = torch.device('cpu')
+
+        def generate(self, input_ids, max_new_tokens, streamer, stopping_criteria=None, **kwargs):
+            streamer.put(input_ids)
+            try:
+                for _ in range(max_new_tokens):
+                    time.sleep(0.01)
+                    steps.append(1)
+                    input_ids = torch.cat([input_ids, torch.tensor([[7]])], dim=-1)
+                    streamer.put(torch.tensor([7]))
+                    if stopping_criteria is not None and stopping_criteria(input_ids, None).all():
+                        break
+            finally:
+                streamer.end()
+
+    class _LocalGenerator(StreamingGenerator):
+        def _init_model(self):
+            self._tokenizer = _Tokenizer()
+            self._pipeline = _SlowModel()
+
+    generator = _LocalGenerator(max_tokens=3000, use_openai=False)
+    stream = generator.generate_stream("Mi a töltőkábel helye?")
+    for _ in range(3):
+        next(stream)
+    # A fogyasztó elhagyja a streamet (pl. SSE disconnect): a GC után a háttérszál zárja le
+    del stream
+    gc.collect()
+
+    acquired = threading.Event()
+
+    def take_slot():
+        with generator._inference_guard:
+            acquired.set()
+
+    start = time.perf_counter()
+    threading.Thread(target=take_slot, daemon=True).start()
+    released = acquired.wait(5.0)
+    waited = time.perf_counter() - start
+    print(f"[7] Elhagyott lokális stream: slot szabad: {released} ({waited:.2f}s), {len(steps)} generált token")
+    if not released or len(steps) >= 3000:
+        failures.append(f"Az elhagyott stream generálása nem állt le (slot szabad: {released}, {len(steps)} token)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Párhuzamos RAGSystem.query stressz teszt')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--queries', type=int, default=160)
+    parser.add_argument('--min-speedup', type=float, default=2.0,
+                        help='Elvárt minimális gyorsulás 1 szálhoz képest')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='rag_stress_')
+    _setup_env(workdir)
+
+    from src.rag_system import RAGSystem
+
+    print("=" * 60)
+    print("PÁRHUZAMOS QUERY STRESSZ TESZT")
+    print("=" * 60)
+    print(f"Munkakönyvtár: {workdir}")
+
+    rag = RAGSystem()
+    _index_corpus(rag)
+    print(f"\n[1] Index: {rag.vector_store.get_collection_info().get('document_count')} chunk")
+
+    # Bemelegítés (modellek, kliensek, system prompt)
+    _run(rag, 1, 4, offset=10_000)
+
+    baseline_count = max(args.queries // 4, 8)
+    single_qps, single_errors = _run(rag, 1, baseline_count, offset=0)
+    print(f"\n[2] 1 szál:  {single_qps:6.1f} query/s ({baseline_count} query)")
+
+    multi_qps, multi_errors = _run(rag, args.threads, args.queries, offset=20_000)
+    speedup = multi_qps / single_qps if single_qps else 0.0
+    print(f"[3] {args.threads} szál: {multi_qps:6.1f} query/s ({args.queries} query), gyorsulás: {speedup:.1f}x")
+
+    failures = []
+    errors = single_errors + multi_errors
+    if errors:
+        failures.append(f"{len(errors)} kérés hibával tért vissza, pl. {errors[0]}")
+    if speedup < args.min_speedup:
+        failures.append(f"Az áteresztőképesség nem skálázódik ({speedup:.1f}x < {args.min_speedup:.1f}x)")
+
+    # Állapot ellenőrzések
+    collector = rag.metrics_collector
+    metrics_file = Path(collector.metrics_file)
+    # Az eventeket a karbantartó szál menti; a futás végén a függők kiírása
+    collector.flush()
+    try:
+        with open(metrics_file, 'r', encoding='utf-8') as f:
+            on_disk = json.load(f)
+        print(f"\n[4] metrics.json: {len(on_disk)} event a lemezen, {len(collector.metrics)} a memóriában")
+        if len(on_disk) != len(collector.metrics):
+            failures.append("A metrics.json eventjei eltérnek a memóriában lévőktől")
+    except ValueError as e:
+        failures.append(f"Sérült metrics.json: {e}")
+    leftovers = list(metrics_file.parent.glob(f".{metrics_file.name}.*.tmp"))
+    if leftovers:
+        failures.append(f"Ideiglenes metrika fájlok maradtak: {leftovers}")
+
+    stats = rag.get_stats()
+    translation = stats['translation_cache']
+    print(f"[5] Fordítási cache: {translation}")
+    if translation['size'] > rag._translation_cache.max_size:
+        failures.append("A fordítási cache túllépte a maximális méretét")
+    print(f"    Retrieval cache: {stats['retrieval_cache']}")
+
+    # Az ismételt (retrieval cache-ből kiszolgált) kérdés is query-nek számít
+    before = collector.get_statistics()['total_retrievals']
+    for _ in range(2):
+        _run_one(rag, "Hogyan kell karbantartani a gumiabroncsot?", stream=False)
+    counted = collector.get_statistics()['total_retrievals'] - before
+    print(f"[6] Ugyanaz a kérdés kétszer: {counted} retrieval event")
+    if counted != 2:
+        failures.append(f"Az ismételt kérdés nem számít bele a query volumenbe ({counted} != 2)")
+
+    _check_abandoned_local_stream(failures)
+
+    rag.close()
+    print("\n" + "=" * 60)
+    if failures:
+        for failure in failures:
+            print(f"HIBA: {failure}")
+        sys.exit(1)
+    print("OK: nincs hiba, az áteresztőképesség skálázódik, az állapot konzisztens")
+
+
+if __name__ == "__main__":
+    main()
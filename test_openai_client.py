@@ -0,0 +1,296 @@
+"""
+Megosztott OpenAI kliens teszt (lokális helyettesítő HTTP szerverrel)
+Egy keep-alive-ot támogató, OpenAI-kompatibilis helyettesítő szervert indít
+(chat, streamelt chat, embeddings), az OPENAI_BASE_URL-t rá irányítja, és
+ellenőrzi, hogy
+  - minden végpont (chat, embeddings, stream) ugyanazt a kliens példányt és
+    connection pool-t kapja,
+  - az egymás utáni kérések egyetlen TCP kapcsolatot használnak újra,
+  - párhuzamos terhelésnél a kapcsolatok száma nem lépi túl az
+    OPENAI_MAX_CONNECTIONS-t,
+  - a streamelt válasz a body végéig in-flight-nak számít,
+  - az InstrumentedTransport metrikái (kérés számláló, fejléc latency,
+    in-flight és pool gauge-ek) a tényleges forgalmat mutatják.
+
+    python test_openai_client.py
+    python test_openai_client.py --threads 16 --max-connections 4
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+project_dir = Path(__file__).parent.absolute()
+sys.path.insert(0, str(project_dir))
+
+CHAT_PATH = '/v1/chat/completions'
+EMBEDDINGS_PATH = '/v1/embeddings'
+STREAM_TOKENS = ['A ', 'töltő', 'kábel ', 'a ', 'csomagtartóban ', 'van.']
+
+
+class StandInServer:
+    """OpenAI-kompatibilis helyettesítő szerver kapcsolat- és párhuzamosság számlálással"""
+
+    def __init__(self, latency: float = 0.02):
+        self.latency = latency
+        self.connections = 0
+        self.requests = {}
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='openai-stand-in', daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}/v1"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1: a kapcsolat a válasz után nyitva marad (keep-alive)
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                # Egy handler példány = egy TCP kapcsolat
+                with server._lock:
+                    server.connections += 1
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                with server._lock:
+                    server.requests[self.path] = server.requests.get(self.path, 0) + 1
+                    server.active += 1
+                    server.max_active = max(server.max_active, server.active)
+                try:
+                    time.sleep(server.latency)
+                    if self.path == CHAT_PATH and body.get('stream'):
+                        self._send(_stream_body(body), 'text/event-stream')
+                    elif self.path == CHAT_PATH:
+                        self._send(json.dumps(_chat_response(body)).encode('utf-8'), 'application/json')
+                    elif self.path == EMBEDDINGS_PATH:
+                        self._send(json.dumps(_embeddings_response(body)).encode('utf-8'), 'application/json')
+                    else:
+                        self.send_error(404)
+                finally:
+                    with server._lock:
+                        server.active -= 1
+
+            def _send(self, payload: bytes, content_type: str):
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def _usage(prompt_tokens: int = 5, completion_tokens: int = 3) -> dict:
+    return {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens}
+
+
+def _chat_response(body: dict) -> dict:
+    return {
+        'id': 'chatcmpl-stand-in', 'object': 'chat.completion', 'created': 0, 'model': body.get('model', 'x'),
+        'choices': [{'index': 0, 'finish_reason': 'stop',
+                     'message': {'role': 'assistant', 'content': body['messages'][-1]['content'][::-1]}}],
+        'usage': _usage(),
+    }
+
+
+def _stream_body(body: dict) -> bytes:
+    def chunk(choices, usage=None):
+        return {'id': 'chatcmpl-stand-in', 'object': 'chat.completion.chunk', 'created': 0,
+                'model': body.get('model', 'x'), 'choices': choices, 'usage': usage}
+
+    events = [chunk([{'index': 0, 'delta': {'content': token}, 'finish_reason': None}]) for token in STREAM_TOKENS]
+    events.append(chunk([], usage=_usage(completion_tokens=len(STREAM_TOKENS))))
+    lines = [f"data: {json.dumps(event)}\n\n" for event in events] + ["data: [DONE]\n\n"]
+    return "".join(lines).encode('utf-8')
+
+
+def _embeddings_response(body: dict) -> dict:
+    inputs = body['input'] if isinstance(body['input'], list) else [body['input']]
+    return {
+        'object': 'list', 'model': body.get('model', 'x'),
+        'data': [{'object': 'embedding', 'index': i, 'embedding': [float(len(text)), 1.0, 0.0]}
+                 for i, text in enumerate(inputs)],
+        'usage': {'prompt_tokens': len(inputs), 'total_tokens': len(inputs)},
+    }
+
+
+def _setup_env(base_url: str, max_connections: int):
+    os.environ['MODEL_BACKEND'] = 'real'
+    os.environ['OPENAI_BASE_URL'] = base_url
+    os.environ.pop('OPENAI_API_KEY', None)
+    os.environ['OPENAI_MAX_CONNECTIONS'] = str(max_connections)
+    os.environ['OPENAI_MAX_KEEPALIVE'] = str(max_connections)
+    os.environ['OPENAI_MAX_RETRIES'] = '0'
+    os.environ['HEDGE_ENABLED'] = '0'
+    os.environ['OPENAI_RPM_LIMIT'] = '0'
+    os.environ['OPENAI_TPM_LIMIT'] = '0'
+
+
+def _http_requests(path: str) -> float:
+    from src.monitoring.openmetrics import REGISTRY
+    return REGISTRY.get_counter('rag_http_requests', labels={'path': path, 'status': '200'})
+
+
+def _chat(i: int) -> str:
+    from src.utils.openai_client import get_openai_client, remote_call
+    client = get_openai_client('chat')
+    response = remote_call('chat', lambda: client.chat.completions.create(
+        model='gpt-4o-mini', messages=[{'role': 'user', 'content': f'kérdés {i}'}]
+    ), estimated_tokens=10)
+    return response.choices[0].message.content
+
+
+def _embed(i: int) -> list:
+    from src.utils.openai_client import get_openai_client, remote_call
+    client = get_openai_client('embeddings')
+    response = remote_call('embeddings', lambda: client.embeddings.create(
+        model='text-embedding-3-small', input=[f'szöveg {i}', 'második']
+    ), estimated_tokens=4)
+    return [item.embedding for item in response.data]
+
+
+def run(threads: int, max_connections: int, failures: list):
+    from src.utils.openai_client import get_openai_client, get_pool_stats, reset_openai_client, remote_call
+
+    server = StandInServer().start()
+    _setup_env(server.base_url, max_connections)
+    reset_openai_client()
+    try:
+        print(f"\nHelyettesítő szerver: {server.base_url}")
+
+        print("[1] Közös kliens és pool")
+        chat_client, embeddings_client = get_openai_client('chat'), get_openai_client('embeddings')
+        if get_openai_client('chat') is not chat_client:
+            failures.append("A get_openai_client('chat') hívásonként új klienst ad")
+        if chat_client._client is not embeddings_client._client:
+            failures.append("A chat és az embeddings kliens nem ugyanazt a httpx klienst (pool-t) használja")
+        if chat_client.timeout == embeddings_client.timeout:
+            failures.append("A végpontonkénti timeout nem érvényesült")
+
+        print("[2] Egymás utáni kérések (keep-alive)")
+        chat_before, embed_before = _http_requests(CHAT_PATH), _http_requests(EMBEDDINGS_PATH)
+        answers = [_chat(i) for i in range(10)]
+        vectors = [_embed(i) for i in range(10)]
+        pool = get_pool_stats()
+        print(f"    {server.connections} TCP kapcsolat 20 kérésre, pool: {pool}")
+        if answers[3] != 'kérdés 3'[::-1] or len(vectors[0]) != 2:
+            failures.append(f"Hibás válasz a helyettesítő szervertől: {answers[3]!r}, {vectors[0]}")
+        if server.connections != 1:
+            failures.append(f"Az egymás utáni kérések nem használták újra a kapcsolatot: {server.connections} kapcsolat")
+        if pool.get('open') != 1 or pool.get('in_flight') != 0:
+            failures.append(f"Váratlan pool állapot: {pool}")
+        if _http_requests(CHAT_PATH) - chat_before != 10 or _http_requests(EMBEDDINGS_PATH) - embed_before != 10:
+            failures.append(
+                f"A rag_http_requests számláló eltér: chat +{_http_requests(CHAT_PATH) - chat_before}, "
+                f"embeddings +{_http_requests(EMBEDDINGS_PATH) - embed_before}"
+            )
+
+        print(f"[3] Párhuzamos kérések ({threads} szál, max {max_connections} kapcsolat)")
+        chat_before = _http_requests(CHAT_PATH)
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(_chat, range(threads * 5)))
+        pool = get_pool_stats()
+        print(f"    {server.connections} TCP kapcsolat, egyszerre max {server.max_active} kérés, pool: {pool}")
+        if server.connections > max_connections or server.max_active > max_connections:
+            failures.append(
+                f"A pool túllépte a korlátot: {server.connections} kapcsolat, {server.max_active} párhuzamos kérés"
+            )
+        if threads > 1 and server.connections < 2:
+            failures.append("Párhuzamos terhelésnél sem nyílt új kapcsolat")
+        if pool.get('in_flight') != 0 or pool.get('open', 0) > max_connections:
+            failures.append(f"Váratlan pool állapot a párhuzamos kérések után: {pool}")
+        if _http_requests(CHAT_PATH) - chat_before != threads * 5:
+            failures.append(f"A párhuzamos kérések száma eltér a számlálótól: +{_http_requests(CHAT_PATH) - chat_before}")
+
+        print("[4] Streamelt válasz")
+        connections_before = server.connections
+        stream_client = get_openai_client('stream')
+        stream = remote_call('stream', lambda: stream_client.chat.completions.create(
+            model='gpt-4o-mini', messages=[{'role': 'user', 'content': 'stream'}],
+            stream=True, stream_options={'include_usage': True}
+        ), estimated_tokens=10)
+        in_flight_open = get_pool_stats().get('in_flight')
+        text, usage = "", None
+        for chunk in stream:
+            if chunk.usage is not None:
+                usage = chunk.usage
+            if chunk.choices and chunk.choices[0].delta.content is not None:
+                text += chunk.choices[0].delta.content
+        in_flight_done = get_pool_stats().get('in_flight')
+        print(f"    {text!r}, in-flight olvasás közben: {in_flight_open}, utána: {in_flight_done}")
+        if text != ''.join(STREAM_TOKENS) or usage is None or usage.completion_tokens != len(STREAM_TOKENS):
+            failures.append(f"Hibás streamelt válasz: {text!r}, usage: {usage}")
+        if in_flight_open != 1 or in_flight_done != 0:
+            failures.append(f"A stream body nem számít in-flight-nak a végéig: {in_flight_open} -> {in_flight_done}")
+        if server.connections != connections_before:
+            failures.append("A streamelt kérés nem a pool meglévő kapcsolatát használta")
+
+        print("[5] OpenMetrics")
+        from src.monitoring.openmetrics import REGISTRY
+        rendered = REGISTRY.render()
+        for line in (
+            f'rag_http_pool_max_connections {max_connections}',
+            'rag_http_pool_in_flight 0',
+            f'rag_http_response_header_seconds_count{{path="{CHAT_PATH}"}}',
+            f'rag_http_requests_total{{path="{EMBEDDINGS_PATH}",status="200"}} 10',
+            'rag_http_pool_connections{state="open"}',
+        ):
+            if line not in rendered:
+                failures.append(f"Hiányzó metrika sor: {line}")
+        utilization = [l for l in rendered.splitlines() if l.startswith('rag_http_pool_utilization ')]
+        print(f"    {utilization[0] if utilization else 'rag_http_pool_utilization hiányzik'}")
+    finally:
+        reset_openai_client()
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Megosztott OpenAI kliens / connection pool teszt')
+    parser.add_argument('--threads', type=int, default=12)
+    parser.add_argument('--max-connections', type=int, default=4)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("OPENAI KLIENS / CONNECTION POOL TESZT")
+    print("=" * 60)
+
+    failures = []
+    run(args.threads, args.max_connections, failures)
+
+    print("\n" + "=" * 60)
+    if failures:
+        for failure in failures:
+            print(f"HIBA: {failure}")
+        sys.exit(1)
+    print("OK: a kérések a közös pool kapcsolatait használják újra, a metrikák a forgalmat mutatják")
+
+
+if __name__ == "__main__":
+    main()
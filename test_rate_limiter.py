@@ -0,0 +1,161 @@
+"""
+Rate limiter teszt (determinisztikus, hálózat nélkül)
+Ellenőrzi, hogy
+  - kimerült keretnél az interaktív kérések megelőzik a korábban sorba
+    állt batch kéréseket,
+  - a batch kérések nem fogyasztják el az interaktív tartalékot,
+  - a 429 utáni szünet (pause) minden várakozót visszatart,
+  - a keretre vágott (túlméretes) kérés elszámolása nem ad vissza soha
+    le nem foglalt tokeneket,
+  - a megosztott állapotfájlon keresztül egy másik processz ugyanabból a
+    keretből fogyaszt, és látja a szünetet.
+
+    python test_rate_limiter.py
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+
+project_dir = Path(__file__).parent.absolute()
+sys.path.insert(0, str(project_dir))
+
+from src.utils.rate_limiter import RateLimiter, fcntl  # noqa: E402
+from src.monitoring.openmetrics import MetricsRegistry  # noqa: E402
+
+CHILD_ACQUIRE = """
+import sys, time
+sys.path.insert(0, {project!r})
+from src.utils.rate_limiter import RateLimiter
+limiter = RateLimiter(tpm=60000, state_file={state!r})
+limiter.acquire({tokens})
+print(time.time())
+"""
+
+
+def _limiter(**kwargs) -> RateLimiter:
+    return RateLimiter(registry=MetricsRegistry(), **kwargs)
+
+
+def check_priority_order(failures: list):
+    # 600 kérés / perc = 10 / s: kimerült keretnél kérésenként 0.1s várakozás
+    limiter = _limiter(rpm=600)
+    limiter._requests.tokens = 0
+    order, threads = [], []
+
+    def call(name: str, priority: str):
+        limiter.acquire(priority=priority)
+        order.append(name)
+
+    def enqueue(name: str, priority: str, queued: int):
+        thread = threading.Thread(target=call, args=(name, priority))
+        thread.start()
+        threads.append(thread)
+        # A következő kérés csak akkor indul, ha ez már a sorban áll
+        while len(limiter._queue) < queued and thread.is_alive():
+            time.sleep(0.001)
+
+    for i in range(3):
+        enqueue(f'batch-{i}', 'batch', i + 1)
+    for i in range(3):
+        enqueue(f'chat-{i}', 'interactive', i + 4)
+    for thread in threads:
+        thread.join()
+    print(f"[1] Admisszió sorrend: {order}")
+    if order[:3] != ['chat-0', 'chat-1', 'chat-2'] or sorted(order[3:]) != ['batch-0', 'batch-1', 'batch-2']:
+        failures.append(f"Az interaktív kérések nem előzték meg a batch kéréseket: {order}")
+
+
+def check_batch_reserve(failures: list):
+    # 60000 token / perc = 1000 / s; a keret 5%-a (3000 token) az interaktív forgalomé
+    limiter = _limiter(tpm=60000, batch_reserve=0.05)
+    limiter._tokens.tokens = 4000
+    chat_wait = limiter.acquire(3500, priority='interactive')
+    # 500 token maradt: a batch kérés a tartalék feletti 3100 tokenig (~2.6s) vár
+    batch_start = time.monotonic()
+    limiter.acquire(100, priority='batch')
+    batch_wait = time.monotonic() - batch_start
+    print(f"[2] Interaktív várakozás: {chat_wait:.2f}s, batch a tartalék felett: {batch_wait:.2f}s")
+    if chat_wait > 0.05:
+        failures.append(f"Az interaktív kérés feleslegesen várt ({chat_wait:.2f}s)")
+    if batch_wait < 2.4:
+        failures.append(f"A batch kérés a tartalékból fogyasztott ({batch_wait:.2f}s várakozás)")
+
+
+def check_pause(failures: list):
+    limiter = _limiter(rpm=6000)
+    limiter.pause(0.3)
+    waited = limiter.acquire(priority='interactive')
+    print(f"[3] 429 szünet után: {waited:.2f}s várakozás")
+    if waited < 0.25:
+        failures.append(f"A pause nem tartotta vissza a kérést ({waited:.2f}s)")
+
+
+def check_usage_clamp(failures: list):
+    limiter = _limiter(tpm=1000)
+    limiter.acquire(5000)
+    limiter.record_usage(5000, 10)
+    tokens = limiter._tokens.tokens
+    print(f"[4] Túlméretes kérés elszámolása után: {tokens:.0f} / {limiter._tokens.capacity:.0f} token")
+    if tokens > limiter._tokens.capacity:
+        failures.append(f"A record_usage le nem foglalt tokeneket térített vissza ({tokens:.0f})")
+
+
+def check_shared_state(workdir: str, failures: list):
+    if fcntl is None:
+        print("[5] Megosztott keret: fcntl nem elérhető, kihagyva")
+        return
+    state = os.path.join(workdir, 'rate_limit_state.json')
+    parent = _limiter(tpm=60000, state_file=state)
+
+    def child_admitted_at(tokens: int) -> float:
+        """A másik processz ekkor (falióra idő) kapott keretet"""
+        code = CHILD_ACQUIRE.format(project=str(project_dir), state=state, tokens=tokens)
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, timeout=60)
+        if output.returncode != 0:
+            raise RuntimeError(output.stderr)
+        return float(output.stdout.strip().splitlines()[-1])
+
+    # A szülő elfogyasztja a teljes keretet: a másik processz 3000 tokent (1000 / s)
+    # csak ~3s múlva kap, a saját indulási idejétől függetlenül
+    parent.acquire(60000)
+    drained_at = time.time()
+    drained = child_admitted_at(3000) - drained_at
+    # A szülő 429-et kapott: a szünet a másik processzre is érvényes
+    parent.pause(3.0)
+    paused_at = time.time()
+    paused = child_admitted_at(1) - paused_at
+    print(f"[5] Másik processz admissziója: kimerült keret után {drained:.2f}s, szünet után {paused:.2f}s")
+    if drained < 2.8:
+        failures.append(f"A másik processz nem a közös keretből fogyasztott ({drained:.2f}s)")
+    if paused < 2.8:
+        failures.append(f"A szünet nem érvényesült a másik processzben ({paused:.2f}s)")
+
+
+def main():
+    print("=" * 60)
+    print("RATE LIMITER TESZT")
+    print("=" * 60)
+
+    failures = []
+    with tempfile.TemporaryDirectory(prefix='rag_ratelimit_') as workdir:
+        check_priority_order(failures)
+        check_batch_reserve(failures)
+        check_pause(failures)
+        check_usage_clamp(failures)
+        check_shared_state(workdir, failures)
+
+    print("\n" + "=" * 60)
+    if failures:
+        for failure in failures:
+            print(f"HIBA: {failure}")
+        sys.exit(1)
+    print("OK: prioritás, tartalék, szünet és a közös keret a várt módon működik")
+
+
+if __name__ == "__main__":
+    main()